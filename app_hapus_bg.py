@@ -20,6 +20,27 @@ if sys.stdout is None:
 if sys.stderr is None:
     sys.stderr = NullWriter()
 
+# --- PROSES WORKER (backend "process" memakai spawn) ---
+# Worker mengimpor ulang modul ini: sebagai __mp_main__ (nama proses bukan MainProcess),
+# atau pada build frozen dengan argumen --multiprocessing-fork sebelum freeze_support().
+# Worker tidak boleh menyentuh folder instalasi atau membuka jendela Tk.
+import multiprocessing
+import multiprocessing.spawn
+IS_POOL_WORKER = (multiprocessing.current_process().name != "MainProcess"
+                  or multiprocessing.spawn.is_forking(sys.argv))
+
+# --- PULIHKAN FILE DUPLIKAT (paket update menyimpan DLL identik hanya sekali) ---
+# Harus sebelum import onnxruntime/torch, karena DLL CUDA yang dipulihkan dimuat di sana
+if not IS_POOL_WORKER:
+    try:
+        from content_store import restore_duplicates
+        _app_dir = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+        _restored = restore_duplicates(_app_dir)
+        if _restored and (_restored["linked"] or _restored["copied"]):
+            print(f"[PRE-LOAD] File duplikat dipulihkan: {_restored}")
+    except Exception as e:
+        print(f"[PRE-LOAD] Gagal memulihkan file duplikat: {e}")
+
 # --- BAGIAN PENCEGAHAN ERROR DLL (Wajib di Paling Atas) ---
 try:
     import onnxruntime as ort
@@ -36,6 +57,7 @@ from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 import tkinter as tk
 import threading
+import time
 
 # License Manager for status display
 try:
@@ -51,12 +73,31 @@ try:
 except ImportError:
     UPDATER_AVAILABLE = False
 
+# Model Store (download with resume + integrity check)
+from model_store import ModelStore
+
+# Komponen instalasi (CUDA/torch opsional untuk PC tanpa GPU NVIDIA)
+from components import COMPONENTS, installed_components, has_nvidia_gpu
+
+# Label perangkat GPU yang komponen CUDA-nya belum terpasang
+GPU_DOWNLOAD_SUFFIX = " (perlu unduh komponen)"
+
+# Mode profiling untuk laporan performa dari PC user (juga: Ctrl+Shift+P)
+PROFILE_FLAG = "--profile"
+
 # --- BAGIAN PENCEGAHAN ERROR IMPORT ---
 try:
     from rembg import remove, new_session
     from PIL import Image, ImageTk
     import io
+    import engine
+    import output_writer
+    from run_report import RunReport
+    from profiler import RunProfiler, diagnostics_dir
+    from autotune import AutoTuner, format_config
 except ImportError as e:
+    if IS_POOL_WORKER:
+        raise
     import tkinter as tk
     root = tk.Tk()
     root.withdraw()
@@ -135,15 +176,53 @@ class BackgroundRemoverApp:
         # Alpha Matting (Remove dark fringe)
         self.alpha_matting = ttk.BooleanVar(value=True)  # Enabled by default
         
+        # Bulk Backend (Thread = satu proses, Proses = multi-core worker processes)
+        self.bulk_backends = ["Thread", "Proses (multi-core)", "Otomatis (auto-tune)"]
+        self.bulk_backend = ttk.StringVar(value=self.bulk_backends[0])
+        self.process_workers = ttk.IntVar(value=engine.default_process_workers())
+        
+        # Output Format (bulk) - encode happens on a separate I/O thread
+        self.output_formats = output_writer.available_formats()
+        self.output_format = ttk.StringVar(value=output_writer.DEFAULT_FORMAT)
+        self.png_compress_level = ttk.IntVar(value=output_writer.DEFAULT_COMPRESS_LEVEL)
+        self.png_optimize = ttk.BooleanVar(value=False)
+        self.output_fsync = ttk.BooleanVar(value=False)
+        
+        # Auto Crop to subject (bulk)
+        self.auto_crop = ttk.BooleanVar(value=False)
+        self.crop_padding = ttk.IntVar(value=10)
+        self.crop_aspects = {"Bebas": None, "1:1": 1.0, "4:3": 4 / 3, "3:4": 3 / 4, "16:9": 16 / 9}
+        self.crop_aspect = ttk.StringVar(value="Bebas")
+        
+        # Laporan waktu per tahap (bulk) - CSV/JSON di folder output
+        self.run_report_enabled = ttk.BooleanVar(value=True)
+        
+        # Profiling (tersembunyi): proses berikutnya dijalankan di bawah cProfile
+        self.profiling = PROFILE_FLAG in sys.argv
+        self._profiler = None
+        
         # Processing Device Selection (CPU/GPU)
         self.available_devices = self.detect_available_devices()
         self.selected_device = ttk.StringVar(value=self.available_devices[0] if self.available_devices else "CPU")
+        
+        # Model Store (checks ~/.u2net and downloads missing models)
+        self.model_store = ModelStore()
 
         self.setup_ui()
+        self.root.bind_all("<Control-Shift-P>", self.toggle_profiling)
+        if self.profiling:
+            self.log_message(f"[INFO] Mode profiling aktif, hasil di: {diagnostics_dir()}")
+        
+        # Silent update check in the background (cached, never blocks the UI)
+        if UPDATER_AVAILABLE:
+            self.root.after(2000, self.check_for_updates_silent)
     
     def detect_available_devices(self):
         """Detect available processing devices (CPU/GPU) with actual names"""
         devices = []
+        app_dir = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+        self.cuda_installed = "onnx-cuda" in (installed_components(app_dir) or COMPONENTS)
+        on_demand_gpu = None
         
         # 1. Detect GPU
         try:
@@ -167,7 +246,11 @@ class BackgroundRemoverApp:
                 except:
                     pass
                 
-                devices.append(gpu_label)
+                if self.cuda_installed:
+                    devices.append(gpu_label)
+                elif has_nvidia_gpu():
+                    # Instalasi CPU di PC dengan GPU NVIDIA: komponen CUDA diunduh saat dipilih
+                    on_demand_gpu = gpu_label + GPU_DOWNLOAD_SUFFIX
         except Exception as e:
             print(f"[INFO] Error detecting GPU: {e}")
         
@@ -185,6 +268,8 @@ class BackgroundRemoverApp:
             pass
             
         devices.append(cpu_label)
+        if on_demand_gpu:
+            devices.append(on_demand_gpu)
         return devices
     
     def get_session_providers(self):
@@ -399,6 +484,45 @@ class BackgroundRemoverApp:
                                           font=("Segoe UI", 9), foreground="gray")
         self.bulk_model_desc.pack(anchor=W, pady=(10, 0))
         
+        # === OUTPUT FORMAT ===
+        output_frame = ttk.Labelframe(self.frame_bulk, text="Format Output", padding=15)
+        output_frame.pack(fill=X, pady=(0, 15))
+        
+        format_row = ttk.Frame(output_frame)
+        format_row.pack(fill=X)
+        ttk.Label(format_row, text="Format:", width=12).pack(side=LEFT)
+        
+        self.format_combo = ttk.Combobox(format_row, textvariable=self.output_format,
+                                          values=self.output_formats, state="readonly", width=16)
+        self.format_combo.pack(side=LEFT, padx=10)
+        self.format_combo.bind("<<ComboboxSelected>>", self.on_output_format_change)
+        
+        ttk.Label(format_row, text="Level PNG:").pack(side=LEFT, padx=(10, 3))
+        self.compress_spin = ttk.Spinbox(format_row, from_=0, to=9, width=3,
+                                          textvariable=self.png_compress_level)
+        self.compress_spin.pack(side=LEFT)
+        
+        self.optimize_check = ttk.Checkbutton(format_row, text="Optimize", variable=self.png_optimize,
+                                               bootstyle="success-round-toggle")
+        self.optimize_check.pack(side=LEFT, padx=(10, 0))
+        
+        ttk.Checkbutton(format_row, text="fsync (lebih aman, lebih lambat)", variable=self.output_fsync,
+                        bootstyle="success-round-toggle").pack(side=RIGHT)
+        
+        self.format_cost_label = ttk.Label(output_frame, font=("Segoe UI", 9), foreground="gray",
+                                            text=output_writer.OUTPUT_FORMATS[self.output_format.get()]["cost"])
+        self.format_cost_label.pack(anchor=W, pady=(10, 0))
+        
+        crop_row = ttk.Frame(output_frame)
+        crop_row.pack(fill=X, pady=(10, 0))
+        ttk.Checkbutton(crop_row, text="✂️ Crop otomatis ke objek", variable=self.auto_crop,
+                        bootstyle="success-round-toggle").pack(side=LEFT)
+        ttk.Label(crop_row, text="Padding (px):").pack(side=LEFT, padx=(15, 3))
+        ttk.Spinbox(crop_row, from_=0, to=500, width=4, textvariable=self.crop_padding).pack(side=LEFT)
+        ttk.Label(crop_row, text="Rasio:").pack(side=LEFT, padx=(15, 3))
+        ttk.Combobox(crop_row, textvariable=self.crop_aspect, values=list(self.crop_aspects.keys()),
+                     state="readonly", width=7).pack(side=LEFT)
+        
         # === ALPHA MATTING ===
         matting_frame = ttk.Frame(self.frame_bulk)
         matting_frame.pack(fill=X, pady=(0, 15))
@@ -411,6 +535,21 @@ class BackgroundRemoverApp:
         )
         self.bulk_matting_check.pack(side=LEFT)
         
+        ttk.Checkbutton(matting_frame, text="📊 Laporan waktu", variable=self.run_report_enabled,
+                        bootstyle="success-round-toggle").pack(side=LEFT, padx=(15, 0))
+        
+        # Backend selection (Thread / Process pool)
+        self.workers_spin = ttk.Spinbox(matting_frame, from_=1, to=max(1, os.cpu_count() or 1),
+                                        textvariable=self.process_workers, width=4, state="disabled")
+        self.workers_spin.pack(side=RIGHT)
+        ttk.Label(matting_frame, text="Worker:").pack(side=RIGHT, padx=(10, 3))
+        
+        self.backend_combo = ttk.Combobox(matting_frame, textvariable=self.bulk_backend,
+                                           values=self.bulk_backends, state="readonly", width=18)
+        self.backend_combo.pack(side=RIGHT)
+        self.backend_combo.bind("<<ComboboxSelected>>", self.on_backend_change)
+        ttk.Label(matting_frame, text="Backend:").pack(side=RIGHT, padx=(0, 3))
+        
         # === STATUS ===
         status_frame = ttk.Frame(self.frame_bulk)
         status_frame.pack(fill=X, pady=(0, 10))
@@ -709,9 +848,52 @@ class BackgroundRemoverApp:
     def on_device_change(self, event=None):
         """Handle device selection change"""
         device = self.selected_device.get()
+        if device.endswith(GPU_DOWNLOAD_SUFFIX):
+            self.offer_gpu_components()
+            return
         self.log_message(f"[INFO] Device diubah ke: {device}")
         self.update_device_description()
 
+    def offer_gpu_components(self):
+        """GPU picked but the CUDA component isn't installed: offer to download it."""
+        cpu_device = next(d for d in self.available_devices if d.startswith("CPU"))
+        self.selected_device.set(cpu_device)
+        if not UPDATER_AVAILABLE:
+            messagebox.showwarning("GPU", "Komponen GPU belum terpasang dan modul updater tidak tersedia.")
+            return
+
+        def size_thread():
+            updater = Updater(UPDATE_VERSION_URL, APP_VERSION)
+            missing = updater.missing_components(["onnx-cuda"])
+            size = updater.component_size(missing)
+            self.root.after(0, lambda: ask(updater, missing, size))
+
+        def ask(updater, missing, size):
+            size_str = f" (±{size / (1024 ** 3):.1f} GB)" if size else ""
+            if messagebox.askyesno("Komponen GPU",
+                f"Akselerasi GPU NVIDIA membutuhkan komponen CUDA{size_str}.\n\n"
+                f"Komponen akan diunduh di latar belakang, lalu aplikasi restart sekali.\n"
+                f"Unduh sekarang?"):
+                self.start_component_install(updater, missing)
+            else:
+                self.log_message("[INFO] Tetap menggunakan CPU.")
+
+        threading.Thread(target=size_thread, daemon=True).start()
+
+    def on_output_format_change(self, event=None):
+        """Update encode cost description and PNG-only controls"""
+        fmt = self.output_format.get()
+        self.format_cost_label.configure(text=output_writer.OUTPUT_FORMATS[fmt]["cost"])
+        png_state = "normal" if fmt == "PNG" else "disabled"
+        self.compress_spin.configure(state=png_state)
+        self.optimize_check.configure(state=png_state)
+
+    def on_backend_change(self, event=None):
+        """Handle bulk backend selection change"""
+        use_process = self.bulk_backend.get() == self.bulk_backends[1]
+        self.workers_spin.configure(state="normal" if use_process else "disabled")
+        self.log_message(f"[INFO] Backend bulk: {self.bulk_backend.get()}")
+
     def update_device_description(self):
         """Update the advantage description label"""
         device = self.selected_device.get()
@@ -729,35 +911,40 @@ class BackgroundRemoverApp:
             return image_data
         
         try:
-            img = Image.open(io.BytesIO(image_data))
-            width, height = img.size
-            
-            # Check if resize is needed
-            if width <= self.max_image_size and height <= self.max_image_size:
-                return image_data
-            
-            # Calculate new dimensions maintaining aspect ratio
-            if width > height:
-                new_width = self.max_image_size
-                new_height = int(height * (self.max_image_size / width))
-            else:
-                new_height = self.max_image_size
-                new_width = int(width * (self.max_image_size / height))
-            
-            # Resize image
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert back to bytes
-            buffer = io.BytesIO()
-            img_resized.save(buffer, format='PNG')
-            resized_data = buffer.getvalue()
-            
-            self.log_message(f"[INFO] Gambar di-resize: {width}x{height} → {new_width}x{new_height}")
+            resized_data, resize_info = engine.resize_for_low_pc(image_data, self.max_image_size)
+            if resize_info:
+                width, height, new_width, new_height = resize_info
+                self.log_message(f"[INFO] Gambar di-resize: {width}x{height} → {new_width}x{new_height}")
             return resized_data
         except Exception as e:
             self.log_message(f"[WARN] Gagal resize: {str(e)}")
             return image_data
 
+    def ensure_model(self, model_name, display_name, status_widget=None):
+        """Download the model through the model store if it is missing or truncated"""
+        if not self.model_store.is_known(model_name) or self.model_store.is_available(model_name):
+            self.root.after(0, lambda: self.log_message(f"[LOAD] Memuat model lokal: {display_name}..."))
+            return
+        
+        model_size = self.model_store.expected_size_mb(model_name)
+        self.root.after(0, lambda: self.log_message(f"[DOWNLOAD] Model {display_name} belum ada. Mengunduh ({model_size} MB)..."))
+        self.root.after(0, lambda: self.log_message("[DOWNLOAD] Mohon tunggu, ini hanya dilakukan sekali."))
+        
+        last_percent = [-1]
+        
+        def on_progress(downloaded, total):
+            if not status_widget or total <= 0:
+                return
+            percent = int(downloaded * 100 / total)
+            if percent == last_percent[0]:
+                return
+            last_percent[0] = percent
+            text = f"Mengunduh model {percent}% ({downloaded / (1024 * 1024):.0f}/{total / (1024 * 1024):.0f} MB)"
+            self.root.after(0, lambda: status_widget.configure(text=text))
+        
+        self.model_store.ensure_model(model_name, progress_callback=on_progress)
+        self.root.after(0, lambda: self.log_message(f"[OK] Model {display_name} terunduh dan terverifikasi."))
+
     def get_internal_model_name(self, display_name):
         """Get internal model name from display name"""
         model_info = self.models.get(display_name, (display_name, ""))
@@ -812,68 +999,9 @@ class BackgroundRemoverApp:
             return image_data
         
         try:
-            import numpy as np
-            from scipy import ndimage
-            
-            img = Image.open(io.BytesIO(image_data))
-            if img.mode != 'RGBA':
-                return image_data
-            
-            img_array = np.array(img, dtype=np.float32)
-            r, g, b, a = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2], img_array[:,:,3]
-            
-            # Step 1: Un-premultiply alpha to recover true colors
-            alpha_safe = np.maximum(a, 1)
-            semi_trans = (a > 0) & (a < 255)
-            r[semi_trans] = np.clip(r[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
-            g[semi_trans] = np.clip(g[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
-            b[semi_trans] = np.clip(b[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
-            
-            # Step 2: Iterative color push from interior to edges
-            for _ in range(5):
-                edge_mask = (a > 5) & (a < 250)
-                if not np.any(edge_mask):
-                    break
-                
-                weight = a / 255.0
-                r_weighted = r * weight
-                g_weighted = g * weight
-                b_weighted = b * weight
-                
-                r_exp = ndimage.maximum_filter(r_weighted, size=3)
-                g_exp = ndimage.maximum_filter(g_weighted, size=3)
-                b_exp = ndimage.maximum_filter(b_weighted, size=3)
-                w_exp = ndimage.maximum_filter(weight, size=3)
-                
-                w_safe = np.maximum(w_exp, 0.01)
-                r[edge_mask] = r[edge_mask] * 0.3 + (r_exp[edge_mask] / w_safe[edge_mask]) * 0.7
-                g[edge_mask] = g[edge_mask] * 0.3 + (g_exp[edge_mask] / w_safe[edge_mask]) * 0.7
-                b[edge_mask] = b[edge_mask] * 0.3 + (b_exp[edge_mask] / w_safe[edge_mask]) * 0.7
-            
-            # Step 3: Brightness boost for remaining dark edges
-            edge_band = (a > 5) & (a < 240)
-            interior = a >= 240
-            if np.any(edge_band) and np.any(interior):
-                brightness = 0.299 * r + 0.587 * g + 0.114 * b
-                interior_bright = np.median(brightness[interior])
-                dark_edges = edge_band & (brightness < interior_bright * 0.5)
-                if np.any(dark_edges):
-                    boost = np.clip(interior_bright * 0.7 / np.maximum(brightness[dark_edges], 1), 1, 2)
-                    r[dark_edges] = np.clip(r[dark_edges] * boost, 0, 255)
-                    g[dark_edges] = np.clip(g[dark_edges] * boost, 0, 255)
-                    b[dark_edges] = np.clip(b[dark_edges] * boost, 0, 255)
-            
-            img_array[:,:,0] = np.clip(r, 0, 255)
-            img_array[:,:,1] = np.clip(g, 0, 255)
-            img_array[:,:,2] = np.clip(b, 0, 255)
-            
-            result = Image.fromarray(img_array.astype(np.uint8))
-            buffer = io.BytesIO()
-            result.save(buffer, format='PNG')
-            
+            result = engine.apply_alpha_matting(image_data)
             self.log_message("[INFO] Alpha Matting applied")
-            return buffer.getvalue()
-            
+            return result
         except ImportError:
             self.log_message("[WARN] scipy tidak tersedia untuk Alpha Matting")
             return image_data
@@ -957,7 +1085,8 @@ class BackgroundRemoverApp:
         self.single_progress.start()
         self.single_status.configure(text="Processing...", foreground="#0dcaf0")
         
-        threading.Thread(target=self._process_single_thread, daemon=True).start()
+        threading.Thread(target=self.run_profiled, args=("single", self._process_single_thread),
+                         daemon=True).start()
 
     def _process_single_thread(self):
         """Thread worker for single image processing"""
@@ -965,34 +1094,8 @@ class BackgroundRemoverApp:
             display_name = self.selected_model.get()
             model_name = self.get_internal_model_name(display_name)  # Get internal name for rembg
             
-            # Known model sizes (in MB) - actual ONNX file sizes
-            MODEL_SIZES = {
-                "u2net": 171,
-                "u2netp": 4.7,
-                "u2net_human_seg": 171,
-                "u2net_cloth_seg": 172,
-                "isnet-general-use": 174,
-                "isnet-anime": 171,
-                "silueta": 43,
-                "birefnet-general": 949,
-                "birefnet-general-lite": 218,
-                "birefnet-portrait": 949,
-                "birefnet-massive": 949,
-                "sam": 375,
-            }
-            
-            # Check if model already exists locally
-            model_dir = os.path.join(os.path.expanduser("~"), ".u2net")
-            model_file = os.path.join(model_dir, f"{model_name}.onnx")
-            
-            if os.path.exists(model_file):
-                # Model exists locally - simple log
-                self.root.after(0, lambda: self.log_message(f"[LOAD] Memuat model lokal: {display_name}..."))
-            else:
-                # Model needs download - show size
-                model_size = MODEL_SIZES.get(model_name, 150)  # Default 150MB if unknown
-                self.root.after(0, lambda ms=model_size: self.log_message(f"[DOWNLOAD] Model {display_name} belum ada. Mengunduh ({ms} MB)..."))
-                self.root.after(0, lambda: self.log_message("[DOWNLOAD] Mohon tunggu, ini hanya dilakukan sekali."))
+            # Make sure the model is downloaded and verified before rembg loads it
+            self.ensure_model(model_name, display_name, self.single_status)
             
             self.set_device_mode()  # Set CPU/GPU mode
             sess_opts = ort.SessionOptions()
@@ -1063,8 +1166,7 @@ class BackgroundRemoverApp:
         
         if filepath:
             try:
-                with open(filepath, 'wb') as f:
-                    f.write(self.single_output_data)
+                output_writer.atomic_write(filepath, self.single_output_data)
                 self.log_message(f"[OK] Tersimpan: {filepath}")
                 messagebox.showinfo("Success", f"Image saved:\n{filepath}")
             except Exception as e:
@@ -1277,7 +1379,41 @@ class BackgroundRemoverApp:
         self.btn_stop.configure(state="normal", text="⬛ STOP")
         
         self.clear_log()
-        threading.Thread(target=self.process_images, daemon=True).start()
+        threading.Thread(target=self.run_profiled, args=("bulk", self.process_images), daemon=True).start()
+
+    def toggle_profiling(self, event=None):
+        """Hidden toggle (Ctrl+Shift+P): profile the next bulk/single runs"""
+        self.profiling = not self.profiling
+        if self.profiling:
+            self.log_message(f"[INFO] Mode profiling aktif, hasil di: {diagnostics_dir()}")
+        else:
+            self.log_message("[INFO] Mode profiling nonaktif")
+
+    def run_profiled(self, label, job):
+        """Run a bulk/single job, under cProfile and the stack sampler when profiling is on"""
+        if not self.profiling:
+            job()
+            return
+        
+        info = {
+            "version": APP_VERSION,
+            "model": self.selected_model.get(),
+            "device": self.selected_device.get(),
+            "backend": self.bulk_backend.get(),
+            "workers": self.process_workers.get(),
+            "low_pc": self.low_pc_mode.get(),
+            "alpha_matting": self.alpha_matting.get(),
+            "format": self.output_format.get(),
+        }
+        try:
+            with RunProfiler(label, info=info) as profiler:
+                self._profiler = profiler
+                job()
+            self.root.after(0, lambda: self.log_message(f"[INFO] Profil disimpan: {profiler.folder}"))
+        except OSError as e:
+            self.root.after(0, lambda m=f"[WARN] Gagal menyimpan profil: {e}": self.log_message(m))
+        finally:
+            self._profiler = None
 
     def process_images(self):
         """Bulk process images"""
@@ -1299,47 +1435,48 @@ class BackgroundRemoverApp:
             model_name = self.get_internal_model_name(display_name)  # Get internal name
             device = self.selected_device.get()
             self.log_message(f"[LOAD] Memuat model AI: {display_name} ({device})...")
-            self.set_device_mode()  # Set CPU/GPU mode
-            sess_opts = ort.SessionOptions()
-            session = new_session(model_name, sess_opts)
-            
-            actual_providers = session.inner_session.get_providers()
-            used_provider = "GPU" if any("CUDA" in p or "TensorRT" in p for p in actual_providers) else "CPU"
-            self.log_message(f"[INFO] Model siap. Provider aktif: {actual_providers[0] if actual_providers else 'Unknown'} ({used_provider})")
-
-            success_count = 0
+            self.ensure_model(model_name, display_name, self.status_label)
+            
+            options = {
+                "low_pc": self.low_pc_mode.get(),
+                "max_image_size": self.max_image_size,
+                "alpha_matting": self.alpha_matting.get(),
+                "format": self.output_format.get(),
+                "compress_level": self.png_compress_level.get(),
+                "optimize": self.png_optimize.get(),
+                "fsync": self.output_fsync.get(),
+                "crop": self.auto_crop.get(),
+                "crop_padding": self.crop_padding.get(),
+                "crop_aspect": self.crop_aspects.get(self.crop_aspect.get()),
+                "instrument": self.run_report_enabled.get(),
+            }
+            if self._profiler:
+                # Process backend workers profile themselves into the same folder
+                options["profile_dir"] = self._profiler.folder
+            ext = output_writer.output_extension(options["format"])
+            jobs, renamed = engine.build_jobs(input_dir, files, output_dir, ext)
+            for source, name in renamed:
+                self.log_message(f"[WARN] Nama output bentrok: {source} disimpan sebagai {name}")
+            report = RunReport(self.bulk_backend.get(), model_name, device, options)
+            
+            backend = self.bulk_backend.get()
+            if backend == self.bulk_backends[2]:
+                success_count = self.run_auto_backend(model_name, device, options, jobs, report)
+            elif backend == self.bulk_backends[1]:
+                success_count = self.run_process_backend(model_name, device, options, jobs, report)
+            else:
+                success_count = self.run_thread_backend(model_name, options, jobs, report)
+            report.finish()
             
-            for index, filename in enumerate(files):
-                if self.stop_flag:
-                    self.log_message("[WARN] >>> PROSES DIHENTIKAN OLEH USER <<<")
-                    break
-                
+            if options["instrument"] and report.results:
+                for line in report.format_summary():
+                    self.log_message(line)
                 try:
-                    input_path = os.path.join(input_dir, filename)
-                    output_filename = os.path.splitext(filename)[0] + ".png"
-                    output_path = os.path.join(output_dir, output_filename)
-
-                    self.root.after(0, lambda m=f"Processing [{index+1}/{len(files)}]: {filename}": 
-                                    self.status_label.configure(text=m))
-
-                    with open(input_path, 'rb') as i:
-                        input_data = i.read()
-                        # Resize if Low PC Mode is enabled
-                        input_data = self.resize_for_low_pc(input_data)
-                        output_data = remove(input_data, session=session)
-                        # Apply alpha matting if enabled
-                        output_data = self.apply_alpha_matting(output_data)
-
-                    with open(output_path, 'wb') as o:
-                        o.write(output_data)
-
-                    success_count += 1
-                    self.root.after(0, lambda m=f"[OK] {filename}": self.log_message(m))
-
-                except Exception as e:
-                    self.root.after(0, lambda m=f"[ERROR] {filename}: {str(e)}": self.log_message(m))
-
-                self.root.after(0, lambda v=index+1: self.progress_bar.configure(value=v))
+                    json_path, csv_path = report.export(output_dir)
+                    self.log_message(f"[INFO] Laporan disimpan: {os.path.basename(json_path)}, "
+                                     f"{os.path.basename(csv_path)}")
+                except OSError as e:
+                    self.log_message(f"[WARN] Gagal menyimpan laporan: {e}")
 
             if self.stop_flag:
                 self.root.after(0, lambda: messagebox.showwarning("Dihentikan", 
@@ -1355,6 +1492,173 @@ class BackgroundRemoverApp:
         finally:
             self.reset_ui()
 
+    def log_file_result(self, result):
+        """Log the outcome of one bulk file (thread or process backend)"""
+        if result.get("resized"):
+            width, height, new_width, new_height = result["resized"]
+            self.log_message(f"[INFO] Gambar di-resize: {width}x{height} → {new_width}x{new_height}")
+        if result.get("matting"):
+            self.log_message("[INFO] Alpha Matting applied")
+        for warning in result.get("warnings", []):
+            self.log_message(f"[WARN] {warning}")
+        if result.get("ok"):
+            self.log_message(f"[OK] {result['file']}")
+        else:
+            self.log_message(f"[ERROR] {result['file']}: {result.get('error')}")
+
+    def progress_text(self, done, total, filename, report):
+        """Status line with the live throughput of the run report"""
+        text = f"Processing [{done}/{total}]: {filename}"
+        rate = report.rate()
+        if rate:
+            eta = report.eta(total - done)
+            remaining = f"{eta / 60:.0f} mnt" if eta >= 90 else f"{eta:.0f} dtk"
+            text += f" — {rate:.1f} gambar/dtk, sisa ~{remaining}"
+        return text
+
+    def run_thread_backend(self, model_name, options, jobs, report, session=None, done_before=0):
+        """Process files one by one in this worker thread"""
+        if session is None:
+            self.set_device_mode()  # Set CPU/GPU mode
+            sess_opts = ort.SessionOptions()
+            load_start = time.perf_counter()
+            session = new_session(model_name, sess_opts)
+            report.add_model_load(time.perf_counter() - load_start, engine.session_provider(session))
+        
+        actual_providers = session.inner_session.get_providers()
+        used_provider = "GPU" if any("CUDA" in p or "TensorRT" in p for p in actual_providers) else "CPU"
+        self.log_message(f"[INFO] Model siap. Provider aktif: {actual_providers[0] if actual_providers else 'Unknown'} ({used_provider})")
+        
+        settled = []
+        
+        def on_result(result):
+            # Called once the output is on disk (a failed write marks the result failed)
+            settled.append(result)
+            report.add(result)
+            self.root.after(0, lambda r=result: self.log_file_result(r))
+        
+        writer = output_writer.OutputWriter(options, on_result=on_result)
+        
+        for index, (input_path, output_path) in enumerate(jobs):
+            if self.stop_flag:
+                self.log_message("[WARN] >>> PROSES DIHENTIKAN OLEH USER <<<")
+                break
+            
+            filename = os.path.basename(input_path)
+            self.root.after(0, lambda m=self.progress_text(done_before + index + 1, done_before + len(jobs),
+                                                           filename, report): 
+                            self.status_label.configure(text=m))
+            
+            try:
+                result = engine.process_file(session, input_path, output_path, options, writer)
+            except Exception as e:
+                result = {"file": filename, "ok": False, "error": str(e)}
+            
+            if result["ok"]:
+                # Its image is still queued on the I/O thread
+                writer.settle(input_path, result)
+            else:
+                on_result(result)
+            self.root.after(0, lambda v=done_before+index+1: self.progress_bar.configure(value=v))
+        
+        # Wait for the I/O thread to flush the remaining outputs
+        writer.close()
+        return sum(1 for result in settled if result["ok"])
+
+    def run_process_backend(self, model_name, device, options, jobs, report, workers=0, done_before=0):
+        """Process files in a pool of worker processes (one session per worker)"""
+        workers = workers or max(1, self.process_workers.get())
+        self.log_message(f"[INFO] Backend proses: {workers} worker, model dibagi lewat memory-map")
+        
+        runner = engine.ProcessPoolRunner(model_name, use_gpu=device.startswith("GPU"),
+                                          options=options, workers=workers)
+        done = [done_before]
+        total = done_before + len(jobs)
+        success = [0]
+        
+        def on_result(result):
+            done[0] += 1
+            report.add(result)
+            if result["ok"]:
+                success[0] += 1
+            self.root.after(0, lambda r=result: self.log_file_result(r))
+            self.root.after(0, lambda v=done[0], m=self.progress_text(done[0], total, result['file'], report): (
+                self.progress_bar.configure(value=v), self.status_label.configure(text=m)))
+        
+        runner.run(jobs, result_callback=on_result, should_stop=lambda: self.stop_flag)
+        
+        if self.stop_flag:
+            self.log_message("[WARN] >>> PROSES DIHENTIKAN OLEH USER <<<")
+        elif runner.memory_report:
+            mb = 1024 * 1024
+            memory = runner.memory_report
+            self.log_message(f"[INFO] Memori worker pertama: {memory['first_worker_rss'] / mb:.0f} MB, "
+                             f"per worker tambahan: {memory['per_additional_worker'] / mb:.0f} MB")
+        return success[0]
+
+    def run_auto_backend(self, model_name, device, options, jobs, report):
+        """Pick the backend by auto-tuning on the first files, then process the rest with it"""
+        tuner = AutoTuner(model_name, use_gpu=device.startswith("GPU"), options=options)
+        remembered = tuner.remembered()
+        session = None
+        done_before = 0
+        success_count = 0
+        
+        if remembered:
+            config = remembered["config"]
+            self.log_message(f"[INFO] Auto-tune: memakai hasil tersimpan ({remembered['measured'][:10]}): "
+                             f"{format_config(config)}, {remembered['rate']:.1f} gambar/dtk")
+        elif not tuner.can_tune(len(jobs)):
+            config = tuner.candidates[0]
+            self.log_message(f"[INFO] Auto-tune dilewati (perlu minimal {tuner.min_files()} file "
+                             f"atau hanya satu kandidat): {format_config(config)}")
+        else:
+            self.log_message(f"[INFO] Auto-tune: mencoba {', '.join(format_config(c) for c in tuner.candidates)} "
+                             f"pada {tuner.trial_files()} file pertama...")
+            done = [0]
+            success = [0]
+            # The thread trial reports written files from its I/O thread
+            lock = threading.Lock()
+            
+            def on_result(result):
+                with lock:
+                    done[0] += 1
+                    report.add(result)
+                    if result["ok"]:
+                        success[0] += 1
+                    count = done[0]
+                self.root.after(0, lambda r=result: self.log_file_result(r))
+                self.root.after(0, lambda v=count, m=self.progress_text(count, len(jobs), result['file'], report): (
+                    self.progress_bar.configure(value=v), self.status_label.configure(text=m)))
+            
+            tuning = tuner.tune(jobs, result_callback=on_result, should_stop=lambda: self.stop_flag)
+            mb = 1024 * 1024
+            for trial in tuning["trials"]:
+                if trial.get("skipped"):
+                    self.log_message(f"[INFO]   {format_config(trial['config'])}: dilewati, perkiraan memori "
+                                     f"{trial['memory'] / mb:.0f} MB melebihi RAM tersedia")
+                else:
+                    memory = f", memori {trial['memory'] / mb:.0f} MB" if trial.get("memory") else ""
+                    self.log_message(f"[INFO]   {format_config(trial['config'])}: "
+                                     f"{trial['rate'] or 0:.1f} gambar/dtk{memory}")
+            config = tuning["config"]
+            if tuning["gain"]:
+                self.log_message(f"[INFO] Auto-tune: {format_config(config)} dipilih, {tuning['rate']:.1f} gambar/dtk "
+                                 f"vs Thread {tuning['baseline_rate']:.1f} ({tuning['gain']:.1f}x)")
+            else:
+                self.log_message(f"[INFO] Auto-tune: {format_config(config)} dipilih")
+            done_before = tuning["files"]
+            success_count = success[0]
+            session = tuner.sessions.get(model_name, tuner.use_gpu) if config["backend"] == "thread" else None
+        
+        report.backend = f"Otomatis: {format_config(config)}"
+        remaining = jobs[done_before:]
+        if config["backend"] == "process":
+            return success_count + self.run_process_backend(model_name, device, options, remaining, report,
+                                                            workers=config["workers"], done_before=done_before)
+        return success_count + self.run_thread_backend(model_name, options, remaining, report,
+                                                       session=session, done_before=done_before)
+
     def reset_ui(self):
         """Reset UI after processing"""
         self.is_processing = False
@@ -1378,16 +1682,32 @@ class BackgroundRemoverApp:
         def check_thread():
             try:
                 updater = Updater(UPDATE_VERSION_URL, APP_VERSION)
+                pending = updater.pending_update()
+                if pending:
+                    self._current_updater = updater
+                    self.root.after(0, lambda: self.btn_update.configure(state="normal", text="🔄"))
+                    self.root.after(0, lambda: self.offer_staged_update(
+                        pending.get('version', '?'), pending['path'],
+                        "Komponen tambahan" if pending.get('components') else None))
+                    return
+                
                 has_update, info = updater.check_for_updates()
                 
                 self.root.after(0, lambda: self.btn_update.configure(state="normal", text="🔄"))
                 
                 if has_update:
                     self.root.after(0, lambda: self.show_update_dialog(info, updater))
+                elif updater.last_check_error:
+                    error = updater.last_check_error
+                    self.root.after(0, lambda: self.log_message(f"[ERROR] Gagal memeriksa update: {error}"))
+                    self.root.after(0, lambda: messagebox.showerror("Error", 
+                        f"Gagal memeriksa update:\n{error}"))
+                elif updater.can_rollback():
+                    self.root.after(0, lambda: self.log_message("[INFO] Aplikasi sudah versi terbaru."))
+                    self.root.after(0, lambda: self.offer_rollback(updater))
                 else:
                     self.root.after(0, lambda: self.log_message("[INFO] Aplikasi sudah versi terbaru."))
-                    self.root.after(0, lambda: messagebox.showinfo("Update", 
-                        f"Anda sudah menggunakan versi terbaru (v{APP_VERSION})."))
+                    self.root.after(0, lambda: self.offer_repair(updater))
             except Exception as e:
                 self.root.after(0, lambda: self.btn_update.configure(state="normal", text="🔄"))
                 self.root.after(0, lambda: self.log_message(f"[ERROR] Gagal memeriksa update: {e}"))
@@ -1396,6 +1716,74 @@ class BackgroundRemoverApp:
         
         threading.Thread(target=check_thread, daemon=True).start()
     
+    def check_for_updates_silent(self):
+        """Startup check: only marks the update button when a new version exists."""
+        updater = Updater(UPDATE_VERSION_URL, APP_VERSION)
+        pending = updater.pending_update()
+        if pending:
+            self.log_message(f"[INFO] Update v{pending.get('version', '?')} sudah siap dipasang. "
+                             f"Klik tombol 🔄 untuk restart dan memasangnya.")
+            self.btn_update.configure(bootstyle="warning")
+            return
+        
+        def on_result(has_update, info):
+            if has_update:
+                version = info.get('version', '?')
+                self.root.after(0, lambda: self.log_message(
+                    f"[INFO] Update tersedia: v{version}. Klik tombol 🔄 untuk memperbarui."))
+                self.root.after(0, lambda: self.btn_update.configure(bootstyle="warning"))
+        
+        updater.check_for_updates_async(on_result)
+    
+    def offer_staged_update(self, version: str, staging_dir: str, label: str = None):
+        """Ask to restart into an update that is already staged (the swap takes seconds)."""
+        if messagebox.askyesno("Update",
+            f"{label or f'Update v{version}'} siap dipasang.\n\n"
+            f"File update sudah disiapkan, pemasangan hanya butuh beberapa detik.\n"
+            f"Restart aplikasi sekarang?"):
+            self._current_updater.apply_sequential_patches([staging_dir])
+        else:
+            self.log_message("[INFO] Update akan tetap disimpan. Klik tombol 🔄 untuk memasangnya nanti.")
+            self.btn_update.configure(bootstyle="warning")
+    
+    def offer_rollback(self, updater):
+        """Latest version installed and the previous one kept: offer to go back to it."""
+        if messagebox.askyesno("Update",
+            f"Anda sudah menggunakan versi terbaru (v{APP_VERSION}).\n\n"
+            f"Versi sebelumnya masih tersimpan.\n"
+            f"Kembalikan ke versi sebelumnya? (aplikasi akan restart)"):
+            self.log_message("[INFO] Mengembalikan versi sebelumnya...")
+            updater.rollback_update()
+    
+    def offer_repair(self, updater):
+        """Latest version installed: offer to verify the install and repair damaged files."""
+        if messagebox.askyesno("Update",
+            f"Anda sudah menggunakan versi terbaru (v{APP_VERSION}).\n\n"
+            f"Periksa file instalasi dan perbaiki file yang rusak atau hilang?"):
+            self.start_repair(updater)
+    
+    def start_repair(self, updater):
+        """Scan the install against the manifest of this version and re-download what differs."""
+        repair_info = updater.repair_info()
+        if not repair_info:
+            messagebox.showwarning("Update", "Server update tidak mendukung pemeriksaan instalasi.")
+            return
+        
+        self.log_message("[INFO] Memeriksa file instalasi...")
+        self.open_update_dialog("Periksa Instalasi", f"🛠️ Periksa & perbaiki v{APP_VERSION}", updater)
+        self._current_updater = updater
+        self._current_update_info = dict(repair_info, repair=True)
+        updater.download_and_apply_async(
+            repair_info,
+            progress_callback=self.on_download_progress,
+            step_callback=self.on_download_step,
+            complete_callback=self.on_download_complete,
+            error_callback=self.on_download_error,
+            verify_local=True,
+            scan_callback=self.on_update_scan,
+            prepare_callback=self.on_update_prepare
+        )
+    
     def show_update_dialog(self, info: dict, updater):
         """Show update available dialog with sequential patch info."""
         new_version = info.get('version', 'Unknown')
@@ -1445,9 +1833,47 @@ class BackgroundRemoverApp:
         """Start downloading and installing the update."""
         self.log_message("[INFO] Mengunduh update...")
         
+        # Title label
+        if use_sequential and chain_info:
+            title_text = f"📦 Sequential Update: {chain_info['version_path_str']}"
+        else:
+            title_text = "📦 Mengunduh Full Update..."
+        self.open_update_dialog("Mengunduh Update", title_text, updater)
+        
+        # Store updater reference and update info
+        self._current_updater = updater
+        self._current_update_info = update_info
+        
+        # Start async download
+        updater.download_and_apply_async(
+            update_info,
+            progress_callback=self.on_download_progress,
+            step_callback=self.on_download_step,
+            complete_callback=self.on_download_complete,
+            error_callback=self.on_download_error,
+            scan_callback=self.on_update_scan,
+            prepare_callback=self.on_update_prepare
+        )
+    
+    def start_component_install(self, updater, components: list):
+        """Download missing components (e.g. CUDA) and restart into them."""
+        self.log_message(f"[INFO] Mengunduh komponen: {', '.join(components)}...")
+        self.open_update_dialog("Mengunduh Komponen", f"📦 Komponen: {', '.join(components)}", updater)
+        self._current_updater = updater
+        self._current_update_info = {'version': APP_VERSION, 'components': components}
+        updater.install_components_async(
+            components,
+            progress_callback=self.on_download_progress,
+            complete_callback=self.on_download_complete,
+            error_callback=self.on_download_error,
+            prepare_callback=self.on_update_prepare
+        )
+    
+    def open_update_dialog(self, window_title: str, title_text: str, updater):
+        """Progress dialog shared by updates and component downloads."""
         # Create progress dialog
         self.update_dialog = tk.Toplevel(self.root)
-        self.update_dialog.title("Mengunduh Update")
+        self.update_dialog.title(window_title)
         self.update_dialog.geometry("450x200")
         self.update_dialog.resizable(False, False)
         self.update_dialog.transient(self.root)
@@ -1462,12 +1888,6 @@ class BackgroundRemoverApp:
         frame = ttk.Frame(self.update_dialog, padding=20)
         frame.pack(fill=BOTH, expand=True)
         
-        # Title label
-        if use_sequential and chain_info:
-            title_text = f"📦 Sequential Update: {chain_info['version_path_str']}"
-        else:
-            title_text = "📦 Mengunduh Full Update..."
-        
         self.update_title_label = ttk.Label(frame, text=title_text, 
                                              font=("Segoe UI", 10, "bold"),
                                              wraplength=400)
@@ -1488,23 +1908,40 @@ class BackgroundRemoverApp:
         self.update_label = ttk.Label(frame, text="0%", font=("Segoe UI", 9))
         self.update_label.pack()
         
-        # Cancel button
-        btn_cancel = ttk.Button(frame, text="Batal", bootstyle="danger-outline",
-                                 command=lambda: self.cancel_update(updater))
-        btn_cancel.pack(pady=(10, 0))
-        
-        # Store updater reference and update info
-        self._current_updater = updater
-        self._current_update_info = update_info
-        
-        # Start async download
-        updater.download_and_apply_async(
-            update_info,
-            progress_callback=self.on_download_progress,
-            step_callback=self.on_download_step,
-            complete_callback=self.on_download_complete,
-            error_callback=self.on_download_error
-        )
+        # Buttons
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(pady=(10, 0))
+        ttk.Button(btn_frame, text="Lanjutkan di latar belakang", bootstyle="secondary-outline",
+                   command=self.hide_update_dialog).pack(side=LEFT, padx=5)
+        ttk.Button(btn_frame, text="Batal", bootstyle="danger-outline",
+                   command=lambda: self.cancel_update(updater)).pack(side=LEFT, padx=5)
+    
+    def hide_update_dialog(self):
+        """Keep downloading and staging in the background; the app stays usable."""
+        try:
+            self.update_dialog.grab_release()
+            self.update_dialog.withdraw()
+        except Exception:
+            pass
+        self.log_message("[INFO] Update diunduh dan disiapkan di latar belakang. "
+                         "Anda akan diberi tahu jika sudah siap.")
+    
+    def on_update_scan(self, done: int, total: int):
+        """Install scan progress (bytes hashed; unchanged files come from the hash cache)."""
+        if total > 0:
+            percent = int(done / total * 100)
+            self.root.after(0, lambda: self.update_step_label.configure(text="Memeriksa file instalasi..."))
+            self.root.after(0, lambda: self.update_progress.configure(value=percent))
+            self.root.after(0, lambda: self.update_label.configure(
+                text=f"{percent}% ({done / (1024 * 1024):.0f} MB / {total / (1024 * 1024):.0f} MB)"))
+    
+    def on_update_prepare(self, done: int, total: int):
+        """Staging progress (files built and verified next to the install)."""
+        if total > 0:
+            percent = int(done / total * 100)
+            self.root.after(0, lambda: self.update_step_label.configure(text="Menyiapkan file update..."))
+            self.root.after(0, lambda: self.update_progress.configure(value=percent))
+            self.root.after(0, lambda: self.update_label.configure(text=f"{percent}% ({done}/{total} file)"))
     
     def on_download_progress(self, downloaded: int, total: int):
         """Update download progress."""
@@ -1541,12 +1978,32 @@ class BackgroundRemoverApp:
             messagebox.showerror("Error", "Download selesai tapi tidak ada file yang tersimpan.")
             return
         
+        if isinstance(path_or_paths, list) and len(path_or_paths) == 0 and self._current_update_info.get('repair'):
+            self.log_message("[INFO] Instalasi utuh, tidak ada file yang perlu diperbaiki.")
+            self.root.after(0, lambda: messagebox.showinfo("Update", "Instalasi utuh, tidak ada file yang perlu diperbaiki."))
+            return
+        
         if isinstance(path_or_paths, list) and len(path_or_paths) == 0:
             self.log_message("[ERROR] Download selesai tapi patch kosong.")
             messagebox.showerror("Error", "Download selesai tapi tidak ada patch yang tersimpan.")
             return
         
-        if is_full:
+        staged = (isinstance(path_or_paths, list) and len(path_or_paths) == 1
+                  and os.path.isdir(path_or_paths[0]))
+        if staged:
+            # Staged next to the install: restarting only swaps it in
+            version = self._current_update_info.get('version', '?')
+            components = self._current_update_info.get('components')
+            if self._current_update_info.get('repair'):
+                label = f"Perbaikan v{version}"
+            elif components and isinstance(components, list):
+                label = f"Komponen {', '.join(components)}"
+            else:
+                label = f"Update v{version}"
+            self.log_message(f"[INFO] {label} siap dipasang.")
+            staging_dir = path_or_paths[0]
+            self.root.after(0, lambda: self.offer_staged_update(version, staging_dir, label))
+        elif is_full:
             # Full update - single path
             update_type = "Full Update"
             self.log_message(f"[INFO] Download full update selesai: {path_or_paths}")
@@ -1602,6 +2059,9 @@ class BackgroundRemoverApp:
 if __name__ == "__main__":
     import subprocess
     
+    # Required for the process backend in the frozen (PyInstaller) exe
+    multiprocessing.freeze_support()
+    
     # Helper function to load app icon
     def get_app_icon_path():
         return os.path.join(os.path.dirname(__file__), "icon.png")
@@ -1644,7 +2104,7 @@ if __name__ == "__main__":
             # Get the script path (works for both .py and frozen .exe)
             if getattr(sys, 'frozen', False):
                 # Running as compiled exe
-                subprocess.Popen([sys.executable])
+                subprocess.Popen([sys.executable] + sys.argv[1:])
             else:
                 # Running as script
                 subprocess.Popen([sys.executable] + sys.argv)
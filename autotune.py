@@ -0,0 +1,268 @@
+"""
+Bulk Auto-Tuner for ZI Background Remover
+=========================================
+Picks the bulk backend configuration for this machine instead of asking the
+operator:
+- Candidates: the thread backend (one session, onnxruntime's own threads)
+  and process pools of 2, 4, 8, 16 workers (at least 2 cores each, one pool
+  size on GPU since the workers share the card)
+- The first files of the run are processed under each candidate in turn;
+  they are real outputs, nothing is thrown away. Throughput is measured at
+  steady state (the first completion wave, model loads included, is
+  excluded) together with the memory used
+- A pool size whose predicted memory (first worker + private memory of each
+  additional one) would not fit in the available RAM is skipped
+- The fastest candidate runs the remaining files, and the choice is
+  remembered per (machine profile, model, device) so later runs skip the
+  trials until MAX_AGE_DAYS have passed
+
+Runs with too few files for the trials are not tuned; they use the
+remembered choice, if any.
+
+Usage:
+    from autotune import AutoTuner
+    tuner = AutoTuner("birefnet-general", use_gpu=False, options=options)
+    config = tuner.remembered()
+    if config is None and tuner.can_tune(len(jobs)):
+        tuning = tuner.tune(jobs, result_callback=on_result)
+        config, jobs = tuning["config"], jobs[tuning["files"]:]
+"""
+
+import os
+import json
+import time
+import platform
+import tempfile
+from datetime import datetime
+
+import engine
+from output_writer import OutputWriter
+
+
+# Files measured per candidate after its first completion wave
+SAMPLES_PER_CANDIDATE = 4
+
+# Only tune runs at least this many times longer than the trials
+MIN_RUN_FACTOR = 3
+
+# A remembered choice is re-measured after this many days
+MAX_AGE_DAYS = 30
+
+# Share of the available RAM a process pool may use
+MEMORY_BUDGET = 0.8
+
+# Process pool sizes tried (capped by the core count)
+POOL_SIZES = (2, 4, 8, 16)
+
+
+def machine_profile(use_gpu: bool) -> dict:
+    """What the best configuration depends on: cores, RAM, CPU architecture, device."""
+    profile = {"cpus": os.cpu_count() or 1, "machine": platform.machine(),
+               "device": "GPU" if use_gpu else "CPU", "ram_gb": None}
+    if engine.PSUTIL_AVAILABLE:
+        profile["ram_gb"] = round(engine.psutil.virtual_memory().total / 1024 ** 3)
+    return profile
+
+
+def profile_key(profile: dict, model_name: str) -> str:
+    return f"{profile['cpus']}c-{profile['ram_gb']}g-{profile['machine']}-{profile['device']}|{model_name}"
+
+
+def candidate_configs(cpu_count: int, use_gpu: bool) -> list[dict]:
+    """Configurations to try, the thread backend (the baseline) first."""
+    configs = [{"backend": "thread", "workers": 1}]
+    pool_sizes = [workers for workers in POOL_SIZES if workers <= cpu_count // 2]
+    if use_gpu:
+        pool_sizes = pool_sizes[:1]
+    return configs + [{"backend": "process", "workers": workers} for workers in pool_sizes]
+
+
+def trial_size(config: dict) -> int:
+    """Files a candidate processes: its first completion wave plus the measured samples."""
+    return config["workers"] + SAMPLES_PER_CANDIDATE
+
+
+def steady_rate(completions: list[float], workers: int) -> float | None:
+    """
+    Images/s between the end of the first completion wave and the last completion.
+
+    Only successful files count, so a candidate whose workers crash is never picked.
+    """
+    if len(completions) <= workers:
+        return None
+    elapsed = completions[-1] - completions[workers - 1]
+    return (len(completions) - workers) / elapsed if elapsed > 0 else None
+
+
+def format_config(config: dict) -> str:
+    """Config as shown in the log."""
+    return "Thread" if config["backend"] == "thread" else f"Proses x{config['workers']}"
+
+
+class AutoTuner:
+    """Measures candidate bulk configurations on the first files of a run."""
+
+    def __init__(self, model_name: str, use_gpu: bool = False, options: dict = None, state_dir: str = None):
+        """
+        Args:
+            model_name: Internal rembg model name (must already be downloaded).
+            use_gpu: Run the candidates on CUDA when available.
+            options: Pipeline options passed to process_file().
+            state_dir: Folder of autotune.json (default: %LOCALAPPDATA%\\ZI-BGRemover).
+        """
+        self.model_name = model_name
+        self.use_gpu = use_gpu
+        self.options = options or {}
+        self.profile = machine_profile(use_gpu)
+        self.key = profile_key(self.profile, model_name)
+        base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+        self.state_path = os.path.join(state_dir or os.path.join(base, "ZI-BGRemover"), "autotune.json")
+        self.candidates = candidate_configs(self.profile["cpus"], use_gpu)
+        # The thread trial's session, reusable for the rest of the run
+        self.sessions = engine.SessionCache()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entry: dict):
+        state = self._load()
+        state[self.key] = entry
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def remembered(self) -> dict | None:
+        """The remembered tuning result for this machine and model, if still fresh."""
+        entry = self._load().get(self.key)
+        if not entry:
+            return None
+        try:
+            age = datetime.now() - datetime.fromisoformat(entry["measured"])
+        except (KeyError, ValueError):
+            return None
+        return entry if age.days < MAX_AGE_DAYS else None
+
+    def trial_files(self) -> int:
+        """Files used by a full tuning pass."""
+        return sum(trial_size(config) for config in self.candidates)
+
+    def min_files(self) -> int:
+        """Smallest run that is tuned."""
+        return self.trial_files() * MIN_RUN_FACTOR
+
+    def can_tune(self, file_count: int) -> bool:
+        """True if there is more than one candidate and the run is long enough for the trials."""
+        return len(self.candidates) > 1 and file_count >= self.min_files()
+
+    def tune(self, jobs: list[tuple[str, str]], result_callback=None, should_stop=None) -> dict:
+        """
+        Run the candidates on the first files of jobs and remember the best.
+
+        Args:
+            jobs: (input_path, output_path) of the whole run; the trials take
+                files from the front.
+            result_callback: Called with each trial file's result dict.
+            should_stop: Polled between files; True ends the tuning early.
+
+        Returns:
+            Dict with 'config' (the fastest candidate), 'rate' (its images/s),
+            'baseline_rate' (thread backend), 'gain' (rate / baseline_rate),
+            'trials' (per candidate: config, rate, memory, or 'skipped') and
+            'files' (how many jobs the trials used).
+        """
+        trials = []
+        position = 0
+        pool_memory = None
+        for config in self.candidates:
+            if should_stop and should_stop():
+                break
+            size = trial_size(config)
+            if position + size > len(jobs):
+                break
+
+            if config["backend"] == "process" and pool_memory and engine.PSUTIL_AVAILABLE:
+                predicted = pool_memory["first_worker_rss"] + (config["workers"] - 1) * pool_memory["per_additional_worker"]
+                if predicted > engine.psutil.virtual_memory().available * MEMORY_BUDGET:
+                    trials.append({"config": config, "rate": None, "memory": predicted, "skipped": "memory"})
+                    continue
+
+            batch = jobs[position:position + size]
+            position += size
+            if config["backend"] == "thread":
+                trial = self._run_thread(batch, result_callback, should_stop)
+            else:
+                trial = self._run_process(config["workers"], batch, result_callback, should_stop)
+                pool_memory = trial.pop("memory_report") or pool_memory
+            trials.append({"config": config, **trial})
+
+        measured = [trial for trial in trials if trial.get("rate")]
+        if not measured:
+            return {"config": self.candidates[0], "rate": None, "baseline_rate": None, "gain": None,
+                    "trials": trials, "files": position}
+
+        best = max(measured, key=lambda trial: trial["rate"])
+        baseline = trials[0]["rate"] if trials[0].get("rate") else None
+        result = {
+            "config": best["config"],
+            "rate": best["rate"],
+            "baseline_rate": baseline,
+            "gain": best["rate"] / baseline if baseline else None,
+            "trials": trials,
+            "files": position,
+        }
+        if len(measured) == len([trial for trial in trials if not trial.get("skipped")]) and len(measured) > 1:
+            # Only a complete pass is remembered (not one cut short by a stop)
+            self._save({"config": best["config"], "rate": best["rate"], "baseline_rate": baseline,
+                        "profile": self.profile, "measured": datetime.now().isoformat(timespec="seconds"),
+                        "trials": [{"config": trial["config"], "rate": trial.get("rate")} for trial in trials]})
+        return result
+
+    def _run_thread(self, batch, result_callback, should_stop) -> dict:
+        session = self.sessions.get(self.model_name, self.use_gpu)
+        completions = []
+
+        def on_result(result):
+            # Encoding happens on the writer thread: a file completes once it is written
+            if result["ok"]:
+                completions.append(time.perf_counter())
+            if result_callback:
+                result_callback(result)
+
+        writer = OutputWriter(self.options, on_result=on_result)
+        for input_path, output_path in batch:
+            if should_stop and should_stop():
+                break
+            try:
+                result = engine.process_file(session, input_path, output_path, self.options, writer)
+            except Exception as e:
+                result = {"file": os.path.basename(input_path), "ok": False, "error": str(e), "warnings": []}
+            if result["ok"]:
+                writer.settle(input_path, result)
+            else:
+                on_result(result)
+        writer.close()
+        memory = engine.process_memory()
+        return {"rate": steady_rate(completions, 1), "memory": memory["rss"] if memory else None}
+
+    def _run_process(self, workers, batch, result_callback, should_stop) -> dict:
+        runner = engine.ProcessPoolRunner(self.model_name, use_gpu=self.use_gpu, options=self.options,
+                                          workers=workers)
+        completions = []
+
+        def on_result(result):
+            if result["ok"]:
+                completions.append(time.perf_counter())
+            if result_callback:
+                result_callback(result)
+
+        runner.run(batch, result_callback=on_result, should_stop=should_stop)
+        memory = runner.memory_report
+        return {"rate": steady_rate(completions, workers),
+                "memory": memory["total_rss"] if memory else None,
+                "memory_report": memory}
@@ -0,0 +1,119 @@
+"""
+Bulk Backend Benchmark: Thread vs Process
+=========================================
+Runs the bulk pipeline over a synthetic fixture set with the thread backend
+(one session, one Python thread) and the process backend (ProcessPoolRunner).
+
+Usage:
+    python benchmarks/bench_backends.py [--images 500] [--workers 4] [--real-model u2netp]
+
+By default a stub ONNX model is used so the benchmark runs offline and measures
+the Python-side pipeline (decode, matting, PNG encode). Pass --real-model to
+benchmark an actual downloaded model from ~/.u2net.
+
+Before timing, a stub two-file "sam" model is run through the process
+backend with shared weights, to check that every file of a multi-file model
+is converted and handed to its session.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import make_images, make_stub_model, make_stub_sam  # noqa: E402
+
+
+def run_thread(model_name, jobs, options):
+    import engine
+    session = engine.SessionCache().get(model_name)
+    start = time.perf_counter()
+    ok = sum(1 for src, dst in jobs if engine.process_file(session, src, dst, options)["ok"])
+    return ok, time.perf_counter() - start
+
+
+def run_process(model_name, jobs, options, workers):
+    import engine
+    runner = engine.ProcessPoolRunner(model_name, options=options, workers=workers)
+    start = time.perf_counter()
+    results = runner.run(jobs)
+    elapsed = time.perf_counter() - start
+    return sum(1 for r in results if r.get("ok")), elapsed, runner.memory_report
+
+
+def check_multi_file_model(fixtures: str):
+    """The process backend opens a multi-file model (stub sam) with shared weights."""
+    import engine
+    model_dir = os.path.join(fixtures, "sam_models")
+    make_stub_sam(model_dir)
+    inputs = make_images(os.path.join(fixtures, "sam_images"), 4, (320, 240))
+    out_dir = tempfile.mkdtemp(prefix="zi_bench_sam_")
+    try:
+        runner = engine.ProcessPoolRunner("sam", options={}, workers=2)
+        results = runner.run([(p, os.path.join(out_dir, os.path.basename(p) + ".png")) for p in inputs])
+        assert len(results) == len(inputs) and all(r["ok"] for r in results), results
+        assert all(os.path.exists(path + ".data") for path in engine.shared_model_paths("sam"))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    print("Multi-file model (sam) through the process backend: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thread vs process bulk backends")
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--size", default="1024x768", help="Image size WxH")
+    parser.add_argument("--workers", type=int, default=0, help="Process workers (0 = default)")
+    parser.add_argument("--no-matting", action="store_true", help="Disable alpha matting")
+    parser.add_argument("--real-model", metavar="NAME", help="Use a real model instead of the stub")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "zi_bench_fixtures"))
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    check_multi_file_model(args.fixtures)
+    if args.real_model:
+        model_name = args.real_model
+    else:
+        model_name = "u2netp"
+        make_stub_model(os.path.join(args.fixtures, "models"), model_name)
+
+    print(f"Generating {args.images} fixture images ({width}x{height})...")
+    inputs = make_images(os.path.join(args.fixtures, "images"), args.images, (width, height))
+    options = {"alpha_matting": not args.no_matting}
+
+    import engine
+    workers = args.workers or engine.default_process_workers()
+    rows = []
+
+    for label in ("thread", "process"):
+        out_dir = tempfile.mkdtemp(prefix=f"zi_bench_{label}_")
+        jobs = [(p, os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ".png")) for p in inputs]
+        if label == "thread":
+            ok, elapsed = run_thread(model_name, jobs, options)
+            memory = None
+        else:
+            ok, elapsed, memory = run_process(model_name, jobs, options, workers)
+        rows.append((label, ok, elapsed, memory))
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print()
+    print(f"{'Backend':<10}{'OK':>6}{'Time (s)':>10}{'img/s':>8}")
+    for label, ok, elapsed, _ in rows:
+        name = label if label == "thread" else f"process x{workers}"
+        print(f"{name:<10}{ok:>6}{elapsed:>10.2f}{ok / elapsed:>8.1f}")
+
+    thread_time, process_time = rows[0][2], rows[1][2]
+    print(f"\nSpeedup (process vs thread): {thread_time / process_time:.2f}x")
+
+    memory = rows[1][3]
+    if memory:
+        mb = 1024 * 1024
+        print(f"Worker memory: first {memory['first_worker_rss'] / mb:.0f} MB RSS, "
+              f"+{memory['per_additional_worker'] / mb:.0f} MB per additional worker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Install Components Benchmark
+============================
+Part 1, on the real manifests in the repo: size of each component
+(components.py) and what the CPU profile (core + onnx-cpu) saves in install
+size, file count and net update size (1.0.6 -> 1.0.8) against the full bundle.
+
+Part 2, end to end on a synthetic release served by the local HTTP stand-in
+(http_standin.py), through the Updater:
+- a CPU-only install updates 1.0.0 -> 1.0.1 and only fetches the files of its
+  components (net update from the content store)
+- the user picks the GPU: install_components_async fetches onnx-cuda for the
+  installed version, stages it and records the new component list
+- a patch chain staged for a CPU-only install skips the CUDA deltas instead of
+  failing on their missing base files
+Every resulting tree is compared with the expected one.
+
+Usage:
+    python benchmarks/bench_components.py [--manifest-dir .]
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import components  # noqa: E402
+import delta_patch  # noqa: E402
+import patch_applier  # noqa: E402
+from content_store import publish_blobs  # noqa: E402
+from manifest_generator import generate_manifest  # noqa: E402
+from update_planner import plan_net_update  # noqa: E402
+from updater import Updater  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def real_manifests(manifest_dir: str):
+    with open(os.path.join(manifest_dir, "manifest_v1.0.8.json"), 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    with open(os.path.join(manifest_dir, "manifest_v1.0.6.json"), 'r', encoding='utf-8') as f:
+        old = json.load(f)
+
+    summary = components.summarize(new)
+    print(components.format_summary(summary))
+
+    cpu = components.with_requirements(components.CPU_PROFILE)
+    full_plan = plan_net_update(old, new)
+    cpu_plan = plan_net_update(components.filter_manifest(old, cpu), components.filter_manifest(new, cpu))
+    cpu_files = sum(summary[name]["files"] for name in cpu)
+    cpu_size = sum(summary[name]["size"] for name in cpu)
+    total_files = sum(entry["files"] for entry in summary.values())
+    total_size = sum(entry["size"] for entry in summary.values())
+
+    print(f"\n{'1.0.8 install':<26}{'Full':>12}{'CPU profile':>14}")
+    print(f"{'files on disk':<26}{total_files:>12}{cpu_files:>14}")
+    print(f"{'install size (MB)':<26}{total_size / MB:>12.0f}{cpu_size / MB:>14.0f}")
+    print(f"{'net update 1.0.6 (MB)':<26}{full_plan['net_bytes'] / MB:>12.0f}{cpu_plan['net_bytes'] / MB:>14.0f}")
+
+
+def _write(root: str, rel_path: str, data: bytes):
+    path = os.path.join(root, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build_release(work: str) -> tuple[str, str]:
+    """Two synthetic releases with files in every component; the second changes some of each."""
+    rng = random.Random(3)
+    files = {
+        "ZI-BGRemover.exe": rng.randbytes(300_000),
+        "_internal/python310.dll": rng.randbytes(200_000),
+        "_internal/PIL/_imaging.pyd": rng.randbytes(100_000),
+        "_internal/onnxruntime/capi/onnxruntime.dll": rng.randbytes(400_000),
+        "_internal/onnxruntime/capi/onnxruntime_providers_shared.dll": rng.randbytes(10_000),
+        "_internal/onnxruntime/capi/onnxruntime_providers_cuda.dll": rng.randbytes(900_000),
+        "_internal/onnxruntime/capi/cublasLt64_12.dll": rng.randbytes(1_500_000),
+        "_internal/onnxruntime/capi/cudnn64_9.dll": rng.randbytes(700_000),
+        "_internal/torch/lib/torch_cpu.dll": rng.randbytes(1_200_000),
+        "_internal/transformers/__init__.pyc": rng.randbytes(50_000),
+    }
+    old_dir, new_dir = os.path.join(work, "v1.0.0"), os.path.join(work, "v1.0.1")
+    for rel_path, data in files.items():
+        _write(old_dir, rel_path, data)
+        changed = rel_path.endswith((".exe", "onnxruntime.dll", "cudnn64_9.dll", "torch_cpu.dll"))
+        _write(new_dir, rel_path, data[:-1000] + rng.randbytes(1000) if changed else data)
+    return old_dir, new_dir
+
+
+def _tree(folder: str) -> dict:
+    return generate_manifest(folder, "-")["files"]
+
+
+def _expected(manifest: dict, names: list[str]) -> dict:
+    return components.filter_manifest(manifest, names)["files"]
+
+
+def run_async(start) -> list:
+    """Run an Updater *_async call and wait for its complete/error callback."""
+    done = threading.Event()
+    result = []
+
+    def complete(paths, is_full):
+        result.append(paths)
+        done.set()
+
+    def error(message):
+        result.append(RuntimeError(message))
+        done.set()
+
+    start(complete, error)
+    done.wait(60)
+    if not result or isinstance(result[0], Exception):
+        raise AssertionError(f"Updater failed: {result}")
+    return result[0]
+
+
+def end_to_end(work: str):
+    old_dir, new_dir = build_release(work)
+    old_manifest = generate_manifest(old_dir, "1.0.0")
+    new_manifest = generate_manifest(new_dir, "1.0.1")
+    store = os.path.join(work, "content")
+    publish_blobs(old_dir, old_manifest, store)
+    publish_blobs(new_dir, new_manifest, store)
+    cpu = components.with_requirements(components.CPU_PROFILE)
+
+    # CPU-only install of 1.0.0, as the installer leaves it
+    app = os.path.join(work, "install", "ZI-BGRemover")
+    for rel_path in _expected(old_manifest, cpu):
+        _write(app, rel_path, open(os.path.join(old_dir, *rel_path.split('/')), 'rb').read())
+    components.write_components(app, cpu)
+    os.environ["LOCALAPPDATA"] = os.path.join(work, "state")
+
+    with StandinServer() as server:
+        for version, manifest in (("1.0.0", old_manifest), ("1.0.1", new_manifest)):
+            server.add_file(f"/manifest_v{version}.json", json.dumps(manifest).encode())
+        for name in os.listdir(store):
+            server.add_file(f"/content/{name}", open(os.path.join(store, name), 'rb').read())
+        version_json = {
+            "version": "1.0.1",
+            "manifest_url": server.url("/manifest_v") + "{version}.json",
+            "content_url": server.url("/content/"),
+            "components": {name: {"files": info["files"], "size": info["size"]}
+                           for name, info in new_manifest["components"].items()},
+            "patches": [],
+        }
+        server.add_file("/version.json", json.dumps(version_json).encode())
+
+        # Update: only the CPU components' files are fetched
+        updater = Updater(server.url("/version.json"), "1.0.0", app)
+        has_update, info = updater.check_for_updates()
+        assert has_update
+        before = server.bytes_sent
+        staged = run_async(lambda complete, error: updater.download_and_apply_async(
+            info, complete_callback=complete, error_callback=error))
+        fetched = server.bytes_sent - before
+        patch_applier.apply_staged(app, staged[0])
+        expected = _expected(new_manifest, cpu)
+        got = _tree(app)
+        got.pop(components.COMPONENTS_FILE)
+        assert got == expected, "CPU update result differs"
+        changed_all = sum(info["size"] for path, info in new_manifest["files"].items()
+                          if old_manifest["files"][path]["hash"] != info["hash"])
+        changed_cpu = sum(info["size"] for path, info in expected.items()
+                          if old_manifest["files"][path]["hash"] != info["hash"])
+        print(f"\nCPU install 1.0.0 -> 1.0.1: fetched {fetched / 1024:.0f} KB "
+              f"(changed files: {changed_cpu / 1024:.0f} KB of {changed_all / 1024:.0f} KB in the full bundle)")
+
+        # The user picks the GPU: add onnx-cuda for the installed version
+        updater = Updater(server.url("/version.json"), "1.0.1", app)
+        missing = updater.missing_components(["onnx-cuda"])
+        assert missing == ["onnx-cuda"], missing
+        print(f"GPU picked: missing {missing}, about {updater.component_size(missing) / 1024:.0f} KB")
+        staged = run_async(lambda complete, error: updater.install_components_async(
+            missing, complete_callback=complete, error_callback=error))
+        pending = updater.pending_update()
+        assert pending and pending["path"] == staged[0] and pending["components"]
+        patch_applier.apply_staged(app, staged[0])
+        gpu = components.with_requirements(cpu + missing)
+        got = _tree(app)
+        got.pop(components.COMPONENTS_FILE)
+        assert got == _expected(new_manifest, gpu), "Component install result differs"
+        assert sorted(components.installed_components(app)) == sorted(gpu)
+        print(f"onnx-cuda installed: components now {', '.join(components.installed_components(app))}")
+
+    # Delta patch chain on a CPU-only install: CUDA deltas are skipped
+    patch_path = os.path.join(work, "patch.zip")
+    delta_patch.create_patch(old_dir, new_dir, old_manifest, new_manifest, patch_path)
+    cpu_app = os.path.join(work, "cpu_only")
+    for rel_path in _expected(old_manifest, cpu):
+        _write(cpu_app, rel_path, open(os.path.join(old_dir, *rel_path.split('/')), 'rb').read())
+    staging_dir = os.path.join(work, "staging")
+    staged, _ = patch_applier.stage([patch_path], cpu_app, staging_dir, skip=components.skip_filter(cpu))
+    assert all(components.component_of(path) in cpu for path in staged)
+    print(f"Patch chain on a CPU-only install: {len(staged)} files staged, CUDA/torch deltas skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Component split: sizes and the on-demand install flow")
+    parser.add_argument("--manifest-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args()
+
+    real_manifests(args.manifest_dir)
+    work = tempfile.mkdtemp(prefix="zi_bench_components_")
+    try:
+        end_to_end(work)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
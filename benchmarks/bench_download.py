@@ -0,0 +1,178 @@
+"""
+Downloader Benchmark
+====================
+Runs the updater downloads against a local HTTP stand-in (http_standin.py):
+- legacy: single connection, 8 KB reads, progress on every chunk, no resume
+  (the old Updater.download_file)
+- downloader.py with 1 and N connections, each connection throttled to the
+  same rate (like a CDN capping per-connection throughput)
+
+Then checks the failure handling, verifying the SHA-256 of every result:
+- injected disconnects: legacy fails, downloader resumes from the .part file
+- cancellation latency and resume after cancel
+- server file replaced between attempts: If-Range makes it start over
+- server without Range support
+- SHA-256 verification while streaming, and rejection of a mismatch
+
+Usage:
+    python benchmarks/bench_download.py [--mb 64] [--rate-mb 16] [--connections 4]
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+from urllib.request import urlopen, Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import downloader  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+
+def legacy_download(url: str, dest_path: str, progress_callback=None) -> bool:
+    """The previous Updater.download_file."""
+    try:
+        req = Request(url, headers={'User-Agent': 'ZI-BGRemover-Updater'})
+        with urlopen(req, timeout=300) as response:
+            total_size = int(response.headers.get('Content-Length', 0))
+            downloaded = 0
+            with open(dest_path, 'wb') as f:
+                while True:
+                    chunk = response.read(8192)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress_callback and total_size > 0:
+                        progress_callback(downloaded, total_size)
+        return downloaded == total_size
+    except Exception:
+        return False
+
+
+def sha256_file(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and fault-test the resumable downloader")
+    parser.add_argument("--mb", type=int, default=64, help="Test file size")
+    parser.add_argument("--rate-mb", type=float, default=16, help="Per-connection rate limit (MB/s)")
+    parser.add_argument("--connections", type=int, default=4)
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    downloader.PARALLEL_MIN_SIZE = min(downloader.PARALLEL_MIN_SIZE, args.mb * mb // 2)
+    data = random.Random(3).randbytes(args.mb * mb)
+    # Drop points of the fault checks: MB steps, scaled down for files under 16 MB
+    step = min(mb, len(data) // 16)
+    expected = hashlib.sha256(data).hexdigest()
+    work = tempfile.mkdtemp(prefix="zi_bench_download_")
+    dest = os.path.join(work, "update.zip")
+
+    def check(label: str):
+        assert sha256_file(dest) == expected, f"{label}: content mismatch"
+        assert not os.path.exists(dest + downloader.PART_SUFFIX), f"{label}: .part left behind"
+        os.remove(dest)
+
+    with StandinServer(rate=int(args.rate_mb * mb)) as server:
+        server.add_file("/update.zip", data)
+        url = server.url("/update.zip")
+
+        print(f"{args.mb} MB file, {args.rate_mb:g} MB/s per connection\n")
+        print(f"{'Method':<28}{'Time (s)':>10}{'Callbacks':>11}")
+        calls = []
+        start = time.perf_counter()
+        assert legacy_download(url, dest, lambda d, t: calls.append(d))
+        print(f"{'legacy (8 KB reads)':<28}{time.perf_counter() - start:>10.2f}{len(calls):>11}")
+        check("legacy")
+
+        for connections in (1, args.connections):
+            calls = []
+            start = time.perf_counter()
+            downloader.download(url, dest, lambda d, t: calls.append(d), connections=connections)
+            label = f"downloader, {connections} conn"
+            print(f"{label:<28}{time.perf_counter() - start:>10.2f}{len(calls):>11}")
+            check(label)
+
+        server.rate = None
+        print("\nFault handling:")
+
+        # Disconnects: every request of the first few is cut short
+        server.faults["/update.zip"] = {"drop_after": [5 * step, 3 * step, 7 * step]}
+        assert not legacy_download(url, dest), "legacy should fail on a dropped connection"
+        print("  legacy, dropped connection:     failed (restart from zero)")
+        server.faults["/update.zip"] = {"drop_after": [5 * step, 3 * step, 7 * step]}
+        before = len(server.requests)
+        downloader.download(url, dest, connections=1)
+        check("disconnects")
+        print(f"  3 drops, 1 connection:          OK after {len(server.requests) - before} requests")
+        server.faults["/update.zip"] = {"drop_after": [5 * step, 3 * step, 7 * step, 2 * step]}
+        downloader.download(url, dest, connections=args.connections, sha256=expected)
+        check("disconnects parallel")
+        print(f"  4 drops, {args.connections} connections:        OK (SHA-256 checked while streaming)")
+
+        # Wrong published hash: rejected when the download finishes, nothing kept
+        try:
+            downloader.download(url, dest, connections=args.connections, sha256="0" * 64)
+            raise AssertionError("hash mismatch not detected")
+        except downloader.IntegrityError:
+            assert not os.path.exists(dest) and not os.path.exists(dest + downloader.PART_SUFFIX)
+        print("  wrong SHA-256:                  rejected, partial file removed")
+
+        # Cancel at about 30 %, then resume from the .part file. Throttled so the
+        # download takes about 2 s whatever --mb is, leaving time to see the progress
+        server.rate = max(1, len(data) // (2 * args.connections))
+        cancel = threading.Event()
+        cancelled_at = []
+
+        def cancel_at_30(downloaded, total):
+            if not cancel.is_set() and downloaded >= total * 0.3:
+                cancelled_at.append(time.perf_counter())
+                cancel.set()
+
+        try:
+            downloader.download(url, dest, cancel_at_30, cancel_event=cancel, connections=args.connections)
+            raise AssertionError("download should have been cancelled")
+        except InterruptedError:
+            latency = time.perf_counter() - cancelled_at[0]
+        server.rate = None
+        resumed = []
+        downloader.download(url, dest, lambda d, t: resumed.append(d), connections=args.connections)
+        check("resume after cancel")
+        print(f"  cancel latency:                 {latency * 1000:.0f} ms, resumed at {resumed[0] / mb:.1f} MB")
+
+        # File replaced on the server while a partial download exists
+        server.faults["/update.zip"] = {"drop_after": [10 * step]}
+        try:
+            downloader.download(url, dest, connections=1, retries=0)
+        except downloader.DownloadError:
+            pass
+        data2 = random.Random(4).randbytes(args.mb * mb)
+        server.add_file("/update.zip", data2)
+        downloader.download(url, dest, connections=1)
+        assert sha256_file(dest) == hashlib.sha256(data2).hexdigest(), "stale partial data was reused"
+        os.remove(dest)
+        server.add_file("/update.zip", data)
+        print("  file changed on server:         restarted via If-Range, OK")
+
+    # Server without Range support: one restart, then a plain download
+    with StandinServer(ranges=False) as server:
+        server.add_file("/update.zip", data)
+        server.faults["/update.zip"] = {"drop_after": [5 * step]}
+        downloader.download(server.url("/update.zip"), dest, connections=args.connections)
+        check("no ranges")
+        print("  server without Range support:   OK (restarted once)")
+
+    os.rmdir(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Engine Benchmark
+================
+Times every stage of the image pipeline on deterministic synthetic images
+(fixtures.make_image: soft-edged subject, textured background) at several
+resolutions, offline on CPU with the stub ONNX model:
+- decode: open + load the input file
+- resize: resize_image (Low PC Mode, longest side > --max-size)
+- inference: rembg remove() with the session (pre/post-processing included)
+- matting: matte_image
+- encode: output_writer.encode_image
+- write: atomic_write of the encoded bytes
+and the two pipelines end to end:
+- single: the GUI single mode on encoded bytes (resize_for_low_pc, remove,
+  apply_alpha_matting)
+- bulk: engine.process_file (the bulk loop body)
+- bulk_timed: the same with the run report instrumentation on
+
+Each stage reports mean, p50 and p95 latency, throughput (images/s) and the
+process peak RSS after the resolution ran (sizes run smallest first, so the
+peak belongs to the largest size so far). Results are written as JSON;
+--baseline compares the run against a saved result and exits 1 when a stage
+got slower than --threshold (and slower by more than --min-ms), or the peak
+RSS grew by more than --threshold.
+
+Usage:
+    python benchmarks/bench_engine.py [--sizes 640x480,1280x960,2560x1920] [--images 3] [--repeat 3]
+                                      [--output engine.json] [--baseline baseline.json] [--threshold 0.1]
+    python benchmarks/bench_engine.py --compare current.json baseline.json
+    python benchmarks/bench_engine.py --real-model u2netp   (a downloaded model from ~/.u2net)
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import make_images, make_stub_model  # noqa: E402
+
+STAGES = ["decode", "resize", "inference", "matting", "encode", "write"]
+PIPELINES = ["single", "bulk", "bulk_timed"]
+
+
+def peak_rss() -> int | None:
+    """Peak resident memory of this process in bytes."""
+    try:
+        import resource
+    except ImportError:
+        import psutil  # Windows: the working set peak
+        return psutil.Process().memory_info().peak_wset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency stats of one stage, in milliseconds."""
+    mean = sum(samples) / len(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": mean * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "images_per_s": 1 / mean if mean else None,
+    }
+
+
+def time_stages(session, path: str, out_dir: str, options: dict, samples: dict):
+    """Run one image through every stage and the two pipelines, appending seconds to samples."""
+    from rembg import remove
+    import engine
+    from output_writer import encode_image, atomic_write
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        samples[stage].append(time.perf_counter() - start)
+        return value
+
+    def decode(input_path):
+        img = engine.Image.open(input_path)
+        img.load()
+        return img
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    img = timed("decode", decode, path)
+    img, _ = timed("resize", engine.resize_image, img, options["max_image_size"])
+    img = timed("inference", lambda image: remove(image, session=session), img)
+    img = timed("matting", engine.matte_image, img)
+    data = timed("encode", encode_image, img, options["format"], options["compress_level"])
+    timed("write", atomic_write, os.path.join(out_dir, name + "_stages.png"), data)
+
+    def single(input_path):
+        with open(input_path, 'rb') as f:
+            image_data = f.read()
+        image_data, _ = engine.resize_for_low_pc(image_data, options["max_image_size"])
+        image_data = engine.apply_alpha_matting(remove(image_data, session=session))
+        atomic_write(os.path.join(out_dir, name + "_single.png"), image_data)
+
+    timed("single", single, path)
+    for stage, stage_options in (("bulk", options), ("bulk_timed", dict(options, instrument=True))):
+        result = timed(stage, engine.process_file, session, path,
+                       os.path.join(out_dir, name + f"_{stage}.png"), stage_options)
+        if not result["ok"] or result["warnings"]:
+            raise RuntimeError(f"process_file failed on {path}: {result}")
+
+
+def run(args) -> dict:
+    import engine
+    import numpy
+    import onnxruntime
+    import PIL
+
+    if args.real_model:
+        model_name = args.real_model
+    else:
+        model_name = "u2netp"
+        make_stub_model(os.path.join(args.fixtures, "models"), model_name)
+    session = engine.SessionCache().get(model_name)
+    options = {"low_pc": True, "max_image_size": args.max_size, "alpha_matting": True,
+               "format": "PNG", "compress_level": args.compress_level}
+
+    sizes = sorted((tuple(int(v) for v in size.lower().split("x")) for size in args.sizes.split(",")),
+                   key=lambda size: size[0] * size[1])
+    results = {}
+    out_dir = tempfile.mkdtemp(prefix="zi_bench_engine_")
+    try:
+        for width, height in sizes:
+            inputs = make_images(os.path.join(args.fixtures, "images"), args.images, (width, height))
+            # Warm-up: first inference, lazy imports, allocator growth
+            time_stages(session, inputs[0], out_dir, options, {stage: [] for stage in STAGES + PIPELINES})
+            samples = {stage: [] for stage in STAGES + PIPELINES}
+            for _ in range(args.repeat):
+                for path in inputs:
+                    time_stages(session, path, out_dir, options, samples)
+            label = f"{width}x{height}"
+            results[label] = {stage: summarize(values) for stage, values in samples.items()}
+            results[label]["peak_rss"] = peak_rss()
+            print(format_size(label, results[label]), flush=True)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    return {
+        "benchmark": "engine",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "onnxruntime": onnxruntime.__version__,
+            "pillow": PIL.__version__,
+            "numpy": numpy.__version__,
+        },
+        "settings": {"model": model_name if args.real_model else "stub", "images": args.images,
+                     "repeat": args.repeat, "max_size": args.max_size, "compress_level": args.compress_level},
+        "results": results,
+    }
+
+
+def format_size(label: str, stages: dict) -> str:
+    mb = 1024 * 1024
+    lines = [f"\n{label}  (peak RSS {stages['peak_rss'] / mb:.0f} MB)",
+             f"  {'Stage':<11}{'Mean (ms)':>11}{'p50 (ms)':>10}{'p95 (ms)':>10}{'img/s':>9}"]
+    for stage in STAGES + PIPELINES:
+        if stage == PIPELINES[0]:
+            lines.append("  " + "-" * 51)
+        entry = stages[stage]
+        lines.append(f"  {stage:<11}{entry['mean_ms']:>11.1f}{entry['p50_ms']:>10.1f}{entry['p95_ms']:>10.1f}"
+                     f"{entry['images_per_s']:>9.1f}")
+    return "\n".join(lines)
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    """
+    Print current vs baseline per size and stage.
+
+    Returns:
+        Regression descriptions (empty if none).
+    """
+    mb = 1024 * 1024
+    regressions = []
+    print(f"\n{'Size':<11}{'Stage':<11}{'Base p50':>10}{'Now p50':>10}{'Change':>9}")
+    for label, stages in current["results"].items():
+        base_stages = baseline["results"].get(label)
+        if not base_stages:
+            print(f"{label:<11}(not in baseline)")
+            continue
+        for stage in STAGES + PIPELINES:
+            if stage not in base_stages:
+                continue
+            now, base = stages[stage]["p50_ms"], base_stages[stage]["p50_ms"]
+            change = now / base - 1 if base else 0
+            flag = ""
+            if change > threshold and now - base > min_ms:
+                flag = "  REGRESSION"
+                regressions.append(f"{label} {stage}: p50 {base:.1f} -> {now:.1f} ms ({change:+.0%})")
+            print(f"{label:<11}{stage:<11}{base:>10.1f}{now:>10.1f}{change:>+9.0%}{flag}")
+        if stages.get("peak_rss") and base_stages.get("peak_rss"):
+            growth = stages["peak_rss"] / base_stages["peak_rss"] - 1
+            if growth > threshold:
+                regressions.append(f"{label} peak RSS: {base_stages['peak_rss'] / mb:.0f} -> "
+                                   f"{stages['peak_rss'] / mb:.0f} MB ({growth:+.0%})")
+    if current.get("environment") != baseline.get("environment"):
+        print("\nNote: the baseline was recorded in a different environment")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image pipeline stage by stage")
+    parser.add_argument("--sizes", default="640x480,1280x960,2560x1920", help="Comma-separated WxH")
+    parser.add_argument("--images", type=int, default=3, help="Images per size")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the images")
+    parser.add_argument("--max-size", type=int, default=1024, help="Low PC Mode longest side")
+    parser.add_argument("--compress-level", type=int, default=6, help="PNG compress level")
+    parser.add_argument("--real-model", metavar="NAME", help="Use a real model instead of the stub")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "zi_bench_fixtures"))
+    parser.add_argument("--output", "-o", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare the run against a saved result")
+    parser.add_argument("--compare", nargs=2, metavar=("CURRENT", "BASELINE"),
+                        help="Compare two saved results without running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (default: 0.10 = 10%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this (timer noise on tiny stages)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        baseline_file = args.compare[1]
+    else:
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            print(f"\nResults written to {args.output}")
+        baseline_file = args.baseline
+
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Manifest Generation Benchmark
+=============================
+Compares the original sequential implementation (rglob + 8 KB reads + second
+stat) with the current manifest_generator on a synthetic tree shaped like the
+dist/ZI-BGRemover bundle: thousands of small .py/.pyc files plus a few very
+large DLLs.
+
+Both implementations run twice: cold (the tree's pages dropped from the OS
+cache first, where the platform allows it: posix_fadvise) and warm (the tree
+read once beforehand, so only hashing is measured).
+
+Usage:
+    python benchmarks/bench_manifest.py [--files 8000] [--large-mb 1024] [--jobs 8]
+
+The tree is kept and reused by runs with the same --files / --large-mb; other
+sizes rebuild it.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manifest_generator  # noqa: E402
+
+
+def legacy_generate_manifest(app_folder: str) -> dict:
+    """The pre-parallel implementation, kept here as the baseline."""
+    files = {}
+    app_path = Path(app_folder)
+    for filepath in app_path.rglob('*'):
+        if filepath.is_file():
+            rel_path_str = str(filepath.relative_to(app_path)).replace('\\', '/')
+            hash_func = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(8192), b''):
+                    hash_func.update(chunk)
+            files[rel_path_str] = {"hash": hash_func.hexdigest(), "size": filepath.stat().st_size}
+    return files
+
+
+def build_tree(root: str, small_files: int, large_mb: int, seed: int = 42):
+    """Create a bundle-shaped tree (reused if it was built with the same parameters)."""
+    marker = os.path.join(root, ".complete")
+    params = f"{small_files} {large_mb} {seed}"
+    try:
+        with open(marker, 'r') as f:
+            if f.read() == params:
+                print(f"Reusing synthetic tree in {root}")
+                return
+    except OSError:
+        pass
+    print(f"Building synthetic tree in {root}...")
+    shutil.rmtree(root, ignore_errors=True)
+
+    rng = random.Random(seed)
+    packages = ["torch", "transformers", "onnxruntime", "pyarrow", "scipy", "numpy", "PIL"]
+
+    for i in range(small_files):
+        pkg = packages[i % len(packages)]
+        folder = os.path.join(root, "_internal", pkg, f"sub{i % 40}")
+        os.makedirs(folder, exist_ok=True)
+        size = int(rng.lognormvariate(8.5, 1.5)) % (2 * 1024 * 1024)
+        with open(os.path.join(folder, f"mod_{i}.pyc"), 'wb') as f:
+            f.write(rng.randbytes(size))
+
+    # A handful of large "DLLs" make up most of the bytes, like the CUDA libraries
+    large_count = 6
+    block = rng.randbytes(1024 * 1024)
+    for i in range(large_count):
+        folder = os.path.join(root, "_internal", packages[i % 3], "lib")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"big_{i}.dll"), 'wb') as f:
+            for j in range(max(1, large_mb // large_count)):
+                f.write(block[j % 997:] + block[:j % 997])
+
+    with open(marker, 'w') as f:
+        f.write(params)
+
+
+def drop_cache(root: str) -> bool:
+    """Evict the tree's pages from the OS cache; False where that isn't possible."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for folder, _, names in os.walk(root):
+        for name in names:
+            fd = os.open(os.path.join(folder, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark manifest generation")
+    parser.add_argument("--files", type=int, default=8000, help="Number of small files")
+    parser.add_argument("--large-mb", type=int, default=1024, help="Total size of the large files (MB)")
+    parser.add_argument("--jobs", type=int, default=None, help="Hashing threads for the new implementation")
+    parser.add_argument("--tree", default=os.path.join(tempfile.gettempdir(), "zi_bench_manifest_tree"))
+    args = parser.parse_args()
+
+    build_tree(args.tree, args.files, args.large_mb)
+
+    rows = []
+    if drop_cache(args.tree):
+        _, legacy_time = timed(legacy_generate_manifest, args.tree)
+        drop_cache(args.tree)
+        _, current_time = timed(manifest_generator.generate_manifest, args.tree, "bench", jobs=args.jobs)
+        rows.append(("cold", legacy_time, current_time))
+    else:
+        print("Cold-cache run skipped: no way to drop the page cache on this platform")
+
+    # Warm the page cache so both runs measure hashing, not the first disk read
+    manifest_generator.generate_manifest(args.tree, "warmup", jobs=args.jobs)
+    legacy, legacy_time = timed(legacy_generate_manifest, args.tree)
+    stats = {}
+    current, current_time = timed(manifest_generator.generate_manifest, args.tree, "bench",
+                                  jobs=args.jobs, stats=stats)
+    rows.append(("warm", legacy_time, current_time))
+
+    assert legacy == current["files"], "Implementations disagree!"
+
+    total_mb = current["total_size"] / (1024 * 1024)
+    print(f"\nFiles: {current['total_files']}, size: {total_mb:.0f} MB, "
+          f"parallel: {stats['jobs']} threads, 1 MB reads, small files batched")
+    print(f"{'Cache':<8}{'Legacy (s)':>12}{'MB/s':>8}{'Parallel (s)':>14}{'MB/s':>8}{'Speedup':>10}")
+    for label, legacy_time, current_time in rows:
+        print(f"{label:<8}{legacy_time:>12.2f}{total_mb / legacy_time:>8.0f}"
+              f"{current_time:>14.2f}{total_mb / current_time:>8.0f}{legacy_time / current_time:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
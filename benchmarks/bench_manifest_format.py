@@ -0,0 +1,84 @@
+"""
+Manifest Format Benchmark: JSON vs Binary
+=========================================
+Compares the pretty-printed JSON manifests with the binary format from
+manifest_format.py on real release manifests: file size, load time, single
+lookups and the full compare_manifests diff.
+
+Usage:
+    python benchmarks/bench_manifest_format.py [--old manifest_v1.0.6.json] [--new manifest_v1.0.8.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import manifest_format  # noqa: E402
+from manifest_generator import compare_manifests  # noqa: E402
+
+
+def best_of(func, repeat: int = 20) -> float:
+    """Fastest of several runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs binary manifests")
+    parser.add_argument("--old", default=os.path.join(ROOT, "manifest_v1.0.6.json"))
+    parser.add_argument("--new", default=os.path.join(ROOT, "manifest_v1.0.8.json"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="zi_bench_manifest_format_")
+    binaries = []
+    for json_path in (args.old, args.new):
+        bin_path = os.path.join(out_dir, os.path.splitext(os.path.basename(json_path))[0] + ".zim")
+        with open(json_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest_format.save_binary_manifest(manifest, bin_path)
+        assert manifest_format.load_manifest(bin_path).to_dict()["files"] == manifest["files"], "Round trip failed"
+        binaries.append(bin_path)
+
+    json_old, json_new = (manifest_format.load_manifest(p) for p in (args.old, args.new))
+    bin_old, bin_new = (manifest_format.load_manifest(p) for p in binaries)
+    assert compare_manifests(json_old, json_new) == compare_manifests(bin_old, bin_new), "Diffs disagree!"
+    probe = sorted(json_new["files"])[len(json_new["files"]) // 2]
+
+    rows = [
+        ("Size (KB)", os.path.getsize(args.new) / 1024, os.path.getsize(binaries[1]) / 1024),
+        ("Load (ms)", best_of(lambda: manifest_format.load_manifest(args.new), args.repeat),
+         best_of(lambda: manifest_format.load_manifest(binaries[1]), args.repeat)),
+        ("Load, no verify (ms)", None,
+         best_of(lambda: manifest_format.load_manifest(binaries[1], verify=False), args.repeat)),
+        ("Lookup x1000 (ms)", best_of(lambda: [json_new["files"].get(probe) for _ in range(1000)], args.repeat),
+         best_of(lambda: [bin_new.get(probe) for _ in range(1000)], args.repeat)),
+        ("Diff (ms)", best_of(lambda: compare_manifests(json_old, json_new), args.repeat),
+         best_of(lambda: compare_manifests(bin_old, bin_new), args.repeat)),
+        ("Load + diff (ms)",
+         best_of(lambda: compare_manifests(*(manifest_format.load_manifest(p) for p in (args.old, args.new))), args.repeat),
+         best_of(lambda: compare_manifests(*(manifest_format.load_manifest(p) for p in binaries)), args.repeat)),
+    ]
+
+    diff = compare_manifests(bin_old, bin_new)
+    print(f"Manifests: {os.path.basename(args.old)} -> {os.path.basename(args.new)} "
+          f"({len(bin_new)} files; {len(diff['changed'])} changed, {len(diff['new'])} new, "
+          f"{len(diff['deleted'])} deleted)\n")
+    print(f"{'Metric':<24}{'JSON':>10}{'Binary':>10}")
+    for label, json_value, bin_value in rows:
+        json_text = f"{json_value:>10.1f}" if json_value is not None else f"{'-':>10}"
+        print(f"{label:<24}{json_text}{bin_value:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
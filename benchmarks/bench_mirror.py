@@ -0,0 +1,236 @@
+"""
+Update Mirror Benchmark
+=======================
+Simulates N workstations updating at the same time behind one internet link
+(the HTTP stand-in with a shared link rate, http_standin.py) and compares:
+- no mirror: every seat downloads the patch from upstream
+- shared folder mirror (update_mirror.FolderMirror)
+- HTTP cache server (update_mirror.MirrorServer)
+reporting wall time and the bytes that crossed the upstream link. A second
+round with a warm mirror must not touch upstream at all.
+
+Then checks the failure handling:
+- a client that died while populating the folder mirror: its lock goes
+  stale, the next client takes over and resumes the .part file
+- a corrupted object in the mirror is detected by SHA-256, evicted, refetched
+- cache server: upstream content that doesn't match its key (patch or
+  <hash>.zst blob) is never stored, keys that aren't content hashes are
+  refused, and a corrupted object already in its folder is evicted
+- unreachable mirror (folder or server): seats fall back to upstream
+- solid patch streaming through the cache server
+
+Usage:
+    python benchmarks/bench_mirror.py [--seats 8] [--mb 32] [--link-mb 32]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.client import HTTPException
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+import zstandard as zstd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import update_mirror  # noqa: E402
+from downloader import download, DownloadError  # noqa: E402
+from update_mirror import FolderMirror, HttpMirror, MirrorServer  # noqa: E402
+from updater import Updater  # noqa: E402
+from update_planner import blob_name  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+
+def run_seats(work: str, seats: int, url: str, sha256: str, mirror: str | None) -> float:
+    """All seats download the patch at once through their own Updater; returns seconds."""
+    updaters = []
+    for i in range(seats):
+        seat = os.path.join(work, f"seat_{i}")
+        shutil.rmtree(seat, ignore_errors=True)
+        os.makedirs(seat)
+        updaters.append(Updater(url, "1.0.0", seat, mirror=mirror))
+
+    results = [None] * seats
+
+    def seat_run(i: int):
+        dest = os.path.join(updaters[i].app_folder, "patch.zip")
+        results[i] = updaters[i].download_file(url, dest, sha256=sha256, key=sha256)
+        with open(dest, 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == sha256
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=seat_run, args=(i,)) for i in range(seats)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results), "a seat failed"
+    return time.perf_counter() - start
+
+
+def server_checks(work: str, upstream: StandinServer, data: bytes):
+    """Cache server: only content that matches its key is stored."""
+    mb = 1024 * 1024
+    good, bad = data[:mb], data[mb:2 * mb]
+    good_sha = hashlib.sha256(good).hexdigest()
+    upstream.add_file("/good.bin", good)
+    upstream.add_file("/bad.bin", bad)
+    upstream.add_file("/good.zst", zstd.ZstdCompressor().compress(good))
+    upstream.add_file("/bad.zst", zstd.ZstdCompressor().compress(bad))
+
+    root = os.path.join(work, "server_checks")
+    with MirrorServer(root, "127.0.0.1", 0, allow_hosts=("127.0.0.1",)) as server:
+        mirror = HttpMirror(f"http://127.0.0.1:{server.port}")
+
+        def status(key: str, path: str, sha256: str = None) -> int:
+            """HTTP status of a request through the server, 0 if the body was cut short."""
+            try:
+                with urlopen(mirror.url(key, upstream.url(path), sha256)) as response:
+                    response.read()
+                    return response.status
+            except HTTPError as e:
+                return e.code
+            except (OSError, HTTPException):
+                return 0
+            finally:
+                # The object is stored (or dropped) once its fetch has finished
+                assert server.wait(key, timeout=30)
+
+        # Wrong content under a hash key, with or without a sha256 in the query:
+        # the response is cut short before the tail, nothing is stored
+        for sha256 in (None, good_sha):
+            assert status(good_sha, "/bad.bin", sha256) == 0
+            assert not os.path.exists(update_mirror.object_path(root, good_sha)), "Poisoned object stored"
+        assert status(blob_name(good_sha), "/bad.zst") == 0
+        assert not os.path.exists(update_mirror.object_path(root, blob_name(good_sha))), "Poisoned blob stored"
+        assert status(good_sha, "/good.bin", hashlib.sha256(bad).hexdigest()) == 400
+        assert status("patch.zip", "/good.bin") == 404
+        print("  server, wrong upstream content: not stored; non-content keys refused")
+
+        assert status(good_sha, "/good.bin") == 200
+        assert status(blob_name(good_sha), "/good.zst") == 200
+        for key in (good_sha, blob_name(good_sha)):
+            assert update_mirror.verify_object(update_mirror.object_path(root, key), key)
+
+    # Corrupted object already in the folder: evicted by a new server run
+    path = update_mirror.object_path(root, good_sha)
+    with open(path, 'r+b') as f:
+        f.write(b"corrupt")
+    with MirrorServer(root, "127.0.0.1", 0, allow_hosts=("127.0.0.1",)) as server:
+        mirror = HttpMirror(f"http://127.0.0.1:{server.port}")
+        dest = os.path.join(work, "server_fixed.bin")
+        assert mirror.fetch(good_sha, upstream.url("/good.bin"), dest, good_sha) == "mirror"
+        assert server.stats["misses"] == 1 and update_mirror.verify_object(path, good_sha)
+    print("  server, corrupted stored object: evicted and refetched")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared update mirror")
+    parser.add_argument("--seats", type=int, default=8)
+    parser.add_argument("--mb", type=int, default=32, help="Patch size")
+    parser.add_argument("--link-mb", type=float, default=32, help="Shared upstream link (MB/s)")
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    data = random.Random(5).randbytes(args.mb * mb)
+    sha256 = hashlib.sha256(data).hexdigest()
+    work = tempfile.mkdtemp(prefix="zi_bench_mirror_")
+    os.environ["LOCALAPPDATA"] = work
+    os.environ.pop(update_mirror.MIRROR_ENV, None)
+
+    with StandinServer(link_rate=int(args.link_mb * mb)) as upstream:
+        upstream.add_file("/patch.zip", data)
+        url = upstream.url("/patch.zip")
+
+        def upstream_mb(since: int) -> float:
+            return (upstream.bytes_sent - since) / mb
+
+        print(f"{args.seats} seats, {args.mb} MB patch, {args.link_mb:g} MB/s shared upstream link\n")
+        print(f"{'Setup':<30}{'Time (s)':>10}{'Upstream (MB)':>15}")
+
+        before = upstream.bytes_sent
+        seconds = run_seats(work, args.seats, url, sha256, None)
+        print(f"{'no mirror':<30}{seconds:>10.2f}{upstream_mb(before):>15.1f}")
+
+        folder = os.path.join(work, "share")
+        for label in ("shared folder, cold", "shared folder, warm"):
+            before = upstream.bytes_sent
+            seconds = run_seats(work, args.seats, url, sha256, folder)
+            print(f"{label:<30}{seconds:>10.2f}{upstream_mb(before):>15.1f}")
+            assert upstream_mb(before) <= args.mb * (1.01 if "cold" in label else 0)
+
+        server_root = os.path.join(work, "server")
+        with MirrorServer(server_root, "127.0.0.1", 0, allow_hosts=("127.0.0.1",)) as server:
+            mirror_url = f"http://127.0.0.1:{server.port}"
+            for label in ("cache server, cold", "cache server, warm"):
+                before = upstream.bytes_sent
+                seconds = run_seats(work, args.seats, url, sha256, mirror_url)
+                print(f"{label:<30}{seconds:>10.2f}{upstream_mb(before):>15.1f}")
+                assert upstream_mb(before) <= args.mb * (1.01 if "cold" in label else 0)
+            print(f"  server: {server.stats['misses']} upstream fetch, {server.stats['joined']} joined it, "
+                  f"{server.stats['hits']} hits")
+
+            # Solid patch streamed through the server
+            upstream.add_file("/patch.tar.zst", data[:4 * mb])
+            solid_sha = hashlib.sha256(data[:4 * mb]).hexdigest()
+            with HttpMirror(mirror_url).open(solid_sha, upstream.url("/patch.tar.zst"), solid_sha) as stream:
+                assert stream.read() == data[:4 * mb]
+                stream.finish()
+            print("  solid patch streamed through the server: OK")
+
+        print("\nFault handling:")
+        upstream.link_rate = None
+
+        # A client died while populating: its lock and half the .part file remain
+        update_mirror.STALE_SECONDS = 1
+        dead = os.path.join(work, "share_dead")
+        mirror = FolderMirror(dead)
+        path = mirror.path(sha256)
+        os.makedirs(os.path.dirname(path))
+        upstream.faults["/patch.zip"] = {"drop_after": [args.mb * mb // 2]}
+        try:
+            download(url, path, retries=0)
+        except DownloadError:
+            pass
+        with open(path + update_mirror.LOCK_SUFFIX, 'w') as f:
+            f.write("dead-host 1234")
+        before = upstream.bytes_sent
+        start = time.perf_counter()
+        source = mirror.fetch(sha256, url, os.path.join(work, "dead.zip"), sha256)
+        assert source == "populated" and not os.path.exists(path + update_mirror.LOCK_SUFFIX)
+        print(f"  stale lock taken over after {time.perf_counter() - start:.1f}s, "
+              f"resumed: {upstream_mb(before):.1f} of {args.mb} MB from upstream")
+
+        # Corrupted object in the mirror
+        with open(path, 'r+b') as f:
+            f.seek(1000)
+            f.write(b"corrupt")
+        before = upstream.bytes_sent
+        assert mirror.fetch(sha256, url, os.path.join(work, "fixed.zip"), sha256) == "populated"
+        with open(path, 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == sha256
+        print(f"  corrupted mirror object:        evicted and refetched ({upstream_mb(before):.1f} MB)")
+
+        # Mirror unreachable
+        blocker = os.path.join(work, "not_a_folder")
+        with open(blocker, 'w') as f:
+            f.write("x")
+        assert FolderMirror(blocker).fetch(sha256, url, os.path.join(work, "a.zip"), sha256) == "upstream"
+        assert HttpMirror("http://127.0.0.1:9").fetch(sha256, url, os.path.join(work, "b.zip"), sha256) == "upstream"
+        print("  unreachable folder / server:    fell back to upstream")
+
+        server_checks(work, upstream, data)
+
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
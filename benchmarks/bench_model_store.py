@@ -0,0 +1,182 @@
+"""
+Model Store Check
+=================
+Runs model_store.ModelStore against the local HTTP stand-in (http_standin.py)
+with a registry of synthetic "models" pinned by MD5, like MODEL_REGISTRY:
+- clean download: verified, installed, size and SHA-256 recorded
+- dropped connection: the .part file is kept and the next attempt resumes
+  with a Range request
+- .part file already complete (the app stopped before the rename): the server
+  answers 416; the file is verified and installed without downloading again,
+  and a complete but corrupted .part file is downloaded again from scratch
+- MD5 mismatch: rejected, the .part file is removed and nothing is installed
+- no Content-Length: accepted when a hash is pinned, refused when nothing can
+  verify the file
+- multi-file model (like SAM): every part is fetched and verified, parts
+  already present are kept
+- a truncated installed file is reported by is_available() and re-downloaded
+
+Usage:
+    python benchmarks/bench_model_store.py [--mb 8]
+"""
+
+import os
+import sys
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from model_store import ModelStore, ModelIntegrityError, STATE_FILENAME  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+
+def _md5(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def _requests(server: StandinServer, path: str) -> list[dict]:
+    return [headers for request_path, headers in server.requests if request_path == path]
+
+
+def run_checks(work: str, size: int):
+    rng = random.Random(7)
+    model = rng.randbytes(size)
+    other = rng.randbytes(size // 2)
+    encoder, decoder = rng.randbytes(size), rng.randbytes(size // 8)
+
+    with StandinServer() as server:
+        for name, data in (("model.onnx", model), ("other.onnx", other),
+                           ("enc.onnx", encoder), ("dec.onnx", decoder)):
+            server.add_file(f"/models/{name}", data)
+        registry = {
+            "stub": {"file": "model.onnx", "size_mb": 1, "md5": _md5(model), "sha256": None},
+            "bad-pin": {"file": "model.onnx", "size_mb": 1, "md5": _md5(other), "sha256": None},
+            "unpinned": {"file": "other.onnx", "size_mb": 1, "sha256": None},
+            "multi": {"size_mb": 1, "parts": [
+                {"file": "enc.onnx", "md5": _md5(encoder), "sha256": None},
+                {"file": "dec.onnx", "md5": _md5(decoder), "sha256": None},
+            ]},
+        }
+
+        def fresh(label: str) -> ModelStore:
+            return ModelStore(os.path.join(work, label), server.url("/models"), registry)
+
+        # Clean download
+        store = fresh("clean")
+        path = store.ensure_model("stub")
+        assert open(path, 'rb').read() == model
+        assert store.is_available("stub") and store.verify("stub")
+        assert store.expected_size_mb("stub") == round(size / (1024 * 1024), 1)
+        print("clean download:                 OK (MD5 checked, SHA-256 recorded)")
+
+        # Dropped connection, then resume
+        store = fresh("resume")
+        server.faults["/models/model.onnx"] = {"drop_after": [size // 3]}
+        try:
+            store.download("stub")
+            raise AssertionError("A dropped connection must fail")
+        except ModelIntegrityError:
+            pass
+        part_path = store.model_path("stub") + ".part"
+        assert os.path.getsize(part_path) == size // 3
+        before = len(server.requests)
+        store.download("stub")
+        resumed = server.requests[before:]
+        assert resumed[0][1].get("Range") == f"bytes={size // 3}-", resumed
+        assert store.verify("stub") and not os.path.exists(part_path)
+        print(f"dropped connection:             OK (resumed from {size // 3} bytes)")
+
+        # Complete .part file left behind: 416, verified and installed
+        store = fresh("complete_part")
+        os.makedirs(store.model_dir)
+        part_path = store.model_path("stub") + ".part"
+        with open(part_path, 'wb') as f:
+            f.write(model)
+        sent = server.bytes_sent
+        store.download("stub")
+        assert server.bytes_sent == sent, "A complete .part file must not be downloaded again"
+        assert store.verify("stub")
+        print("complete .part (416):           OK (verified, installed without a download)")
+
+        # Complete but corrupted .part file: 416, then a fresh download
+        store = fresh("corrupt_part")
+        os.makedirs(store.model_dir)
+        part_path = store.model_path("stub") + ".part"
+        with open(part_path, 'wb') as f:
+            f.write(model[:-1] + b"\0")
+        store.download("stub")
+        assert store.verify("stub") and open(store.model_path("stub"), 'rb').read() == model
+        print("corrupted complete .part (416): OK (downloaded again)")
+
+        # MD5 mismatch
+        store = fresh("mismatch")
+        try:
+            store.download("bad-pin")
+            raise AssertionError("An MD5 mismatch must be rejected")
+        except ModelIntegrityError as e:
+            assert "MD5 mismatch" in str(e), e
+        assert not os.path.exists(store.model_path("bad-pin"))
+        assert not os.path.exists(store.model_path("bad-pin") + ".part")
+        print("MD5 mismatch:                   OK (rejected, .part removed)")
+
+        # No Content-Length
+        server.faults["/models/model.onnx"] = {"no_length": True}
+        server.faults["/models/other.onnx"] = {"no_length": True}
+        store = fresh("no_length")
+        store.download("stub")
+        assert store.verify("stub")
+        try:
+            store.download("unpinned")
+            raise AssertionError("An unverifiable download must be refused")
+        except ModelIntegrityError as e:
+            assert "cannot be verified" in str(e), e
+        assert not os.path.exists(store.model_path("unpinned"))
+        server.faults.clear()
+        store.download("unpinned")  # with a length it is accepted and its SHA-256 recorded
+        assert store.verify("unpinned")
+        print("no Content-Length:              OK (pinned accepted, unverifiable refused)")
+
+        # Multi-file model, one part already present
+        store = fresh("multi")
+        os.makedirs(store.model_dir)
+        with open(os.path.join(store.model_dir, "enc.onnx"), 'wb') as f:
+            f.write(encoder)
+        assert not store.is_available("multi")
+        requests = len(_requests(server, "/models/enc.onnx"))
+        store.ensure_model("multi")
+        assert len(_requests(server, "/models/enc.onnx")) == requests, "A present part must be kept"
+        assert store.is_available("multi") and store.verify("multi")
+        print("multi-file model:               OK (missing part fetched, present part kept)")
+
+        # Truncated install is detected and repaired
+        store = fresh("clean")
+        with open(store.model_path("stub"), 'r+b') as f:
+            f.truncate(size // 2)
+        assert not store.is_available("stub")
+        store.ensure_model("stub")
+        assert store.verify("stub")
+        print("truncated model file:           OK (detected, downloaded again)")
+
+        assert os.path.exists(os.path.join(store.model_dir, STATE_FILENAME))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model store download and verification checks")
+    parser.add_argument("--mb", type=float, default=8, help="Size of the synthetic model")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zi_bench_models_")
+    try:
+        run_checks(work, int(args.mb * 1024 * 1024))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    print("\nAll model store checks passed")
+
+
+if __name__ == "__main__":
+    main()
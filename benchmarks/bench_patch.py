@@ -0,0 +1,146 @@
+"""
+Delta Patch Benchmark
+=====================
+Builds synthetic old/new release trees (an "exe" with scattered edits and an
+insertion, a few modified DLL-like binaries, new, deleted and unchanged files),
+then compares a delta patch from create_patch with the legacy whole-file ZIP.
+
+Every run round-trips the patch: it is staged against the old tree and every
+rebuilt file must equal the new tree (patch_applier also checks the hashes), and
+deletions must match.
+
+Usage:
+    python benchmarks/bench_patch.py [--exe-mb 64] [--dll-mb 16] [--jobs N]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import delta_patch  # noqa: E402
+import patch_applier  # noqa: E402
+from manifest_generator import generate_manifest, compare_manifests  # noqa: E402
+
+
+def _mutate(data: bytes, rng: random.Random, edits: int, insert: int) -> bytes:
+    """Scattered small edits plus one insertion (shifts everything after it)."""
+    out = bytearray(data)
+    for _ in range(edits):
+        pos = rng.randrange(max(1, len(out) - 64))
+        out[pos:pos + 32] = rng.randbytes(32)
+    pos = rng.randrange(max(1, len(out)))
+    out[pos:pos] = rng.randbytes(insert)
+    return bytes(out)
+
+
+def _binary(rng: random.Random, size: int) -> bytes:
+    """Binary-looking content: repeated code-like blocks plus noise, so it compresses a little."""
+    blocks = [rng.randbytes(4096) for _ in range(64)]
+    out = bytearray()
+    while len(out) < size:
+        out += blocks[rng.randrange(len(blocks))] if rng.random() < 0.6 else rng.randbytes(4096)
+    return bytes(out[:size])
+
+
+def _write(root: str, rel_path: str, data: bytes):
+    path = os.path.join(root, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build_trees(old_dir: str, new_dir: str, exe_mb: int, dll_mb: int, seed: int = 7):
+    """Write the synthetic old and new releases."""
+    rng = random.Random(seed)
+    mb = 1024 * 1024
+
+    exe = _binary(rng, exe_mb * mb)
+    _write(old_dir, "ZI-BGRemover.exe", exe)
+    _write(new_dir, "ZI-BGRemover.exe", _mutate(exe, rng, edits=500, insert=200_000))
+
+    for i in range(3):
+        dll = _binary(rng, dll_mb * mb)
+        rel_path = f"_internal/onnxruntime/capi/provider_{i}.dll"
+        _write(old_dir, rel_path, dll)
+        _write(new_dir, rel_path, _mutate(dll, rng, edits=50, insert=4096) if i < 2 else dll)
+
+    for i in range(200):
+        data = rng.randbytes(rng.randrange(100, 20_000))
+        rel_path = f"_internal/app/mod_{i}.pyc"
+        _write(old_dir, rel_path, data)
+        if i % 20 == 0:
+            _write(new_dir, rel_path, _mutate(data, rng, edits=3, insert=16))
+        elif i % 50 != 1:  # a few files are deleted in the new version
+            _write(new_dir, rel_path, data)
+
+    for i in range(5):
+        _write(new_dir, f"_internal/app/new_{i}.pyc", rng.randbytes(5000))
+
+
+def legacy_patch(new_dir: str, diff: dict, zip_path: str) -> float:
+    """Whole-file deflate ZIP of the changed/new files (the old patch format)."""
+    start = time.perf_counter()
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for rel_path in diff["changed"] + diff["new"]:
+            zf.write(os.path.join(new_dir, *rel_path.split('/')), rel_path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delta patches vs whole-file ZIPs")
+    parser.add_argument("--exe-mb", type=int, default=64)
+    parser.add_argument("--dll-mb", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zi_bench_patch_")
+    try:
+        old_dir, new_dir = os.path.join(work, "old"), os.path.join(work, "new")
+        print(f"Building synthetic trees in {work}...")
+        build_trees(old_dir, new_dir, args.exe_mb, args.dll_mb)
+        old_manifest = generate_manifest(old_dir, "1.0.0")
+        new_manifest = generate_manifest(new_dir, "1.0.1")
+        diff = compare_manifests(old_manifest, new_manifest)
+
+        legacy_path = os.path.join(work, "legacy.zip")
+        legacy_seconds = legacy_patch(new_dir, diff, legacy_path)
+
+        patch_path = os.path.join(work, "delta.zip")
+        stats = delta_patch.create_patch(old_dir, new_dir, old_manifest, new_manifest, patch_path, jobs=args.jobs)
+
+        staging_dir = os.path.join(work, "staging")
+        os.makedirs(staging_dir)
+        start = time.perf_counter()
+        staged, deleted = patch_applier.stage([patch_path], old_dir, staging_dir, jobs=args.jobs)
+        apply_seconds = time.perf_counter() - start
+
+        # Round trip: staged files equal the new tree, deletions match the diff
+        assert staged == sorted(diff["changed"] + diff["new"]), "Staged file set differs"
+        assert deleted == sorted(diff["deleted"]), "Deleted file set differs"
+        for rel_path in staged:
+            with open(os.path.join(staging_dir, *rel_path.split('/')), 'rb') as a, \
+                    open(os.path.join(new_dir, *rel_path.split('/')), 'rb') as b:
+                assert a.read() == b.read(), f"Round trip mismatch: {rel_path}"
+
+        mb = 1024 * 1024
+        print(f"\nChanged: {len(diff['changed'])}, new: {len(diff['new'])}, deleted: {len(diff['deleted'])} "
+              f"({stats['new_bytes'] / mb:.1f} MB of changed content)")
+        print(f"Delta patch: {stats['delta']} delta, {stats['full']} full\n")
+        print(f"{'Patch':<22}{'Size (MB)':>12}{'Build (s)':>12}")
+        print(f"{'legacy zip (deflate)':<22}{os.path.getsize(legacy_path) / mb:>12.2f}{legacy_seconds:>12.2f}")
+        print(f"{'delta (zstd dict)':<22}{stats['patch_bytes'] / mb:>12.2f}{stats['seconds']:>12.2f}")
+        print(f"\nSize reduction: {os.path.getsize(legacy_path) / stats['patch_bytes']:.1f}x")
+        print(f"Apply (rebuild + verify): {apply_seconds:.2f}s - round trip OK")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Solid Patch Benchmark
+=====================
+Compares patch archive formats on a synthetic binary release tree: PE-like
+"DLLs" and an "exe" (x86-style code with relative calls, strings, padding,
+runtime code shared between modules) plus small .pyc-like files.
+
+Two cases:
+- full: every file of the release (first install / full update)
+- patch: old -> new release with edited binaries, new and deleted files
+
+Formats:
+- deflate zip: per-file deflate (the legacy patches and portable ZIP)
+- delta zip: delta_patch.py (per-file zstd / zstd-dictionary deltas)
+- solid zstd / solid xz: solid_patch.py repack of the delta zip
+
+Every archive is extracted and compared against the new tree. The solid zstd
+archive is also streamed from the local HTTP stand-in (http_standin.py)
+through downloader.open_stream, so nothing but the staged files touches disk.
+
+Usage:
+    python benchmarks/bench_solid_patch.py [--exe-mb 24] [--dll-mb 8] [--dlls 3] [--skip-xz]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import struct
+import hashlib
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import delta_patch  # noqa: E402
+import patch_applier  # noqa: E402
+import solid_patch  # noqa: E402
+from downloader import open_stream  # noqa: E402
+from manifest_generator import generate_manifest, compare_manifests  # noqa: E402
+from bench_patch import _mutate, _write  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+BLOCK = 4096
+_WORDS = [b"onnxruntime", b"CUDAExecutionProvider", b"std::runtime_error", b"kernel32.dll",
+          b"GetProcAddress", b"invalid argument", b"Tensor", b"allocator", b"%s:%d", b"\\x00"]
+
+
+def _code_templates(rng: random.Random, count: int = 32) -> list[tuple[bytes, list[int]]]:
+    """Instruction-like blocks; the offsets mark E8 rel32 call sites to fill in per copy."""
+    prologues = [b"\x55\x48\x89\xe5", b"\x48\x83\xec\x28", b"\x48\x8b\x45\xf8", b"\x89\x7d\xfc",
+                 b"\x48\x8d\x0d\x00\x10\x00\x00", b"\x31\xc0", b"\xc3", b"\x0f\x1f\x44\x00\x00"]
+    templates = []
+    for _ in range(count):
+        out = bytearray()
+        calls = []
+        while len(out) < BLOCK - 8:
+            if rng.random() < 0.15:
+                calls.append(len(out))
+                out += b"\xe8\x00\x00\x00\x00"
+            else:
+                out += prologues[rng.randrange(len(prologues))]
+        templates.append((bytes(out[:BLOCK - 8]) + bytes(8), [c for c in calls if c + 5 <= BLOCK - 8]))
+    return templates
+
+
+def _pe_like(rng: random.Random, size: int, templates: list, shared: list[bytes]) -> bytes:
+    """Binary with code (relative calls to a fixed set of functions), strings, padding, shared runtime code."""
+    functions = [rng.randrange(size) for _ in range(256)]
+    out = bytearray()
+    while len(out) < size:
+        r = rng.random()
+        if r < 0.25:
+            out += shared[rng.randrange(len(shared))]
+        elif r < 0.75:
+            block, calls = templates[rng.randrange(len(templates))]
+            block = bytearray(block)
+            for offset in calls:
+                target = functions[rng.randrange(len(functions))]
+                struct.pack_into("<i", block, offset + 1, (target - (len(out) + offset + 5)) & 0x7fffffff)
+            out += block
+        elif r < 0.88:
+            text = b"\x00".join(_WORDS[rng.randrange(len(_WORDS))] for _ in range(300))
+            out += (text * 2)[:BLOCK]
+        elif r < 0.94:
+            out += bytes(BLOCK)
+        else:
+            out += rng.randbytes(BLOCK)     # Compressed resources
+    return bytes(out[:size])
+
+
+def build_trees(old_dir: str, new_dir: str, exe_mb: int, dll_mb: int, dlls: int, seed: int = 11):
+    """Write the synthetic old and new releases."""
+    rng = random.Random(seed)
+    mb = 1024 * 1024
+    templates = _code_templates(rng)
+    shared = [_pe_like(rng, BLOCK, templates, [bytes(BLOCK)]) for _ in range(256)]
+
+    exe = _pe_like(rng, exe_mb * mb, templates, shared)
+    _write(old_dir, "ZI-BGRemover.exe", exe)
+    _write(new_dir, "ZI-BGRemover.exe", _mutate(exe, rng, edits=300, insert=65_536))
+
+    for i in range(dlls):
+        dll = _pe_like(rng, dll_mb * mb, templates, shared)
+        rel_path = f"_internal/onnxruntime/capi/provider_{i}.dll"
+        _write(old_dir, rel_path, dll)
+        _write(new_dir, rel_path, _mutate(dll, rng, edits=40, insert=4096) if i % 2 == 0 else dll)
+    # The same DLL shipped twice (like the CUDA DLLs under torch and onnxruntime)
+    _write(new_dir, "_internal/torch/lib/provider_0.dll",
+           open(os.path.join(new_dir, "_internal", "onnxruntime", "capi", "provider_0.dll"), 'rb').read())
+
+    for i in range(150):
+        data = _pe_like(rng, rng.randrange(2, 12) * 1024, templates, shared)
+        rel_path = f"_internal/app/mod_{i}.pyc"
+        _write(old_dir, rel_path, data)
+        if i % 15 == 0:
+            _write(new_dir, rel_path, _mutate(data, rng, edits=3, insert=16))
+        elif i % 40 != 1:
+            _write(new_dir, rel_path, data)
+    for i in range(5):
+        _write(new_dir, f"_internal/app/new_{i}.pyc", _pe_like(rng, 6000, templates, shared))
+
+
+def _same_as_new(staging_dir: str, new_dir: str, rel_paths: list[str]):
+    for rel_path in rel_paths:
+        with open(os.path.join(staging_dir, *rel_path.split('/')), 'rb') as a, \
+                open(os.path.join(new_dir, *rel_path.split('/')), 'rb') as b:
+            assert a.read() == b.read(), f"Round trip mismatch: {rel_path}"
+
+
+def _fresh(path: str) -> str:
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def run_case(label: str, work: str, old_dir: str | None, new_dir: str, old_manifest: dict,
+             new_manifest: dict, skip_xz: bool):
+    mb = 1024 * 1024
+    diff = compare_manifests(old_manifest, new_manifest)
+    expected = sorted(diff["changed"] + diff["new"])
+    content = sum(new_manifest["files"][p]["size"] for p in expected)
+    base_dir = old_dir or _fresh(os.path.join(work, "empty"))
+    staging_dir = os.path.join(work, "staging")
+    rows = []
+
+    # Per-file deflate
+    deflate_path = os.path.join(work, f"{label}_deflate.zip")
+    start = time.perf_counter()
+    with zipfile.ZipFile(deflate_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for rel_path in expected:
+            zf.write(os.path.join(new_dir, *rel_path.split('/')), rel_path)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    with zipfile.ZipFile(deflate_path, 'r') as zf:
+        zf.extractall(_fresh(staging_dir))
+    extract = time.perf_counter() - start
+    _same_as_new(staging_dir, new_dir, expected)
+    rows.append(("deflate zip", os.path.getsize(deflate_path), build, extract))
+
+    # Delta zip
+    delta_path = os.path.join(work, f"{label}_delta.zip")
+    stats = delta_patch.create_patch(old_dir, new_dir, old_manifest, new_manifest, delta_path)
+    start = time.perf_counter()
+    staged, _ = patch_applier.stage([delta_path], base_dir, _fresh(staging_dir))
+    extract = time.perf_counter() - start
+    assert staged == expected
+    _same_as_new(staging_dir, new_dir, expected)
+    rows.append(("delta zip (zstd)", stats["patch_bytes"], stats["seconds"], extract))
+
+    # Solid archives, repacked from the delta zip
+    for codec in solid_patch.CODECS:
+        if codec == "xz" and skip_xz:
+            continue
+        solid_path = solid_patch.solid_path_for(delta_path, codec)
+        solid = solid_patch.create_solid_patch(delta_path, solid_path, codec)
+        start = time.perf_counter()
+        with open(solid_path, 'rb') as f:
+            staged, deleted = solid_patch.extract_stream(f, base_dir, _fresh(staging_dir))
+        extract = time.perf_counter() - start
+        assert staged == expected and deleted == sorted(diff["deleted"])
+        _same_as_new(staging_dir, new_dir, expected)
+        rows.append((f"solid {codec}", solid["solid_bytes"], stats["seconds"] + solid["seconds"], extract))
+
+    # Streamed from HTTP: decompressed while downloading, archive never saved
+    solid_path = solid_patch.solid_path_for(delta_path, "zstd")
+    with open(solid_path, 'rb') as f:
+        data = f.read()
+    with StandinServer() as server:
+        server.add_file("/patch.tar.zst", data)
+        server.faults["/patch.tar.zst"] = {"drop_after": [len(data) // 3]}
+        start = time.perf_counter()
+        with open_stream(server.url("/patch.tar.zst"), sha256=hashlib.sha256(data).hexdigest()) as stream:
+            staged, _ = solid_patch.extract_stream(stream, base_dir, _fresh(staging_dir))
+            stream.finish()
+        streamed = time.perf_counter() - start
+    assert staged == expected
+    _same_as_new(staging_dir, new_dir, expected)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    print(f"\n[{label}] {len(expected)} files, {content / mb:.1f} MB, {len(diff['deleted'])} deleted")
+    print(f"{'Format':<20}{'Size (MB)':>11}{'Ratio':>8}{'Build (s)':>11}{'Extract (s)':>13}{'MB/s':>8}")
+    for name, size, build, extract in rows:
+        print(f"{name:<20}{size / mb:>11.2f}{size / max(content, 1):>8.3f}{build:>11.2f}"
+              f"{extract:>13.2f}{content / mb / max(extract, 1e-9):>8.0f}")
+    print(f"solid zstd over HTTP (1 dropped connection, continued with Range): "
+          f"{streamed:.2f}s, round trip OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark solid zstd/xz patch archives against ZIPs")
+    parser.add_argument("--exe-mb", type=int, default=24)
+    parser.add_argument("--dll-mb", type=int, default=8)
+    parser.add_argument("--dlls", type=int, default=3)
+    parser.add_argument("--skip-xz", action="store_true", help="xz is slow to build at its preset")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zi_bench_solid_")
+    try:
+        old_dir, new_dir = os.path.join(work, "old"), os.path.join(work, "new")
+        print(f"Building synthetic trees in {work}...")
+        build_trees(old_dir, new_dir, args.exe_mb, args.dll_mb, args.dlls)
+        old_manifest = generate_manifest(old_dir, "1.0.0")
+        new_manifest = generate_manifest(new_dir, "1.0.1")
+
+        run_case("full", work, None, new_dir, {"version": None, "files": {}}, new_manifest, args.skip_xz)
+        run_case("patch", work, old_dir, new_dir, old_manifest, new_manifest, args.skip_xz)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
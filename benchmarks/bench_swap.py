@@ -0,0 +1,158 @@
+"""
+Pre-staged Update Benchmark
+===========================
+Measures the downtime of an update restart (the time the app is closed) on a
+synthetic install in temp folders:
+- legacy: the helper stages and swaps after the app exits (apply_update)
+- pre-staged: the update is staged while the app runs (stage_update), the
+  helper only swaps (apply_staged)
+for a patch chain (file renames) and a full update (two folder renames).
+
+Every result is compared with the expected tree, then rolled back
+(patch_applier.rollback) and compared with the original install. Also checks
+the Updater side: stage_downloaded, pending_update and stale staging folders.
+
+Usage:
+    python benchmarks/bench_swap.py [--patches 3] [--files 400] [--big-mb 32]
+"""
+
+import os
+import sys
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import patch_applier  # noqa: E402
+from manifest_generator import generate_manifest  # noqa: E402
+from updater import Updater  # noqa: E402
+from bench_applier import build_chain, _write  # noqa: E402
+
+
+def _tree(folder: str) -> dict:
+    return generate_manifest(folder, "-")["files"]
+
+
+def _full_zip(final: str, zip_path: str):
+    """Portable ZIP of the expected tree, under a ZI-BGRemover/ root."""
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for root, _, files in os.walk(final):
+            for name in files:
+                path = os.path.join(root, name)
+                zf.write(path, "ZI-BGRemover/" + os.path.relpath(path, final).replace(os.sep, '/'))
+
+
+def run_case(label: str, work: str, base: str, expected: dict, patch_files: list[str] = None,
+             full_update: str = None) -> tuple[float, float, float, float]:
+    """Returns (legacy downtime, background staging, pre-staged downtime, rollback) seconds."""
+    original = _tree(base)
+
+    app = os.path.join(work, f"{label}_legacy", "ZI-BGRemover")
+    shutil.copytree(base, app)
+    stats = patch_applier.apply_update(app, patch_files, full_update)
+    legacy = stats["stage_seconds"] + stats["swap_seconds"]
+    got = _tree(app)
+    if full_update:
+        # Site settings survive a full update
+        assert got.pop(patch_applier.KEEP_FILES[0])
+    assert got == expected, "Legacy result differs"
+
+    app = os.path.join(work, f"{label}_staged", "ZI-BGRemover")
+    shutil.copytree(base, app)
+    staging_dir = app + patch_applier.STAGING_SUFFIX
+    start = time.perf_counter()
+    patch_applier.stage_update(app, staging_dir, patch_files, full_update, version="2.0.0")
+    staging = time.perf_counter() - start
+    assert _tree(app) == original, "Staging touched the install"
+
+    stats = patch_applier.apply_staged(app, staging_dir)
+    assert not os.path.exists(staging_dir)
+    got = _tree(app)
+    if full_update:
+        # Site settings survive a full update
+        assert got.pop(patch_applier.KEEP_FILES[0])
+    assert got == expected, "Pre-staged result differs"
+
+    rolled = patch_applier.rollback(app)
+    assert _tree(app) == original, "Rollback result differs"
+    try:
+        patch_applier.rollback(app)
+        raise AssertionError("A second rollback must fail")
+    except patch_applier.PatchError:
+        pass
+    return legacy, staging, stats["swap_seconds"], rolled["seconds"]
+
+
+def check_updater(work: str, base: str, patch_files: list[str], expected: dict):
+    """Updater.stage_downloaded / pending_update on a copy of the install."""
+    os.environ["LOCALAPPDATA"] = work
+    app = os.path.join(work, "updater", "ZI-BGRemover")
+    shutil.copytree(base, app)
+    download_dir = os.path.join(work, "updater", "zi_patches")
+
+    def downloaded() -> list[str]:
+        os.makedirs(download_dir)
+        return [shutil.copy2(patch_path, download_dir) for patch_path in patch_files]
+
+    updater = Updater("http://127.0.0.1:9/version.json", "1.0.0", app)
+    staging_dir = updater.stage_downloaded(downloaded(), False, "2.0.0")
+    assert staging_dir and not os.path.exists(download_dir), "Downloads should be removed once staged"
+    pending = updater.pending_update()
+    assert pending and pending["version"] == "2.0.0" and pending["path"] == staging_dir
+
+    # Patches staged on top of another version are useless
+    assert Updater("http://127.0.0.1:9/version.json", "1.0.1", app).pending_update() is None
+    assert not os.path.exists(staging_dir), "Stale staging folder should be removed"
+
+    staging_dir = updater.stage_downloaded(downloaded(), False, "2.0.0")
+    patch_applier.apply_staged(app, staging_dir)
+    assert _tree(app) == expected and updater.can_rollback()
+    assert Updater("http://127.0.0.1:9/version.json", "2.0.0", app).pending_update() is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark restart downtime with pre-staged updates")
+    parser.add_argument("--patches", type=int, default=3)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--big-mb", type=int, default=32)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zi_bench_swap_")
+    try:
+        print(f"Building install and {args.patches} patches in {work}...")
+        base, patch_files, expected_after = build_chain(work, args.patches, args.files, 1, args.big_mb)
+        expected = expected_after[-1]
+        # The expected final tree on disk, for the full update
+        final = os.path.join(work, "expected")
+        shutil.copytree(base, final)
+        for patch_path in patch_files:
+            with zipfile.ZipFile(patch_path, 'r') as zf:
+                zf.extractall(final)
+        assert _tree(final) == expected
+        _write(base, patch_applier.KEEP_FILES[0], b"\\\\fileserver\\zi-updates\n")
+        full_zip = os.path.join(work, "full.zip")
+        _full_zip(final, full_zip)
+
+        # Patches leave files they don't mention alone
+        expected_patched = dict(expected)
+        expected_patched[patch_applier.KEEP_FILES[0]] = _tree(base)[patch_applier.KEEP_FILES[0]]
+
+        print(f"\n{'Update':<14}{'Legacy downtime':>17}{'Staged in bg':>14}{'Downtime':>10}{'Rollback':>10}")
+        for label, target, kwargs in (("patch chain", expected_patched, {"patch_files": patch_files}),
+                                      ("full update", expected, {"full_update": full_zip})):
+            legacy, staging, swap, rolled = run_case(label.replace(" ", "_"), work, base, target, **kwargs)
+            print(f"{label:<14}{legacy:>16.2f}s{staging:>13.2f}s{swap:>9.3f}s{rolled:>9.3f}s")
+
+        check_updater(work, base, patch_files, expected_patched)
+        print("\nAll results identical; rollbacks restored the original install")
+        print("Updater: staged in background, pending update found, stale staging removed")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Update Check Benchmark
+======================
+Exercises update_check.UpdateChecker against the local HTTP stand-in
+(http_standin.py) and compares it with the previous check (a plain GET of
+version.json with a blocking timeout on every click):
+- 200, then cache hits within the TTL (no request at all)
+- conditional revalidation after the TTL: 304 with If-None-Match
+- a changed version.json is picked up
+- server timeouts and 500s: exponential backoff, answers without waiting,
+  cached data served while offline
+- the silent background check returns to the caller immediately
+
+Usage:
+    python benchmarks/bench_update_check.py [--timeout 1.0] [--clicks 5]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from urllib.request import urlopen, Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import update_check  # noqa: E402
+from update_check import UpdateChecker, UpdateCheckError  # noqa: E402
+from updater import Updater  # noqa: E402
+from http_standin import StandinServer  # noqa: E402
+
+
+def legacy_check(url: str, timeout: float):
+    """The previous Updater.check_for_updates request."""
+    try:
+        req = Request(url, headers={'User-Agent': 'ZI-BGRemover-Updater'})
+        with urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except Exception:
+        return None
+
+
+def version_json(version: str) -> bytes:
+    return json.dumps({"version": version, "patches": []}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cached/conditional update check")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Request timeout (the app uses 5s, legacy 10s)")
+    parser.add_argument("--clicks", type=int, default=5, help="Update button clicks while offline")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zi_bench_check_")
+    cache_path = os.path.join(work, "update_check.json")
+
+    with StandinServer() as server:
+        server.add_file("/version.json", version_json("1.0.8"), modified=1_700_000_000)
+        url = server.url("/version.json")
+        checker = UpdateChecker(url, cache_path, ttl=60, timeout=args.timeout)
+
+        def requests():
+            return len(server.requests)
+
+        assert checker.fetch()["version"] == "1.0.8" and checker.last_source == "network"
+        before = requests()
+        for _ in range(10):
+            assert checker.fetch()["version"] == "1.0.8" and checker.last_source == "cache"
+        assert requests() == before, "cache hits must not touch the network"
+        print("200 then 10 checks within TTL:   1 request")
+
+        checker.ttl = 0
+        assert checker.fetch()["version"] == "1.0.8" and checker.last_source == "not-modified"
+        headers = server.requests[-1][1]
+        assert "If-None-Match" in headers and "If-Modified-Since" in headers
+        print("after TTL:                       304 Not Modified (If-None-Match sent)")
+
+        server.add_file("/version.json", version_json("1.0.9"), modified=1_700_000_100)
+        assert checker.fetch()["version"] == "1.0.9" and checker.last_source == "network"
+        print("version.json changed:            200, new data")
+
+        # Offline: the server stops answering in time
+        server.faults["/version.json"] = {"delay": args.timeout * 1.5}
+        start = time.perf_counter()
+        for _ in range(args.clicks):
+            legacy_check(url, args.timeout)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.clicks):
+            data = checker.fetch()
+            assert data["version"] == "1.0.9" and checker.last_source == "stale"
+        cached_seconds = time.perf_counter() - start
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        assert state["failures"] == 1, "only the first offline click should hit the network"
+        print(f"{args.clicks} clicks offline:              legacy {legacy_seconds:.2f}s, "
+              f"cached {cached_seconds:.2f}s (1 timeout, then backoff)")
+
+        # Backoff doubles on consecutive failures (force skips the window)
+        server.faults["/version.json"] = {"status": 500}
+        delays = []
+        for _ in range(4):
+            checker.fetch(force=True)
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            delays.append(round(state["retry_after"] - time.time()))
+        assert delays[1] > delays[0] and delays[2] > delays[1], delays
+        print(f"500s, backoff after failures:    {delays} s (capped at {update_check.BACKOFF_MAX}s)")
+
+        # Recovery resets the backoff
+        server.faults.clear()
+        checker.fetch(force=True)
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            assert json.load(f)["failures"] == 0
+        print("server back:                     backoff reset")
+
+        # No cache at all + offline: immediate error after the first timeout
+        os.remove(cache_path)
+        server.faults["/version.json"] = {"delay": args.timeout * 1.5}
+        for attempt in range(2):
+            start = time.perf_counter()
+            try:
+                checker.fetch()
+                raise AssertionError("expected UpdateCheckError")
+            except UpdateCheckError:
+                pass
+            print(f"no cache, offline, check {attempt + 1}:    error after {time.perf_counter() - start:.2f}s")
+        server.faults.clear()
+
+        # Silent startup check: returns at once, result arrives later
+        os.environ["LOCALAPPDATA"] = work
+        updater = Updater(url, "1.0.8", work)
+        updater.checker.timeout = args.timeout
+        results = []
+        start = time.perf_counter()
+        thread = updater.check_for_updates_async(lambda has_update, info: results.append(has_update))
+        returned = time.perf_counter() - start
+        thread.join()
+        assert results == [True]
+        print(f"silent check:                    returned in {returned * 1000:.1f} ms, update found")
+
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
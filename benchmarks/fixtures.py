@@ -0,0 +1,144 @@
+"""
+Benchmark Fixtures
+==================
+Deterministic synthetic inputs for the benchmark scripts, so they run offline:
+- Images with a soft-edged subject on a textured background
+- A stub "u2netp" ONNX model (same input/output layout as the real one)
+- A stub two-file "sam" model (encoder + decoder, the inputs and outputs
+  rembg's SamSession feeds and reads)
+"""
+
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+
+def make_image(width: int, height: int, seed: int) -> Image.Image:
+    """Create one RGB test image: gradient background plus a blurred ellipse subject."""
+    rng = random.Random(seed)
+    img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(img)
+
+    # Background clutter
+    for _ in range(20):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(5, max(6, width // 20))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + r, y + r), fill=color)
+
+    # Subject with soft edges
+    subject = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(subject).ellipse(
+        (width * 0.25, height * 0.15, width * 0.75, height * 0.9), fill=255)
+    subject = subject.filter(ImageFilter.GaussianBlur(radius=max(2, width // 200)))
+    color = tuple(rng.randrange(256) for _ in range(3))
+    img.paste(Image.new('RGB', (width, height), color), mask=subject)
+    return img
+
+
+def make_images(folder: str, count: int, size: tuple[int, int] = (1024, 768),
+                fmt: str = "JPEG", seed: int = 1234) -> list[str]:
+    """Write `count` test images to a folder (reused if already present)."""
+    os.makedirs(folder, exist_ok=True)
+    ext = ".jpg" if fmt == "JPEG" else f".{fmt.lower()}"
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"img_{size[0]}x{size[1]}_{i:04d}{ext}")
+        if not os.path.exists(path):
+            make_image(size[0], size[1], seed + i).save(path, format=fmt, quality=90)
+        paths.append(path)
+    return paths
+
+
+def make_stub_model(model_dir: str, model_name: str = "u2netp") -> str:
+    """
+    Write a tiny ONNX model that rembg's u2netp session can run.
+
+    Input (1, 3, 320, 320) -> output (1, 1, 320, 320) computed with a small
+    convolution, so inference cost is negligible but the full pipeline runs.
+    Also sets MODEL_CHECKSUM_DISABLED so rembg accepts the file.
+    """
+    import numpy as np
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"{model_name}.onnx")
+    os.environ["U2NET_HOME"] = model_dir
+    os.environ["MODEL_CHECKSUM_DISABLED"] = "1"
+    if os.path.exists(path):
+        return path
+
+    weight = np.full((1, 3, 3, 3), 1.0 / 27, dtype=np.float32)
+    graph = helper.make_graph(
+        [helper.make_node('Conv', ['input.1', 'w'], ['mask'], pads=[1, 1, 1, 1]),
+         helper.make_node('Sigmoid', ['mask'], ['out'])],
+        'stub',
+        [helper.make_tensor_value_info('input.1', TensorProto.FLOAT, [1, 3, 320, 320])],
+        [helper.make_tensor_value_info('out', TensorProto.FLOAT, [1, 1, 320, 320])],
+        [numpy_helper.from_array(weight, 'w')])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+def make_stub_sam(model_dir: str) -> list[str]:
+    """
+    Write a tiny encoder/decoder pair that rembg's sam session can run.
+
+    The encoder reduces the image to a (1, 1, 1) "embedding"; the decoder adds
+    it to a weight the size of mask_input, so each file has an initializer
+    large enough to go to external data. Sets U2NET_HOME and
+    MODEL_CHECKSUM_DISABLED like make_stub_model.
+    """
+    import numpy as np
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+
+    os.makedirs(model_dir, exist_ok=True)
+    os.environ["U2NET_HOME"] = model_dir
+    os.environ["MODEL_CHECKSUM_DISABLED"] = "1"
+    encoder_path = os.path.join(model_dir, "sam_vit_b_01ec64.encoder.onnx")
+    decoder_path = os.path.join(model_dir, "sam_vit_b_01ec64.decoder.onnx")
+    if os.path.exists(encoder_path) and os.path.exists(decoder_path):
+        return [encoder_path, decoder_path]
+
+    def save(graph, path):
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+        model.ir_version = 8
+        onnx.save(model, path)
+
+    scale = np.full((1, 1, 1), 1.0 / 255, dtype=np.float32)
+    save(helper.make_graph(
+        [helper.make_node('ReduceMean', ['input_image'], ['mean'], keepdims=1),
+         helper.make_node('Reshape', ['mean', 'shape'], ['flat']),
+         helper.make_node('Mul', ['flat', 'scale'], ['image_embeddings'])],
+        'stub_sam_encoder',
+        [helper.make_tensor_value_info('input_image', TensorProto.FLOAT, ['h', 'w', 3])],
+        [helper.make_tensor_value_info('image_embeddings', TensorProto.FLOAT, [1, 1, 1])],
+        [numpy_helper.from_array(np.array([1, 1, 1], dtype=np.int64), 'shape'),
+         numpy_helper.from_array(scale, 'scale'),
+         numpy_helper.from_array(np.zeros((1, 1, 64, 64), dtype=np.float32), 'unused_weight')]),
+        encoder_path)
+
+    bias = np.full((1, 1, 256, 256), -0.5, dtype=np.float32)
+    save(helper.make_graph(
+        [helper.make_node('Add', ['mask_input', 'bias'], ['shifted']),
+         helper.make_node('Add', ['shifted', 'image_embeddings'], ['masks']),
+         helper.make_node('Identity', ['has_mask_input'], ['iou_predictions']),
+         helper.make_node('Identity', ['mask_input'], ['low_res_masks'])],
+        'stub_sam_decoder',
+        [helper.make_tensor_value_info('image_embeddings', TensorProto.FLOAT, [1, 1, 1]),
+         helper.make_tensor_value_info('point_coords', TensorProto.FLOAT, [1, 'n', 2]),
+         helper.make_tensor_value_info('point_labels', TensorProto.FLOAT, [1, 'n']),
+         helper.make_tensor_value_info('mask_input', TensorProto.FLOAT, [1, 1, 256, 256]),
+         helper.make_tensor_value_info('has_mask_input', TensorProto.FLOAT, [1]),
+         helper.make_tensor_value_info('orig_im_size', TensorProto.FLOAT, [2])],
+        [helper.make_tensor_value_info('masks', TensorProto.FLOAT, [1, 1, 256, 256]),
+         helper.make_tensor_value_info('iou_predictions', TensorProto.FLOAT, [1]),
+         helper.make_tensor_value_info('low_res_masks', TensorProto.FLOAT, [1, 1, 256, 256])],
+        [numpy_helper.from_array(bias, 'bias')]),
+        decoder_path)
+    return [encoder_path, decoder_path]
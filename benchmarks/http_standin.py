@@ -0,0 +1,184 @@
+"""
+HTTP Stand-in Server
+====================
+Local stand-in for GitHub releases / raw files, for the download and update
+check scripts. Serves in-memory files with the behaviour the updater depends on:
+- Range / If-Range requests (206), ETag and Last-Modified validators
+- Conditional GETs (If-None-Match / If-Modified-Since -> 304)
+- Fault injection: drop the connection after N bytes, delay responses,
+  throttle each connection, answer with a fixed status code, or send the
+  body without a Content-Length (ended by closing the connection)
+- Optional shared link rate for all connections (many clients behind one
+  internet connection), and a count of the bytes sent
+
+Usage:
+    with StandinServer() as server:
+        server.add_file("/patch.zip", data)
+        server.faults["/patch.zip"] = {"drop_after": [1_000_000, 5_000_000]}
+        url = server.url("/patch.zip")
+"""
+
+import time
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head: bool):
+        server = self.server.standin
+        path = self.path.split('?', 1)[0]
+        with server.lock:
+            server.requests.append((path, dict(self.headers)))
+            entry = server.files.get(path)
+            fault = server.faults.get(path, {})
+            drops = fault.get("drop_after", [])
+            drop_after = drops.pop(0) if drops else None
+
+        if fault.get("delay"):
+            time.sleep(fault["delay"])
+        if fault.get("status"):
+            self.send_response(fault["status"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if entry is None:
+            self.send_error(404)
+            return
+
+        data, etag, modified = entry["data"], entry["etag"], entry["modified"]
+
+        # Conditional GET
+        if self.headers.get("If-None-Match") == etag or (
+                self.headers.get("If-Modified-Since") and "If-None-Match" not in self.headers
+                and parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp() >= modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end = 0, len(data)
+        status = 200
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and server.ranges and (not if_range or if_range in (etag, formatdate(modified, usegmt=True))):
+            first, _, last = range_header.split("=", 1)[1].partition("-")
+            start = int(first)
+            end = int(last) + 1 if last else len(data)
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            end = min(end, len(data))
+            status = 206
+
+        self.send_response(status)
+        if fault.get("no_length"):
+            self.close_connection = True
+        else:
+            self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        if head:
+            return
+
+        rate = fault.get("rate") or server.rate
+        pos = start
+        block = 64 * 1024
+        begin = time.monotonic()
+        try:
+            while pos < end:
+                stop = min(end, pos + block)
+                if drop_after is not None and pos - start + block >= drop_after:
+                    stop = start + drop_after
+                    self.wfile.write(data[pos:stop])
+                    server.sent(stop - pos)
+                    self.wfile.flush()
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                self.wfile.write(data[pos:stop])
+                server.sent(stop - pos)
+                pos = stop
+                if rate:
+                    ahead = (pos - start) / rate - (time.monotonic() - begin)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class StandinServer:
+    """Threaded local HTTP server with in-memory files and fault injection."""
+
+    def __init__(self, ranges: bool = True, rate: int = None, link_rate: int = None):
+        """
+        Args:
+            ranges: Honour Range requests (False = always send the whole file).
+            rate: Bytes per second per connection (None = unlimited).
+            link_rate: Bytes per second shared by all connections (None = unlimited).
+        """
+        self.files = {}
+        self.faults = {}
+        self.requests = []
+        self.ranges = ranges
+        self.rate = rate
+        self.link_rate = link_rate
+        self.bytes_sent = 0
+        self._link_free = 0.0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def add_file(self, path: str, data: bytes, modified: float = None):
+        """Serve data at path; the ETag is derived from the content."""
+        with self.lock:
+            self.files[path] = {
+                "data": data,
+                "etag": '"' + hashlib.sha256(data).hexdigest()[:16] + '"',
+                "modified": int(modified if modified is not None else time.time()),
+            }
+
+    def sent(self, count: int):
+        """Account for bytes written; waits for the shared link when link_rate is set."""
+        with self.lock:
+            self.bytes_sent += count
+            if not self.link_rate:
+                return
+            start = max(time.monotonic(), self._link_free)
+            self._link_free = start + count / self.link_rate
+            wait = self._link_free - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}{path}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
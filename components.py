@@ -0,0 +1,249 @@
+"""
+Install Components for ZI Background Remover
+============================================
+Splits the bundle into named components so CPU-only machines neither download
+nor install the CUDA and torch payloads:
+- core: the app, the Python runtime and every library of the CPU pipeline
+- onnx-cpu: onnxruntime with its CPU execution provider
+- onnx-cuda: the CUDA execution provider and the CUDA/cuDNN DLLs it loads
+- torch: torch, torchvision and the libraries that only run on top of them
+  (the app only uses torch for the VRAM readout)
+
+Files are assigned by path patterns, first matching component wins, anything
+unmatched is core. The rules are recorded in every JSON manifest
+('components'), so a client classifies a release's files with that release's
+rules. The installed set is kept in COMPONENTS_FILE in the app folder; an
+install without one has every component (portable ZIP, installs from before
+the split).
+
+Usage:
+    python components.py report manifest_v1.0.8.json
+    python components.py split dist/ZI-BGRemover manifest_v1.0.8.json dist/components
+    python components.py profile
+
+    from components import detect_profile, installed_components, component_of
+"""
+
+import os
+import sys
+import json
+import shutil
+import fnmatch
+import argparse
+
+from content_store import link_or_copy
+from manifest_format import iter_manifest
+
+
+# Written to the app folder by the installer / updater
+COMPONENTS_FILE = "zi_components.json"
+
+# First matching component wins; patterns are matched against the lowercased path
+DEFAULT_RULES = [
+    {"name": "onnx-cuda", "requires": ["onnx-cpu"], "patterns": [
+        "_internal/onnxruntime/capi/onnxruntime_providers_cuda.dll",
+        "_internal/onnxruntime/capi/onnxruntime_providers_tensorrt.dll",
+        "_internal/onnxruntime/capi/cu*.dll",       # cudart, cublas, cudnn, cufft, curand, cusolver, cusparse, cupti
+        "_internal/onnxruntime/capi/nv*.dll",       # nvrtc, nvJitLink
+        "_internal/onnxruntime/capi/c10_cuda.dll",
+        "_internal/onnxruntime/capi/caffe2_nvrtc.dll",
+        "_internal/onnxruntime/capi/zlibwapi.dll",  # cuDNN dependency
+    ]},
+    {"name": "onnx-cpu", "requires": ["core"], "patterns": [
+        "_internal/onnxruntime/*",
+        "_internal/onnxruntime*.dist-info/*",
+    ]},
+    {"name": "torch", "requires": ["core"], "patterns": [
+        "_internal/torch/*",
+        "_internal/torch-*.dist-info/*",
+        "_internal/torchvision/*",
+        "_internal/torchvision-*.dist-info/*",
+        "_internal/torchvision.libs/*",
+        "_internal/functorch/*",
+        "_internal/transformers/*",
+        "_internal/timm/*",
+    ]},
+    {"name": "core", "requires": [], "patterns": []},
+]
+
+COMPONENTS = [rule["name"] for rule in DEFAULT_RULES]
+CPU_PROFILE = ("core", "onnx-cpu")
+
+
+def rules_of(manifest=None) -> list[dict]:
+    """Component rules recorded in a JSON manifest, else DEFAULT_RULES."""
+    if isinstance(manifest, dict) and manifest.get("components"):
+        return [{"name": name, "requires": info.get("requires", []), "patterns": info.get("patterns", [])}
+                for name, info in manifest["components"].items()]
+    return DEFAULT_RULES
+
+
+def component_of(path: str, rules: list[dict] = None) -> str:
+    """Component a file belongs to."""
+    lowered = path.lower()
+    for rule in rules or DEFAULT_RULES:
+        if any(fnmatch.fnmatchcase(lowered, pattern) for pattern in rule["patterns"]):
+            return rule["name"]
+    return "core"
+
+
+def with_requirements(names, rules: list[dict] = None) -> list[str]:
+    """Components plus everything they require, in rule order."""
+    requires = {rule["name"]: rule["requires"] for rule in rules or DEFAULT_RULES}
+    selected = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in requires:
+            raise ValueError(f"Unknown component: {name}")
+        if name not in selected:
+            selected.add(name)
+            todo.extend(requires[name])
+    return [rule["name"] for rule in rules or DEFAULT_RULES if rule["name"] in selected]
+
+
+def summarize(manifest, rules: list[dict] = None) -> dict:
+    """
+    Per-component rules and totals, as recorded in the manifest.
+
+    Returns:
+        Dict name -> {'requires', 'patterns', 'files', 'size'}.
+    """
+    rules = rules or DEFAULT_RULES
+    summary = {rule["name"]: {"requires": rule["requires"], "patterns": rule["patterns"], "files": 0, "size": 0}
+               for rule in rules}
+    for path, _, size in iter_manifest(manifest):
+        entry = summary[component_of(path, rules)]
+        entry["files"] += 1
+        entry["size"] += size
+    return summary
+
+
+def filter_manifest(manifest, names, rules: list[dict] = None) -> dict:
+    """
+    Manifest restricted to the files of some components.
+
+    Accepts JSON dicts and BinaryManifest objects; returns a JSON-style dict
+    (version and file entries only), sorted by path like the input.
+    """
+    rules = rules or rules_of(manifest)
+    keep = set(names)
+    files = {path: {"hash": file_hash, "size": size}
+             for path, file_hash, size in iter_manifest(manifest)
+             if component_of(path, rules) in keep}
+    version = manifest.get("version") if isinstance(manifest, dict) else getattr(manifest, "version", None)
+    return {"version": version, "files": files}
+
+
+def installed_components(app_folder: str) -> list[str] | None:
+    """Components recorded in the app folder, or None for a full install."""
+    try:
+        with open(os.path.join(app_folder, COMPONENTS_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)["components"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_components(folder: str, names):
+    """Record the installed components (atomically)."""
+    path = os.path.join(folder, COMPONENTS_FILE)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"components": with_requirements(names)}, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def skip_filter(names, rules: list[dict] = None):
+    """Predicate that is True for paths outside the given components (None: skip nothing)."""
+    if names is None:
+        return None
+    keep = set(names)
+    return lambda path: component_of(path, rules) not in keep
+
+
+def has_nvidia_gpu() -> bool:
+    """
+    True if an NVIDIA driver is installed (without loading onnxruntime or CUDA).
+
+    The driver ships nvcuda.dll (Windows) / libcuda.so.1 (Linux); both are
+    there even when no CUDA toolkit is.
+    """
+    if sys.platform == "win32":
+        system_root = os.environ.get("SystemRoot", r"C:\Windows")
+        return os.path.exists(os.path.join(system_root, "System32", "nvcuda.dll"))
+    import ctypes.util
+    return ctypes.util.find_library("cuda") is not None or shutil.which("nvidia-smi") is not None
+
+
+def detect_profile() -> list[str]:
+    """Components the hardware needs: the CUDA provider only with an NVIDIA GPU."""
+    names = list(CPU_PROFILE)
+    if has_nvidia_gpu():
+        names.append("onnx-cuda")
+    return with_requirements(names)
+
+
+def split_folder(app_folder: str, manifest: dict, out_dir: str) -> dict:
+    """
+    Hardlink (or copy) the build into one folder per component.
+
+    The installer packs each folder as its own component.
+
+    Returns:
+        Dict name -> file count.
+    """
+    rules = rules_of(manifest)
+    counts = {rule["name"]: 0 for rule in rules}
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    for path, _, _ in iter_manifest(manifest):
+        name = component_of(path, rules)
+        link_or_copy(os.path.join(app_folder, *path.split('/')), os.path.join(out_dir, name, *path.split('/')))
+        counts[name] += 1
+    return counts
+
+
+def format_summary(summary: dict) -> str:
+    """Human-readable component sizes."""
+    mb = 1024 * 1024
+    total = sum(entry["size"] for entry in summary.values())
+    lines = [f"{'Component':<12}{'Files':>8}{'Size (MB)':>12}{'Share':>8}  Requires"]
+    for name, entry in summary.items():
+        lines.append(f"{name:<12}{entry['files']:>8}{entry['size'] / mb:>12.1f}"
+                     f"{entry['size'] / max(total, 1):>8.1%}  {', '.join(entry['requires']) or '-'}")
+    cpu = sum(summary[name]["size"] for name in with_requirements(CPU_PROFILE) if name in summary)
+    lines.append(f"CPU profile ({', '.join(CPU_PROFILE)}): {cpu / mb:.1f} MB of {total / mb:.1f} MB")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the bundle into install components")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Component sizes of a manifest")
+    report.add_argument("manifest")
+    split = sub.add_parser("split", help="Hardlink a build into one folder per component (for the installer)")
+    split.add_argument("app_folder")
+    split.add_argument("manifest")
+    split.add_argument("out_dir")
+    sub.add_parser("profile", help="Components this machine needs")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "profile":
+            print(" ".join(detect_profile()))
+            return
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if args.command == "report":
+            print(format_summary(summarize(manifest, rules_of(manifest))))
+        else:
+            counts = split_folder(args.app_folder, manifest, args.out_dir)
+            print(f"✓ Components written to {args.out_dir}")
+            for name, count in counts.items():
+                print(f"  {name}: {count} files")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
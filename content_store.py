@@ -0,0 +1,302 @@
+"""
+Content Store for ZI Background Remover
+=======================================
+Content-addressed deduplication of identical files in the bundle:
+- Find duplicate content in a manifest by hash and report the wasted bytes
+- Write packages (full ZIP or patch ZIP) that store each blob only once, plus a
+  DUPLICATES_FILE mapping every duplicate path to the path that holds its blob
+- Materialise the duplicates after extraction with hardlinks (copy fallback)
+- Publish a per-file store of <hash>.zst blobs, from which the updater fetches
+  only the final version of each changed file (update_planner.py)
+
+The PyInstaller bundle ships several CUDA DLLs twice (e.g. under both
+_internal/torch/lib and _internal/onnxruntime/capi), so this saves gigabytes in
+the full download and the installed footprint.
+
+Hardlinked files share their data, so anything that replaces one of them must
+delete (or rename over) the file first instead of writing into it.
+
+Usage:
+    python content_store.py report manifest_v1.0.8.json
+    python content_store.py pack dist/ZI-BGRemover manifest_v1.0.8.json out.zip [--root ZI-BGRemover]
+    python content_store.py publish dist/ZI-BGRemover manifest_v1.0.8.json content_store
+"""
+
+import os
+import sys
+import json
+import shutil
+import zipfile
+import argparse
+
+
+# Written to the package root and kept in the app folder after install
+DUPLICATES_FILE = "zi_duplicates.json"
+
+
+def find_duplicates(manifest: dict) -> list[dict]:
+    """
+    Group files with identical content.
+
+    Returns:
+        List of {'hash', 'size', 'paths', 'wasted'} for every hash shared by more
+        than one non-empty file, largest waste first. 'paths' is sorted; the first
+        one is the canonical copy.
+    """
+    groups = {}
+    for path, info in manifest.get("files", {}).items():
+        if info["size"] > 0:
+            groups.setdefault(info["hash"], []).append(path)
+
+    duplicates = []
+    for file_hash, paths in groups.items():
+        if len(paths) > 1:
+            size = manifest["files"][paths[0]]["size"]
+            duplicates.append({
+                "hash": file_hash,
+                "size": size,
+                "paths": sorted(paths),
+                "wasted": size * (len(paths) - 1),
+            })
+    duplicates.sort(key=lambda group: (-group["wasted"], group["paths"][0]))
+    return duplicates
+
+
+def dedup_links(manifest: dict, paths=None) -> dict:
+    """
+    Map duplicate paths to their canonical path.
+
+    Args:
+        manifest: Manifest dict.
+        paths: Optional subset of paths (e.g. the files in a patch); only
+            duplicates within this subset are linked.
+
+    Returns:
+        Dict of duplicate path -> canonical path.
+    """
+    selected = set(paths) if paths is not None else None
+    links = {}
+    for group in find_duplicates(manifest):
+        members = [p for p in group["paths"] if selected is None or p in selected]
+        for path in members[1:]:
+            links[path] = members[0]
+    return links
+
+
+def format_report(duplicates: list[dict], limit: int = None) -> str:
+    """Human-readable duplicate report."""
+    mb = 1024 * 1024
+    total = sum(group["wasted"] for group in duplicates)
+    lines = [f"Duplicate groups: {len(duplicates)}, wasted: {total / mb:.1f} MB"]
+    for group in duplicates[:limit]:
+        lines.append(f"  {group['wasted'] / mb:8.1f} MB  {len(group['paths'])}x {group['size'] / mb:.1f} MB "
+                     f"({group['hash'][:12]})")
+        for path in group["paths"]:
+            lines.append(f"      {path}")
+    return "\n".join(lines)
+
+
+def write_package(app_folder: str, manifest: dict, zip_path: str, paths=None,
+                  root: str = "", compression=zipfile.ZIP_DEFLATED) -> dict:
+    """
+    Write a ZIP that stores each distinct blob once.
+
+    Args:
+        app_folder: Folder the files are read from.
+        manifest: Manifest of app_folder.
+        zip_path: Output ZIP.
+        paths: Files to include (default: every file in the manifest).
+        root: Folder name prefixed to every entry (e.g. "ZI-BGRemover" for the
+            portable ZIP, which extracts next to the app folder).
+        compression: zipfile compression method.
+
+    Returns:
+        Dict with 'files', 'stored', 'linked' counts and 'saved_bytes'.
+    """
+    files = manifest.get("files", {})
+    paths = sorted(paths if paths is not None else files)
+    links = dedup_links(manifest, paths)
+    prefix = f"{root.strip('/')}/" if root else ""
+
+    with zipfile.ZipFile(zip_path, 'w', compression=compression, allowZip64=True) as zf:
+        for path in paths:
+            if path not in links:
+                zf.write(os.path.join(app_folder, *path.split('/')), prefix + path)
+        if links:
+            zf.writestr(prefix + DUPLICATES_FILE, json.dumps({"links": links}, indent=2, sort_keys=True))
+
+    return {
+        "files": len(paths),
+        "stored": len(paths) - len(links),
+        "linked": len(links),
+        "saved_bytes": sum(files[path]["size"] for path in links),
+    }
+
+
+def read_links(zip_path: str) -> dict:
+    """Duplicate links stored in a package (empty if it has none)."""
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for name in zf.namelist():
+            if name == DUPLICATES_FILE or name.endswith("/" + DUPLICATES_FILE):
+                return json.loads(zf.read(name)).get("links", {})
+    return {}
+
+
+def link_or_copy(src: str, dst: str, use_hardlinks: bool = True) -> str:
+    """
+    Create dst with the content of src.
+
+    Returns:
+        'link' or 'copy'.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if use_hardlinks:
+        try:
+            os.link(src, dst)
+            return "link"
+        except OSError:
+            pass  # Different volume / FAT32 / no permission
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def materialize(app_folder: str, links: dict, use_hardlinks: bool = True, only_missing: bool = False) -> dict:
+    """
+    Recreate duplicate files from their canonical copies.
+
+    Args:
+        app_folder: Installed app folder.
+        links: Duplicate path -> canonical path (relative, '/' separated).
+        use_hardlinks: Try hardlinks before copying.
+        only_missing: Skip duplicates that already exist.
+
+    Returns:
+        Dict with 'linked', 'copied' and 'missing_source' counts.
+    """
+    counts = {"linked": 0, "copied": 0, "missing_source": 0}
+    for dup_path, canonical in sorted(links.items()):
+        dst = os.path.join(app_folder, *dup_path.split('/'))
+        src = os.path.join(app_folder, *canonical.split('/'))
+        if only_missing and os.path.exists(dst):
+            continue
+        if not os.path.exists(src):
+            print(f"[ContentStore] Canonical copy missing: {canonical}")
+            counts["missing_source"] += 1
+            continue
+        counts["linked" if link_or_copy(src, dst, use_hardlinks) == "link" else "copied"] += 1
+    return counts
+
+
+def restore_duplicates(app_folder: str) -> dict | None:
+    """
+    Recreate missing duplicates listed in the app folder's DUPLICATES_FILE.
+
+    Cheap enough to call at startup (a few stat calls): covers portable ZIPs
+    extracted by hand, where nothing else materialised the links.
+
+    Returns:
+        materialize() counts, or None when the folder has no duplicates file.
+    """
+    links_path = os.path.join(app_folder, DUPLICATES_FILE)
+    if not os.path.exists(links_path):
+        return None
+    with open(links_path, 'r', encoding='utf-8') as f:
+        links = json.load(f).get("links", {})
+
+    # Duplicates of components that aren't installed stay absent
+    from components import installed_components, skip_filter
+    skip = skip_filter(installed_components(app_folder))
+    if skip:
+        links = {dup: canonical for dup, canonical in links.items() if not skip(dup)}
+    return materialize(app_folder, links, only_missing=True)
+
+
+def publish_blobs(app_folder: str, manifest: dict, store_dir: str, jobs: int = None) -> dict:
+    """
+    Add every content of a release missing from the per-file store.
+
+    Blobs are named <hash>.zst and hold zstd-compressed file content (the
+    delta_patch 'full' blob format). The store only grows: blobs of older
+    releases stay, so any installed version can be updated from it.
+
+    Returns:
+        Dict with 'blobs' (distinct contents), 'new' (list of blob names written)
+        and 'new_bytes' (their total size).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from delta_patch import compress_full, default_jobs
+
+    os.makedirs(store_dir, exist_ok=True)
+    sources = {}
+    for path, info in sorted(manifest.get("files", {}).items()):
+        sources.setdefault(info["hash"], path)
+    missing = {file_hash: path for file_hash, path in sources.items()
+               if not os.path.exists(os.path.join(store_dir, f"{file_hash}.zst"))}
+
+    def publish(item):
+        file_hash, path = item
+        blob_path = os.path.join(store_dir, f"{file_hash}.zst")
+        with open(blob_path + ".tmp", 'wb') as f:
+            f.write(compress_full(os.path.join(app_folder, *path.split('/'))))
+        os.replace(blob_path + ".tmp", blob_path)
+        return os.path.basename(blob_path), os.path.getsize(blob_path)
+
+    with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+        written = list(pool.map(publish, missing.items()))
+
+    return {
+        "blobs": len(sources),
+        "new": sorted(name for name, _ in written),
+        "new_bytes": sum(size for _, size in written),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Duplicate content report and deduplicated packaging")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report = sub.add_parser("report", help="List duplicate files in a manifest")
+    report.add_argument("manifest")
+    report.add_argument("--limit", type=int, default=None, help="Show only the N largest groups")
+
+    pack = sub.add_parser("pack", help="Write a ZIP storing each blob once")
+    pack.add_argument("app_folder")
+    pack.add_argument("manifest")
+    pack.add_argument("output_zip")
+    pack.add_argument("--root", default="", help="Folder name prefixed to every entry")
+
+    publish = sub.add_parser("publish", help="Add a release's blobs to the per-file content store")
+    publish.add_argument("app_folder")
+    publish.add_argument("manifest")
+    publish.add_argument("store_dir")
+    publish.add_argument("--new-list", default=None, help="Write the names of the new blobs to this file")
+    args = parser.parse_args()
+
+    try:
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if args.command == "report":
+            print(format_report(find_duplicates(manifest), args.limit))
+        elif args.command == "publish":
+            stats = publish_blobs(args.app_folder, manifest, args.store_dir)
+            if args.new_list:
+                with open(args.new_list, 'w', encoding='utf-8') as f:
+                    f.write("".join(f"{name}\n" for name in stats["new"]))
+            print(f"✓ Content store updated: {args.store_dir}")
+            print(f"  Blobs: {stats['blobs']} ({len(stats['new'])} new, "
+                  f"{stats['new_bytes'] / (1024 * 1024):.1f} MB to upload)")
+        else:
+            stats = write_package(args.app_folder, manifest, args.output_zip, root=args.root)
+            print(f"✓ Package written: {args.output_zip}")
+            print(f"  Files: {stats['files']} ({stats['stored']} stored, {stats['linked']} linked)")
+            print(f"  Saved: {stats['saved_bytes'] / (1024 * 1024):.1f} MB")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
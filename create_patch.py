@@ -0,0 +1,132 @@
+"""
+Patch Creator for ZI Background Remover
+=======================================
+Builds patch_<old>_to_<new>.zip for release.bat from the two version manifests:
+changed files are stored as binary deltas against the previous release (or as
+full zstd content when that is smaller), removed files are listed for deletion.
+See delta_patch.py for the format.
+
+The previous release folder is needed for deltas; release.bat keeps a copy of
+every build in releases/ZI-BGRemover-v<version>. Without it, every changed file
+is stored full.
+
+With --solid, the patch is also repacked as a solid zstd/xz archive
+(solid_patch.py) that the updater can extract while it downloads.
+
+Usage:
+    python create_patch.py <old_version> <new_version> [--old-dir DIR] [--new-dir DIR] [--output FILE] [--jobs N]
+                           [--solid zstd|xz]
+
+Example:
+    python create_patch.py 1.0.6 1.0.8
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from delta_patch import create_patch, default_jobs
+from patch_applier import stage
+from solid_patch import CODECS, create_solid_patch, extract_stream, solid_path_for
+
+
+def load_manifest(version: str) -> dict:
+    """Load manifest_v<version>.json from the current folder."""
+    with open(f"manifest_v{version}.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_patch(patch_path: str, old_dir: str, jobs: int = None) -> float:
+    """Apply the patch to a scratch staging folder (hashes are checked); returns seconds."""
+    staging_dir = tempfile.mkdtemp(prefix="zi_patch_verify_")
+    try:
+        start = time.perf_counter()
+        stage([patch_path], old_dir, staging_dir, jobs=jobs)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def verify_solid_patch(solid_path: str, old_dir: str) -> float:
+    """Stream-extract a solid patch to a scratch staging folder (hashes are checked); returns seconds."""
+    staging_dir = tempfile.mkdtemp(prefix="zi_patch_verify_")
+    try:
+        start = time.perf_counter()
+        with open(solid_path, 'rb') as f:
+            extract_stream(f, old_dir, staging_dir)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a delta patch between two releases.",
+        epilog="Example: python create_patch.py 1.0.6 1.0.8")
+    parser.add_argument("old_version")
+    parser.add_argument("new_version")
+    parser.add_argument("--old-dir", default=None,
+                        help="Previous release folder (default: releases/ZI-BGRemover-v<old_version>)")
+    parser.add_argument("--new-dir", default=os.path.join("dist", "ZI-BGRemover"), help="New release folder")
+    parser.add_argument("--output", default=None, help="Output ZIP (default: patch_<old>_to_<new>.zip)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help=f"Parallel files (default: {default_jobs()})")
+    parser.add_argument("--solid", choices=CODECS, default=None,
+                        help="Also write a solid archive (patch_<old>_to_<new>.tar.zst / .tar.xz)")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the test application of the patch")
+    args = parser.parse_args()
+
+    old_dir = args.old_dir or os.path.join("releases", f"ZI-BGRemover-v{args.old_version}")
+    output = args.output or f"patch_{args.old_version}_to_{args.new_version}.zip"
+
+    try:
+        old_manifest = load_manifest(args.old_version)
+        new_manifest = load_manifest(args.new_version)
+
+        if not os.path.isdir(old_dir):
+            print(f"WARNING: Previous release folder not found: {old_dir}")
+            print("         Changed files will be stored in full (no deltas).")
+            old_dir = None
+
+        print(f"Creating patch {args.old_version} -> {args.new_version}...")
+
+        def progress(done, total):
+            print(f"\r  Encoding files: {done}/{total}", end="", flush=True)
+
+        stats = create_patch(old_dir, args.new_dir, old_manifest, new_manifest, output,
+                             jobs=args.jobs, progress_callback=progress)
+        print()
+
+        mb = 1024 * 1024
+        print(f"✓ Patch created: {output}")
+        print(f"  Files: {stats['files']} changed/new ({stats['delta']} delta, {stats['full']} full), "
+              f"{stats['deleted']} deleted")
+        print(f"  Size: {stats['patch_bytes'] / mb:.1f} MB "
+              f"(changed files: {stats['new_bytes'] / mb:.1f} MB), built in {stats['seconds']:.1f}s")
+
+        if old_dir and not args.no_verify:
+            apply_seconds = verify_patch(output, old_dir, args.jobs)
+            print(f"  Verified: applied to {old_dir} in {apply_seconds:.1f}s, all hashes match")
+
+        if args.solid:
+            solid_path = solid_path_for(output, args.solid)
+            print(f"Packing solid {args.solid} archive...")
+            solid = create_solid_patch(output, solid_path, args.solid)
+            print(f"✓ Solid patch created: {solid_path}")
+            print(f"  Size: {solid['solid_bytes'] / mb:.1f} MB (ZIP: {solid['patch_bytes'] / mb:.1f} MB), "
+                  f"packed in {solid['seconds']:.1f}s")
+            if old_dir and not args.no_verify:
+                extract_seconds = verify_solid_patch(solid_path, old_dir)
+                print(f"  Verified: extracted against {old_dir} in {extract_seconds:.1f}s, all hashes match")
+
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
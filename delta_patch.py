@@ -0,0 +1,241 @@
+"""
+Delta Patch Format for ZI Background Remover
+============================================
+Patches carry binary diffs instead of whole files:
+- Each changed file is stored as a zstd delta against the previous version's
+  file (identified by hash from the manifests), or as full zstd-compressed
+  content when the delta isn't smaller / no base is available
+- Deltas are cut into CHUNK_SIZE pieces, each compressed with the matching
+  region of the old file as a raw-content dictionary, so memory stays bounded
+  even for the 500 MB+ CUDA DLLs
+- Files are encoded and rebuilt in parallel threads (zstd releases the GIL)
+- Every rebuilt file is verified against its target hash
+
+Patch ZIP layout (stored, the blobs are already compressed):
+    zi_patch.json                      index: files, methods, hashes, deletions
+    blobs/<base>-<target>.delta        chunked zstd-dictionary delta
+    blobs/<target>.zst                 full content
+Blobs are content-addressed, so identical changes are stored once.
+
+Patches are applied by patch_applier.py.
+
+Usage:
+    from delta_patch import create_patch
+    create_patch(old_dir, new_dir, old_manifest, new_manifest, "patch.zip")
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import zstandard as zstd
+
+from manifest_generator import compare_manifests
+
+
+PATCH_INDEX = "zi_patch.json"
+PATCH_FORMAT = 1
+
+CHUNK_SIZE = 4 * 1024 * 1024      # New-file bytes per delta frame
+DICT_MARGIN = 1024 * 1024         # Old-file bytes on each side of the aligned region
+DELTA_LEVEL = 15
+FULL_LEVEL = 12
+MAX_WINDOW_SIZE = 1 << 24         # >= dictionary + chunk
+
+_DELTA_MAGIC = b"ZIDL"
+_DELTA_HEADER = struct.Struct("<4sI")
+_CHUNK = struct.Struct("<QIII")   # dict offset, dict length, frame length, output length
+
+
+class PatchError(Exception):
+    """Raised when a patch is malformed or a rebuilt file fails verification."""
+    pass
+
+
+def default_jobs() -> int:
+    """Worker threads for creating/applying patches."""
+    return min(8, os.cpu_count() or 1)
+
+
+def _read_file(path: str) -> bytes:
+    """Read a file via mmap (copy-free until sliced); empty files give b''."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _dict_region(offset: int, new_size: int, old_size: int) -> tuple[int, int]:
+    """Old-file region used as dictionary for the chunk at `offset` of the new file."""
+    aligned = offset * old_size // max(new_size, 1)
+    start = max(0, aligned - DICT_MARGIN)
+    end = min(old_size, aligned + CHUNK_SIZE + DICT_MARGIN)
+    return start, max(0, end - start)
+
+
+def make_delta(old, new) -> bytes:
+    """Encode `new` as a chunked zstd delta against `old` (bytes-like)."""
+    params = zstd.ZstdCompressionParameters.from_level(DELTA_LEVEL, window_log=MAX_WINDOW_SIZE.bit_length() - 1)
+    headers = []
+    frames = []
+    for offset in range(0, len(new), CHUNK_SIZE):
+        chunk = new[offset:offset + CHUNK_SIZE]
+        dict_start, dict_len = _dict_region(offset, len(new), len(old))
+        if dict_len:
+            dictionary = zstd.ZstdCompressionDict(old[dict_start:dict_start + dict_len],
+                                                  dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            cctx = zstd.ZstdCompressor(dict_data=dictionary, compression_params=params)
+        else:
+            cctx = zstd.ZstdCompressor(compression_params=params)
+        frame = cctx.compress(chunk)
+        headers.append(_CHUNK.pack(dict_start, dict_len, len(frame), len(chunk)))
+        frames.append(frame)
+    return _DELTA_HEADER.pack(_DELTA_MAGIC, len(frames)) + b"".join(headers) + b"".join(frames)
+
+
+def apply_delta(old, delta: bytes, out):
+    """Decode a delta against `old`, writing the new content to file object `out`."""
+    magic, count = _DELTA_HEADER.unpack_from(delta, 0)
+    if magic != _DELTA_MAGIC:
+        raise PatchError("Not a delta blob (bad magic)")
+    pos = _DELTA_HEADER.size + count * _CHUNK.size
+    for index in range(count):
+        dict_start, dict_len, frame_len, out_len = _CHUNK.unpack_from(delta, _DELTA_HEADER.size + index * _CHUNK.size)
+        if dict_len:
+            dictionary = zstd.ZstdCompressionDict(old[dict_start:dict_start + dict_len],
+                                                  dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            dctx = zstd.ZstdDecompressor(dict_data=dictionary, max_window_size=MAX_WINDOW_SIZE)
+        else:
+            dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
+        out.write(dctx.decompress(delta[pos:pos + frame_len], max_output_size=out_len))
+        pos += frame_len
+
+
+def compress_full(path: str) -> bytes:
+    """Full file content, zstd-compressed (multi-threaded)."""
+    cctx = zstd.ZstdCompressor(level=FULL_LEVEL, threads=-1)
+    with open(path, 'rb') as f:
+        return cctx.compress(f.read())
+
+
+def _encode_file(rel_path: str, old_dir: str, new_dir: str, old_info: dict | None, new_info: dict) -> dict:
+    """Build the smallest blob for one changed file -> index entry + blob bytes."""
+    new_path = os.path.join(new_dir, *rel_path.split('/'))
+    full = compress_full(new_path)
+    entry = {"method": "full", "blob": f"blobs/{new_info['hash']}.zst",
+             "hash": new_info["hash"], "size": new_info["size"]}
+    blob = full
+
+    old_path = os.path.join(old_dir, *rel_path.split('/')) if old_dir else None
+    if old_info and old_path and os.path.isfile(old_path) and old_info["size"] > 0:
+        old_data = _read_file(old_path)
+        new_data = _read_file(new_path)
+        try:
+            delta = make_delta(old_data, new_data)
+        finally:
+            for data in (old_data, new_data):
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        if len(delta) < len(full):
+            entry = {"method": "delta", "blob": f"blobs/{old_info['hash']}-{new_info['hash']}.delta",
+                     "base_hash": old_info["hash"], "hash": new_info["hash"], "size": new_info["size"]}
+            blob = delta
+
+    return {"path": rel_path, "entry": entry, "blob": blob}
+
+
+def create_patch(old_dir: str | None, new_dir: str, old_manifest: dict, new_manifest: dict,
+                 patch_path: str, jobs: int = None, progress_callback=None) -> dict:
+    """
+    Create a delta patch from the old to the new version.
+
+    Args:
+        old_dir: Previous release folder (None = no bases, every file stored full).
+        new_dir: New release folder.
+        old_manifest / new_manifest: Manifests of both versions.
+        patch_path: Output ZIP.
+        jobs: Parallel files being encoded.
+        progress_callback: Called with (done, total) after each file.
+
+    Returns:
+        Stats dict: files, delta, full, deleted, new_bytes, patch_bytes, seconds.
+    """
+    start = time.perf_counter()
+    diff = compare_manifests(old_manifest, new_manifest)
+    old_files, new_files = old_manifest.get("files", {}), new_manifest.get("files", {})
+    changed = diff["changed"] + diff["new"]
+
+    index = {
+        "format": PATCH_FORMAT,
+        "from": old_manifest.get("version"),
+        "to": new_manifest.get("version"),
+        "files": {},
+        "deleted": diff["deleted"],
+    }
+    stats = {"files": len(changed), "delta": 0, "full": 0, "deleted": len(diff["deleted"]),
+             "new_bytes": sum(new_files[p]["size"] for p in changed)}
+
+    with zipfile.ZipFile(patch_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf, \
+            ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+        written = set()
+        futures = {pool.submit(_encode_file, p, old_dir, new_dir, old_files.get(p), new_files[p]) for p in changed}
+        for done, future in enumerate(as_completed(futures), 1):
+            futures.discard(future)  # Drop the reference so the blob can be freed once written
+            result = future.result()
+            entry = result["entry"]
+            index["files"][result["path"]] = entry
+            stats[entry["method"]] += 1
+            if entry["blob"] not in written:
+                zf.writestr(entry["blob"], result["blob"])
+                written.add(entry["blob"])
+            if progress_callback:
+                progress_callback(done, len(changed))
+        zf.writestr(PATCH_INDEX, json.dumps(index, indent=2, sort_keys=True))
+
+    stats["patch_bytes"] = os.path.getsize(patch_path)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def is_delta_patch(patch_path: str) -> bool:
+    """True if the ZIP is a delta patch (has a patch index)."""
+    with zipfile.ZipFile(patch_path, 'r') as zf:
+        return PATCH_INDEX in zf.namelist()
+
+
+def read_index(zf: zipfile.ZipFile) -> dict:
+    """Load and check the patch index of an open patch ZIP."""
+    index = json.loads(zf.read(PATCH_INDEX))
+    if index.get("format") != PATCH_FORMAT:
+        raise PatchError(f"Unsupported patch format: {index.get('format')}")
+    return index
+
+
+def decode_entry(zf: zipfile.ZipFile, entry: dict, base_path: str | None, out):
+    """
+    Write the content described by one patch index entry to file object `out`.
+
+    Args:
+        zf: Open patch ZIP.
+        entry: Index entry ('method', 'blob', ...).
+        base_path: Previous version of the file (required for deltas).
+        out: Writable binary file object.
+    """
+    if entry["method"] == "delta":
+        if not base_path or not os.path.exists(base_path):
+            raise PatchError(f"Base file missing for delta: {entry['blob']}")
+        old = _read_file(base_path)
+        try:
+            apply_delta(old, zf.read(entry["blob"]), out)
+        finally:
+            if isinstance(old, mmap.mmap):
+                old.close()
+    elif entry["method"] == "full":
+        with zf.open(entry["blob"]) as src:
+            zstd.ZstdDecompressor().copy_stream(src, out)
+    else:
+        raise PatchError(f"Unknown patch method: {entry['method']}")
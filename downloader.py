@@ -0,0 +1,518 @@
+"""
+Resumable Downloader for ZI Background Remover
+==============================================
+HTTP downloads for the updater that survive dropped connections:
+- Data goes to <dest>.part; a small <dest>.part.json records the byte ranges
+  already written, so an interrupted download resumes with HTTP Range requests
+  (also after the app is restarted)
+- Resumes are guarded with If-Range (ETag / Last-Modified): if the file changed
+  on the server, the download starts over instead of mixing two versions
+- Large files can be fetched over N parallel range requests
+- Transient errors retry the unfinished part of a range with backoff
+- 1 MB buffers, throttled progress callbacks, cancellation between reads
+- Optional SHA-256 check computed while the data streams in, so a corrupt file
+  is rejected as soon as its download finishes
+- open_stream(): the same for consumers that read the response as it arrives
+  (solid patches are extracted without being saved); a dropped connection is
+  continued transparently with a Range request
+
+Usage:
+    from downloader import download
+    download(url, "update.zip", progress_callback=on_progress,
+             cancel_event=event, connections=4, sha256=expected_hash)
+
+    with open_stream(url, sha256=expected_hash) as stream:
+        consume(stream)         # any reader of a binary file object
+        stream.finish()         # read the rest, check the SHA-256
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+from http.client import HTTPException
+from urllib.request import urlopen, Request
+from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+
+
+USER_AGENT = "ZI-BGRemover-Updater"
+
+BUFFER_SIZE = 1024 * 1024           # Bytes per read/write
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024  # Smaller files use one connection
+DEFAULT_CONNECTIONS = 4
+MAX_RETRIES = 5                     # Consecutive failures without progress, per range
+PROGRESS_INTERVAL = 0.1             # Seconds between progress callbacks
+STATE_INTERVAL = 1.0                # Seconds between .part.json updates
+
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+
+
+class DownloadError(Exception):
+    """Raised when a download fails for good (retries exhausted, bad response)."""
+    pass
+
+
+class IntegrityError(DownloadError):
+    """Raised when a finished download does not match its expected SHA-256."""
+    pass
+
+
+class _Restart(Exception):
+    """The partial file can't be resumed (server file changed or no range support)."""
+    pass
+
+
+def _open(url: str, timeout: float, start: int = None, end: int = None, validator: str = None):
+    """Open a (range) request; end is exclusive, None = to the end of the file."""
+    headers = {'User-Agent': USER_AGENT}
+    if start is not None:
+        headers['Range'] = f"bytes={start}-{end - 1 if end else ''}"
+        if validator:
+            headers['If-Range'] = validator
+    return urlopen(Request(url, headers=headers), timeout=timeout)
+
+
+def _total_size(response) -> int | None:
+    """Full file size from Content-Range (206) or Content-Length (200)."""
+    content_range = response.headers.get('Content-Range', '')
+    if response.status == 206 and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _validator(response) -> str | None:
+    """Strong validator for If-Range (weak ETags are not allowed there)."""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+class _Download:
+    """One download: shared state of its range workers."""
+
+    def __init__(self, url: str, dest_path: str, progress_callback, cancel_event,
+                 connections: int, timeout: float, retries: int, sha256: str = None):
+        self.url = url
+        self.dest_path = dest_path
+        self.part_path = dest_path + PART_SUFFIX
+        self.state_path = dest_path + STATE_SUFFIX
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.connections = max(1, connections)
+        self.timeout = timeout
+        self.retries = retries
+        self.expected_hash = sha256.lower() if sha256 else None
+
+        self.size = None
+        self.validator = None
+        self.ranges = []            # [start, end, pos] per range, end exclusive
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_progress = 0.0
+        self._last_state = 0.0
+        self._hasher = None
+        self._hashed = 0            # Length of the file prefix fed to _hasher
+        self._hash_lock = threading.Lock()
+
+    # ==================== STATE ====================
+
+    def _load_state(self) -> bool:
+        """Pick up a previous partial download of the same URL."""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state["url"] != self.url or os.path.getsize(self.part_path) != state["size"]:
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self.size = state["size"]
+        self.validator = state.get("validator")
+        self.ranges = state["ranges"]
+        return True
+
+    def _save_state(self, force: bool = False):
+        """Record the written ranges (at most every STATE_INTERVAL seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            if self.size is None or (not force and now - self._last_state < STATE_INTERVAL):
+                return
+            self._last_state = now
+            state = {"url": self.url, "size": self.size, "validator": self.validator,
+                     "ranges": [list(r) for r in self.ranges]}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _discard(self):
+        """Forget the partial download."""
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ==================== PROGRESS ====================
+
+    def downloaded(self) -> int:
+        return sum(pos - start for start, _, pos in self.ranges)
+
+    def _report(self, force: bool = False):
+        if not self.progress_callback:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_progress < PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+            done = self.downloaded()
+        self.progress_callback(done, self.size or 0)
+
+    def _check_cancel(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise InterruptedError(f"Download cancelled: {self.url}")
+        if self._stop.is_set():
+            raise InterruptedError("Stopped after another range failed")
+
+    # ==================== VERIFICATION ====================
+
+    def _reset_hash(self):
+        self._hasher = hashlib.sha256() if self.expected_hash else None
+        self._hashed = 0
+
+    def _hash_written(self, offset: int, chunk: bytes):
+        """
+        Feed the SHA-256 in file order.
+
+        A chunk that continues the hashed prefix is used directly; data that
+        other ranges wrote further ahead is read back from the .part file once
+        the prefix reaches it. Workers never wait for each other here: if the
+        lock is busy, the chunk is picked up by the catch-up read later.
+        """
+        if self._hasher is None or not self._hash_lock.acquire(blocking=False):
+            return
+        try:
+            if offset == self._hashed:
+                self._hasher.update(chunk)
+                self._hashed += len(chunk)
+            self._catch_up()
+        finally:
+            self._hash_lock.release()
+
+    def _catch_up(self):
+        """Hash everything already written contiguously after the hashed prefix."""
+        while True:
+            available = self._hashed
+            for start, end, pos in self.ranges:
+                if start <= self._hashed and (end is None or self._hashed < end):
+                    available = pos
+                    break
+            if available <= self._hashed:
+                return
+            with open(self.part_path, 'rb', buffering=0) as f:
+                f.seek(self._hashed)
+                while self._hashed < available:
+                    data = f.read(min(BUFFER_SIZE, available - self._hashed))
+                    if not data:
+                        return
+                    self._hasher.update(data)
+                    self._hashed += len(data)
+
+    def _verify(self):
+        """Finish the SHA-256 and reject the file if it doesn't match."""
+        if self._hasher is None:
+            return
+        with self._hash_lock:
+            self._catch_up()
+        digest = self._hasher.hexdigest()
+        if digest != self.expected_hash:
+            self._discard()
+            raise IntegrityError(f"SHA-256 mismatch for {self.url} "
+                                 f"(expected {self.expected_hash}, got {digest})")
+
+    # ==================== TRANSFER ====================
+
+    def _start(self):
+        """Fresh download: learn size/validator, split into ranges."""
+        self._discard()
+        response = _open(self.url, self.timeout, 0, None) if self.connections > 1 else _open(self.url, self.timeout)
+        self.size = _total_size(response)
+        self.validator = _validator(response)
+        ranged = response.status == 206 or response.headers.get('Accept-Ranges', '') == 'bytes'
+
+        with open(self.part_path, 'wb') as f:
+            if self.size:
+                f.truncate(self.size)
+
+        if self.size is None:
+            # No length (chunked): plain stream, no resume
+            self.ranges = [[0, None, 0]]
+            return response
+
+        count = self.connections if ranged and self.size >= PARALLEL_MIN_SIZE else 1
+        step = max(1, -(-self.size // count))
+        self.ranges = [[start, min(start + step, self.size), start] for start in range(0, self.size, step)]
+        if not ranged:
+            self.validator = None  # Can't resume anyway
+        self._save_state(force=True)
+        return response
+
+    def _fetch_range(self, index: int, response=None):
+        """Download one range, reopening at the current position after errors."""
+        start, end, _ = self.ranges[index]
+        failures = 0
+        while end is None or self.ranges[index][2] < end:
+            self._check_cancel()
+            pos = self.ranges[index][2]
+            try:
+                if response is None:
+                    response = _open(self.url, self.timeout, pos, end, self.validator)
+                    if response.status != 206:
+                        response.close()
+                        raise _Restart(f"Server sent the whole file instead of bytes {pos}-")
+                elif pos != start and response.status != 206:
+                    raise _Restart("Server does not support range requests")
+                if response.status == 200 and index != 0:
+                    raise _Restart("Server does not support range requests")
+
+                # Unbuffered: the hash catch-up reads the file through another handle
+                with response, open(self.part_path, 'r+b', buffering=0) as f:
+                    f.seek(pos)
+                    while end is None or pos < end:
+                        self._check_cancel()
+                        chunk = response.read1(BUFFER_SIZE) if end is None else \
+                            response.read1(min(BUFFER_SIZE, end - pos))
+                        if not chunk:
+                            if end is None:
+                                self.size = pos
+                                return
+                            raise DownloadError(f"Connection closed at byte {pos} of {end}")
+                        written = 0
+                        while written < len(chunk):
+                            written += f.write(chunk[written:])
+                        pos += len(chunk)
+                        self.ranges[index][2] = pos
+                        self._hash_written(pos - len(chunk), chunk)
+                        failures = 0
+                        self._report()
+                        self._save_state()
+            except (InterruptedError, _Restart):
+                raise
+            except HTTPError as e:
+                if e.code == 416 or e.code == 412:
+                    raise _Restart(f"HTTP {e.code} on resume")
+                failures += 1
+                if failures > self.retries or e.code < 500:
+                    raise DownloadError(f"HTTP {e.code} for {self.url}") from e
+            except (OSError, HTTPException, DownloadError) as e:
+                failures += 1
+                if failures > self.retries:
+                    raise DownloadError(f"Download failed after {self.retries} retries: {e}") from e
+                if end is None:
+                    raise DownloadError(f"Connection lost and the server gave no length: {e}") from e
+                print(f"[Downloader] {e} - retrying at byte {self.ranges[index][2]}")
+            finally:
+                if response is not None:
+                    response.close()
+                    response = None
+            # Backoff, interruptible by cancellation
+            if failures and self.cancel_event is not None:
+                self.cancel_event.wait(min(0.5 * 2 ** (failures - 1), 8))
+            elif failures:
+                time.sleep(min(0.5 * 2 ** (failures - 1), 8))
+
+    def _run_ranges(self, first_response=None):
+        pending = [i for i, (_, end, pos) in enumerate(self.ranges) if end is None or pos < end]
+        if first_response is not None and (not pending or pending[0] != 0):
+            first_response.close()
+            first_response = None
+
+        workers = min(self.connections, len(pending))
+        if workers <= 1:
+            for i in pending:
+                self._fetch_range(i, first_response if i == 0 else None)
+                first_response = None
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._fetch_range, i, first_response if i == 0 else None) for i in pending]
+            error = None
+            for future in futures:
+                try:
+                    future.result()
+                except BaseException as e:  # Stop the other ranges, report the first real error
+                    self._stop.set()
+                    if error is None or (isinstance(error, InterruptedError) and not isinstance(e, InterruptedError)):
+                        error = e
+            if error is not None:
+                raise error
+
+    def run(self) -> int:
+        """Download to dest_path; returns its size."""
+        for attempt in range(2):
+            response = None
+            self._reset_hash()
+            if attempt or not self._load_state():
+                response = self._start()
+            else:
+                print(f"[Downloader] Resuming {os.path.basename(self.dest_path)} "
+                      f"at {self.downloaded()} of {self.size} bytes")
+            try:
+                self._run_ranges(response)
+                break
+            except _Restart as e:
+                print(f"[Downloader] {e} - starting over")
+                self._stop.clear()
+            finally:
+                self._save_state(force=True)
+        else:
+            raise DownloadError(f"Could not download {self.url}")
+
+        self._report(force=True)
+        self._verify()
+        os.replace(self.part_path, self.dest_path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return os.path.getsize(self.dest_path)
+
+
+def download(url: str, dest_path: str, progress_callback=None, cancel_event: threading.Event = None,
+             connections: int = 1, timeout: float = 30, retries: int = MAX_RETRIES, sha256: str = None) -> int:
+    """
+    Download a URL to a file, resuming a previous partial download.
+
+    Args:
+        url: File URL.
+        dest_path: Final path; data is written to dest_path + '.part' first.
+        progress_callback: Called with (downloaded_bytes, total_bytes), at most
+            every PROGRESS_INTERVAL seconds and once at the end. total_bytes is
+            0 when the server sends no length.
+        cancel_event: Optional threading.Event; the download stops within one
+            read when it is set (the partial file is kept for resume).
+        connections: Parallel range requests for files >= PARALLEL_MIN_SIZE.
+        timeout: Socket timeout per request (seconds).
+        retries: Consecutive failed attempts per range before giving up.
+        sha256: Expected SHA-256 (hex), hashed while downloading; a mismatch
+            deletes the partial file.
+
+    Returns:
+        Size of the downloaded file.
+
+    Raises:
+        DownloadError: Retries exhausted or unusable response (partial file kept).
+        IntegrityError: SHA-256 mismatch (partial file removed).
+        InterruptedError: Cancelled.
+    """
+    return _Download(url, dest_path, progress_callback, cancel_event, connections, timeout, retries, sha256).run()
+
+
+class StreamReader(io.RawIOBase):
+    """Sequential, hashed, cancellable read of one HTTP response that survives disconnects."""
+
+    def __init__(self, url: str, progress_callback=None, cancel_event: threading.Event = None,
+                 timeout: float = 30, retries: int = MAX_RETRIES, sha256: str = None):
+        self.url = url
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.timeout = timeout
+        self.retries = retries
+        self.expected_hash = sha256.lower() if sha256 else None
+        self._hasher = hashlib.sha256() if sha256 else None
+        self.pos = 0
+        self._last_progress = 0.0
+        try:
+            self._response = _open(url, timeout)
+        except (OSError, HTTPException) as e:
+            raise DownloadError(f"Could not open {url}: {e}") from e
+        self.size = _total_size(self._response)
+        self._validator = _validator(self._response)
+
+    def readable(self) -> bool:
+        return True
+
+    def _reconnect(self, error: Exception, attempt: int):
+        """Continue at self.pos with a range request for the same file version."""
+        if attempt > self.retries or not self._validator:
+            raise DownloadError(f"Stream of {self.url} failed at {self.pos} bytes: {error}") from error
+        if self.cancel_event is not None and self.cancel_event.wait(min(2 ** attempt, 30)):
+            raise InterruptedError(f"Download cancelled: {self.url}")
+        self._response.close()
+        try:
+            self._response = _open(self.url, self.timeout, self.pos, None, self._validator)
+        except (OSError, HTTPException):
+            self._response = None
+            return
+        if self._response.status != 206:
+            # Can't skip data the consumer already saw
+            raise DownloadError(f"Server can't resume the stream of {self.url}")
+
+    def readinto(self, buffer) -> int:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise InterruptedError(f"Download cancelled: {self.url}")
+        attempt = 0
+        while True:
+            try:
+                if self._response is None:
+                    raise ConnectionError("No connection")
+                n = self._response.readinto(buffer)
+                if not n and self.size is not None and self.pos < self.size:
+                    raise ConnectionError("Connection closed early")
+                break
+            except (OSError, HTTPException) as e:
+                attempt += 1
+                self._reconnect(e, attempt)
+
+        if n:
+            if self._hasher:
+                self._hasher.update(memoryview(buffer)[:n])
+            self.pos += n
+            now = time.monotonic()
+            if self.progress_callback and now - self._last_progress >= PROGRESS_INTERVAL:
+                self._last_progress = now
+                self.progress_callback(self.pos, self.size or 0)
+        return n
+
+    def finish(self) -> int:
+        """Read whatever the consumer left, verify the SHA-256; returns the total bytes."""
+        buffer = bytearray(BUFFER_SIZE)
+        while self.readinto(buffer):
+            pass
+        if self.progress_callback:
+            self.progress_callback(self.pos, self.size or self.pos)
+        if self._hasher and self._hasher.hexdigest() != self.expected_hash:
+            raise IntegrityError(f"SHA-256 mismatch for {self.url}")
+        return self.pos
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+        super().close()
+
+
+def open_stream(url: str, progress_callback=None, cancel_event: threading.Event = None,
+                timeout: float = 30, retries: int = MAX_RETRIES, sha256: str = None) -> StreamReader:
+    """
+    Open a URL for sequential reading without saving it.
+
+    Reads that hit a dropped connection are continued with If-Range requests
+    (up to `retries` times in a row). Call finish() after consuming the data
+    to check the SHA-256.
+
+    Raises:
+        DownloadError: Can't connect, or the stream can't be continued.
+        IntegrityError: SHA-256 mismatch (from finish()).
+        InterruptedError: Cancelled.
+    """
+    return StreamReader(url, progress_callback, cancel_event, timeout, retries, sha256)
+
+
+def remove_partial(dest_path: str):
+    """Delete the partial download of dest_path, if any."""
+    for path in (dest_path + PART_SUFFIX, dest_path + STATE_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,739 @@
+"""
+Processing Engine for ZI Background Remover
+============================================
+Image pipeline (resize, background removal, alpha matting) and ONNX session
+management shared by the GUI and the bulk backends.
+
+Bulk backends:
+    - Thread: the GUI worker thread runs process_file() in a loop.
+    - Process: ProcessPoolRunner spreads files over worker processes; each worker
+      owns its own session, receives file paths, writes outputs directly and sends
+      back a small result dict. Avoids the GIL in matting and PNG encoding.
+
+Shared-weights mode:
+    Large models (birefnet ~1 GB) are converted once to ONNX external-data format
+    with every initializer aligned to 64 KB. onnxruntime memory-maps aligned external
+    initializers instead of copying them, so N worker processes map the same file
+    pages from the OS page cache and share one physical copy of the weights.
+    Pre-packing is disabled in this mode because pre-packed weights are private
+    per-process copies.
+
+Usage:
+    from engine import SessionCache, process_file
+    cache = SessionCache(shared_weights=True)
+    session = cache.get("birefnet-general", use_gpu=False)
+    result = process_file(session, "in.jpg", "out.png", {"alpha_matting": True})
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import onnxruntime as ort
+from PIL import Image
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from model_store import ModelStore
+from output_writer import write_image, atomic_write
+from run_report import StageTimer, NULL_TIMER
+
+
+# Windows allocation granularity (also a multiple of the page size on Linux/macOS).
+# onnxruntime only memory-maps external data whose offset is aligned to this.
+EXTERNAL_DATA_ALIGNMENT = 64 * 1024
+
+# Tensors smaller than this stay inline in the model file
+EXTERNAL_DATA_THRESHOLD = 1024
+
+
+def get_session_class(model_name: str):
+    """Find the rembg session class for a model name."""
+    from rembg.sessions import sessions_class
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class
+    raise ValueError(f"No session class found for model '{model_name}'")
+
+
+def shared_model_paths(model_name: str, model_dir: str = None) -> list[str]:
+    """Paths of the external-data copies of a model, one per model file."""
+    store = ModelStore(model_dir)
+    return [os.path.join(store.model_dir, "shared", model_name, os.path.basename(path))
+            for path in store.model_paths(model_name)]
+
+
+def prepare_shared_model(model_name: str, model_dir: str = None) -> list[str]:
+    """
+    Convert a downloaded model to page-aligned external-data ONNX (once).
+
+    Every file of a multi-file model (SAM: encoder and decoder) is converted.
+
+    Returns:
+        Paths of the converted model files, in the order of the model's
+        files. The weights of each live next to it in "<file>.onnx.data".
+    """
+    store = ModelStore(model_dir)
+    targets = shared_model_paths(model_name, model_dir)
+    for source_path, target_path in zip(store.model_paths(model_name), targets):
+        _convert_external_data(source_path, target_path)
+    return targets
+
+
+def _convert_external_data(source_path: str, target_path: str):
+    """Write source_path as target_path with its large initializers in an aligned .data file."""
+    import onnx
+    from onnx import numpy_helper
+
+    data_name = os.path.basename(target_path) + ".data"
+    data_path = os.path.join(os.path.dirname(target_path), data_name)
+
+    if (os.path.exists(target_path) and os.path.exists(data_path)
+            and os.path.getmtime(target_path) >= os.path.getmtime(source_path)):
+        return
+
+    print(f"[Engine] Converting {os.path.basename(source_path)} to shared external-data format...")
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    model = onnx.load(source_path)
+
+    tmp_data_path = data_path + ".tmp"
+    offset = 0
+    with open(tmp_data_path, 'wb') as data_file:
+        for tensor in model.graph.initializer:
+            if tensor.data_type == onnx.TensorProto.STRING:
+                continue
+            raw = numpy_helper.to_array(tensor).tobytes()
+            if len(raw) < EXTERNAL_DATA_THRESHOLD:
+                continue
+
+            # Pad so every tensor starts on an allocation-granularity boundary
+            padding = (-offset) % EXTERNAL_DATA_ALIGNMENT
+            if padding:
+                data_file.write(b'\0' * padding)
+                offset += padding
+
+            data_file.write(raw)
+            for field in ("raw_data", "float_data", "int32_data", "int64_data", "double_data", "uint64_data"):
+                tensor.ClearField(field)
+            del tensor.external_data[:]
+            for key, value in (("location", data_name), ("offset", str(offset)), ("length", str(len(raw)))):
+                entry = tensor.external_data.add()
+                entry.key = key
+                entry.value = value
+            tensor.data_location = onnx.TensorProto.EXTERNAL
+            offset += len(raw)
+
+    tmp_model_path = target_path + ".tmp"
+    with open(tmp_model_path, 'wb') as f:
+        f.write(model.SerializeToString())
+
+    # Data first: the model file is what marks the conversion as complete
+    os.replace(tmp_data_path, data_path)
+    os.replace(tmp_model_path, target_path)
+    print(f"[Engine] Shared model ready: {target_path} ({offset / (1024 * 1024):.0f} MB weights)")
+
+
+def create_session_options(shared_weights: bool = False, intra_op_threads: int = 0) -> ort.SessionOptions:
+    """Build onnxruntime session options for the engine."""
+    sess_opts = ort.SessionOptions()
+    if intra_op_threads:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if shared_weights:
+        # Pre-packed weights are private copies; keep the mapped initializers instead
+        sess_opts.add_session_config_entry("session.disable_prepacking", "1")
+    return sess_opts
+
+
+def create_session(model_name: str, use_gpu: bool = False, shared_weights: bool = False,
+                   intra_op_threads: int = 0):
+    """
+    Create a rembg session for a model.
+
+    Args:
+        model_name: Internal rembg model name.
+        use_gpu: Use CUDA when available, otherwise force CPUExecutionProvider.
+        shared_weights: Load the weights memory-mapped from external-data ONNX.
+        intra_op_threads: onnxruntime intra-op thread count (0 = default).
+    """
+    session_class = get_session_class(model_name)
+    sess_opts = create_session_options(shared_weights, intra_op_threads)
+
+    if shared_weights:
+        paths = prepare_shared_model(model_name)
+        # Same pre/post-processing as the stock session, different model files
+        # (multi-file sessions such as SAM index the tuple download_models returns)
+        model_paths = paths[0] if len(paths) == 1 else tuple(paths)
+        session_class = type(f"Shared{session_class.__name__}", (session_class,), {
+            "download_models": classmethod(lambda cls, *args, **kwargs: model_paths),
+        })
+
+    if use_gpu and "CUDAExecutionProvider" in ort.get_available_providers():
+        providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    else:
+        providers = ["CPUExecutionProvider"]
+
+    return session_class(model_name, sess_opts, providers=providers)
+
+
+def session_provider(session) -> str:
+    """Execution provider a rembg session actually runs on."""
+    providers = session.inner_session.get_providers()
+    return providers[0] if providers else "Unknown"
+
+
+class SessionCache:
+    """Keeps one session per (model, device) so repeated runs skip model loading."""
+
+    def __init__(self, shared_weights: bool = False, intra_op_threads: int = 0):
+        self.shared_weights = shared_weights
+        self.intra_op_threads = intra_op_threads
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, use_gpu: bool = False):
+        """Return a cached session, creating it on first use."""
+        key = (model_name, use_gpu, self.shared_weights, self.intra_op_threads)
+        with self._lock:
+            if key not in self._sessions:
+                self._sessions[key] = create_session(
+                    model_name, use_gpu, self.shared_weights, self.intra_op_threads)
+            return self._sessions[key]
+
+    def clear(self):
+        """Drop all cached sessions (frees model memory)."""
+        with self._lock:
+            self._sessions.clear()
+
+
+# ==================== PIPELINE ====================
+
+def resize_image(img: Image.Image, max_size: int) -> tuple[Image.Image, tuple | None]:
+    """
+    Downscale an image so that its longest side is at most max_size.
+
+    Returns:
+        Tuple of (image, resize_info). resize_info is
+        (width, height, new_width, new_height), or None if no resize was needed.
+    """
+    width, height = img.size
+
+    if width <= max_size and height <= max_size:
+        return img, None
+
+    # Calculate new dimensions maintaining aspect ratio
+    if width > height:
+        new_width = max_size
+        new_height = int(height * (max_size / width))
+    else:
+        new_height = max_size
+        new_width = int(width * (max_size / height))
+
+    img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return img_resized, (width, height, new_width, new_height)
+
+
+def resize_for_low_pc(image_data: bytes, max_size: int) -> tuple[bytes, tuple | None]:
+    """Encoded-bytes variant of resize_image() (used by single mode)."""
+    img, resize_info = resize_image(Image.open(io.BytesIO(image_data)), max_size)
+    if not resize_info:
+        return image_data, None
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue(), resize_info
+
+
+def matte_image(img: Image.Image) -> Image.Image:
+    """
+    Remove the dark fringe from the edges of an RGBA cut-out.
+
+    Raises:
+        ImportError: numpy/scipy are not installed.
+    """
+    import numpy as np
+    from scipy import ndimage
+
+    if img.mode != 'RGBA':
+        return img
+
+    img_array = np.array(img, dtype=np.float32)
+    r, g, b, a = img_array[:,:,0], img_array[:,:,1], img_array[:,:,2], img_array[:,:,3]
+
+    # Step 1: Un-premultiply alpha to recover true colors
+    alpha_safe = np.maximum(a, 1)
+    semi_trans = (a > 0) & (a < 255)
+    r[semi_trans] = np.clip(r[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
+    g[semi_trans] = np.clip(g[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
+    b[semi_trans] = np.clip(b[semi_trans] * 255.0 / alpha_safe[semi_trans], 0, 255)
+
+    # Step 2: Iterative color push from interior to edges
+    for _ in range(5):
+        edge_mask = (a > 5) & (a < 250)
+        if not np.any(edge_mask):
+            break
+
+        weight = a / 255.0
+        r_weighted = r * weight
+        g_weighted = g * weight
+        b_weighted = b * weight
+
+        r_exp = ndimage.maximum_filter(r_weighted, size=3)
+        g_exp = ndimage.maximum_filter(g_weighted, size=3)
+        b_exp = ndimage.maximum_filter(b_weighted, size=3)
+        w_exp = ndimage.maximum_filter(weight, size=3)
+
+        w_safe = np.maximum(w_exp, 0.01)
+        r[edge_mask] = r[edge_mask] * 0.3 + (r_exp[edge_mask] / w_safe[edge_mask]) * 0.7
+        g[edge_mask] = g[edge_mask] * 0.3 + (g_exp[edge_mask] / w_safe[edge_mask]) * 0.7
+        b[edge_mask] = b[edge_mask] * 0.3 + (b_exp[edge_mask] / w_safe[edge_mask]) * 0.7
+
+    # Step 3: Brightness boost for remaining dark edges
+    edge_band = (a > 5) & (a < 240)
+    interior = a >= 240
+    if np.any(edge_band) and np.any(interior):
+        brightness = 0.299 * r + 0.587 * g + 0.114 * b
+        interior_bright = np.median(brightness[interior])
+        dark_edges = edge_band & (brightness < interior_bright * 0.5)
+        if np.any(dark_edges):
+            boost = np.clip(interior_bright * 0.7 / np.maximum(brightness[dark_edges], 1), 1, 2)
+            r[dark_edges] = np.clip(r[dark_edges] * boost, 0, 255)
+            g[dark_edges] = np.clip(g[dark_edges] * boost, 0, 255)
+            b[dark_edges] = np.clip(b[dark_edges] * boost, 0, 255)
+
+    img_array[:,:,0] = np.clip(r, 0, 255)
+    img_array[:,:,1] = np.clip(g, 0, 255)
+    img_array[:,:,2] = np.clip(b, 0, 255)
+
+    return Image.fromarray(img_array.astype(np.uint8))
+
+
+def apply_alpha_matting(image_data: bytes) -> bytes:
+    """Encoded-bytes variant of matte_image() (used by single mode)."""
+    img = Image.open(io.BytesIO(image_data))
+    if img.mode != 'RGBA':
+        return image_data
+
+    buffer = io.BytesIO()
+    matte_image(img).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def subject_box(img: Image.Image, padding: int = 0, aspect: float | None = None,
+                threshold: int = 8) -> tuple[int, int, int, int] | None:
+    """
+    Bounding box of the visible subject in an RGBA image.
+
+    Args:
+        img: RGBA cut-out.
+        padding: Extra pixels around the subject (clamped to the canvas).
+        aspect: Optional width/height ratio; the box is grown around its center to match.
+        threshold: Alpha values at or below this count as transparent.
+
+    Returns:
+        (left, top, right, bottom), or None if the image is fully transparent.
+    """
+    if img.mode != 'RGBA':
+        return None
+
+    box = img.getchannel('A').point(lambda v: 255 if v > threshold else 0).getbbox()
+    if not box:
+        return None
+
+    width, height = img.size
+    left, top, right, bottom = box
+    left, top = max(0, left - padding), max(0, top - padding)
+    right, bottom = min(width, right + padding), min(height, bottom + padding)
+
+    if aspect:
+        box_w, box_h = right - left, bottom - top
+        if box_w / box_h < aspect:
+            box_w = min(width, round(box_h * aspect))
+        else:
+            box_h = min(height, round(box_w / aspect))
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        # Grow around the center, shifting back inside the canvas if needed
+        left = int(min(max(0, center_x - box_w / 2), width - box_w))
+        top = int(min(max(0, center_y - box_h / 2), height - box_h))
+        right, bottom = left + box_w, top + box_h
+
+    return left, top, right, bottom
+
+
+def write_crop_sidecar(output_path: str, crop_box: tuple, canvas_size: tuple, source_size: tuple):
+    """
+    Record crop offsets next to an output ("<output>.crop.json").
+
+    The cropped image goes back at (offset_x, offset_y) on a canvas_size canvas;
+    canvas_size differs from source_size only when Low PC Mode resized the input.
+    """
+    sidecar = {
+        "image": os.path.basename(output_path),
+        "offset": [crop_box[0], crop_box[1]],
+        "box": list(crop_box),
+        "canvas_size": list(canvas_size),
+        "source_size": list(source_size),
+    }
+    atomic_write(output_path + ".crop.json", json.dumps(sidecar, indent=2).encode('utf-8'))
+
+
+def build_jobs(input_dir: str, files: list[str], output_dir: str, ext: str) -> tuple[list, list]:
+    """
+    Pair each input file with its output path, keeping output paths unique.
+
+    Inputs with the same name but a different extension (photo.jpg, photo.png)
+    would write to the same output; the first keeps stem + ext, later ones get
+    the source extension in the name (photo_png.png), numbered if still taken.
+    Names are compared case-insensitively (Windows file systems).
+
+    Returns:
+        (jobs, renamed): jobs is a list of (input_path, output_path),
+        renamed a list of (input file, output file name) that were changed.
+    """
+    wanted = [os.path.splitext(f)[0] + ext for f in files]
+    primary = {name.lower() for name in wanted}
+    taken = set()
+    jobs, renamed = [], []
+    for f, name in zip(files, wanted):
+        if name.lower() in taken:
+            stem, source_ext = os.path.splitext(f)
+            base = f"{stem}_{source_ext.lstrip('.').lower()}" if source_ext else stem
+            name, number = base + ext, 2
+            while name.lower() in taken or name.lower() in primary:
+                name, number = f"{base}_{number}{ext}", number + 1
+            renamed.append((f, name))
+        taken.add(name.lower())
+        jobs.append((os.path.join(input_dir, f), os.path.join(output_dir, name)))
+    return jobs, renamed
+
+
+def process_file(session, input_path: str, output_path: str, options: dict, writer=None) -> dict:
+    """
+    Run the full pipeline for one image and write the result.
+
+    The image stays decoded from input to output; it is encoded exactly once,
+    by the output writer.
+
+    Args:
+        session: rembg session.
+        input_path: Source image.
+        output_path: Destination file (extension should match the output format).
+        options: Dict with 'low_pc' (bool), 'max_image_size' (int), 'alpha_matting' (bool),
+            'crop' (bool), 'crop_padding' (int), 'crop_aspect' (float or None),
+            'instrument' (bool, time each stage) and the output_writer settings
+            ('format', 'compress_level', 'optimize', 'fsync').
+        writer: Optional OutputWriter; when given the write happens on its I/O thread
+            (submitted with input_path as key, see OutputWriter.settle).
+
+    Returns:
+        Dict with 'file', 'ok', 'error', 'resized' (see resize_image),
+        'matting' (bool), 'crop' (box or None) and 'warnings' (list of log messages).
+        With 'instrument' also 'timings' (seconds per stage, see run_report.STAGES;
+        encode/write are filled in by the writer thread), 'size' (source
+        width, height) and 'provider'.
+    """
+    from rembg import remove
+
+    result = {"file": os.path.basename(input_path), "ok": False, "error": None,
+              "resized": None, "matting": False, "crop": None, "warnings": []}
+    timer = StageTimer() if options.get("instrument") else NULL_TIMER
+
+    img = Image.open(input_path)
+    img.load()
+    source_size = img.size
+    timer.mark("decode")
+
+    if options.get("low_pc"):
+        try:
+            img, result["resized"] = resize_image(img, options.get("max_image_size", 1024))
+        except Exception as e:
+            result["warnings"].append(f"Gagal resize: {e}")
+        timer.mark("resize")
+
+    output_img = remove(img, session=session)
+    timer.mark("inference")
+
+    if options.get("crop"):
+        # Crop before matting and encoding so neither touches transparent padding
+        crop_box = subject_box(output_img, options.get("crop_padding", 0), options.get("crop_aspect"))
+        if crop_box and crop_box != (0, 0) + output_img.size:
+            write_crop_sidecar(output_path, crop_box, output_img.size, source_size)
+            output_img = output_img.crop(crop_box)
+            result["crop"] = crop_box
+        timer.mark("crop")
+
+    if options.get("alpha_matting"):
+        try:
+            output_img = matte_image(output_img)
+            result["matting"] = True
+        except ImportError:
+            result["warnings"].append("scipy tidak tersedia untuk Alpha Matting")
+        except Exception as e:
+            result["warnings"].append(f"Alpha Matting gagal: {e}")
+        timer.mark("matting")
+
+    if timer is not NULL_TIMER:
+        result["timings"] = timer.stages
+        result["size"] = source_size
+        result["provider"] = session_provider(session)
+
+    if writer is not None:
+        writer.submit(output_path, output_img, timer, key=input_path)
+    else:
+        write_image(output_path, output_img, options, timer)
+
+    result["ok"] = True
+    return result
+
+
+# ==================== PROCESS BACKEND ====================
+
+# Per-worker state, set by _init_worker in each child process
+_worker_session = None
+_worker_options = None
+_worker_cancel = None
+_worker_load_seconds = None
+_worker_profile = None
+
+# Workers are always spawned (the Windows default): a forked child inherits the
+# onnxruntime thread pool of a parent that already ran a session and can deadlock
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def default_process_workers() -> int:
+    """Reasonable worker count for the process backend."""
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def _init_worker(model_name, use_gpu, options, shared_weights, intra_op_threads, cancel_event):
+    """Process pool initializer: load this worker's session once."""
+    global _worker_session, _worker_options, _worker_cancel, _worker_load_seconds, _worker_profile
+    _worker_cancel = cancel_event
+    _worker_options = options
+    if options.get("profile_dir"):
+        import cProfile
+        _worker_profile = cProfile.Profile()
+    start = time.perf_counter()
+    cache = SessionCache(shared_weights=shared_weights, intra_op_threads=intra_op_threads)
+    _worker_session = cache.get(model_name, use_gpu)
+    _worker_load_seconds = time.perf_counter() - start
+
+
+def _worker_process_file(input_path: str, output_path: str) -> dict:
+    """Process pool task: returns a small result dict (never raises)."""
+    global _worker_load_seconds
+    if _worker_cancel is not None and _worker_cancel.is_set():
+        return {"file": os.path.basename(input_path), "cancelled": True}
+    if _worker_profile is not None:
+        _worker_profile.enable()
+    try:
+        result = process_file(_worker_session, input_path, output_path, _worker_options)
+    except Exception as e:
+        result = {"file": os.path.basename(input_path), "ok": False, "error": str(e), "warnings": []}
+    if _worker_profile is not None:
+        # Workers are never told the run ended: rewrite the cumulative profile each task
+        _worker_profile.disable()
+        _worker_profile.dump_stats(os.path.join(_worker_options["profile_dir"], f"worker_{os.getpid()}.prof"))
+    result["pid"] = os.getpid()
+    if _worker_options.get("instrument") and _worker_load_seconds is not None:
+        # Reported once per worker, with its first file
+        result["model_load"] = _worker_load_seconds
+        _worker_load_seconds = None
+    return result
+
+
+class ProcessPoolRunner:
+    """Bulk backend running the pipeline in a pool of worker processes."""
+
+    def __init__(self, model_name: str, use_gpu: bool = False, options: dict = None,
+                 workers: int = 0, shared_weights: bool = True):
+        """
+        Args:
+            model_name: Internal rembg model name (must already be downloaded).
+            use_gpu: Use CUDA in the workers when available.
+            options: Pipeline options passed to process_file(); with 'profile_dir'
+                each worker also writes its cProfile data there (see profiler.py).
+            workers: Number of worker processes (0 = default_process_workers()).
+            shared_weights: Memory-map the model weights so workers share them.
+        """
+        self.model_name = model_name
+        self.use_gpu = use_gpu
+        self.options = options or {}
+        self.workers = workers or default_process_workers()
+        self.shared_weights = shared_weights
+        self.memory_report = None
+        self._cancel_event = POOL_CONTEXT.Event()
+        self._executor = None
+
+    def run(self, jobs: list[tuple[str, str]], result_callback=None, should_stop=None) -> list[dict]:
+        """
+        Process (input_path, output_path) jobs and block until done or cancelled.
+
+        Args:
+            jobs: List of (input_path, output_path).
+            result_callback: Called with each result dict as soon as it arrives.
+            should_stop: Polled a few times per second; returning True cancels the run.
+
+        Returns:
+            List of result dicts for the files that were processed.
+        """
+        if self.shared_weights:
+            # Convert once here so the workers don't race on it
+            prepare_shared_model(self.model_name)
+
+        intra_op_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=POOL_CONTEXT,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.use_gpu, self.options, self.shared_weights,
+                      intra_op_threads, self._cancel_event))
+
+        futures = {self._executor.submit(_worker_process_file, src, dst): src for src, dst in jobs}
+        pending = set(futures)
+        results = []
+        worker_pids = set()
+
+        try:
+            while pending:
+                if should_stop and should_stop():
+                    self.cancel()
+                    break
+
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Worker crashed (e.g. out of memory)
+                        result = {"file": os.path.basename(futures[future]), "ok": False,
+                                  "error": str(e), "warnings": []}
+                    if result.get("cancelled"):
+                        continue
+                    if result.get("pid"):
+                        worker_pids.add(result["pid"])
+                    results.append(result)
+                    if result_callback:
+                        result_callback(result)
+
+            if not self._cancel_event.is_set():
+                self.memory_report = worker_memory_report(sorted(worker_pids))
+        finally:
+            # On cancel don't wait: workers finish their current image and exit
+            self._executor.shutdown(wait=not self._cancel_event.is_set(), cancel_futures=True)
+
+        return results
+
+    def cancel(self):
+        """Stop handing out work; queued files are dropped."""
+        self._cancel_event.set()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==================== MEMORY REPORT ====================
+
+def process_memory(pid: int = None) -> dict | None:
+    """
+    Memory usage of a process in bytes.
+
+    Returns:
+        Dict with 'rss' (resident, includes shared mapped pages) and 'uss'
+        (unique set size: memory freed if the process exits), or None if
+        psutil is not installed.
+    """
+    if not PSUTIL_AVAILABLE:
+        return None
+    proc = psutil.Process(pid or os.getpid())
+    try:
+        info = proc.memory_full_info()
+        return {"rss": info.rss, "uss": info.uss}
+    except psutil.AccessDenied:
+        return {"rss": proc.memory_info().rss, "uss": None}
+
+
+def worker_memory_report(pids: list[int]) -> dict | None:
+    """
+    Summarize memory across worker processes.
+
+    The first worker pays for the shared weights; every additional worker should
+    only add its private (USS) memory.
+
+    Returns:
+        Dict with per-worker stats, 'first_worker_rss' and 'per_additional_worker'
+        (mean USS of workers 2..N), or None if psutil is not installed.
+    """
+    if not PSUTIL_AVAILABLE or not pids:
+        return None
+
+    workers = []
+    for pid in pids:
+        try:
+            mem = process_memory(pid)
+        except psutil.NoSuchProcess:
+            continue
+        workers.append({"pid": pid, **mem})
+
+    if not workers:
+        return None
+
+    extra = [w["uss"] for w in workers[1:] if w["uss"] is not None]
+    return {
+        "workers": workers,
+        "first_worker_rss": workers[0]["rss"],
+        "per_additional_worker": sum(extra) / len(extra) if extra else 0,
+        "total_rss": sum(w["rss"] for w in workers),
+    }
+
+
+def _load_and_wait(model_name, ready, done):
+    """Quick test worker: load a shared-weights session and hold it."""
+    create_session(model_name, shared_weights=True)
+    ready.put(os.getpid())
+    done.wait()
+
+
+# ==================== QUICK TEST ====================
+if __name__ == '__main__':
+    # python engine.py <model_name> [workers]
+    # Loads the model in N processes with shared weights and prints memory per worker.
+    import multiprocessing
+
+    model = sys.argv[1] if len(sys.argv) > 1 else "silueta"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    ModelStore().ensure_model(model)
+    prepare_shared_model(model)
+
+    ready_queue = multiprocessing.Queue()
+    done_event = multiprocessing.Event()
+    procs = [multiprocessing.Process(target=_load_and_wait, args=(model, ready_queue, done_event))
+             for _ in range(count)]
+    for p in procs:
+        p.start()
+    worker_pids = [ready_queue.get() for _ in procs]
+
+    report = worker_memory_report(worker_pids)
+    if report:
+        mb = 1024 * 1024
+        print(f"Model: {model}, workers: {count}")
+        for w in report["workers"]:
+            uss = f"{w['uss'] / mb:.0f} MB" if w["uss"] is not None else "n/a"
+            print(f"  pid {w['pid']}: RSS {w['rss'] / mb:.0f} MB, private {uss}")
+        print(f"  Per additional worker: {report['per_additional_worker'] / mb:.0f} MB")
+    else:
+        print("Install psutil for the memory report.")
+
+    done_event.set()
+    for p in procs:
+        p.join()
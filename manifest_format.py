@@ -0,0 +1,335 @@
+"""
+Binary Manifest Format for ZI Background Remover
+================================================
+Compact alternative to the pretty-printed manifest_v*.json files:
+- Paths sorted by UTF-8 bytes and prefix-compressed (the long "_internal/..."
+  prefixes are stored once per run of similar paths)
+- Raw 32-byte SHA256 digests and varint sizes
+- A restart point every RESTART_INTERVAL entries (full path stored) so lookups
+  binary-search the restart index and decode at most one block
+- Header with a SHA256 content hash of everything after the header
+
+Layout (columnar, so digests can be addressed by entry index):
+    header  : magic "ZIMF", format version, entry count, restart interval,
+              restart count, section lengths, total size, content hash
+    meta    : varint-prefixed version and generated strings
+    paths   : per entry varint shared-prefix length, varint suffix length, suffix
+    sizes   : per entry varint size
+    digests : count x 32 raw bytes
+    index   : per restart point u32 offsets into the paths and sizes sections
+
+Usage:
+    python manifest_format.py to-binary manifest_v1.0.8.json [manifest_v1.0.8.zim]
+    python manifest_format.py to-json manifest_v1.0.8.zim [manifest_v1.0.8.json]
+
+    from manifest_format import load_manifest
+    manifest = load_manifest("manifest_v1.0.8.zim")
+    manifest.get("ZI-BGRemover.exe")  # -> {"hash": ..., "size": ...}
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import bisect
+import hashlib
+
+
+MAGIC = b"ZIMF"
+FORMAT_VERSION = 1
+RESTART_INTERVAL = 32
+BINARY_EXTENSION = ".zim"
+
+_HEADER = struct.Struct("<4sBxxxIIIIIQ32s")
+_RESTART = struct.Struct("<II")
+DIGEST_SIZE = 32
+
+
+class ManifestFormatError(Exception):
+    """Raised when a binary manifest is malformed or fails its content hash."""
+    pass
+
+
+def _encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(buf, pos: int) -> tuple[int, int]:
+    byte = buf[pos]
+    if byte < 0x80:  # Fast path: almost every length fits in one byte
+        return byte, pos + 1
+    result = byte & 0x7F
+    shift = 7
+    pos += 1
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_string(text: str, out: bytearray):
+    data = text.encode('utf-8')
+    _encode_varint(len(data), out)
+    out += data
+
+
+def encode_manifest(manifest: dict) -> bytes:
+    """Encode a JSON-style manifest dict to the binary format."""
+    files = manifest.get("files", {})
+    entries = sorted((path.encode('utf-8'), info) for path, info in files.items())
+
+    meta = bytearray()
+    _encode_string(str(manifest.get("version", "")), meta)
+    _encode_string(str(manifest.get("generated", "")), meta)
+
+    paths = bytearray()
+    sizes = bytearray()
+    digests = bytearray()
+    index = bytearray()
+    previous = b""
+    for position, (path, info) in enumerate(entries):
+        if position % RESTART_INTERVAL == 0:
+            index += _RESTART.pack(len(paths), len(sizes))
+            shared = 0
+        else:
+            limit = min(len(previous), len(path))
+            shared = 0
+            while shared < limit and previous[shared] == path[shared]:
+                shared += 1
+        _encode_varint(shared, paths)
+        _encode_varint(len(path) - shared, paths)
+        paths += path[shared:]
+        _encode_varint(info["size"], sizes)
+        digests += bytes.fromhex(info["hash"])
+        previous = path
+
+    content = bytes(meta + paths + sizes + digests + index)
+    total_size = manifest.get("total_size", sum(info["size"] for _, info in entries))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), RESTART_INTERVAL,
+                          len(index) // _RESTART.size, len(paths), len(sizes), total_size,
+                          hashlib.sha256(content).digest())
+    return header + content
+
+
+class BinaryManifest:
+    """
+    Lazily decoded binary manifest.
+
+    Entries are only decoded when looked up or iterated; get() binary-searches
+    the restart points and scans one block. Digests live in a fixed-width
+    column, so manifests with the same file list are diffed without decoding
+    any path.
+    """
+
+    def __init__(self, data, verify: bool = True):
+        """
+        Args:
+            data: Encoded manifest (bytes, bytearray or mmap).
+            verify: Check the header content hash (reads the whole buffer once).
+        """
+        if len(data) < _HEADER.size:
+            raise ManifestFormatError("File too small for a binary manifest")
+        (magic, fmt_version, self.count, self.restart_interval, restart_count,
+         paths_len, sizes_len, self.total_size, self.content_hash) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ManifestFormatError("Not a binary manifest (bad magic)")
+        if fmt_version != FORMAT_VERSION:
+            raise ManifestFormatError(f"Unsupported manifest format version: {fmt_version}")
+
+        view = memoryview(data)
+        if verify and hashlib.sha256(view[_HEADER.size:]).digest() != self.content_hash:
+            raise ManifestFormatError("Manifest content hash mismatch (file corrupted)")
+
+        self._data = data
+        length, pos = _decode_varint(data, _HEADER.size)
+        self.version = bytes(data[pos:pos + length]).decode('utf-8')
+        length, pos = _decode_varint(data, pos + length)
+        self.generated = bytes(data[pos:pos + length]).decode('utf-8')
+        pos += length
+
+        # Sections are copied out of the buffer once; bytes indexing is much
+        # faster than mmap indexing in the decode loops
+        self.paths_section = bytes(view[pos:pos + paths_len])
+        pos += paths_len
+        self._sizes = bytes(view[pos:pos + sizes_len])
+        pos += sizes_len
+        self.digests = view[pos:pos + self.count * DIGEST_SIZE]
+        pos += self.count * DIGEST_SIZE
+        self._restarts = [_RESTART.unpack_from(data, pos + i * _RESTART.size) for i in range(restart_count)]
+        if pos + restart_count * _RESTART.size != len(data):
+            raise ManifestFormatError("Manifest section lengths do not match the file size")
+        self._restart_keys = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _iter_paths(self, block: int = 0):
+        """Yield (index, path_bytes) starting at a restart point."""
+        data = self.paths_section
+        pos = self._restarts[block][0] if self._restarts else 0
+        path = b""
+        for index in range(block * self.restart_interval, self.count):
+            shared, pos = _decode_varint(data, pos)
+            suffix_len, pos = _decode_varint(data, pos)
+            path = path[:shared] + data[pos:pos + suffix_len]
+            pos += suffix_len
+            yield index, path
+
+    def _iter_sizes(self, block: int = 0):
+        data = self._sizes
+        pos = self._restarts[block][1] if self._restarts else 0
+        for _ in range(block * self.restart_interval, self.count):
+            size, pos = _decode_varint(data, pos)
+            yield size
+
+    def digest(self, index: int) -> bytes:
+        """Raw digest of entry `index`."""
+        return bytes(self.digests[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE])
+
+    def path(self, index: int) -> str:
+        """Path of entry `index`."""
+        for position, path in self._iter_paths(index // self.restart_interval):
+            if position == index:
+                return path.decode('utf-8')
+        raise IndexError(index)
+
+    def size(self, index: int) -> int:
+        """Size of entry `index`."""
+        block = index // self.restart_interval
+        for position, size in enumerate(self._iter_sizes(block), block * self.restart_interval):
+            if position == index:
+                return size
+        raise IndexError(index)
+
+    def iter_raw(self):
+        """Yield (path_bytes, size, digest_bytes) in sorted order."""
+        digests = self.digests
+        for (index, path), size in zip(self._iter_paths(), self._iter_sizes()):
+            yield path, size, bytes(digests[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE])
+
+    def __iter__(self):
+        """Yield (path, hash_hex, size) in sorted order."""
+        for path, size, digest in self.iter_raw():
+            yield path.decode('utf-8'), digest.hex(), size
+
+    def find(self, path: str) -> int | None:
+        """Entry index of a path, or None."""
+        if not self._restarts:
+            return None
+        if self._restart_keys is None:
+            self._restart_keys = [next(self._iter_paths(block))[1] for block in range(len(self._restarts))]
+        key = path.encode('utf-8')
+        block = bisect.bisect_right(self._restart_keys, key) - 1
+        if block < 0:
+            return None
+        for position, current in self._iter_paths(block):
+            if current >= key or position - block * self.restart_interval >= self.restart_interval - 1:
+                return position if current == key else None
+        return None
+
+    def get(self, path: str) -> dict | None:
+        """Look up one file -> {"hash", "size"} or None."""
+        index = self.find(path)
+        if index is None:
+            return None
+        return {"hash": self.digest(index).hex(), "size": self.size(index)}
+
+    def __contains__(self, path: str) -> bool:
+        return self.find(path) is not None
+
+    def to_dict(self) -> dict:
+        """Convert to the JSON manifest structure."""
+        files = {path: {"hash": file_hash, "size": size} for path, file_hash, size in self}
+        return {
+            "version": self.version,
+            "generated": self.generated,
+            "files": files,
+            "total_files": self.count,
+            "total_size": self.total_size,
+        }
+
+    def close(self):
+        """Release the underlying mmap, if any."""
+        self.digests.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def is_binary_manifest(path: str) -> bool:
+    """True if the file starts with the binary manifest magic."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_manifest(path: str, verify: bool = True):
+    """
+    Load a manifest file of either format.
+
+    Returns:
+        BinaryManifest (memory-mapped) for binary files, dict for JSON files.
+    """
+    if is_binary_manifest(path):
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return BinaryManifest(data, verify=verify)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_binary_manifest(manifest: dict, path: str):
+    """Write a manifest dict in the binary format."""
+    with open(path, 'wb') as f:
+        f.write(encode_manifest(manifest))
+
+
+def iter_manifest(manifest):
+    """
+    Yield (path, hash_hex, size) sorted by path from a manifest of either format.
+    """
+    if isinstance(manifest, BinaryManifest):
+        yield from manifest
+        return
+    files = manifest.get("files", {})
+    for path in sorted(files):
+        info = files[path]
+        yield path, info["hash"], info["size"]
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("to-binary", "to-json"):
+        print("Usage: python manifest_format.py to-binary|to-json <input> [output]")
+        sys.exit(1)
+
+    command, input_file = sys.argv[1], sys.argv[2]
+    stem = os.path.splitext(input_file)[0]
+
+    try:
+        if command == "to-binary":
+            output_file = sys.argv[3] if len(sys.argv) > 3 else stem + BINARY_EXTENSION
+            with open(input_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            save_binary_manifest(manifest, output_file)
+        else:
+            output_file = sys.argv[3] if len(sys.argv) > 3 else stem + ".json"
+            manifest = load_manifest(input_file)
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(manifest.to_dict(), f, indent=2)
+            manifest.close()
+
+        in_kb = os.path.getsize(input_file) / 1024
+        out_kb = os.path.getsize(output_file) / 1024
+        print(f"✓ {input_file} ({in_kb:.0f} KB) -> {output_file} ({out_kb:.0f} KB)")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
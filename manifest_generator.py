@@ -4,128 +4,592 @@ Manifest Generator for Delta Updates
 Generates a JSON manifest containing SHA256 hashes of all files in the application folder.
 Used for comparing local vs remote files to determine what needs updating.
 
+Files are hashed in parallel by a thread pool (hashlib releases the GIL on large
+buffers) using 1 MB reads; the folder is walked once with os.scandir and the stat
+results are reused. Output is sorted by path, so it is deterministic.
+
+Incremental mode: hashes are kept in a local cache keyed by
+(relative path, size, mtime_ns, inode), so unchanged files are not re-read on the
+next release. Use --verify to ignore the cache and rehash everything.
+Pass --binary to also write the compact binary manifest (see manifest_format.py).
+The JSON manifest also records the install components (see components.py):
+their path rules, file counts and sizes.
+
+The diff command explains what a release changes: bytes per top-level package,
+the largest changed files, files rebuilt with the same size (content-only
+changes), resized files and duplicate content shipped by the patch. With more
+than two manifests it prints a trend table, one row per consecutive pair.
+
 Usage:
-    python manifest_generator.py <app_folder> <version> [output_file]
+    python manifest_generator.py <app_folder> <version> [output_file] [--jobs N] [--cache FILE] [--verify] [--binary]
+    python manifest_generator.py diff OLD NEW [MORE...] [--top N] [--json]
     
 Example:
     python manifest_generator.py dist/ZI-BGRemover 1.0.0 manifest_v1.0.0.json
+    python manifest_generator.py diff manifest_v1.0.6.json manifest_v1.0.8.json
 """
 
 import os
 import sys
 import json
+import time
 import hashlib
-from pathlib import Path
+import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from components import summarize
+from content_store import find_duplicates, format_report
+from manifest_format import (BinaryManifest, iter_manifest, load_manifest, save_binary_manifest,
+                             BINARY_EXTENSION, DIGEST_SIZE)
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
 
+# Files under HASH_CHUNK_SIZE are hashed in batches of up to this many bytes /
+# files per pool task: a task per file costs more than hashing a small file
+BATCH_BYTES = 8 * 1024 * 1024
+BATCH_FILES = 256
 
-def calculate_file_hash(filepath: str, algorithm: str = 'sha256') -> str:
+# Files modified this close to the scan are not cached: a write in the same
+# mtime tick could otherwise go unnoticed on the next run
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def default_jobs() -> int:
+    """Default number of hashing threads."""
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+def calculate_file_hash(filepath: str, algorithm: str = 'sha256', chunk_size: int = HASH_CHUNK_SIZE) -> str:
     """Calculate hash of a file."""
     hash_func = hashlib.new(algorithm)
-    with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            hash_func.update(chunk)
+    with open(filepath, 'rb', buffering=0) as f:
+        if os.fstat(f.fileno()).st_size < chunk_size:
+            # One read, no chunk buffer to allocate
+            hash_func.update(f.read())
+            return hash_func.hexdigest()
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hash_func.update(view[:n])
     return hash_func.hexdigest()
 
 
-def generate_manifest(app_folder: str, version: str) -> dict:
+def scan_files(app_folder: str) -> list[tuple[str, str, os.stat_result]]:
+    """
+    Walk a folder once with os.scandir.
+    
+    Returns:
+        List of (relative_path, absolute_path, stat_result), relative paths use
+        forward slashes.
+    """
+    results = []
+    stack = [(app_folder, "")]
+    while stack:
+        folder, prefix = stack.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                rel_path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel_path + "/"))
+                elif entry.is_file():
+                    results.append((rel_path, entry.path, entry.stat()))
+    return results
+
+
+class HashCache:
+    """
+    Persistent file hash cache keyed by (relative path, size, mtime_ns, inode).
+    
+    Note: os.scandir reports inode 0 on Windows, so there the key is effectively
+    (path, size, mtime_ns).
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("files", {})
+        except (OSError, ValueError):
+            pass
+    
+    def lookup(self, rel_path: str, st: os.stat_result) -> str | None:
+        """Cached hash if the file is unchanged, else None."""
+        entry = self.entries.get(rel_path)
+        if entry and entry[:3] == [st.st_size, st.st_mtime_ns, st.st_ino]:
+            return entry[3]
+        return None
+    
+    def store(self, rel_path: str, st: os.stat_result, file_hash: str):
+        """Remember the hash of a file."""
+        self.entries[rel_path] = [st.st_size, st.st_mtime_ns, st.st_ino, file_hash]
+        self._dirty = True
+    
+    def prune(self, keep_paths: set):
+        """Drop entries for files that no longer exist."""
+        for rel_path in set(self.entries) - keep_paths:
+            del self.entries[rel_path]
+            self._dirty = True
+    
+    def save(self):
+        """Write the cache atomically (only if it changed)."""
+        if not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+def default_cache_path(app_folder: str) -> str:
+    """Cache file for an app folder (kept outside the folder so it is never hashed)."""
+    name = os.path.basename(os.path.normpath(app_folder)) or "app"
+    return f".manifest_cache_{name}.json"
+
+
+def _batches(entries: list, indexes: list[int]) -> list[list[int]]:
+    """Group entry indexes into pool tasks: large files alone, small files together."""
+    batches, current, current_bytes = [], [], 0
+    for index in indexes:
+        size = entries[index][2].st_size
+        if size >= HASH_CHUNK_SIZE:
+            batches.append([index])
+            continue
+        current.append(index)
+        current_bytes += size
+        if current_bytes >= BATCH_BYTES or len(current) >= BATCH_FILES:
+            batches.append(current)
+            current, current_bytes = [], 0
+    if current:
+        batches.append(current)
+    # Largest first, so a big file found last doesn't run alone at the end
+    batches.sort(key=lambda batch: -sum(entries[i][2].st_size for i in batch))
+    return batches
+
+
+def _hash_batch(paths: list[str]) -> list[str]:
+    return [calculate_file_hash(path) for path in paths]
+
+
+def hash_files(entries: list, jobs: int = None, cache: HashCache = None,
+               verify: bool = False, stats: dict = None, progress_callback=None) -> list[str]:
+    """
+    Hash scanned files in parallel, reusing cached hashes for unchanged files.
+    
+    Args:
+        entries: Output of scan_files().
+        jobs: Number of hashing threads.
+        cache: Optional HashCache, updated with the new hashes.
+        verify: Ignore cached hashes (still refreshes the cache).
+        stats: Optional dict receiving 'cached' and 'hashed' counts.
+        progress_callback: Called with (hashed_bytes, total_bytes) as files finish
+            (cached files are not counted).
+    
+    Returns:
+        List of hex digests in the same order as entries.
+    """
+    hashes = [None] * len(entries)
+    todo = []
+    for index, (rel_path, _, st) in enumerate(entries):
+        cached = cache.lookup(rel_path, st) if cache and not verify else None
+        if cached:
+            hashes[index] = cached
+        else:
+            todo.append(index)
+    
+    if todo:
+        total = sum(entries[i][2].st_size for i in todo)
+        done = 0
+        batches = _batches(entries, todo)
+        jobs = jobs or default_jobs()
+        if jobs == 1:
+            results = ((batch, _hash_batch([entries[i][1] for i in batch])) for batch in batches)
+        else:
+            pool = ThreadPoolExecutor(max_workers=jobs)
+            futures = {pool.submit(_hash_batch, [entries[i][1] for i in batch]): batch for batch in batches}
+            results = ((futures[future], future.result()) for future in as_completed(futures))
+        try:
+            for batch, batch_hashes in results:
+                for index, file_hash in zip(batch, batch_hashes):
+                    hashes[index] = file_hash
+                    done += entries[index][2].st_size
+                if progress_callback:
+                    progress_callback(done, total)
+        finally:
+            if jobs != 1:
+                pool.shutdown(cancel_futures=True)
+    
+    if cache is not None:
+        racy_limit = time.time_ns() - RACY_WINDOW_NS
+        for index in todo:
+            rel_path, _, st = entries[index]
+            if st.st_mtime_ns < racy_limit:
+                cache.store(rel_path, st, hashes[index])
+        cache.prune({rel_path for rel_path, _, _ in entries})
+        cache.save()
+    
+    if stats is not None:
+        stats["cached"] = len(entries) - len(todo)
+        stats["hashed"] = len(todo)
+    
+    return hashes
+
+
+def generate_manifest(app_folder: str, version: str, jobs: int = None, stats: dict = None,
+                      cache: HashCache = None, verify: bool = False) -> dict:
     """
     Generate a manifest of all files in the application folder.
     
     Args:
         app_folder: Path to the application folder (e.g., dist/ZI-BGRemover)
         version: Version string (e.g., "1.0.0")
+        jobs: Number of hashing threads (default: default_jobs())
+        stats: Optional dict filled with timing info ('scan_seconds', 'hash_seconds')
+            and 'cached'/'hashed' file counts
+        cache: Optional HashCache for incremental runs
+        verify: Rehash every file even if the cache says it is unchanged
     
     Returns:
         Dictionary containing version and file hashes
     """
-    app_path = Path(app_folder)
-    
-    if not app_path.exists():
+    if not os.path.isdir(app_folder):
         raise FileNotFoundError(f"Application folder not found: {app_folder}")
     
+    start = time.perf_counter()
+    entries = sorted(scan_files(app_folder))
+    scanned = time.perf_counter()
+    
+    hashes = hash_files(entries, jobs, cache, verify, stats)
+    hashed = time.perf_counter()
+    
     manifest = {
         "version": version,
         "generated": datetime.now().isoformat(),
         "files": {}
     }
     
-    # Walk through all files
-    for filepath in app_path.rglob('*'):
-        if filepath.is_file():
-            # Get relative path from app folder
-            rel_path = filepath.relative_to(app_path)
-            # Use forward slashes for consistency
-            rel_path_str = str(rel_path).replace('\\', '/')
-            
-            # Calculate hash
-            file_hash = calculate_file_hash(str(filepath))
-            file_size = filepath.stat().st_size
-            
-            manifest["files"][rel_path_str] = {
-                "hash": file_hash,
-                "size": file_size
-            }
+    for (rel_path, _, st), file_hash in zip(entries, hashes):
+        manifest["files"][rel_path] = {
+            "hash": file_hash,
+            "size": st.st_size
+        }
     
     manifest["total_files"] = len(manifest["files"])
     manifest["total_size"] = sum(f["size"] for f in manifest["files"].values())
+    manifest["components"] = summarize(manifest)
+    
+    if stats is not None:
+        stats["scan_seconds"] = scanned - start
+        stats["hash_seconds"] = hashed - scanned
+        stats["jobs"] = jobs or default_jobs()
     
     return manifest
 
 
-def compare_manifests(local_manifest: dict, remote_manifest: dict) -> dict:
+def compare_manifests(local_manifest, remote_manifest) -> dict:
     """
     Compare local and remote manifests to find changed/new/deleted files.
     
+    Both manifests may be JSON dicts or BinaryManifest objects; they are walked
+    as two sorted streams in a single linear merge.
+    
     Returns:
-        Dictionary with 'changed', 'new', 'deleted' lists of file paths
+        Dictionary with 'changed', 'new', 'deleted' lists of file paths (sorted)
     """
-    local_files = local_manifest.get("files", {})
-    remote_files = remote_manifest.get("files", {})
-    
     result = {
         "changed": [],  # Files that exist in both but have different hashes
         "new": [],      # Files in remote but not in local
         "deleted": []   # Files in local but not in remote
     }
     
-    # Find changed and new files
-    for filepath, info in remote_files.items():
-        if filepath in local_files:
-            if local_files[filepath]["hash"] != info["hash"]:
-                result["changed"].append(filepath)
+    if isinstance(local_manifest, BinaryManifest) and isinstance(remote_manifest, BinaryManifest):
+        # Same file list (the usual case between releases): only the digest
+        # columns differ, compare them block by block without decoding paths
+        if local_manifest.paths_section == remote_manifest.paths_section:
+            local_digests, remote_digests = local_manifest.digests, remote_manifest.digests
+            block = DIGEST_SIZE * local_manifest.restart_interval
+            for start in range(0, len(local_digests), block):
+                if local_digests[start:start + block] != remote_digests[start:start + block]:
+                    for offset in range(start, min(start + block, len(local_digests)), DIGEST_SIZE):
+                        if local_digests[offset:offset + DIGEST_SIZE] != remote_digests[offset:offset + DIGEST_SIZE]:
+                            result["changed"].append(remote_manifest.path(offset // DIGEST_SIZE))
+            return result
+        
+        # Otherwise merge on raw path/digest bytes (no hex/decode per entry)
+        local_iter = ((path, digest) for path, _, digest in local_manifest.iter_raw())
+        remote_iter = ((path, digest) for path, _, digest in remote_manifest.iter_raw())
+        decode = lambda path: path.decode('utf-8')
+    else:
+        local_iter = ((path, file_hash) for path, file_hash, _ in iter_manifest(local_manifest))
+        remote_iter = ((path, file_hash) for path, file_hash, _ in iter_manifest(remote_manifest))
+        decode = lambda path: path
+    
+    local_entry = next(local_iter, None)
+    remote_entry = next(remote_iter, None)
+    while local_entry is not None and remote_entry is not None:
+        if local_entry[0] == remote_entry[0]:
+            if local_entry[1] != remote_entry[1]:
+                result["changed"].append(decode(remote_entry[0]))
+            local_entry = next(local_iter, None)
+            remote_entry = next(remote_iter, None)
+        elif local_entry[0] < remote_entry[0]:
+            result["deleted"].append(decode(local_entry[0]))
+            local_entry = next(local_iter, None)
         else:
-            result["new"].append(filepath)
+            result["new"].append(decode(remote_entry[0]))
+            remote_entry = next(remote_iter, None)
     
-    # Find deleted files
-    for filepath in local_files:
-        if filepath not in remote_files:
-            result["deleted"].append(filepath)
+    while local_entry is not None:
+        result["deleted"].append(decode(local_entry[0]))
+        local_entry = next(local_iter, None)
+    while remote_entry is not None:
+        result["new"].append(decode(remote_entry[0]))
+        remote_entry = next(remote_iter, None)
     
     return result
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python manifest_generator.py <app_folder> <version> [output_file]")
-        print("Example: python manifest_generator.py dist/ZI-BGRemover 1.0.0")
+def package_of(path: str) -> str:
+    """
+    Top-level package of a bundle path: the first folder under _internal
+    (dist-info folders count as their package), else the file itself.
+    """
+    parts = path.split('/')
+    if parts[0] == "_internal" and len(parts) > 1:
+        parts = parts[1:]
+    name = parts[0]
+    if name.endswith(".dist-info"):
+        name = name.split('-')[0]
+    return name
+
+
+def diff_manifests(old_manifest, new_manifest, top: int = 10) -> dict:
+    """
+    Explain the difference between two releases.
+    
+    Both manifests may be JSON dicts or BinaryManifest objects.
+    
+    Returns:
+        Dict with the versions, 'files' and 'bytes' totals per status, 'patch_bytes'
+        (size of the changed and new files, what a file-level patch carries),
+        'packages' (per top-level package, most patch bytes first), 'largest'
+        (top changed/new files), 'same_size' (content changed, size did not:
+        usually rebuild noise such as timestamps or obfuscation keys), 'resized'
+        (changed files whose size changed, largest change first) and
+        'duplicates' (content shipped more than once by the patch).
+    """
+    old_files = {path: (file_hash, size) for path, file_hash, size in iter_manifest(old_manifest)}
+    new_files = {path: (file_hash, size) for path, file_hash, size in iter_manifest(new_manifest)}
+    changes = compare_manifests(old_manifest, new_manifest)
+    
+    packages = {}
+    
+    def package(path: str) -> dict:
+        name = package_of(path)
+        if name not in packages:
+            packages[name] = {"package": name, "changed": 0, "new": 0, "deleted": 0,
+                              "patch_bytes": 0, "size_delta": 0}
+        return packages[name]
+    
+    touched = []
+    for status in ("changed", "new", "deleted"):
+        for path in changes[status]:
+            old_size = old_files[path][1] if path in old_files else 0
+            new_size = new_files[path][1] if path in new_files else 0
+            entry = package(path)
+            entry[status] += 1
+            entry["size_delta"] += new_size - old_size
+            if status != "deleted":
+                entry["patch_bytes"] += new_size
+                touched.append({"path": path, "status": status, "old_size": old_size, "new_size": new_size})
+    
+    resized = [dict(item, delta=item["new_size"] - item["old_size"]) for item in touched
+               if item["status"] == "changed" and item["new_size"] != item["old_size"]]
+    resized.sort(key=lambda item: (-abs(item["delta"]), item["path"]))
+    same_size = sorted(item["path"] for item in touched
+                       if item["status"] == "changed" and item["new_size"] == item["old_size"])
+    
+    by_hash = {}
+    for item in touched:
+        if item["new_size"] > 0:
+            by_hash.setdefault(new_files[item["path"]][0], []).append(item["path"])
+    duplicates = [{"hash": file_hash, "size": new_files[paths[0]][1], "paths": sorted(paths),
+                   "wasted": new_files[paths[0]][1] * (len(paths) - 1)}
+                  for file_hash, paths in by_hash.items() if len(paths) > 1]
+    duplicates.sort(key=lambda group: (-group["wasted"], group["paths"][0]))
+    
+    old_total = sum(size for _, size in old_files.values())
+    new_total = sum(size for _, size in new_files.values())
+    version = lambda manifest: manifest.get("version") if isinstance(manifest, dict) else manifest.version
+    return {
+        "old_version": version(old_manifest),
+        "new_version": version(new_manifest),
+        "files": {"total": len(new_files), **{status: len(paths) for status, paths in changes.items()}},
+        "bytes": {
+            "total": new_total,
+            "size_delta": new_total - old_total,
+            "changed": sum(item["new_size"] for item in touched if item["status"] == "changed"),
+            "new": sum(item["new_size"] for item in touched if item["status"] == "new"),
+            "deleted": sum(old_files[path][1] for path in changes["deleted"]),
+            "same_size": sum(new_files[path][1] for path in same_size),
+        },
+        "patch_bytes": sum(item["new_size"] for item in touched),
+        "packages": sorted(packages.values(), key=lambda entry: (-entry["patch_bytes"], entry["package"])),
+        "largest": sorted(touched, key=lambda item: (-item["new_size"], item["path"]))[:top],
+        "same_size": same_size,
+        "resized": resized[:top],
+        "duplicates": duplicates,
+    }
+
+
+def format_diff(diff: dict) -> str:
+    """Human-readable release diff."""
+    mb = 1024 * 1024
+    files, sizes = diff["files"], diff["bytes"]
+    lines = [
+        f"Manifest diff {diff['old_version']} -> {diff['new_version']}",
+        f"  Files: {files['changed']} changed, {files['new']} new, {files['deleted']} deleted "
+        f"(of {files['total']})",
+        f"  Patch payload: {diff['patch_bytes'] / mb:.1f} MB "
+        f"(changed {sizes['changed'] / mb:.1f} MB, new {sizes['new'] / mb:.1f} MB), "
+        f"deleted {sizes['deleted'] / mb:.1f} MB",
+        f"  Bundle size: {sizes['total'] / mb:.1f} MB ({sizes['size_delta'] / mb:+.2f} MB)",
+        "",
+        f"  {'Package':<34}{'Changed':>8}{'New':>6}{'Deleted':>8}{'Patch (MB)':>12}{'Size delta':>12}",
+    ]
+    for entry in diff["packages"]:
+        lines.append(f"  {entry['package']:<34}{entry['changed']:>8}{entry['new']:>6}{entry['deleted']:>8}"
+                     f"{entry['patch_bytes'] / mb:>12.2f}{entry['size_delta']:>+12,}")
+    if diff["largest"]:
+        lines += ["", "  Largest changed files:"]
+        for item in diff["largest"]:
+            lines.append(f"    {item['new_size'] / mb:9.2f} MB  {item['status']:<7}  {item['path']}")
+    if diff["resized"]:
+        lines += ["", "  Resized files:"]
+        for item in diff["resized"]:
+            lines.append(f"    {item['delta']:>+12,} B  {item['old_size']:,} -> {item['new_size']:,}  {item['path']}")
+    if diff["same_size"]:
+        lines += ["", f"  Rebuilt with the same size ({sizes['same_size'] / mb:.2f} MB, content-only changes):"]
+        lines += [f"    {path}" for path in diff["same_size"]]
+    if diff["duplicates"]:
+        wasted = sum(group["wasted"] for group in diff["duplicates"])
+        lines += ["", f"  Duplicate content in the patch ({wasted / mb:.2f} MB shipped more than once):"]
+        for group in diff["duplicates"]:
+            lines.append(f"    {len(group['paths'])}x {group['size'] / mb:.2f} MB  {', '.join(group['paths'])}")
+    return "\n".join(lines)
+
+
+def manifest_trend(manifests: list) -> list[dict]:
+    """diff_manifests for every consecutive pair of releases."""
+    return [diff_manifests(old, new) for old, new in zip(manifests, manifests[1:])]
+
+
+def format_trend(diffs: list[dict]) -> str:
+    """One row per release: bundle size, files touched and patch payload."""
+    mb = 1024 * 1024
+    lines = [f"{'Release':<18}{'Files':>7}{'Bundle (MB)':>13}{'Delta (MB)':>12}{'Chg':>6}{'New':>6}{'Del':>6}"
+             f"{'Patch (MB)':>12}{'Same size':>11}  Top package"]
+    for diff in diffs:
+        files, sizes = diff["files"], diff["bytes"]
+        top = diff["packages"][0] if diff["packages"] else None
+        top_text = f"{top['package']} ({top['patch_bytes'] / mb:.1f} MB)" if top else "-"
+        lines.append(f"{diff['old_version'] + ' -> ' + diff['new_version']:<18}{files['total']:>7}"
+                     f"{sizes['total'] / mb:>13.1f}{sizes['size_delta'] / mb:>+12.2f}"
+                     f"{files['changed']:>6}{files['new']:>6}{files['deleted']:>6}"
+                     f"{diff['patch_bytes'] / mb:>12.1f}{len(diff['same_size']):>11}  {top_text}")
+    return "\n".join(lines)
+
+
+def diff_main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="manifest_generator.py diff",
+        description="Explain what changed between releases (two manifests) or print a trend table (more).",
+        epilog="Example: python manifest_generator.py diff manifest_v1.0.6.json manifest_v1.0.8.json")
+    parser.add_argument("manifests", nargs="+", help="Manifests (JSON or binary), oldest first")
+    parser.add_argument("--top", type=int, default=10, help="Largest / resized files to list (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Machine-readable output")
+    args = parser.parse_args(argv)
+    if len(args.manifests) < 2:
+        parser.error("need at least two manifests")
+    
+    try:
+        manifests = [load_manifest(path) for path in args.manifests]
+        if len(manifests) == 2:
+            result = diff_manifests(manifests[0], manifests[1], top=args.top)
+            print(json.dumps(result, indent=2) if args.json else format_diff(result))
+        else:
+            diffs = manifest_trend(manifests)
+            print(json.dumps(diffs, indent=2) if args.json else format_trend(diffs))
+    except Exception as e:
+        print(f"✗ Error: {e}")
         sys.exit(1)
+
+
+def main():
+    if sys.argv[1:2] == ["diff"]:
+        diff_main(sys.argv[2:])
+        return
     
-    app_folder = sys.argv[1]
-    version = sys.argv[2]
-    output_file = sys.argv[3] if len(sys.argv) > 3 else f"manifest_v{version}.json"
+    parser = argparse.ArgumentParser(
+        description="Generate a SHA256 manifest of an application folder.",
+        epilog="Example: python manifest_generator.py dist/ZI-BGRemover 1.0.0")
+    parser.add_argument("app_folder", help="Application folder (e.g. dist/ZI-BGRemover)")
+    parser.add_argument("version", help="Version string (e.g. 1.0.0)")
+    parser.add_argument("output_file", nargs="?", help="Output JSON (default: manifest_v<version>.json)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help=f"Hashing threads (default: {default_jobs()})")
+    parser.add_argument("--cache", default=None,
+                        help="Hash cache file (default: .manifest_cache_<folder>.json)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the hash cache")
+    parser.add_argument("--verify", action="store_true", help="Rehash every file, ignoring cached hashes")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="List every group of files with identical content")
+    parser.add_argument("--binary", action="store_true",
+                        help=f"Also write the compact binary manifest ({BINARY_EXTENSION})")
+    args = parser.parse_args()
     
-    print(f"Generating manifest for {app_folder} v{version}...")
+    output_file = args.output_file or f"manifest_v{args.version}.json"
+    
+    print(f"Generating manifest for {args.app_folder} v{args.version}...")
     
     try:
-        manifest = generate_manifest(app_folder, version)
+        stats = {}
+        cache = None if args.no_cache else HashCache(args.cache or default_cache_path(args.app_folder))
+        manifest = generate_manifest(args.app_folder, args.version, jobs=args.jobs, stats=stats,
+                                     cache=cache, verify=args.verify)
         
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(manifest, f, indent=2)
         
+        if args.binary:
+            binary_file = os.path.splitext(output_file)[0] + BINARY_EXTENSION
+            save_binary_manifest(manifest, binary_file)
+        
+        total_gb = manifest['total_size'] / (1024*1024*1024)
+        hash_rate = manifest['total_size'] / (1024*1024) / max(stats['hash_seconds'], 1e-9)
         print(f"✓ Manifest generated: {output_file}")
         print(f"  Total files: {manifest['total_files']}")
-        print(f"  Total size: {manifest['total_size'] / (1024*1024*1024):.2f} GB")
+        print(f"  Total size: {total_gb:.2f} GB")
+        print(f"  Timing: scan {stats['scan_seconds']:.2f}s, "
+              f"hash {stats['hash_seconds']:.2f}s ({hash_rate:.0f} MB/s, {stats['jobs']} threads)")
+        print(f"  Hashed: {stats['hashed']} files, reused from cache: {stats['cached']} files")
+        print("  Components: " + ", ".join(f"{name} {info['size'] / (1024*1024):.0f} MB"
+                                           for name, info in manifest["components"].items()))
+        duplicates = find_duplicates(manifest)
+        if duplicates:
+            wasted_mb = sum(group['wasted'] for group in duplicates) / (1024*1024)
+            print(f"  Duplicates: {len(duplicates)} groups, {wasted_mb:.1f} MB stored more than once")
+            if args.duplicates:
+                print(format_report(duplicates))
+        if args.binary:
+            print(f"  Binary manifest: {binary_file} ({os.path.getsize(binary_file) / 1024:.0f} KB)")
         
     except Exception as e:
         print(f"✗ Error: {e}")
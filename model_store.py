@@ -0,0 +1,342 @@
+"""
+Model Store for ZI Background Remover
+======================================
+Keeps track of the ONNX models used by rembg (~/.u2net) and downloads them safely:
+- HTTP range requests into a temporary .part file (interrupted downloads resume)
+- Size, MD5 and SHA-256 verification before an atomic rename to the final file
+- Progress callback so the UI can show download status
+
+Every model in MODEL_REGISTRY is pinned to the MD5 rembg publishes for it, so a
+first download is already verified. Its SHA-256 and size are then recorded in a
+small state file, so later runs can detect truncated or corrupted files instead
+of failing inside onnxruntime.
+
+Usage:
+    from model_store import ModelStore
+    store = ModelStore()
+    if not store.is_available("silueta"):
+        store.ensure_model("silueta", progress_callback=on_progress)
+"""
+
+import os
+import json
+import hashlib
+import threading
+from urllib.request import urlopen, Request
+from urllib.error import HTTPError
+
+
+MODEL_BASE_URL = "https://github.com/danielgatis/rembg/releases/download/v0.0.0"
+
+# Known rembg models: internal name -> remote file, approximate size (MB) and the
+# digests it is checked against. "md5" is the checksum rembg pins for the file;
+# "sha256" may pin a stronger digest (None: recorded from the first verified download).
+# Multi-file models list their files under "parts" (stored under their remote names,
+# where rembg looks for them).
+MODEL_REGISTRY = {
+    "u2net": {"file": "u2net.onnx", "size_mb": 171,
+              "md5": "60024c5c889badc19c04ad937298a77b", "sha256": None},
+    "u2netp": {"file": "u2netp.onnx", "size_mb": 4.7,
+               "md5": "8e83ca70e441ab06c318d82300c84806", "sha256": None},
+    "u2net_human_seg": {"file": "u2net_human_seg.onnx", "size_mb": 171,
+                        "md5": "c09ddc2e0104f800e3e1bb4652583d1f", "sha256": None},
+    "u2net_cloth_seg": {"file": "u2net_cloth_seg.onnx", "size_mb": 172,
+                        "md5": "2434d1f3cb744e0e49386c906e5a08bb", "sha256": None},
+    "isnet-general-use": {"file": "isnet-general-use.onnx", "size_mb": 174,
+                          "md5": "fc16ebd8b0c10d971d3513d564d01e29", "sha256": None},
+    "isnet-anime": {"file": "isnet-anime.onnx", "size_mb": 171,
+                    "md5": "6f184e756bb3bd901c8849220a83e38e", "sha256": None},
+    "silueta": {"file": "silueta.onnx", "size_mb": 43,
+                "md5": "55e59e0d8062d2f5d013f4725ee84782", "sha256": None},
+    "birefnet-general": {"file": "BiRefNet-general-epoch_244.onnx", "size_mb": 949,
+                         "md5": "7a35a0141cbbc80de11d9c9a28f52697", "sha256": None},
+    "birefnet-general-lite": {"file": "BiRefNet-general-bb_swin_v1_tiny-epoch_232.onnx", "size_mb": 218,
+                              "md5": "4fab47adc4ff364be1713e97b7e66334", "sha256": None},
+    "birefnet-portrait": {"file": "BiRefNet-portrait-epoch_150.onnx", "size_mb": 949,
+                          "md5": "c3a64a6abf20250d090cd055f12a3b67", "sha256": None},
+    "birefnet-massive": {"file": "BiRefNet-massive-TR_DIS5K_TR_TEs-epoch_420.onnx", "size_mb": 949,
+                         "md5": "33e726a2136a3d59eb0fdf613e31e3e9", "sha256": None},
+    "sam": {"size_mb": 375, "parts": [
+        {"file": "sam_vit_b_01ec64.encoder.onnx", "md5": "a780f8ba09bceceaa1435724ed354848", "sha256": None},
+        {"file": "sam_vit_b_01ec64.decoder.onnx", "md5": "c4218b16ec1cb09889fcd6eb7a42a7c9", "sha256": None},
+    ]},
+}
+
+CHUNK_SIZE = 1024 * 1024
+STATE_FILENAME = "zi_models.json"
+
+
+class ModelIntegrityError(Exception):
+    """Raised when a downloaded model does not match its expected size or hash."""
+
+
+class ModelStore:
+    """Download, verify and locate rembg ONNX models."""
+
+    def __init__(self, model_dir: str = None, base_url: str = MODEL_BASE_URL, registry: dict = None):
+        """
+        Initialize the model store.
+
+        Args:
+            model_dir: Folder holding the .onnx files (default: $U2NET_HOME or ~/.u2net).
+            base_url: Base URL the model files are downloaded from.
+            registry: Model registry override (default: MODEL_REGISTRY).
+        """
+        self.model_dir = model_dir or os.environ.get(
+            "U2NET_HOME", os.path.join(os.path.expanduser("~"), ".u2net"))
+        self.base_url = base_url.rstrip('/')
+        self.registry = registry if registry is not None else MODEL_REGISTRY
+        self._state_lock = threading.Lock()
+
+    # ==================== LOOKUP ====================
+
+    def model_path(self, model_name: str) -> str:
+        """Local path of a model file (the name rembg expects; the first file of a multi-file model)."""
+        parts = self.registry.get(model_name, {}).get("parts")
+        if parts:
+            return os.path.join(self.model_dir, parts[0]["file"])
+        return os.path.join(self.model_dir, f"{model_name}.onnx")
+
+    def model_paths(self, model_name: str) -> list[str]:
+        """Local paths of every file of a model, in the order its session loads them."""
+        if model_name in self.registry:
+            return [part["path"] for part in self._parts(model_name)]
+        return [self.model_path(model_name)]
+
+    def model_url(self, model_name: str) -> str:
+        """Remote URL of a model file (the first file of a multi-file model)."""
+        return self._parts(model_name)[0]["url"]
+
+    def _parts(self, model_name: str) -> list[dict]:
+        """Files of a model: state key, remote URL, local path and pinned digests."""
+        entry = self.registry[model_name]
+        if "parts" not in entry:
+            return [{"key": model_name, "url": f"{self.base_url}/{entry['file']}",
+                     "path": os.path.join(self.model_dir, f"{model_name}.onnx"),
+                     "md5": entry.get("md5"), "sha256": entry.get("sha256")}]
+        return [{"key": part["file"], "url": f"{self.base_url}/{part['file']}",
+                 "path": os.path.join(self.model_dir, part["file"]),
+                 "md5": part.get("md5"), "sha256": part.get("sha256")} for part in entry["parts"]]
+
+    def expected_size_mb(self, model_name: str) -> float:
+        """Approximate download size in MB (for log messages)."""
+        if model_name in self.registry:
+            state = self._load_state()
+            sizes = [state.get(part["key"], {}).get("size") for part in self._parts(model_name)]
+            if all(sizes):
+                return round(sum(sizes) / (1024 * 1024), 1)
+        return self.registry.get(model_name, {}).get("size_mb", 150)
+
+    def is_known(self, model_name: str) -> bool:
+        """Whether the model is managed by this store."""
+        return model_name in self.registry
+
+    def is_available(self, model_name: str) -> bool:
+        """
+        Check if a model is present locally and not truncated.
+
+        Only the file size is compared here (cheap); use verify() for a full hash check.
+        """
+        if model_name not in self.registry:
+            return os.path.isfile(self.model_path(model_name))
+        state = self._load_state()
+        return all(self._part_available(part, state) for part in self._parts(model_name))
+
+    def _part_available(self, part: dict, state: dict) -> bool:
+        if not os.path.isfile(part["path"]):
+            return False
+        record = state.get(part["key"])
+        if record and record.get("size"):
+            return os.path.getsize(part["path"]) == record["size"]
+        return True
+
+    def verify(self, model_name: str) -> bool:
+        """Fully re-hash a local model and compare with the expected digests."""
+        for part in self._parts(model_name):
+            if not os.path.isfile(part["path"]):
+                return False
+            expected = self._expected_digests(part)
+            if expected and _hash_file(part["path"], list(expected)) != expected:
+                return False
+        return True
+
+    # ==================== DOWNLOAD ====================
+
+    def ensure_model(self, model_name: str, progress_callback=None, cancel_event=None) -> str:
+        """
+        Return the local path of a model, downloading it first if needed.
+
+        Args:
+            model_name: Internal rembg model name (e.g. "silueta").
+            progress_callback: Called with (downloaded_bytes, total_bytes).
+            cancel_event: Optional threading.Event; download stops when it is set.
+        """
+        if self.is_available(model_name):
+            return self.model_path(model_name)
+        return self.download(model_name, progress_callback, cancel_event)
+
+    def download(self, model_name: str, progress_callback=None, cancel_event=None) -> str:
+        """
+        Download a model with resume support and verify it before installing.
+
+        Files of a multi-file model that are already present are kept;
+        progress_callback then reports each remaining file in turn.
+
+        Raises:
+            KeyError: Model is not in the registry.
+            ModelIntegrityError: Size or hash mismatch (the partial file is removed),
+                or a file that cannot be verified at all.
+            InterruptedError: Download was cancelled (the partial file is kept for resume).
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        state = self._load_state()
+        for part in self._parts(model_name):
+            if not self._part_available(part, state):
+                self._download_part(model_name, part, progress_callback, cancel_event)
+        return self.model_path(model_name)
+
+    def _download_part(self, model_name: str, part: dict, progress_callback, cancel_event):
+        part_path = part["path"] + ".part"
+        try:
+            size, total_size, digests = self._fetch(model_name, part, part_path, progress_callback, cancel_event)
+        except HTTPError as e:
+            if e.code != 416 or not os.path.exists(part_path):
+                raise
+            # Range past the end: the .part file already holds the whole file
+            # (e.g. the app stopped before the rename). Keep it only if it verifies.
+            expected = self._expected_digests(part)
+            digests = _hash_file(part_path, ["md5", "sha256"])
+            if expected and all(digests[name] == value for name, value in expected.items()):
+                print(f"[ModelStore] {model_name}: partial download already complete")
+                size = total_size = os.path.getsize(part_path)
+            else:
+                print(f"[ModelStore] {model_name}: partial download does not verify, restarting")
+                os.remove(part_path)
+                size, total_size, digests = self._fetch(model_name, part, part_path, progress_callback, cancel_event)
+
+        self._verify_download(model_name, part, part_path, size, total_size, digests)
+        os.replace(part_path, part["path"])
+        self._record(part["key"], size, digests["sha256"], part["url"])
+        print(f"[ModelStore] Installed {os.path.basename(part['path'])} ({size} bytes)")
+
+    def _fetch(self, model_name: str, part: dict, part_path: str, progress_callback, cancel_event):
+        """
+        Download (or resume) one file into part_path.
+
+        Returns:
+            (size, total_size, {'md5': hex, 'sha256': hex}); total_size is 0 when
+            the server sent no length.
+        """
+        hashes = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+        offset = 0
+        if os.path.exists(part_path):
+            # Re-hash what we already have so the final digest covers the whole file
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    for hash_func in hashes.values():
+                        hash_func.update(chunk)
+                    offset += len(chunk)
+
+        headers = {'User-Agent': 'ZI-BGRemover-ModelStore'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        with urlopen(Request(part["url"], headers=headers), timeout=60) as response:
+            if offset and response.status != 206:
+                # Server ignored the range request, start over
+                print(f"[ModelStore] Server does not support resume, restarting {model_name}")
+                offset = 0
+                hashes = {"md5": hashlib.md5(), "sha256": hashlib.sha256()}
+            elif offset:
+                print(f"[ModelStore] Resuming {model_name} from {offset} bytes")
+
+            content_range = response.headers.get('Content-Range', '')
+            content_length = int(response.headers.get('Content-Length', 0))
+            if offset and content_range.rpartition('/')[2].isdigit():
+                total_size = int(content_range.rpartition('/')[2])
+            else:
+                total_size = offset + content_length if content_length else 0
+            downloaded = offset
+
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise InterruptedError(f"Download of {model_name} cancelled")
+
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    f.write(chunk)
+                    for hash_func in hashes.values():
+                        hash_func.update(chunk)
+                    downloaded += len(chunk)
+
+                    if progress_callback:
+                        progress_callback(downloaded, total_size)
+
+        return downloaded, total_size, {name: hash_func.hexdigest() for name, hash_func in hashes.items()}
+
+    def _verify_download(self, model_name: str, part: dict, part_path: str, size: int, total_size: int,
+                         digests: dict):
+        """Check a finished .part file; remove it if it can never become valid."""
+        if total_size and size != total_size:
+            # Connection dropped early: keep the .part file so the next attempt resumes
+            raise ModelIntegrityError(
+                f"{model_name}: incomplete download ({size} of {total_size} bytes)")
+
+        expected = self._expected_digests(part)
+        if not expected and not total_size:
+            # Neither a length nor a digest: a truncated file would go unnoticed
+            os.remove(part_path)
+            raise ModelIntegrityError(
+                f"{model_name}: cannot be verified (no Content-Length and no known hash)")
+
+        for name, value in expected.items():
+            if digests[name] != value:
+                os.remove(part_path)
+                raise ModelIntegrityError(
+                    f"{model_name}: {name.upper()} mismatch (expected {value}, got {digests[name]})")
+
+    # ==================== STATE FILE ====================
+
+    def _expected_digests(self, part: dict) -> dict:
+        """Digests a file must match: the pinned MD5 and the pinned or recorded SHA-256."""
+        expected = {}
+        if part.get("md5"):
+            expected["md5"] = part["md5"]
+        record = self._load_state().get(part["key"])
+        sha256 = part.get("sha256") or (record.get("sha256") if record else None)
+        if sha256:
+            expected["sha256"] = sha256
+        return expected
+
+    def _state_path(self) -> str:
+        return os.path.join(self.model_dir, STATE_FILENAME)
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, key: str, size: int, digest: str, url: str):
+        """Remember the verified size and hash of a model file."""
+        with self._state_lock:
+            state = self._load_state()
+            state[key] = {"size": size, "sha256": digest, "url": url}
+            tmp_path = self._state_path() + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self._state_path())
+
+
+def _hash_file(filepath: str, algorithms: list[str]) -> dict:
+    """Digests of a file (e.g. ['md5', 'sha256']) in one pass with large reads."""
+    hashes = {name: hashlib.new(name) for name in algorithms}
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            for hash_func in hashes.values():
+                hash_func.update(chunk)
+    return {name: hash_func.hexdigest() for name, hash_func in hashes.items()}
@@ -0,0 +1,224 @@
+"""
+Output Writer for ZI Background Remover
+========================================
+Encodes result images and writes them atomically:
+- Encode to the selected format (PNG level 0-9 + optimize, lossless WebP, TIFF, AVIF)
+- Write to a temporary file in the output folder, optionally fsync, then rename
+  over the final name, so a crash never leaves a half-written image behind
+- OutputWriter runs encode + write on its own I/O thread so disk latency
+  never stalls inference; with on_result, a file's result dict is reported
+  only once its image is on disk (marked failed if the write failed); results
+  are matched to writes by a key (the input path), not the output path
+
+Usage:
+    from output_writer import OutputWriter
+    writer = OutputWriter(fmt="PNG", compress_level=3)
+    writer.submit("out/photo.png", rgba_image)
+    writer.close()  # waits for pending writes
+"""
+
+import os
+import io
+import queue
+import threading
+
+from PIL import Image
+
+
+# Format name -> save settings and the encode cost shown in the UI
+OUTPUT_FORMATS = {
+    "PNG": {"ext": ".png", "pil_format": "PNG",
+            "cost": "Standar, lossless (level tinggi = lambat)"},
+    "WebP (lossless)": {"ext": ".webp", "pil_format": "WEBP",
+                        "cost": "Lambat, file paling kecil"},
+    "TIFF (alpha)": {"ext": ".tiff", "pil_format": "TIFF",
+                     "cost": "Sangat cepat, file besar"},
+    "AVIF": {"ext": ".avif", "pil_format": "AVIF",
+             "cost": "Paling lambat, lossy (q90), file kecil"},
+}
+
+DEFAULT_FORMAT = "PNG"
+DEFAULT_COMPRESS_LEVEL = 6  # PIL default
+
+
+def _avif_available() -> bool:
+    """AVIF needs Pillow >= 11.2 or the pillow-avif-plugin package."""
+    try:
+        import pillow_avif  # noqa: F401  (registers the plugin)
+    except ImportError:
+        pass
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+def available_formats() -> list[str]:
+    """Output formats usable with the installed Pillow."""
+    return [name for name in OUTPUT_FORMATS if name != "AVIF" or _avif_available()]
+
+
+def output_extension(fmt: str) -> str:
+    """File extension for an output format."""
+    return OUTPUT_FORMATS.get(fmt, OUTPUT_FORMATS[DEFAULT_FORMAT])["ext"]
+
+
+def encode_image(img: Image.Image, fmt: str = DEFAULT_FORMAT,
+                 compress_level: int = DEFAULT_COMPRESS_LEVEL, optimize: bool = False) -> bytes:
+    """
+    Encode an image to bytes.
+
+    Args:
+        img: Result image (usually RGBA).
+        fmt: Key of OUTPUT_FORMATS.
+        compress_level: PNG zlib level 0-9 (0 = none/fastest, 9 = smallest/slowest).
+        optimize: PNG optimize pass (slower, slightly smaller).
+    """
+    spec = OUTPUT_FORMATS.get(fmt, OUTPUT_FORMATS[DEFAULT_FORMAT])
+    pil_format = spec["pil_format"]
+    buffer = io.BytesIO()
+
+    if pil_format == "PNG":
+        img.save(buffer, format="PNG", compress_level=max(0, min(9, compress_level)), optimize=optimize)
+    elif pil_format == "WEBP":
+        img.save(buffer, format="WEBP", lossless=True, quality=80, method=4)
+    elif pil_format == "TIFF":
+        img.save(buffer, format="TIFF", compression="tiff_lzw")
+    elif pil_format == "AVIF":
+        img.save(buffer, format="AVIF", quality=90)
+    else:
+        img.save(buffer, format=pil_format)
+
+    return buffer.getvalue()
+
+
+def atomic_write(path: str, data: bytes, fsync: bool = False):
+    """
+    Write a file atomically: temp file in the same folder, then rename.
+
+    Args:
+        path: Final file path.
+        data: File contents.
+        fsync: Flush to disk before the rename (survives power loss, slower).
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_image(path: str, img: Image.Image, settings: dict = None, timer=None):
+    """
+    Encode and atomically write one image using writer settings.
+
+    timer: Optional run_report.StageTimer, marked after 'encode' and 'write'.
+    """
+    settings = settings or {}
+    data = encode_image(img, settings.get("format", DEFAULT_FORMAT),
+                        settings.get("compress_level", DEFAULT_COMPRESS_LEVEL),
+                        settings.get("optimize", False))
+    if timer is not None:
+        timer.mark("encode")
+    atomic_write(path, data, settings.get("fsync", False))
+    if timer is not None:
+        timer.mark("write")
+
+
+class OutputWriter:
+    """Background I/O thread that encodes and writes result images in order."""
+
+    def __init__(self, settings: dict = None, max_pending: int = 8, on_error=None, on_result=None):
+        """
+        Args:
+            settings: Dict with 'format', 'compress_level', 'optimize', 'fsync'.
+            max_pending: Queue bound; submit() blocks when the disk can't keep up.
+            on_error: Called with (path, exception) when a write fails.
+            on_result: Called with each result dict handed to settle(), once
+                its image is written (from the I/O thread or settle's caller).
+                Results are matched to writes by the key given to submit().
+        """
+        self.settings = settings or {}
+        self.on_error = on_error
+        self.on_result = on_result
+        self.failed = []
+        self.written = 0
+        self._lock = threading.Lock()
+        self._results = {}      # key -> result dict waiting for its write
+        self._outcomes = {}     # key -> write error (None = written) waiting for its result dict
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, img: Image.Image, timer=None, key: str = None):
+        """
+        Queue an image for encoding and writing (timer: see write_image).
+
+        key: Identifies the file for settle(), usually its input path
+            (defaults to path). Must be unique among pending files.
+        """
+        self._queue.put((path, img, timer, path if key is None else key))
+
+    def settle(self, key: str, result: dict):
+        """
+        Hand over the result dict of the image submitted with key.
+
+        on_result gets it once the write is done; a failed write sets 'ok'
+        to False and 'error' to the reason.
+        """
+        with self._lock:
+            if key not in self._outcomes:
+                self._results[key] = result
+                return
+            error = self._outcomes.pop(key)
+        self._report(result, error)
+
+    def _settled(self, key: str, error: str | None):
+        if self.on_result is None:
+            return
+        with self._lock:
+            result = self._results.pop(key, None)
+            if result is None:
+                # The write finished before the caller got its result dict
+                self._outcomes[key] = error
+                return
+        self._report(result, error)
+
+    def _report(self, result: dict, error: str | None):
+        if error is not None:
+            result["ok"] = False
+            result["error"] = f"Gagal menulis: {error}"
+        self.on_result(result)
+
+    def close(self):
+        """Wait until every queued image is written and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            path, img, timer, key = item
+            try:
+                if timer is not None:
+                    # Time spent waiting in the queue is not encode time
+                    timer.restart()
+                write_image(path, img, self.settings, timer)
+                self.written += 1
+            except Exception as e:
+                self.failed.append((path, str(e)))
+                if self.on_error:
+                    self.on_error(path, e)
+                self._settled(key, str(e))
+            else:
+                self._settled(key, None)
@@ -0,0 +1,566 @@
+"""
+Patch Applier for ZI Background Remover
+=======================================
+Installs updates with zipfile instead of one PowerShell Expand-Archive per patch:
+- Collapses a patch chain first: for every file only the ops after its last
+  whole-file version (or deletion) are kept, so each file is written once
+- Rebuilds files into a staging folder next to the install, in parallel
+  (legacy whole-file ZIPs, full update ZIPs and delta patches)
+- Swaps them in with atomic renames, keeping the replaced files until the swap
+  completed so a failure rolls everything back
+- Runs as a small helper process after the app exits (waits for its PID, then
+  restarts it), so nothing depends on batch scripts, tasklist or ping delays
+- Updates can be staged ahead of time while the app keeps running
+  (stage_update, or solid patches extracted straight from the download
+  stream); the helper then only swaps: file renames for patches, two folder
+  renames for a full update
+- The replaced files (or the whole previous install) are kept after a staged
+  swap, so rollback() can restore the previous version just as quickly
+- Partial installs (see components.py) only get the files of their components
+
+Works on any OS; the install/staging folders are plain paths, so it can be
+exercised on Linux against temp directories.
+
+Usage (helper process):
+    python patch_applier.py <plan.json>
+
+    plan.json: {"app_folder": ..., "patches": [...], "full_update": null, "staged": null,
+                "rollback": false, "components": null, "wait_pid": 1234,
+                "restart": ["path/to/ZI-BGRemover.exe"], "cleanup": [...]}
+
+    from patch_applier import apply_update
+    apply_update(app_folder, patch_files=["patch_1.0.6_to_1.0.8.zip"])
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from components import COMPONENTS_FILE, skip_filter, write_components
+from content_store import DUPLICATES_FILE, read_links, materialize
+from delta_patch import PATCH_INDEX, PatchError, decode_entry, read_index, default_jobs
+from manifest_generator import calculate_file_hash
+
+
+STAGING_SUFFIX = ".zi_staging"
+BACKUP_SUFFIX = ".zi_backup"
+STAGED_INDEX = "zi_staged.json"     # What a pre-staged folder holds (see stage_update)
+BACKUP_INDEX = "zi_backup.json"     # What a kept backup restores (see rollback)
+KEEP_FILES = ("update_mirror.txt", COMPONENTS_FILE)  # Carried into a fully staged install
+LOG_FILE = "zi_update.log"
+# Reads from a ZIP member: zipfile joins many small decompressed pieces per
+# read, so reads much larger than this get slower, not faster
+MEMBER_READ_SIZE = 256 * 1024
+
+
+def log(message: str):
+    """Print and append to the update log in the temp folder (the helper may have no console)."""
+    line = f"[PatchApplier] {message}"
+    print(line)
+    try:
+        with open(os.path.join(tempfile.gettempdir(), LOG_FILE), 'a', encoding='utf-8') as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {line}\n")
+    except OSError:
+        pass
+
+
+def _zip_root(names: list[str]) -> str:
+    """Common top-level folder of every entry ('ZI-BGRemover/' in the portable ZIP), else ''."""
+    tops = {name.split('/', 1)[0] for name in names}
+    if len(tops) == 1 and all('/' in name for name in names):
+        return tops.pop() + '/'
+    return ""
+
+
+def plan_chain(patch_files: list[str]) -> tuple[dict, set, dict]:
+    """
+    Collapse a patch chain into per-file operations.
+
+    Returns:
+        (ops, deleted, links): ops maps relative path -> list of (kind, patch_path, data)
+        with kind 'member' (whole file from a ZIP member) or 'delta'/'full' (delta
+        patch entry); deleted is the set of paths removed by the chain; links maps
+        deduplicated paths to their canonical path in the same package.
+    """
+    ops = {}
+    deleted = set()
+    links = {}
+
+    for patch_path in patch_files:
+        with zipfile.ZipFile(patch_path, 'r') as zf:
+            names = zf.namelist()
+            if PATCH_INDEX in names:
+                index = read_index(zf)
+                for rel_path, entry in index["files"].items():
+                    op = (entry["method"], patch_path, entry)
+                    if entry["method"] == "delta":
+                        ops[rel_path] = ops.get(rel_path, []) + [op]
+                    else:
+                        # A whole-file version makes every earlier op for the path irrelevant
+                        ops[rel_path] = [op]
+                    deleted.discard(rel_path)
+                for rel_path in index["deleted"]:
+                    ops.pop(rel_path, None)
+                    deleted.add(rel_path)
+                continue
+
+            files = [n for n in names if not n.endswith('/')]
+            root = _zip_root(files)
+            for name in files:
+                rel_path = name[len(root):]
+                if rel_path == DUPLICATES_FILE:
+                    continue
+                ops[rel_path] = [("member", patch_path, name)]
+                deleted.discard(rel_path)
+
+        # A deduplicated file is the canonical's member of the same package
+        for dup_path, canonical in read_links(patch_path).items():
+            ops[dup_path] = [("member", patch_path, root + canonical)]
+            deleted.discard(dup_path)
+            links[dup_path] = canonical
+
+    # Only keep links whose final content still comes from the shared member
+    links = {dup: canonical for dup, canonical in links.items()
+             if dup in ops and ops[dup] == ops.get(canonical)}
+    return ops, deleted, links
+
+
+class _ZipHandles:
+    """Per-thread open ZipFile handles (ZipFile objects aren't thread-safe to share)."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> zipfile.ZipFile:
+        handles = self._local.__dict__.setdefault("handles", {})
+        if path not in handles:
+            handles[path] = zipfile.ZipFile(path, 'r')
+            with self._lock:
+                self._all.append(handles[path])
+        return handles[path]
+
+    def close(self):
+        for zf in self._all:
+            zf.close()
+
+
+def _build_file(rel_path: str, file_ops: list, app_folder: str, staging_dir: str, zips: _ZipHandles):
+    """Run the collapsed ops of one file, leaving the final version in the staging folder."""
+    target = os.path.join(staging_dir, *rel_path.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    base_path = os.path.join(app_folder, *rel_path.split('/'))
+    temps = []
+
+    try:
+        for step, (kind, patch_path, data) in enumerate(file_ops):
+            tmp_path = f"{target}.zi_tmp{step}"
+            temps.append(tmp_path)
+            zf = zips.get(patch_path)
+            with open(tmp_path, 'wb') as out:
+                if kind == "member":
+                    with zf.open(data) as src:  # zipfile checks the CRC at EOF
+                        shutil.copyfileobj(src, out, MEMBER_READ_SIZE)
+                else:
+                    decode_entry(zf, data, base_path, out)
+            if kind in ("delta", "full") and calculate_file_hash(tmp_path) != data["hash"]:
+                raise PatchError(f"Hash mismatch after patching: {rel_path}")
+            base_path = tmp_path
+        os.replace(base_path, target)
+    finally:
+        for tmp_path in temps:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _output_size(op: tuple, zips: _ZipHandles) -> int:
+    """Size of the file an op produces (for scheduling)."""
+    kind, patch_path, data = op
+    if kind == "member":
+        return zips.get(patch_path).getinfo(data).file_size
+    return data.get("size", 0)
+
+
+def stage(patch_files: list[str], app_folder: str, staging_dir: str,
+          jobs: int = None, progress_callback=None, skip=None) -> tuple[list[str], list[str]]:
+    """
+    Build the final version of every file changed by a patch chain in a staging folder.
+
+    The install itself is not modified. Files are built in parallel; deltas whose
+    base isn't changed earlier in the chain use the installed file.
+
+    Args:
+        patch_files: Patch (or full update) ZIPs in chain order.
+        app_folder: Installed app folder.
+        staging_dir: Output folder (created; same relative layout as the install).
+        jobs: Parallel files.
+        progress_callback: Called with (done, total) files.
+        skip: Optional predicate; paths it is True for are left out (files
+            of components that aren't installed).
+
+    Returns:
+        (staged relative paths, relative paths to delete from the install)
+    """
+    ops, deleted, links = plan_chain(patch_files)
+    if skip:
+        ops = {rel_path: file_ops for rel_path, file_ops in ops.items() if not skip(rel_path)}
+        links = {dup: canonical for dup, canonical in links.items() if dup in ops and canonical in ops}
+    os.makedirs(staging_dir, exist_ok=True)
+
+    done = 0
+    zips = _ZipHandles()
+    try:
+        with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+            # Largest files first so one big file doesn't finish last on its own
+            order = sorted((p for p in ops if p not in links), key=lambda p: -_output_size(ops[p][-1], zips))
+            futures = [pool.submit(_build_file, rel_path, ops[rel_path], app_folder, staging_dir, zips)
+                       for rel_path in order]
+            for future in futures:
+                future.result()
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(ops))
+    finally:
+        zips.close()
+
+    # Identical files are written once and hardlinked inside the staging folder
+    materialize(staging_dir, links)
+    if progress_callback and links:
+        progress_callback(len(ops), len(ops))
+
+    return sorted(ops), sorted(deleted)
+
+
+def swap_in(staging_dir: str, app_folder: str, staged: list[str], deleted: list[str],
+            backup_dir: str = None, keep_backup: bool = False) -> dict:
+    """
+    Move staged files into the install with atomic renames.
+
+    Replaced and deleted files are moved to backup_dir first; if anything fails
+    the swap is rolled back from there. os.replace also detaches hardlinked
+    names, so deduplicated copies are never modified in place. With
+    keep_backup the backup stays afterwards, for rollback().
+
+    Returns:
+        Dict with 'replaced', 'deleted' counts and 'seconds'.
+    """
+    start = time.perf_counter()
+    backup_dir = backup_dir or app_folder.rstrip("/\\") + BACKUP_SUFFIX
+    if os.path.exists(backup_dir):
+        shutil.rmtree(backup_dir)
+    moved = []  # (relative path, install path, backup path or None)
+    deleted_set = set(deleted)
+
+    try:
+        for rel_path in list(staged) + list(deleted):
+            dest = os.path.join(app_folder, *rel_path.split('/'))
+            backup = None
+            if os.path.lexists(dest):
+                backup = os.path.join(backup_dir, *rel_path.split('/'))
+                os.makedirs(os.path.dirname(backup), exist_ok=True)
+                os.replace(dest, backup)
+            moved.append((rel_path, dest, backup))
+            if rel_path in deleted_set:
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            src = os.path.join(staging_dir, *rel_path.split('/'))
+            try:
+                os.replace(src, dest)
+            except OSError:
+                shutil.move(src, dest)  # Staging on another volume
+    except BaseException:
+        log("Swap failed, rolling back")
+        for _, dest, backup in reversed(moved):
+            try:
+                if os.path.lexists(dest):
+                    os.remove(dest)
+                if backup:
+                    os.replace(backup, dest)
+            except OSError as e:
+                log(f"Rollback failed for {dest}: {e}")
+        raise
+
+    if keep_backup:
+        os.makedirs(backup_dir, exist_ok=True)
+        with open(os.path.join(backup_dir, BACKUP_INDEX), 'w', encoding='utf-8') as f:
+            json.dump({"mode": "files",
+                       "restore": [rel for rel, _, backup in moved if backup],
+                       "remove": [rel for rel, _, backup in moved if not backup and rel not in deleted_set]},
+                      f, indent=2)
+    else:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    return {"replaced": len(staged), "deleted": len(deleted), "seconds": time.perf_counter() - start}
+
+
+def swap_folder(staging_dir: str, app_folder: str, backup_dir: str = None):
+    """Replace the whole install with a fully staged folder (full update), keeping a backup."""
+    backup_dir = backup_dir or app_folder.rstrip("/\\") + BACKUP_SUFFIX
+    if os.path.exists(backup_dir):
+        shutil.rmtree(backup_dir)
+    os.replace(app_folder, backup_dir)
+    try:
+        try:
+            os.replace(staging_dir, app_folder)
+        except OSError:
+            shutil.move(staging_dir, app_folder)  # Staging on another volume
+    except BaseException:
+        shutil.rmtree(app_folder, ignore_errors=True)
+        os.replace(backup_dir, app_folder)
+        raise
+    with open(os.path.join(backup_dir, BACKUP_INDEX), 'w', encoding='utf-8') as f:
+        json.dump({"mode": "folder"}, f)
+
+
+def apply_update(app_folder: str, patch_files: list[str] = None, full_update: str = None,
+                 jobs: int = None, progress_callback=None, skip=None) -> dict:
+    """
+    Stage and swap in a patch chain or a full update.
+
+    The staging folder sits next to the install so the final renames stay on
+    one volume.
+
+    Returns:
+        Stats dict with 'files', 'deleted', 'stage_seconds', 'swap_seconds'.
+    """
+    staging_dir = app_folder.rstrip("/\\") + STAGING_SUFFIX
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+
+    start = time.perf_counter()
+    try:
+        if full_update:
+            staged, deleted = stage([full_update], app_folder, staging_dir, jobs, progress_callback, skip)
+            _keep_files(app_folder, staging_dir, staged)
+            staged_seconds = time.perf_counter() - start
+            swap_folder(staging_dir, app_folder)
+        else:
+            staged, deleted = stage(patch_files, app_folder, staging_dir, jobs, progress_callback, skip)
+            staged_seconds = time.perf_counter() - start
+            swap_in(staging_dir, app_folder, staged, deleted)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return {"files": len(staged), "deleted": len(deleted), "stage_seconds": staged_seconds,
+            "swap_seconds": time.perf_counter() - start - staged_seconds}
+
+
+def _keep_files(app_folder: str, staging_dir: str, staged: list[str]):
+    """Copy KEEP_FILES from the install into a staged full install."""
+    for name in KEEP_FILES:
+        if os.path.isfile(os.path.join(app_folder, name)) and name not in staged:
+            shutil.copy2(os.path.join(app_folder, name), os.path.join(staging_dir, name))
+
+
+def write_staged_index(staging_dir: str, staged: list[str], deleted: list[str],
+                       mode: str = "files", version: str = None, base_version: str = None,
+                       components: list[str] = None):
+    """
+    Record what a pre-staged folder holds, for apply_staged().
+
+    mode 'files': changed files only (swapped in file by file), valid only on
+    top of base_version; mode 'folder': a complete install (swapped in as a whole).
+    components: set when the folder adds components to the install.
+    """
+    with open(os.path.join(staging_dir, STAGED_INDEX), 'w', encoding='utf-8') as f:
+        json.dump({"mode": mode, "version": version, "base_version": base_version,
+                   "components": components, "files": staged, "deleted": deleted}, f, indent=2)
+
+
+def read_staged_index(staging_dir: str) -> dict | None:
+    """Index of a pre-staged folder, or None if there is no complete one."""
+    try:
+        with open(os.path.join(staging_dir, STAGED_INDEX), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def stage_update(app_folder: str, staging_dir: str, patch_files: list[str] = None,
+                 full_update: str = None, version: str = None, base_version: str = None,
+                 jobs: int = None, progress_callback=None, skip=None, components: list[str] = None) -> dict:
+    """
+    Build an update in a staging folder without touching the install.
+
+    Safe while the app is running: the install is only read (delta bases).
+    A full update is staged as a complete install; site settings (KEEP_FILES)
+    are copied over from the current one. The index is written last, so a
+    staging folder without one is incomplete.
+
+    Args:
+        skip: Predicate for paths to leave out (see stage).
+        components: New component list of the install (written to
+            COMPONENTS_FILE when the update adds components).
+
+    Returns:
+        The staged index (see write_staged_index).
+    """
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    if full_update:
+        staged, deleted = stage([full_update], app_folder, staging_dir, jobs, progress_callback, skip)
+        _keep_files(app_folder, staging_dir, staged)
+        mode = "folder"
+    else:
+        staged, deleted = stage(patch_files, app_folder, staging_dir, jobs, progress_callback, skip)
+        mode = "files"
+    if components is not None:
+        write_components(staging_dir, components)
+        staged = sorted(set(staged) | {COMPONENTS_FILE})
+    write_staged_index(staging_dir, staged, deleted, mode, version, base_version, components)
+    return read_staged_index(staging_dir)
+
+
+def apply_staged(app_folder: str, staging_dir: str) -> dict:
+    """
+    Swap in a folder staged ahead of time (see stage_update).
+
+    The previous version stays in the backup folder for rollback().
+
+    Returns:
+        Stats dict like apply_update (stage_seconds is 0).
+    """
+    index = read_staged_index(staging_dir)
+    if index is None:
+        raise PatchError(f"No complete staged update in {staging_dir}")
+    start = time.perf_counter()
+    if index.get("mode") == "folder":
+        os.remove(os.path.join(staging_dir, STAGED_INDEX))
+        try:
+            swap_folder(staging_dir, app_folder)
+        except BaseException:
+            write_staged_index(staging_dir, index["files"], index["deleted"], "folder",
+                               index.get("version"), index.get("base_version"), index.get("components"))
+            raise
+    else:
+        try:
+            swap_in(staging_dir, app_folder, index["files"], index["deleted"], keep_backup=True)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    return {"files": len(index["files"]), "deleted": len(index["deleted"]), "stage_seconds": 0.0,
+            "swap_seconds": time.perf_counter() - start}
+
+
+def rollback(app_folder: str, backup_dir: str = None) -> dict:
+    """
+    Restore the version that the last staged swap replaced.
+
+    Returns:
+        Dict with 'mode', 'restored', 'removed' counts and 'seconds'.
+    """
+    start = time.perf_counter()
+    backup_dir = backup_dir or app_folder.rstrip("/\\") + BACKUP_SUFFIX
+    try:
+        with open(os.path.join(backup_dir, BACKUP_INDEX), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        raise PatchError(f"No backup to roll back to in {backup_dir}")
+    os.remove(os.path.join(backup_dir, BACKUP_INDEX))
+
+    if index["mode"] == "folder":
+        replaced_dir = app_folder.rstrip("/\\") + STAGING_SUFFIX
+        if os.path.exists(replaced_dir):
+            shutil.rmtree(replaced_dir)
+        os.replace(app_folder, replaced_dir)
+        try:
+            os.replace(backup_dir, app_folder)
+        except BaseException:
+            os.replace(replaced_dir, app_folder)
+            raise
+        shutil.rmtree(replaced_dir, ignore_errors=True)
+        return {"mode": "folder", "restored": 1, "removed": 0, "seconds": time.perf_counter() - start}
+
+    for rel_path in index["remove"]:
+        dest = os.path.join(app_folder, *rel_path.split('/'))
+        if os.path.lexists(dest):
+            os.remove(dest)
+    for rel_path in index["restore"]:
+        dest = os.path.join(app_folder, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(os.path.join(backup_dir, *rel_path.split('/')), dest)
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    return {"mode": "files", "restored": len(index["restore"]), "removed": len(index["remove"]),
+            "seconds": time.perf_counter() - start}
+
+
+def wait_for_exit(pid: int, timeout: float = 60):
+    """Block until process `pid` has exited (or the timeout passes)."""
+    if os.name == 'nt':
+        import ctypes
+        SYNCHRONIZE = 0x00100000
+        handle = ctypes.windll.kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if handle:
+            ctypes.windll.kernel32.WaitForSingleObject(handle, int(timeout * 1000))
+            ctypes.windll.kernel32.CloseHandle(handle)
+        return
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return
+        time.sleep(0.1)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python patch_applier.py <plan.json>")
+        sys.exit(1)
+
+    plan_path = sys.argv[1]
+    plan = {}
+    try:
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+
+        if plan.get("wait_pid"):
+            log(f"Waiting for process {plan['wait_pid']} to exit...")
+            wait_for_exit(plan["wait_pid"])
+
+        def progress(done, total):
+            print(f"\r[PatchApplier] Files: {done}/{total}", end="", flush=True)
+
+        if plan.get("rollback"):
+            stats = rollback(plan["app_folder"])
+            log(f"Rolled back to the previous version: {stats['restored']} restored, "
+                f"{stats['removed']} removed ({stats['seconds']:.1f}s)")
+        else:
+            if plan.get("staged"):
+                stats = apply_staged(plan["app_folder"], plan["staged"])
+            else:
+                stats = apply_update(plan["app_folder"], plan.get("patches"), plan.get("full_update"),
+                                     progress_callback=progress, skip=skip_filter(plan.get("components")))
+            print()
+            log(f"Update applied: {stats['files']} files, {stats['deleted']} deleted "
+                f"(stage {stats['stage_seconds']:.1f}s, swap {stats['swap_seconds']:.1f}s)")
+
+        for path in plan.get("cleanup", []):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        os.remove(plan_path)
+        exit_code = 0
+    except Exception as e:
+        print()
+        log(f"Update failed: {e}")
+        exit_code = 1
+
+    # Restart the app either way: updated on success, untouched after a rollback
+    if plan.get("restart"):
+        subprocess.Popen(plan["restart"], cwd=plan.get("app_folder"), close_fds=True)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Profiling Mode for ZI Background Remover
+========================================
+Captures what a slow bulk or single job spends its time on, on the user's
+machine, without a debug build:
+- cProfile on the thread running the job (process_images / single image)
+- Optional sampler: every few milliseconds it records the stack of every
+  other thread (OutputWriter I/O thread, process pool management, ...) as
+  collapsed stacks ("thread;file:func;file:func count"), the input format of
+  flamegraph.pl and speedscope
+- Process backend workers profile their own tasks (engine._worker_process_file)
+  into worker_<pid>.prof in the same run folder; they are merged into the
+  summary
+
+Each run writes a folder under %LOCALAPPDATA%\\ZI-BGRemover\\diagnostics:
+    profile.prof        pstats dump of the job thread
+    stacks.collapsed    sampled stacks of all threads
+    worker_<pid>.prof   process backend workers
+    summary.txt         environment and the top functions (job + workers)
+The user zips the folder and sends it with the report.
+
+Enabled from the app with Ctrl+Shift+P (hidden toggle) or the --profile flag.
+
+Usage:
+    from profiler import RunProfiler
+    with RunProfiler("bulk", info={"files": 120}) as profiler:
+        process_images()
+    print(profiler.folder)
+
+    python profiler.py <run_folder>     (print the summary of a received report)
+"""
+
+import io
+import os
+import sys
+import time
+import glob
+import pstats
+import cProfile
+import platform
+import tempfile
+import threading
+from datetime import datetime
+
+
+# Sampling period of the stack sampler (seconds)
+SAMPLE_INTERVAL = 0.01
+
+# Functions listed per table in summary.txt
+TOP_FUNCTIONS = 25
+
+
+def diagnostics_dir() -> str:
+    """Per-user folder for profiling runs."""
+    base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+    return os.path.join(base, "ZI-BGRemover", "diagnostics")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Samples the stacks of all other threads into collapsed-stack counts."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def write_collapsed(self, path: str):
+        """One "frame;frame;frame count" line per distinct stack."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+    def top_leaves(self, limit: int = 15) -> list[tuple[str, int]]:
+        """Leaf frames (where threads were) by sample count, idle waits included."""
+        leaves = {}
+        for stack, count in self.stacks.items():
+            thread, _, rest = stack.partition(";")
+            leaf = f"{thread}: {rest.rsplit(';', 1)[-1]}" if rest else thread
+            leaves[leaf] = leaves.get(leaf, 0) + count
+        return sorted(leaves.items(), key=lambda item: -item[1])[:limit]
+
+
+class RunProfiler:
+    """cProfile (+ optional stack sampling) around one job, written to a run folder."""
+
+    def __init__(self, label: str, folder: str = None, sample: bool = True,
+                 interval: float = SAMPLE_INTERVAL, info: dict = None):
+        """
+        Args:
+            label: Job name ("bulk", "single"), used in the folder name.
+            folder: Run folder (default: diagnostics_dir()/<label>_<timestamp>).
+            sample: Also sample the stacks of all threads.
+            interval: Sampling period in seconds.
+            info: Extra key/values written to the summary (settings, file count).
+        """
+        self.label = label
+        self.folder = folder or os.path.join(diagnostics_dir(), f"{label}_{datetime.now():%Y%m%d_%H%M%S}")
+        self.info = dict(info or {})
+        self.sampler = StackSampler(interval) if sample else None
+        self.seconds = None
+        self._profile = cProfile.Profile()
+        self._started = None
+
+    def __enter__(self):
+        os.makedirs(self.folder, exist_ok=True)
+        if self.sampler:
+            self.sampler.start()
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        self.seconds = time.perf_counter() - self._started
+        if self.sampler:
+            self.sampler.stop()
+        if exc_type is not None:
+            self.info["error"] = f"{exc_type.__name__}: {exc}"
+        self.write()
+        return False
+
+    def write(self):
+        """Write profile.prof, stacks.collapsed and summary.txt."""
+        self._profile.dump_stats(os.path.join(self.folder, "profile.prof"))
+        if self.sampler:
+            self.sampler.write_collapsed(os.path.join(self.folder, "stacks.collapsed"))
+        with open(os.path.join(self.folder, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(self.summary())
+
+    def summary(self) -> str:
+        """Environment, run info and the top functions of the job and the workers."""
+        lines = [
+            f"ZI Background Remover profile: {self.label}",
+            f"Date: {datetime.now().isoformat(timespec='seconds')}",
+            f"Python {platform.python_version()} on {platform.platform()}, {os.cpu_count()} CPUs",
+            f"Wall time: {self.seconds:.2f} s",
+        ]
+        lines += [f"{key}: {value}" for key, value in self.info.items()]
+        lines.append("")
+        lines.append(format_stats(pstats.Stats(self._profile), "Job thread"))
+
+        workers = sorted(glob.glob(os.path.join(self.folder, "worker_*.prof")))
+        if workers:
+            lines.append(format_stats(pstats.Stats(*workers), f"Process workers ({len(workers)}, merged)"))
+
+        if self.sampler and self.sampler.samples:
+            lines.append(f"Sampled stacks: {self.sampler.samples} samples every "
+                         f"{self.sampler.interval * 1000:.0f} ms (stacks.collapsed)")
+            for leaf, count in self.sampler.top_leaves():
+                lines.append(f"  {count / self.sampler.samples:6.1%}  {leaf}")
+        return "\n".join(lines) + "\n"
+
+
+def format_stats(stats: pstats.Stats, title: str, limit: int = TOP_FUNCTIONS) -> str:
+    """Top functions by cumulative and by own time."""
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.strip_dirs()
+    buffer.write(f"=== {title}: top {limit} by cumulative time ===\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    buffer.write(f"=== {title}: top {limit} by own time ===\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(limit)
+    return buffer.getvalue()
+
+
+def main():
+    if len(sys.argv) != 2 or not os.path.isdir(sys.argv[1]):
+        print("Usage: python profiler.py <run_folder>")
+        sys.exit(1)
+
+    folder = sys.argv[1]
+    summary = os.path.join(folder, "summary.txt")
+    if os.path.exists(summary):
+        with open(summary, 'r', encoding='utf-8') as f:
+            print(f.read())
+        return
+    profiles = sorted(glob.glob(os.path.join(folder, "*.prof")))
+    if not profiles:
+        print(f"✗ No .prof files in {folder}")
+        sys.exit(1)
+    print(format_stats(pstats.Stats(*profiles), f"{len(profiles)} profiles"))
+
+
+if __name__ == "__main__":
+    main()
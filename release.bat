@@ -58,6 +58,14 @@ if %ERRORLEVEL% NEQ 0 (
     pause
     exit /b 1
 )
+
+:: Update helper (installs patches after the app exits, see patch_applier.py)
+pyinstaller --noconfirm --onefile --console --name "ZI-Updater" --distpath "dist\ZI-BGRemover" --workpath "build\updater" --specpath "build\updater" patch_applier.py
+if %ERRORLEVEL% NEQ 0 (
+    echo ERROR: PyInstaller failed to build the update helper!
+    pause
+    exit /b 1
+)
 echo [OK] PyInstaller completed.
 
 :: Step 2: PyArmor
@@ -83,12 +91,15 @@ if %ERRORLEVEL% NEQ 0 (
     exit /b 1
 )
 echo [OK] Manifest generated.
+if exist manifest_v%OLD_VERSION%.json (
+    python manifest_generator.py diff manifest_v%OLD_VERSION%.json manifest_v%NEW_VERSION%.json
+)
 
 :: Step 4: Create Patch
 echo.
 echo [4/8] Creating patch %OLD_VERSION% -^> %NEW_VERSION%...
 echo ========================================
-python create_patch.py %OLD_VERSION% %NEW_VERSION%
+python create_patch.py %OLD_VERSION% %NEW_VERSION% --solid zstd
 if %ERRORLEVEL% NEQ 0 (
     echo ERROR: Patch creation failed!
     pause
@@ -96,11 +107,28 @@ if %ERRORLEVEL% NEQ 0 (
 )
 echo [OK] Patch created.
 
+:: Keep the patch files: hashes missing from older version.json entries are backfilled from them
+if not exist "releases\patches" mkdir "releases\patches"
+copy /Y "patch_%OLD_VERSION%_to_%NEW_VERSION%.*" "releases\patches\" > nul
+
+:: Keep this build as the delta base for the next release's patch
+robocopy "dist\ZI-BGRemover" "releases\ZI-BGRemover-v%NEW_VERSION%" /MIR /NFL /NDL /NJH /NJS /NP > nul
+if %ERRORLEVEL% GEQ 8 (
+    echo WARNING: Failed to keep a copy of this build in releases\ - the next patch will have no deltas.
+)
+
+:: Per-file content store: lets old installs fetch only the final version of each changed file
+python content_store.py publish "dist\ZI-BGRemover" manifest_v%NEW_VERSION%.json "releases\content" --new-list "releases\content_new_v%NEW_VERSION%.txt"
+if %ERRORLEVEL% NEQ 0 (
+    echo WARNING: Failed to update the content store - updates will use the patch chain only.
+)
+
 :: Step 5: Create Full Portable ZIP
 echo.
 echo [5/8] Creating Full Portable ZIP...
 echo ========================================
-powershell -Command "Compress-Archive -Path 'dist\ZI-BGRemover' -DestinationPath 'ZI-BGRemover-v%NEW_VERSION%-Portable.zip' -Force"
+:: Identical files (duplicated CUDA DLLs) are stored once; the app restores them on first start
+python content_store.py pack "dist\ZI-BGRemover" manifest_v%NEW_VERSION%.json "ZI-BGRemover-v%NEW_VERSION%-Portable.zip" --root ZI-BGRemover
 if %ERRORLEVEL% NEQ 0 (
     echo WARNING: Failed to create portable ZIP.
 ) else (
@@ -115,10 +143,22 @@ echo ========================================
 :: Get the old patch file size if it exists
 set PATCH_SIZE=0
 for %%A in (patch_%OLD_VERSION%_to_%NEW_VERSION%.zip) do set PATCH_SIZE=%%~zA
+set SOLID_SIZE=0
+for %%A in (patch_%OLD_VERSION%_to_%NEW_VERSION%.tar.zst) do set SOLID_SIZE=%%~zA
 
 python -c "
 import json
 import os
+import hashlib
+
+def sha256(path):
+    if not os.path.exists(path):
+        return ''
+    hash_func = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hash_func.update(chunk)
+    return hash_func.hexdigest()
 
 # Load existing version.json if exists
 existing_patches = []
@@ -129,12 +169,43 @@ try:
 except:
     pass
 
+def published_sha256(url):
+    # Kept copy of the patch (releases\patches), else the published file itself
+    name = url.rsplit('/', 1)[-1]
+    for folder in (os.path.join('releases', 'patches'), '.'):
+        digest = sha256(os.path.join(folder, name))
+        if digest:
+            return digest
+    try:
+        from urllib.request import urlopen
+        hash_func = hashlib.sha256()
+        with urlopen(url, timeout=60) as response:
+            for chunk in iter(lambda: response.read(1024 * 1024), b''):
+                hash_func.update(chunk)
+        return hash_func.hexdigest()
+    except Exception as e:
+        print('WARNING: Could not hash ' + name + ' (' + str(e) + '), the app will not use it in a patch chain')
+        return ''
+
+# Patches published before hashes were recorded: the updater refuses a chain
+# with an unhashed patch, so backfill them once
+for p in existing_patches:
+    for url_key, hash_key in (('url', 'sha256'), ('solid_url', 'solid_sha256')):
+        if p.get(url_key) and not p.get(hash_key):
+            p[hash_key] = published_sha256(p[url_key])
+            if p[hash_key]:
+                print('[OK] Backfilled ' + hash_key + ' for patch ' + p.get('from', '?') + ' -> ' + p.get('to', '?'))
+
 # Add new patch to the chain
 new_patch = {
     'from': '%OLD_VERSION%',
     'to': '%NEW_VERSION%',
     'url': 'https://github.com/mandash12/zi-bg-remover/releases/download/v%NEW_VERSION%/patch_%OLD_VERSION%_to_%NEW_VERSION%.zip',
     'size': %PATCH_SIZE%,
+    'sha256': sha256('patch_%OLD_VERSION%_to_%NEW_VERSION%.zip'),
+    'solid_url': 'https://github.com/mandash12/zi-bg-remover/releases/download/v%NEW_VERSION%/patch_%OLD_VERSION%_to_%NEW_VERSION%.tar.zst',
+    'solid_size': %SOLID_SIZE%,
+    'solid_sha256': sha256('patch_%OLD_VERSION%_to_%NEW_VERSION%.tar.zst'),
     'changelog': '%CHANGELOG%'
 }
 
@@ -149,12 +220,25 @@ for i, p in enumerate(existing_patches):
 if not patch_exists:
     existing_patches.append(new_patch)
 
+# Component sizes (components.py), shown before an on-demand component download
+components = {}
+try:
+    with open('manifest_v%NEW_VERSION%.json', 'r') as f:
+        for name, info in json.load(f).get('components', {}).items():
+            components[name] = {'files': info['files'], 'size': info['size']}
+except:
+    pass
+
 # Create new version.json
 data = {
     'version': '%NEW_VERSION%',
     'full_url': 'https://github.com/mandash12/zi-bg-remover/releases/download/v%NEW_VERSION%/ZI-BGRemover-v%NEW_VERSION%-Portable.zip',
+    'full_sha256': sha256('ZI-BGRemover-v%NEW_VERSION%-Portable.zip'),
     'changelog': '%CHANGELOG%',
     'min_supported_version': '1.0.5',
+    'manifest_url': 'https://raw.githubusercontent.com/mandash12/zi-bg-remover/main/manifest_v{version}.json',
+    'content_url': 'https://github.com/mandash12/zi-bg-remover/releases/download/content/',
+    'components': components,
     'patches': existing_patches
 }
 
@@ -169,6 +253,13 @@ echo [OK] version.json updated.
 echo.
 echo [7/8] Building Installer with Inno Setup...
 echo ========================================
+:: One folder per install component (core, onnx-cpu, onnx-cuda, torch); CUDA/torch are optional in the installer
+python components.py split "dist\ZI-BGRemover" manifest_v%NEW_VERSION%.json "dist\components"
+if %ERRORLEVEL% NEQ 0 (
+    echo ERROR: Component split failed!
+    pause
+    exit /b 1
+)
 if exist "C:\Program Files (x86)\Inno Setup 6\ISCC.exe" (
     "C:\Program Files (x86)\Inno Setup 6\ISCC.exe" installer\setup.iss
     if %ERRORLEVEL% NEQ 0 (
@@ -185,7 +276,7 @@ if exist "C:\Program Files (x86)\Inno Setup 6\ISCC.exe" (
 echo.
 echo [8/8] Pushing to GitHub...
 echo ========================================
-git add version.json manifest_v%NEW_VERSION%.json app_hapus_bg.py updater.py license_dialog.py installer\setup.iss
+git add version.json manifest_v%NEW_VERSION%.json app_hapus_bg.py updater.py components.py license_dialog.py installer\setup.iss
 git commit -m "Release v%NEW_VERSION% - %CHANGELOG%"
 git push
 if %ERRORLEVEL% NEQ 0 (
@@ -203,6 +294,7 @@ echo Files created:
 echo   - dist\ZI-BGRemover\ (built application)
 echo   - manifest_v%NEW_VERSION%.json (file hashes)
 echo   - patch_%OLD_VERSION%_to_%NEW_VERSION%.zip (delta update)
+echo   - patch_%OLD_VERSION%_to_%NEW_VERSION%.tar.zst (same update, solid zstd, streamed by the updater)
 echo   - ZI-BGRemover-v%NEW_VERSION%-Portable.zip (full portable)
 echo   - installer\output\ZI-BGRemover-Setup-v%NEW_VERSION%.exe (installer)
 echo.
@@ -211,9 +303,12 @@ echo   1. Go to: https://github.com/mandash12/zi-bg-remover/releases
 echo   2. Create new release with tag: v%NEW_VERSION%
 echo   3. Upload these files:
 echo      - patch_%OLD_VERSION%_to_%NEW_VERSION%.zip
+echo      - patch_%OLD_VERSION%_to_%NEW_VERSION%.tar.zst
 echo      - ZI-BGRemover-v%NEW_VERSION%-Portable.zip
 echo      - installer\output\ZI-BGRemover-Setup-v%NEW_VERSION%.exe
 echo   4. Publish release
+echo   5. Upload the new blobs listed in releases\content_new_v%NEW_VERSION%.txt
+echo      (from releases\content\) to the release with tag: content
 echo.
 echo Your users can now update automatically with sequential patches!
 echo.
@@ -0,0 +1,238 @@
+"""
+Run Report for ZI Background Remover
+====================================
+Per-stage timing of bulk runs:
+- StageTimer: monotonic (perf_counter) marks around each pipeline stage of one
+  image; NULL_TIMER is the no-op stand-in used when instrumentation is off
+- RunReport: collects the result dicts of a run (stage timings, image size,
+  provider, model load time) and produces the summary shown in the log:
+  totals, share and percentiles per stage, slowest files, throughput
+- The summary is exported next to the outputs as JSON (summary + per-file
+  rows) and CSV (one row per file)
+
+The report also feeds the throughput shown while a run is in progress; that
+only needs completion times, so it works with instrumentation off.
+
+Usage:
+    from run_report import RunReport
+    report = RunReport("Thread", "silueta", "CPU")
+    report.add_model_load(1.2, "CPUExecutionProvider")
+    report.add(engine.process_file(session, src, dst, {"instrument": True}))
+    print("\\n".join(report.format_summary()))
+    report.export(output_dir)
+"""
+
+import os
+import csv
+import json
+import math
+import time
+from collections import deque
+from datetime import datetime
+
+
+# Pipeline stages in order (crop/resize/matting only appear when enabled)
+STAGES = ("decode", "resize", "inference", "crop", "matting", "encode", "write")
+
+# Completions used for the live throughput
+RATE_WINDOW = 20
+
+
+class StageTimer:
+    """Accumulates seconds per stage between consecutive marks."""
+
+    __slots__ = ("stages", "_last")
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        """Start timing from now (e.g. when the I/O thread picks the image up)."""
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Charge the time since the previous mark to a stage."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+class _NullTimer:
+    """StageTimer that records nothing."""
+
+    __slots__ = ()
+    stages = None
+
+    def restart(self):
+        pass
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RunReport:
+    """Timing summary of one bulk run."""
+
+    def __init__(self, backend: str, model: str, device: str, settings: dict = None):
+        self.backend = backend
+        self.model = model
+        self.device = device
+        self.settings = settings or {}
+        self.created = datetime.now()
+        self.results = []
+        self.model_loads = []
+        self._started = time.perf_counter()
+        self._finished = None
+        self._recent = deque(maxlen=RATE_WINDOW)
+
+    def add_model_load(self, seconds: float, provider: str = None):
+        """Record a session load (one per worker on the process backend)."""
+        self.model_loads.append({"seconds": seconds, "provider": provider})
+
+    def add(self, result: dict):
+        """Record the result dict of one file."""
+        self.results.append(result)
+        self._recent.append(time.perf_counter())
+        if result.get("model_load") is not None:
+            self.add_model_load(result["model_load"], result.get("provider"))
+
+    def finish(self):
+        """Stop the wall clock (call after the outputs are flushed)."""
+        self._finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self._finished or time.perf_counter()) - self._started
+
+    def rate(self) -> float | None:
+        """Images per second over the last RATE_WINDOW completions (whole run before that)."""
+        if len(self._recent) >= 2 and len(self.results) > len(self._recent):
+            return (len(self._recent) - 1) / max(self._recent[-1] - self._recent[0], 1e-9)
+        if self.results:
+            return len(self.results) / max(self.wall_seconds, 1e-9)
+        return None
+
+    def eta(self, remaining: int) -> float | None:
+        """Seconds left for `remaining` files at the current rate."""
+        rate = self.rate()
+        return remaining / rate if rate else None
+
+    def summary(self, slowest: int = 5) -> dict:
+        """
+        Aggregate the run.
+
+        Returns:
+            Dict with run info, 'files'/'ok'/'failed' counts, 'wall_seconds',
+            'images_per_s', 'model_load' ({'count', 'seconds'}), 'providers'
+            (count per provider), 'stages' (per stage: total seconds, share of
+            the summed stage time, mean/p50/p95 ms) and 'slowest' files.
+        """
+        timed = [result for result in self.results if result.get("timings")]
+        stages = {}
+        for stage in STAGES:
+            values = [result["timings"][stage] for result in timed if stage in result["timings"]]
+            if values:
+                stages[stage] = {
+                    "count": len(values),
+                    "total_seconds": sum(values),
+                    "mean_ms": sum(values) / len(values) * 1000,
+                    "p50_ms": percentile(values, 0.50) * 1000,
+                    "p95_ms": percentile(values, 0.95) * 1000,
+                }
+        stage_total = sum(entry["total_seconds"] for entry in stages.values())
+        for entry in stages.values():
+            entry["share"] = entry["total_seconds"] / stage_total if stage_total else 0
+
+        providers = {}
+        for result in timed:
+            provider = result.get("provider") or "?"
+            providers[provider] = providers.get(provider, 0) + 1
+
+        ok = sum(1 for result in self.results if result.get("ok"))
+        wall = self.wall_seconds
+        return {
+            "created": self.created.isoformat(timespec="seconds"),
+            "backend": self.backend,
+            "model": self.model,
+            "device": self.device,
+            "settings": self.settings,
+            "files": len(self.results),
+            "ok": ok,
+            "failed": len(self.results) - ok,
+            "wall_seconds": wall,
+            "images_per_s": ok / wall if wall else None,
+            "model_load": {"count": len(self.model_loads),
+                           "seconds": sum(load["seconds"] for load in self.model_loads)},
+            "providers": providers,
+            "stages": stages,
+            "slowest": [self._row(result) for result in
+                        sorted(timed, key=lambda result: -sum(result["timings"].values()))[:slowest]],
+        }
+
+    def format_summary(self) -> list[str]:
+        """Log lines for the summary."""
+        summary = self.summary()
+        lines = [f"[INFO] Laporan: {summary['ok']}/{summary['files']} berhasil dalam {summary['wall_seconds']:.1f} dtk "
+                 f"({summary['images_per_s'] or 0:.2f} gambar/dtk, backend {self.backend})"]
+        if summary["model_load"]["count"]:
+            lines.append(f"[INFO] Muat model: {summary['model_load']['seconds']:.1f} dtk "
+                         f"({summary['model_load']['count']}x), provider: "
+                         + ", ".join(f"{name} ({count})" for name, count in summary["providers"].items()))
+        for stage, entry in summary["stages"].items():
+            lines.append(f"[INFO]   {stage:<10} {entry['share']:>4.0%}  total {entry['total_seconds']:7.1f} dtk  "
+                         f"rata2 {entry['mean_ms']:7.1f} ms  p50 {entry['p50_ms']:7.1f} ms  p95 {entry['p95_ms']:7.1f} ms")
+        if summary["slowest"]:
+            lines.append("[INFO] Paling lambat: " + ", ".join(
+                f"{row['file']} ({row['total_ms']:.0f} ms)" for row in summary["slowest"]))
+        return lines
+
+    def _row(self, result: dict) -> dict:
+        """Flat per-file record (CSV row)."""
+        timings = result.get("timings") or {}
+        width, height = result.get("size") or (None, None)
+        row = {
+            "file": result.get("file"),
+            "ok": bool(result.get("ok")),
+            "width": width,
+            "height": height,
+            "resized": bool(result.get("resized")),
+            "provider": result.get("provider"),
+            "pid": result.get("pid"),
+        }
+        for stage in STAGES:
+            row[f"{stage}_ms"] = round(timings[stage] * 1000, 2) if stage in timings else None
+        row["total_ms"] = round(sum(timings.values()) * 1000, 2)
+        row["error"] = result.get("error")
+        return row
+
+    def export(self, folder: str) -> tuple[str, str]:
+        """
+        Write zi_run_<timestamp>.json (summary + per-file rows) and .csv to a folder.
+
+        Returns:
+            (json_path, csv_path)
+        """
+        from output_writer import atomic_write
+
+        stem = os.path.join(folder, f"zi_run_{self.created:%Y%m%d_%H%M%S}")
+        rows = [self._row(result) for result in self.results]
+        atomic_write(stem + ".json", json.dumps({"summary": self.summary(), "files": rows},
+                                                indent=2).encode('utf-8'))
+
+        tmp_path = stem + ".csv.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["file"])
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, stem + ".csv")
+        return stem + ".json", stem + ".csv"
@@ -0,0 +1,281 @@
+"""
+Solid Patch Archives for ZI Background Remover
+==============================================
+Streamable, solid-compressed variant of the delta patch format:
+- One tar stream compressed as a whole, so matches are found across files
+  (zstd with long-distance matching and a 128 MB window, or xz with the x86
+  BCJ filter, which helps on PE code)
+- Built from a delta patch ZIP: whole-file entries are stored uncompressed in
+  the tar (the solid compressor does the work, once), deltas are kept as-is
+- The index comes first and members are read in order, so an archive can be
+  extracted straight from a download stream into a staging folder; nothing
+  has to be on disk before extraction starts
+- Every extracted file is verified against its target hash
+
+Archive layout (tar, then zstd or xz):
+    zi_patch.json                      index: like the ZIP index, plus "solid"
+    files/<target>                     whole file, uncompressed in the tar
+    blobs/<base>-<target>.delta        chunked zstd-dictionary delta (delta_patch.py)
+Whole files are grouped by extension so similar binaries sit next to each other.
+
+Usage:
+    from solid_patch import create_solid_patch, extract_stream
+    create_solid_patch("patch_1.0.6_to_1.0.8.zip", "patch_1.0.6_to_1.0.8.tar.zst")
+    with open("patch_1.0.6_to_1.0.8.tar.zst", 'rb') as f:
+        staged, deleted = extract_stream(f, app_folder, staging_dir)
+"""
+
+import io
+import os
+import json
+import lzma
+import mmap
+import time
+import hashlib
+import tarfile
+import zipfile
+
+import zstandard as zstd
+
+from content_store import link_or_copy
+from delta_patch import PATCH_INDEX, PatchError, apply_delta, read_index, _read_file
+from manifest_generator import calculate_file_hash
+
+
+CODECS = ("zstd", "xz")
+SOLID_SUFFIXES = {"zstd": ".tar.zst", "xz": ".tar.xz"}
+
+ZSTD_LEVEL = 19
+ZSTD_WINDOW_LOG = 27              # 128 MB window; the decoder must allow the same
+XZ_PRESET = 7
+XZ_DICT_SIZE = 64 * 1024 * 1024
+
+STREAM_BUFFER = 1024 * 1024
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+
+
+def solid_path_for(patch_path: str, codec: str = "zstd") -> str:
+    """patch_1.0.6_to_1.0.8.zip -> patch_1.0.6_to_1.0.8.tar.zst"""
+    return os.path.splitext(patch_path)[0] + SOLID_SUFFIXES[codec]
+
+
+def _compressed_writer(f, codec: str, level: int = None):
+    """Writable stream that compresses into file object f (closing it leaves f open)."""
+    if codec == "zstd":
+        params = zstd.ZstdCompressionParameters.from_level(
+            level or ZSTD_LEVEL, window_log=ZSTD_WINDOW_LOG, enable_ldm=True, threads=-1)
+        return zstd.ZstdCompressor(compression_params=params).stream_writer(f, closefd=False)
+    if codec == "xz":
+        filters = [{"id": lzma.FILTER_X86},
+                   {"id": lzma.FILTER_LZMA2, "preset": level or XZ_PRESET, "dict_size": XZ_DICT_SIZE}]
+        return lzma.LZMAFile(f, 'wb', format=lzma.FORMAT_XZ, filters=filters)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def _decompressed_reader(fileobj):
+    """Readable decompressed stream; the codec is detected from the first bytes."""
+    if not hasattr(fileobj, "peek"):
+        fileobj = io.BufferedReader(fileobj, STREAM_BUFFER)
+    magic = fileobj.peek(len(_XZ_MAGIC))[:len(_XZ_MAGIC)]
+    if magic.startswith(_ZSTD_MAGIC):
+        dctx = zstd.ZstdDecompressor(max_window_size=1 << ZSTD_WINDOW_LOG)
+        return dctx.stream_reader(fileobj, read_size=STREAM_BUFFER, closefd=False)
+    if magic == _XZ_MAGIC:
+        return lzma.LZMAFile(fileobj, 'rb')
+    raise PatchError("Not a solid patch (unknown compression)")
+
+
+def is_solid_patch(patch_path: str) -> bool:
+    """True if the file is a zstd or xz compressed solid patch."""
+    with open(patch_path, 'rb') as f:
+        head = f.read(len(_XZ_MAGIC))
+    return head.startswith(_ZSTD_MAGIC) or head == _XZ_MAGIC
+
+
+def create_solid_patch(patch_zip: str, solid_path: str, codec: str = "zstd", level: int = None) -> dict:
+    """
+    Repack a delta patch ZIP (create_patch) as a solid archive.
+
+    Args:
+        patch_zip: Delta patch ZIP (has a zi_patch.json index).
+        solid_path: Output archive (.tar.zst / .tar.xz).
+        codec: 'zstd' or 'xz'.
+        level: zstd level / xz preset (default ZSTD_LEVEL / XZ_PRESET).
+
+    Returns:
+        Stats dict: files, raw, delta, patch_bytes, solid_bytes, seconds.
+    """
+    start = time.perf_counter()
+    with zipfile.ZipFile(patch_zip, 'r') as zf:
+        index = read_index(zf)
+        files = {}
+        raw = {}        # target hash -> (first path, size, zip blob)
+        deltas = []
+        for rel_path, entry in sorted(index["files"].items()):
+            if entry["method"] == "full":
+                raw.setdefault(entry["hash"], (rel_path, entry["size"], entry["blob"]))
+                files[rel_path] = {"method": "raw", "blob": f"files/{entry['hash']}",
+                                   "hash": entry["hash"], "size": entry["size"]}
+            else:
+                if entry["blob"] not in deltas:
+                    deltas.append(entry["blob"])
+                files[rel_path] = dict(entry)
+        solid_index = dict(index, files=files, solid=codec)
+
+        tmp_path = solid_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            with _compressed_writer(f, codec, level) as writer, \
+                    tarfile.open(fileobj=writer, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+
+                def add(name: str, size: int, src):
+                    info = tarfile.TarInfo(name)
+                    info.size = size
+                    tar.addfile(info, src)
+
+                data = json.dumps(solid_index, indent=2, sort_keys=True).encode('utf-8')
+                add(PATCH_INDEX, len(data), io.BytesIO(data))
+
+                # Similar files (all DLLs, all .pyc, ...) next to each other
+                order = sorted(raw.items(), key=lambda item: (os.path.splitext(item[1][0])[1].lower(), item[1][0]))
+                for file_hash, (_, size, blob) in order:
+                    with zf.open(blob) as compressed, \
+                            zstd.ZstdDecompressor().stream_reader(compressed) as src:
+                        add(f"files/{file_hash}", size, src)
+
+                for blob in deltas:
+                    with zf.open(blob) as src:
+                        add(blob, zf.getinfo(blob).file_size, src)
+        os.replace(tmp_path, solid_path)
+
+    return {"files": len(files), "raw": len(raw), "delta": len(deltas),
+            "patch_bytes": os.path.getsize(patch_zip), "solid_bytes": os.path.getsize(solid_path),
+            "seconds": time.perf_counter() - start}
+
+
+def _target(staging_dir: str, rel_path: str) -> str:
+    """Staging path of an index path (index paths must stay inside the folder)."""
+    parts = rel_path.split('/')
+    if not rel_path or rel_path.startswith('/') or '..' in parts or ':' in parts[0]:
+        raise PatchError(f"Invalid path in patch index: {rel_path}")
+    return os.path.join(staging_dir, *parts)
+
+
+def _write_raw(src, target: str, expected_hash: str):
+    """Copy one tar member to target, hashing on the way."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".zi_tmp"
+    hash_func = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = src.read(STREAM_BUFFER)
+                if not chunk:
+                    break
+                hash_func.update(chunk)
+                out.write(chunk)
+        if hash_func.hexdigest() != expected_hash:
+            raise PatchError(f"Hash mismatch after extracting: {os.path.basename(target)}")
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_delta(delta: bytes, base_path: str, target: str, rel_path: str, expected_hash: str):
+    """Rebuild one file from its base and a delta blob."""
+    if not os.path.exists(base_path):
+        raise PatchError(f"Base file missing for delta: {rel_path}")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = target + ".zi_tmp"
+    try:
+        old = _read_file(base_path)
+        try:
+            with open(tmp_path, 'wb') as out:
+                apply_delta(old, delta, out)
+        finally:
+            # The base may be the staged target itself (changed in an earlier hop);
+            # Windows can't replace a file while a view of it is mapped
+            if isinstance(old, mmap.mmap):
+                old.close()
+        if calculate_file_hash(tmp_path) != expected_hash:
+            raise PatchError(f"Hash mismatch after patching: {rel_path}")
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def extract_stream(fileobj, app_folder: str, staging_dir: str, changes: dict = None,
+                   progress_callback=None, skip=None) -> tuple[list[str], list[str]]:
+    """
+    Extract a solid patch from a sequential stream into a staging folder.
+
+    The stream is read once, front to back (an HTTP response works). Deltas use
+    the staged file as base if an earlier patch of the chain already staged it,
+    otherwise the installed file.
+
+    Args:
+        fileobj: Readable binary stream of the compressed archive.
+        app_folder: Installed app folder (delta bases).
+        staging_dir: Output folder (same relative layout as the install).
+        changes: {'staged': set, 'deleted': set} carried over from earlier
+            patches of a chain (updated in place).
+        progress_callback: Called with (done, total) files.
+        skip: Optional predicate; paths it is True for are not extracted
+            (files of components that aren't installed).
+
+    Returns:
+        (staged relative paths, relative paths to delete) for the whole chain so far.
+    """
+    changes = changes if changes is not None else {"staged": set(), "deleted": set()}
+    staged, deleted = changes["staged"], changes["deleted"]
+
+    with _decompressed_reader(fileobj) as reader, tarfile.open(fileobj=reader, mode='r|') as tar:
+        member = tar.next()
+        if member is None or member.name != PATCH_INDEX:
+            raise PatchError("Solid patch doesn't start with its index")
+        index = json.loads(tar.extractfile(member).read())
+        if not index.get("solid"):
+            raise PatchError("Not a solid patch index")
+
+        by_blob = {}
+        for rel_path, entry in index["files"].items():
+            if not (skip and skip(rel_path)):
+                by_blob.setdefault(entry["blob"], []).append(rel_path)
+        total = sum(len(paths) for paths in by_blob.values())
+        done = 0
+
+        for member in tar:
+            paths = by_blob.pop(member.name, None)
+            if not paths or not member.isfile():
+                continue
+            src = tar.extractfile(member)
+            if member.name.startswith("files/"):
+                first = _target(staging_dir, paths[0])
+                _write_raw(src, first, index["files"][paths[0]]["hash"])
+                for rel_path in paths[1:]:
+                    link_or_copy(first, _target(staging_dir, rel_path))
+            else:
+                delta = src.read()
+                for rel_path in paths:
+                    target = _target(staging_dir, rel_path)
+                    base = target if rel_path in staged else os.path.join(app_folder, *rel_path.split('/'))
+                    _write_delta(delta, base, target, rel_path, index["files"][rel_path]["hash"])
+            staged.update(paths)
+            deleted.difference_update(paths)
+            done += len(paths)
+            if progress_callback:
+                progress_callback(done, total)
+
+        if by_blob:
+            raise PatchError(f"Solid patch ended early: {len(by_blob)} blobs missing")
+
+    for rel_path in index["deleted"]:
+        if rel_path in staged:
+            os.remove(_target(staging_dir, rel_path))
+            staged.discard(rel_path)
+        deleted.add(rel_path)
+
+    return sorted(staged), sorted(deleted)
@@ -0,0 +1,160 @@
+"""
+Update Check Cache for ZI Background Remover
+============================================
+Cheap, non-blocking version.json checks:
+- The last response is kept on disk with its ETag / Last-Modified headers
+- Within CACHE_TTL the cached copy is served without any request
+- After that a conditional request is sent (If-None-Match / If-Modified-Since);
+  a 304 just refreshes the cache timestamp
+- Failures back off exponentially (BACKOFF_BASE doubling up to BACKOFF_MAX):
+  during the backoff window no request is made, so offline users get an
+  immediate answer instead of waiting for a timeout on every click
+
+Usage:
+    from update_check import UpdateChecker
+    checker = UpdateChecker(version_url, cache_path)
+    data = checker.fetch()          # version.json as dict (possibly cached)
+"""
+
+import os
+import json
+import time
+import threading
+from urllib.request import urlopen, Request
+from urllib.error import HTTPError
+
+
+CACHE_TTL = 10 * 60         # Seconds a response is used without asking the server
+REQUEST_TIMEOUT = 5         # Seconds per request
+BACKOFF_BASE = 30           # Seconds after the first failure
+BACKOFF_MAX = 15 * 60
+
+
+class UpdateCheckError(Exception):
+    """Raised when version.json can't be fetched and nothing usable is cached."""
+    pass
+
+
+class UpdateChecker:
+    """Fetches version.json with an on-disk cache, conditional requests and backoff."""
+
+    def __init__(self, version_url: str, cache_path: str, ttl: float = CACHE_TTL,
+                 timeout: float = REQUEST_TIMEOUT):
+        """
+        Args:
+            version_url: URL of version.json.
+            cache_path: JSON file holding the last response and the backoff state.
+            ttl: Seconds a response is served from cache.
+            timeout: Request timeout in seconds.
+        """
+        self.version_url = version_url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.last_source = None     # 'cache', 'not-modified', 'network' or 'stale'
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get("url") == self.version_url:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {"url": self.version_url}
+
+    def _save(self, cache: dict):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"[UpdateCheck] Could not write cache: {e}")
+
+    def _request(self, cache: dict) -> dict:
+        """Conditional GET; returns the (new or revalidated) version data."""
+        headers = {'User-Agent': 'ZI-BGRemover-Updater'}
+        if "data" in cache:
+            if cache.get("etag"):
+                headers['If-None-Match'] = cache["etag"]
+            if cache.get("last_modified"):
+                headers['If-Modified-Since'] = cache["last_modified"]
+
+        try:
+            with urlopen(Request(self.version_url, headers=headers), timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+                cache["etag"] = response.headers.get('ETag')
+                cache["last_modified"] = response.headers.get('Last-Modified')
+            cache["data"] = data
+            self.last_source = "network"
+        except HTTPError as e:
+            if e.code != 304 or "data" not in cache:
+                raise
+            self.last_source = "not-modified"
+        return cache["data"]
+
+    def fetch(self, force: bool = False) -> dict:
+        """
+        Current version.json data.
+
+        Args:
+            force: Ignore the TTL and the backoff window (still conditional).
+
+        Returns:
+            Parsed version.json. If the server can't be reached but an older
+            response is cached, that one is returned (last_source == 'stale').
+
+        Raises:
+            UpdateCheckError: Nothing could be fetched and nothing is cached.
+        """
+        with self._lock:
+            cache = self._load()
+            now = time.time()
+
+            if not force and "data" in cache and now - cache.get("fetched", 0) < self.ttl:
+                self.last_source = "cache"
+                return cache["data"]
+
+            retry_after = cache.get("retry_after", 0)
+            if not force and now < retry_after:
+                if "data" in cache:
+                    self.last_source = "stale"
+                    return cache["data"]
+                raise UpdateCheckError(f"Update server unreachable, next try in {int(retry_after - now)}s")
+
+            try:
+                data = self._request(cache)
+            except Exception as e:
+                failures = cache.get("failures", 0) + 1
+                cache["failures"] = failures
+                cache["retry_after"] = now + min(BACKOFF_BASE * 2 ** (failures - 1), BACKOFF_MAX)
+                self._save(cache)
+                print(f"[UpdateCheck] Check failed ({failures}x): {e}")
+                if "data" in cache:
+                    self.last_source = "stale"
+                    return cache["data"]
+                raise UpdateCheckError(f"Could not check for updates: {e}") from e
+
+            cache["fetched"] = now
+            cache["failures"] = 0
+            cache["retry_after"] = 0
+            self._save(cache)
+            return data
+
+    def fetch_async(self, callback, error_callback=None):
+        """Run fetch() in a daemon thread; callback(data) / error_callback(exc) are called from it."""
+        def worker():
+            try:
+                data = self.fetch()
+            except Exception as e:
+                if error_callback:
+                    error_callback(e)
+                return
+            callback(data)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,685 @@
+"""
+Local Update Mirror for ZI Background Remover
+=============================================
+Lets many workstations share one copy of every update download:
+- Objects are stored by content key: the SHA-256 from version.json (patches,
+  solid patches, full update) or the content-store blob name (<hash>.zst)
+- Clients look in the mirror first and fall back to the upstream URL; the
+  first client that misses downloads the object into the mirror, so upstream
+  traffic scales with the number of versions, not the number of seats
+- Two kinds of mirror:
+    * a shared folder (\\\\server\\share\\zi-mirror): a lock file next to the
+      object marks the client populating it, the others wait for it (a lock
+      that stops changing for STALE_SECONDS is taken over, and the resumable
+      download continues from its .part file)
+    * a tiny HTTP cache server (python update_mirror.py serve ...): a miss is
+      fetched from upstream once and streamed to every client asking for it
+      while it arrives; it only caches content keys and checks every object
+      against the hash in its key before storing it (the last HOLD_BACK bytes
+      go out only after the check, so a mismatch cuts every response short)
+- Everything fetched through the mirror is still checked against its SHA-256
+
+Clients find the mirror in the ZI_UPDATE_MIRROR environment variable or in
+update_mirror.txt next to the app (one line: folder path or http:// URL).
+
+Usage:
+    python update_mirror.py serve <folder> [--port 8765] [--allow-host HOST ...]
+
+    from update_mirror import open_mirror, configured_mirror
+    mirror = open_mirror(configured_mirror(app_folder))
+    mirror.fetch(sha256, upstream_url, "patch.zip", sha256=sha256)
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import socket
+import shutil
+import hashlib
+import argparse
+import threading
+import zstandard as zstd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.error import URLError
+from urllib.parse import urlsplit, urlencode, quote, unquote, parse_qs
+
+from downloader import (download, open_stream, remove_partial, DownloadError, IntegrityError,
+                        BUFFER_SIZE, PROGRESS_INTERVAL, PART_SUFFIX, STATE_SUFFIX)
+
+
+MIRROR_ENV = "ZI_UPDATE_MIRROR"
+MIRROR_FILE = "update_mirror.txt"
+
+LOCK_SUFFIX = ".lock"
+HEARTBEAT_INTERVAL = 5          # Seconds between lock touches while populating
+STALE_SECONDS = 120             # A lock unchanged this long belongs to a dead client
+POLL_INTERVAL = 1.0
+
+DEFAULT_PORT = 8765
+HOLD_BACK = 64 * 1024           # Tail of an object the server sends only after checking its hash
+DEFAULT_ALLOWED_HOSTS = ("github.com", "objects.githubusercontent.com", "raw.githubusercontent.com",
+                         "drive.google.com", "drive.usercontent.google.com")
+
+_KEY = re.compile(r"^[0-9A-Za-z][0-9A-Za-z._-]{0,127}$")
+_CONTENT_KEY = re.compile(r"^([0-9a-f]{64})(\.zst)?$")
+
+
+class MirrorUnavailable(Exception):
+    """Raised when the mirror folder can't be read or written (the caller goes upstream)."""
+    pass
+
+
+def configured_mirror(app_folder: str = None) -> str | None:
+    """Mirror location from ZI_UPDATE_MIRROR or update_mirror.txt in the app folder."""
+    location = os.environ.get(MIRROR_ENV, "").strip()
+    if location:
+        return location
+    if app_folder:
+        try:
+            with open(os.path.join(app_folder, MIRROR_FILE), 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        return line
+        except OSError:
+            pass
+    return None
+
+
+def open_mirror(location: str | None):
+    """FolderMirror / HttpMirror for a location, or None."""
+    if not location:
+        return None
+    if location.startswith(("http://", "https://")):
+        return HttpMirror(location)
+    return FolderMirror(location)
+
+
+def object_path(root: str, key: str) -> str:
+    """Where an object lives in a mirror folder (two-character fan-out)."""
+    if not _KEY.match(key) or ".." in key:
+        raise ValueError(f"Invalid mirror key: {key}")
+    return os.path.join(root, key[:2], key)
+
+
+def content_hash(key: str) -> tuple[str, bool] | None:
+    """(SHA-256, compressed) named by a content key, or None for any other key."""
+    match = _CONTENT_KEY.match(key)
+    if not match:
+        return None
+    return match.group(1), bool(match.group(2))
+
+
+def verify_object(path: str, key: str) -> bool:
+    """True if a stored object matches the hash in its key (blobs: the decompressed content)."""
+    expected, compressed = content_hash(key)
+    hasher = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            reader = zstd.ZstdDecompressor().stream_reader(f) if compressed else f
+            while True:
+                chunk = reader.read(BUFFER_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+    except zstd.ZstdError:
+        return False
+    return hasher.hexdigest() == expected
+
+
+class _FileStream(io.RawIOBase):
+    """Sequential read of a mirror object with the interface of downloader.StreamReader."""
+
+    def __init__(self, path: str, progress_callback=None, cancel_event: threading.Event = None,
+                 sha256: str = None):
+        self._file = open(path, 'rb', buffering=0)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.pos = 0
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.expected_hash = sha256.lower() if sha256 else None
+        self._hasher = hashlib.sha256() if sha256 else None
+        self._last_progress = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise InterruptedError("Download cancelled")
+        n = self._file.readinto(buffer)
+        if n:
+            if self._hasher:
+                self._hasher.update(memoryview(buffer)[:n])
+            self.pos += n
+            now = time.monotonic()
+            if self.progress_callback and (now - self._last_progress >= PROGRESS_INTERVAL or self.pos == self.size):
+                self._last_progress = now
+                self.progress_callback(self.pos, self.size)
+        return n
+
+    def finish(self) -> int:
+        buffer = bytearray(BUFFER_SIZE)
+        while self.readinto(buffer):
+            pass
+        if self._hasher and self._hasher.hexdigest() != self.expected_hash:
+            raise IntegrityError(f"SHA-256 mismatch for mirror object {self._file.name}")
+        return self.pos
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class FolderMirror:
+    """Mirror in a shared folder; clients populate it themselves."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return object_path(self.root, key)
+
+    def _wait(self, path: str, progress_callback, cancel_event):
+        """Wait for the client holding the lock; returns when the object exists or the lock is gone/stale."""
+        lock_path = path + LOCK_SUFFIX
+        last_mtime, changed_at = None, time.monotonic()
+        while not os.path.isfile(path):
+            try:
+                mtime = os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                raise MirrorUnavailable(str(e)) from e
+            now = time.monotonic()
+            if mtime != last_mtime:
+                last_mtime, changed_at = mtime, now
+            elif now - changed_at > STALE_SECONDS:
+                print(f"[Mirror] Taking over stale download: {os.path.basename(path)}")
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                return
+
+            # Show the other client's progress
+            if progress_callback:
+                try:
+                    with open(path + STATE_SUFFIX, 'r', encoding='utf-8') as f:
+                        state = json.load(f)
+                    progress_callback(sum(pos - start for start, _, pos in state["ranges"]), state["size"])
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+
+            if cancel_event is not None:
+                if cancel_event.wait(POLL_INTERVAL):
+                    raise InterruptedError("Download cancelled")
+            else:
+                time.sleep(POLL_INTERVAL)
+
+    def _ensure(self, key: str, url: str, sha256: str, progress_callback, cancel_event,
+                connections: int) -> tuple[str, bool]:
+        """Make sure the object is in the mirror -> (path, populated by this call)."""
+        path = self.path(key)
+        while True:
+            if os.path.isfile(path):
+                return path, False
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd = os.open(path + LOCK_SUFFIX, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._wait(path, progress_callback, cancel_event)
+                continue
+            except OSError as e:
+                raise MirrorUnavailable(str(e)) from e
+            os.write(fd, f"{socket.gethostname()} {os.getpid()}".encode())
+            os.close(fd)
+
+            last_beat = [time.monotonic()]
+
+            def heartbeat(downloaded, total):
+                now = time.monotonic()
+                if now - last_beat[0] >= HEARTBEAT_INTERVAL:
+                    last_beat[0] = now
+                    try:
+                        os.utime(path + LOCK_SUFFIX)
+                    except OSError:
+                        pass
+                if progress_callback:
+                    progress_callback(downloaded, total)
+
+            try:
+                if os.path.isfile(path):
+                    return path, False
+                print(f"[Mirror] Populating {key}")
+                download(url, path, heartbeat, cancel_event, connections=connections, sha256=sha256)
+                return path, True
+            except (InterruptedError, URLError):
+                raise
+            except OSError as e:
+                raise MirrorUnavailable(str(e)) from e
+            finally:
+                try:
+                    os.remove(path + LOCK_SUFFIX)
+                except OSError:
+                    pass
+
+    def _evict(self, key: str):
+        """Drop a corrupted object so the next client downloads it again."""
+        print(f"[Mirror] Removing corrupted object {key}")
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def fetch(self, key: str, url: str, dest_path: str, sha256: str = None, progress_callback=None,
+              cancel_event: threading.Event = None, connections: int = 1) -> str:
+        """
+        Get an object into dest_path, through the mirror.
+
+        Returns:
+            'mirror' (copied), 'populated' (downloaded into the mirror first) or
+            'upstream' (mirror unusable, downloaded directly).
+
+        Raises:
+            Same as downloader.download().
+        """
+        for _ in range(2):
+            try:
+                path, populated = self._ensure(key, url, sha256, progress_callback, cancel_event, connections)
+            except MirrorUnavailable as e:
+                print(f"[Mirror] Mirror unavailable ({e}), downloading from upstream")
+                download(url, dest_path, progress_callback, cancel_event, connections=connections, sha256=sha256)
+                return "upstream"
+
+            tmp_path = dest_path + ".tmp"
+            try:
+                with _FileStream(path, None if populated else progress_callback, cancel_event, sha256) as src, \
+                        open(tmp_path, 'wb') as out:
+                    shutil.copyfileobj(src, out, BUFFER_SIZE)
+                    src.finish()
+                os.replace(tmp_path, dest_path)
+                return "populated" if populated else "mirror"
+            except IntegrityError:
+                self._evict(key)
+            except InterruptedError:
+                raise
+            except OSError as e:
+                print(f"[Mirror] Could not read {key} ({e}), downloading from upstream")
+                download(url, dest_path, progress_callback, cancel_event, connections=connections, sha256=sha256)
+                return "upstream"
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        raise IntegrityError(f"Mirror object {key} is corrupted and could not be replaced")
+
+    def open(self, key: str, url: str, sha256: str = None, progress_callback=None,
+             cancel_event: threading.Event = None):
+        """Readable stream of an object (see downloader.open_stream); populates the mirror on a miss."""
+        try:
+            path, populated = self._ensure(key, url, sha256, progress_callback, cancel_event, 1)
+        except MirrorUnavailable as e:
+            print(f"[Mirror] Mirror unavailable ({e}), streaming from upstream")
+            return open_stream(url, progress_callback, cancel_event, sha256=sha256)
+        return _FileStream(path, None if populated else progress_callback, cancel_event, sha256)
+
+
+class HttpMirror:
+    """Client of a MirrorServer."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def url(self, key: str, upstream_url: str, sha256: str = None) -> str:
+        query = {"src": upstream_url}
+        if sha256:
+            query["sha256"] = sha256
+        return f"{self.base_url}/{quote(key)}?{urlencode(query)}"
+
+    def fetch(self, key: str, url: str, dest_path: str, sha256: str = None, progress_callback=None,
+              cancel_event: threading.Event = None, connections: int = 1) -> str:
+        """Like FolderMirror.fetch; returns 'mirror' or 'upstream'."""
+        try:
+            # One connection: the server may still be receiving the object
+            download(self.url(key, url, sha256), dest_path, progress_callback, cancel_event, sha256=sha256)
+            return "mirror"
+        except InterruptedError:
+            raise
+        except (DownloadError, OSError) as e:
+            print(f"[Mirror] {e}, downloading from upstream")
+            remove_partial(dest_path)
+        download(url, dest_path, progress_callback, cancel_event, connections=connections, sha256=sha256)
+        return "upstream"
+
+    def open(self, key: str, url: str, sha256: str = None, progress_callback=None,
+             cancel_event: threading.Event = None):
+        """Readable stream of an object (see downloader.open_stream)."""
+        try:
+            return open_stream(self.url(key, url, sha256), progress_callback, cancel_event, sha256=sha256)
+        except DownloadError as e:
+            print(f"[Mirror] {e}, streaming from upstream")
+        return open_stream(url, progress_callback, cancel_event, sha256=sha256)
+
+
+# ==================== HTTP CACHE SERVER ====================
+
+class _Fetch:
+    """One object being fetched from upstream; clients read it while it grows."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.part_path = path + PART_SUFFIX
+        self.cond = threading.Condition()
+        self.size = None
+        self.received = 0
+        self.finished = False
+        self.error = None
+
+    def read(self, pos: int, n: int) -> bytes:
+        """Bytes at pos (after the data arrived); the file moves to its final name when done."""
+        for path in ((self.path,) if self.finished else (self.part_path, self.path)):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(pos)
+                    return f.read(n)
+            except FileNotFoundError:
+                continue
+        raise OSError(f"Mirror object disappeared: {self.path}")
+
+
+def _replace(src: str, dst: str, attempts: int = 50):
+    """os.replace that waits out readers briefly holding src open (Windows)."""
+    for attempt in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1)
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _range(self, size: int, etag: str) -> tuple[int, int, int] | None:
+        """(status, start, end exclusive) for the request, or None after sending a 416."""
+        header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if not header or (if_range and if_range != etag) or not header.startswith("bytes="):
+            return 200, 0, size
+        first, _, last = header[6:].partition("-")
+        if not first.isdigit():
+            return 200, 0, size
+        start = int(first)
+        end = min(int(last) + 1, size) if last.isdigit() else size
+        if start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        return 206, start, end
+
+    def _headers(self, status: int, start: int, end: int, size: int, etag: str):
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.end_headers()
+
+    def _send_file(self, path: str, etag: str):
+        size = os.path.getsize(path)
+        span = self._range(size, etag)
+        if span is None:
+            return
+        status, start, end = span
+        self._headers(status, start, end, size, etag)
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def _send_growing(self, fetch: _Fetch, etag: str):
+        with fetch.cond:
+            fetch.cond.wait_for(lambda: fetch.size is not None or fetch.finished or fetch.error)
+        if fetch.error:
+            self.send_error(502, f"Upstream failed: {fetch.error}")
+            return
+        if fetch.size is None:
+            # Upstream sent no length: serve once complete
+            self._send_file(fetch.path, etag)
+            return
+
+        span = self._range(fetch.size, etag)
+        if span is None:
+            return
+        status, start, end = span
+        self._headers(status, start, end, fetch.size, etag)
+        # The tail waits for the hash check and the rename: no client gets a whole
+        # unverified object, and a mismatch ends every response short
+        unverified_end = max(0, fetch.size - HOLD_BACK)
+        pos = start
+        while pos < end:
+            with fetch.cond:
+                fetch.cond.wait_for(lambda: fetch.error or fetch.finished
+                                    or min(fetch.received, unverified_end) > pos)
+                if fetch.error:
+                    self.close_connection = True    # The client sees a short response
+                    return
+                available = fetch.size if fetch.finished else min(fetch.received, unverified_end)
+            chunk = fetch.read(pos, min(BUFFER_SIZE, available - pos, end - pos))
+            if not chunk:
+                self.close_connection = True
+                return
+            self.wfile.write(chunk)
+            pos += len(chunk)
+
+    def do_GET(self):
+        server = self.server.mirror
+        parts = urlsplit(self.path)
+        key = unquote(parts.path.lstrip('/'))
+        query = parse_qs(parts.query)
+        digest = content_hash(key)
+        if not digest:
+            # Only content keys: anything else could be stored under a name of the client's choosing
+            self.send_error(404)
+            return
+        path = object_path(server.root, key)
+        etag = f'"{key}"'
+
+        try:
+            if server.stored(key):
+                server.count("hits")
+                self._send_file(path, etag)
+                return
+            src = query.get("src", [None])[0]
+            sha256 = query.get("sha256", [None])[0]
+            if not src:
+                self.send_error(404)
+                return
+            if not digest[1] and sha256 and sha256.lower() != digest[0]:
+                self.send_error(400, "SHA-256 does not match the key")
+                return
+            if not server.allowed(src):
+                self.send_error(403, "Upstream host not allowed")
+                return
+            self._send_growing(server.fetch(key, src), etag)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MirrorServer:
+    """
+    Caching HTTP server: objects by content key, misses fetched from upstream once and shared.
+
+    Keys are a SHA-256 (patches, full update) or <sha256>.zst (content-store
+    blobs, hash of the decompressed file). An upstream object is stored only
+    if it matches its key; objects already in the folder are checked once per
+    server run and evicted if they don't.
+    """
+
+    def __init__(self, root: str, host: str = "0.0.0.0", port: int = DEFAULT_PORT,
+                 allow_hosts: tuple = DEFAULT_ALLOWED_HOSTS):
+        """
+        Args:
+            root: Folder holding the objects (same layout as FolderMirror).
+            host / port: Listen address (port 0 = any free port).
+            allow_hosts: Upstream hosts the server may fetch from.
+        """
+        self.root = root
+        self.allow_hosts = tuple(allow_hosts)
+        self._active = {}
+        self._verified = set()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _MirrorHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mirror = self
+        self.stats = {"hits": 0, "misses": 0, "joined": 0, "upstream_bytes": 0}
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_port
+
+    def allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and parts.hostname in self.allow_hosts
+
+    def count(self, stat: str, n: int = 1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def wait(self, key: str, timeout: float = None) -> bool:
+        """Wait for a running upstream fetch of key to end; False on timeout."""
+        with self._lock:
+            fetch = self._active.get(key)
+        if fetch is None:
+            return True
+        with fetch.cond:
+            return fetch.cond.wait_for(lambda: fetch.finished, timeout)
+
+    def stored(self, key: str) -> bool:
+        """True if key is in the folder and matches its hash (a corrupted object is evicted)."""
+        path = object_path(self.root, key)
+        if not os.path.isfile(path):
+            return False
+        with self._lock:
+            if key in self._verified:
+                return True
+        if verify_object(path, key):
+            with self._lock:
+                self._verified.add(key)
+            return True
+        print(f"[Mirror] Removing corrupted object {key}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    def fetch(self, key: str, url: str) -> _Fetch:
+        """The running fetch of key, starting one if needed."""
+        path = object_path(self.root, key)
+        with self._lock:
+            fetch = self._active.get(key)
+            if fetch:
+                self.stats["joined"] += 1
+                return fetch
+            fetch = self._active[key] = _Fetch(path)
+            self.stats["misses"] += 1
+        threading.Thread(target=self._populate, args=(key, fetch, url), daemon=True).start()
+        return fetch
+
+    def _populate(self, key: str, fetch: _Fetch, url: str):
+        print(f"[Mirror] Fetching {key} from upstream")
+        sha256, compressed = content_hash(key)
+        try:
+            os.makedirs(os.path.dirname(fetch.path), exist_ok=True)
+            # Plain objects are hashed while they stream; blobs are checked once complete
+            with open_stream(url, sha256=None if compressed else sha256) as stream:
+                with fetch.cond:
+                    fetch.size = stream.size
+                    fetch.cond.notify_all()
+                with open(fetch.part_path, 'wb') as out:
+                    while True:
+                        chunk = stream.read(BUFFER_SIZE)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        out.flush()
+                        with fetch.cond:
+                            fetch.received += len(chunk)
+                            fetch.cond.notify_all()
+                stream.finish()
+            if compressed and not verify_object(fetch.part_path, key):
+                raise IntegrityError(f"Content of {key} does not match its hash")
+            _replace(fetch.part_path, fetch.path)
+            with self._lock:
+                self._verified.add(key)
+                self.stats["upstream_bytes"] += fetch.received
+            print(f"[Mirror] Stored {key} ({fetch.received / (1024 * 1024):.1f} MB)")
+        except Exception as e:
+            print(f"[Mirror] Upstream fetch of {key} failed: {e}")
+            fetch.error = e
+            try:
+                os.remove(fetch.part_path)
+            except OSError:
+                pass
+        finally:
+            with fetch.cond:
+                fetch.finished = True
+                fetch.cond.notify_all()
+            with self._lock:
+                self._active.pop(key, None)
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local update mirror for ZI Background Remover")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Run the HTTP cache server")
+    p_serve.add_argument("root", help="Folder for the cached objects")
+    p_serve.add_argument("--host", default="0.0.0.0")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--allow-host", action="append", default=None,
+                         help=f"Upstream host to allow (repeatable, default: {', '.join(DEFAULT_ALLOWED_HOSTS)})")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = MirrorServer(args.root, args.host, args.port, tuple(args.allow_host or DEFAULT_ALLOWED_HOSTS))
+        print(f"[Mirror] Serving {os.path.abspath(args.root)} on port {server.port}")
+        print(f"[Mirror] Clients: set {MIRROR_ENV}=http://<this machine>:{server.port} "
+              f"or put the URL in {MIRROR_FILE} next to ZI-BGRemover.exe")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Update Planner for ZI Background Remover
+========================================
+Collapses a multi-hop patch chain into one net file set:
+- Diffs the installed version's manifest against the target manifest, so a file
+  changed in several hops is fetched once in its final version, and a file
+  changed and later reverted is not fetched at all
+- Each distinct content is fetched once from the per-file content store
+  (<hash>.zst blobs published by content_store.py), however many paths share it
+- Reports the bytes saved versus downloading every patch of the hop-by-hop chain
+- Can diff against the files actually installed instead of the installed
+  version's manifest (plan_local_update): a parallel scan that reuses a
+  persisted HashCache, so corrupted or half-updated installs are repaired and
+  files the user already has are not fetched again
+
+The fetched blobs are packed into a local patch in the delta_patch format
+('full' entries only) and applied by patch_applier.py like any other patch, so
+every file is still verified against its target hash.
+
+Blob sizes are not known before download: the net size counts uncompressed
+file sizes, an upper bound, so the planner never picks the net download when
+the chain is actually smaller.
+
+Usage:
+    python update_planner.py <installed_version> <target_version> [--version-json version.json]
+    python update_planner.py <installed_version> <target_version> --local <app_folder>
+
+Example:
+    python update_planner.py 1.0.5 1.0.8
+"""
+
+import os
+import sys
+import json
+import zipfile
+import argparse
+from urllib.request import urlopen, Request
+
+from delta_patch import PATCH_INDEX, PATCH_FORMAT
+from manifest_format import MAGIC, BinaryManifest, load_manifest, iter_manifest
+from manifest_generator import compare_manifests, scan_files, hash_files, HashCache
+
+
+# Name of a version's manifest, locally and under 'manifest_url' in version.json
+MANIFEST_NAME = "manifest_v{version}.json"
+
+
+def blob_name(file_hash: str) -> str:
+    """File name of a blob in the content store."""
+    return f"{file_hash}.zst"
+
+
+def fetch_manifest(source: str, timeout: int = 60):
+    """
+    Load a manifest from a local path or an http(s) URL.
+
+    Returns:
+        BinaryManifest for binary manifests, dict for JSON manifests.
+    """
+    if not source.startswith(("http://", "https://")):
+        return load_manifest(source)
+    req = Request(source, headers={'User-Agent': 'ZI-BGRemover-Updater'})
+    with urlopen(req, timeout=timeout) as response:
+        data = response.read()
+    if data[:len(MAGIC)] == MAGIC:
+        return BinaryManifest(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def _lookup(manifest, path: str) -> dict:
+    """{'hash', 'size'} of one file in a manifest of either format."""
+    if isinstance(manifest, BinaryManifest):
+        return manifest.get(path)
+    return manifest["files"][path]
+
+
+def plan_net_update(local_manifest, target_manifest, chain: list[dict] = None) -> dict:
+    """
+    Compute the net file set from the installed version to the target.
+
+    Args:
+        local_manifest: Manifest of the installed version.
+        target_manifest: Manifest of the target version.
+        chain: Optional hop-by-hop patch chain (dicts with 'size') to compare against.
+
+    Returns:
+        Dict with:
+        - 'files': path -> {'hash', 'size'} of every file to write
+        - 'deleted': paths to remove
+        - 'blobs': hash -> size of every distinct content to fetch
+        - 'net_bytes': bytes to fetch (uncompressed, upper bound)
+        - 'chain_bytes': size of the hop-by-hop chain (None without a chain)
+        - 'saved_bytes': chain_bytes - net_bytes (None without a chain)
+        - 'use_net': True when the net download is the cheaper one
+    """
+    diff = compare_manifests(local_manifest, target_manifest)
+    files = {path: _lookup(target_manifest, path) for path in sorted(diff["changed"] + diff["new"])}
+    return _make_plan(files, diff["deleted"], chain)
+
+
+def plan_local_update(app_folder: str, target_manifest, installed_manifest=None, chain: list[dict] = None,
+                      cache: HashCache = None, jobs: int = None, progress_callback=None,
+                      stats: dict = None) -> dict:
+    """
+    Compute the file set that turns the files actually installed into the target.
+
+    Only paths of the target manifest are checked: missing files and files with
+    a different size are fetched without hashing, the rest are hashed in
+    parallel (unchanged files come from the cache).
+
+    Args:
+        app_folder: Installed app folder.
+        target_manifest: Manifest of the target version.
+        installed_manifest: Optional manifest of the installed version; its files
+            missing from the target are deleted. Without it nothing is deleted,
+            so files the user put in the folder are never touched.
+        chain: Optional hop-by-hop patch chain to compare against.
+        cache: Optional HashCache of the install, updated and saved.
+        jobs: Hashing threads.
+        progress_callback: Called with (hashed_bytes, total_bytes).
+        stats: Optional dict receiving 'checked', 'missing', 'size_mismatch',
+            'cached' and 'hashed' counts.
+
+    Returns:
+        Same structure as plan_net_update().
+    """
+    local = {rel_path: (abs_path, st) for rel_path, abs_path, st in scan_files(app_folder)}
+    files = {}
+    candidates = []
+    counts = {"checked": 0, "missing": 0, "size_mismatch": 0}
+    for path, file_hash, size in iter_manifest(target_manifest):
+        counts["checked"] += 1
+        found = local.get(path)
+        if found is None:
+            counts["missing"] += 1
+            files[path] = {"hash": file_hash, "size": size}
+        elif found[1].st_size != size:
+            counts["size_mismatch"] += 1
+            files[path] = {"hash": file_hash, "size": size}
+        else:
+            candidates.append((path, found[0], found[1], file_hash))
+
+    hashes = hash_files([(path, abs_path, st) for path, abs_path, st, _ in candidates],
+                        jobs, cache, stats=counts, progress_callback=progress_callback)
+    for (path, _, st, file_hash), local_hash in zip(candidates, hashes):
+        if local_hash != file_hash:
+            files[path] = {"hash": file_hash, "size": st.st_size}
+
+    deleted = []
+    if installed_manifest is not None:
+        target_paths = {path for path, _, _ in iter_manifest(target_manifest)}
+        deleted = [path for path, _, _ in iter_manifest(installed_manifest)
+                   if path not in target_paths and path in local]
+
+    if stats is not None:
+        stats.update(counts)
+    return _make_plan(dict(sorted(files.items())), deleted, chain)
+
+
+def _make_plan(files: dict, deleted: list, chain: list[dict] | None) -> dict:
+    """Plan dict for a file set (see plan_net_update)."""
+    blobs = {}
+    for info in files.values():
+        blobs[info["hash"]] = info["size"]
+
+    net_bytes = sum(blobs.values())
+    # The updater streams the solid archive of a patch when there is one
+    chain_bytes = sum(patch.get("solid_size") or patch.get("size", 0) for patch in chain) if chain else None
+    saved_bytes = chain_bytes - net_bytes if chain_bytes is not None else None
+
+    return {
+        "files": files,
+        "deleted": deleted,
+        "blobs": blobs,
+        "net_bytes": net_bytes,
+        "chain_bytes": chain_bytes,
+        "saved_bytes": saved_bytes,
+        "use_net": saved_bytes is None or saved_bytes > 0,
+    }
+
+
+def format_plan(plan: dict) -> str:
+    """Human-readable plan summary."""
+    mb = 1024 * 1024
+    lines = [
+        f"Net update: {len(plan['files'])} files ({len(plan['blobs'])} distinct blobs), "
+        f"{len(plan['deleted'])} deleted",
+        f"  Net download:   {plan['net_bytes'] / mb:10.1f} MB (uncompressed, upper bound)",
+    ]
+    if plan["chain_bytes"] is not None:
+        lines.append(f"  Patch chain:    {plan['chain_bytes'] / mb:10.1f} MB")
+        lines.append(f"  Saved:          {plan['saved_bytes'] / mb:10.1f} MB -> "
+                     f"{'net download' if plan['use_net'] else 'patch chain'}")
+    return "\n".join(lines)
+
+
+def build_net_patch(plan: dict, blob_dir: str, patch_path: str, from_version: str = None,
+                    to_version: str = None) -> str:
+    """
+    Pack downloaded blobs into a patch for patch_applier.
+
+    Args:
+        plan: Result of plan_net_update().
+        blob_dir: Folder holding every blob of the plan (blob_name(hash)).
+        patch_path: Output ZIP.
+        from_version / to_version: Recorded in the patch index.
+
+    Returns:
+        patch_path.
+    """
+    index = {
+        "format": PATCH_FORMAT,
+        "from": from_version,
+        "to": to_version,
+        "files": {},
+        "deleted": plan["deleted"],
+    }
+    with zipfile.ZipFile(patch_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for file_hash in sorted(plan["blobs"]):
+            zf.write(os.path.join(blob_dir, blob_name(file_hash)), f"blobs/{blob_name(file_hash)}")
+        for path, info in plan["files"].items():
+            index["files"][path] = {"method": "full", "blob": f"blobs/{blob_name(info['hash'])}",
+                                    "hash": info["hash"], "size": info["size"]}
+        zf.writestr(PATCH_INDEX, json.dumps(index, indent=2, sort_keys=True))
+    return patch_path
+
+
+def chain_between(patches: list[dict], from_version: str, to_version: str) -> list[dict] | None:
+    """Hop-by-hop patches from one version to another (None if there is a gap)."""
+    patch_map = {patch.get("from"): patch for patch in patches}
+    chain = []
+    current = from_version
+    while current != to_version:
+        patch = patch_map.get(current)
+        if not patch or len(chain) > len(patches):
+            return None
+        chain.append(patch)
+        current = patch.get("to")
+    return chain
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Plan a collapsed update and compare it with the hop-by-hop patch chain.",
+        epilog="Example: python update_planner.py 1.0.5 1.0.8")
+    parser.add_argument("installed_version")
+    parser.add_argument("target_version")
+    parser.add_argument("--version-json", default="version.json", help="Patch chain source")
+    parser.add_argument("--files", action="store_true", help="List the files of the plan")
+    parser.add_argument("--local", metavar="APP_FOLDER", default=None,
+                        help="Diff against the files installed in APP_FOLDER instead of the installed manifest")
+    parser.add_argument("--cache", default=None, help="Hash cache file for --local")
+    args = parser.parse_args()
+
+    try:
+        local = fetch_manifest(MANIFEST_NAME.format(version=args.installed_version))
+        target = fetch_manifest(MANIFEST_NAME.format(version=args.target_version))
+
+        chain = None
+        if os.path.exists(args.version_json):
+            with open(args.version_json, 'r', encoding='utf-8') as f:
+                patches = json.load(f).get("patches", [])
+            chain = chain_between(patches, args.installed_version, args.target_version)
+            if chain:
+                print(f"Patch chain: {' -> '.join([chain[0]['from']] + [p['to'] for p in chain])}")
+            else:
+                print(f"No patch chain {args.installed_version} -> {args.target_version} in {args.version_json}")
+
+        if args.local:
+            cache = HashCache(args.cache) if args.cache else None
+            stats = {}
+
+            def progress(done, total):
+                print(f"\r  Hashing: {done * 100 // max(total, 1)}%", end="", flush=True)
+
+            plan = plan_local_update(args.local, target, local, chain, cache=cache,
+                                     progress_callback=progress, stats=stats)
+            print(f"\r  Checked {stats['checked']} files: {stats['missing']} missing, "
+                  f"{stats['size_mismatch']} size mismatch, {stats['hashed']} hashed, {stats['cached']} cached")
+        else:
+            plan = plan_net_update(local, target, chain)
+        print(format_plan(plan))
+        if args.files:
+            for path, info in plan["files"].items():
+                print(f"  {info['size'] / (1024 * 1024):8.1f} MB  {path}")
+            for path in plan["deleted"]:
+                print(f"  {'deleted':>11}  {path}")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
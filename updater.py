@@ -4,11 +4,26 @@ Auto Updater Module for ZI Background Remover
 Supports both full updates and sequential patch updates.
 
 Sequential Update Flow:
-1. Check version.json for new version and patch chain
+1. Check version.json for new version and patch chain (cached with ETag /
+   Last-Modified and backoff, see update_check.py)
 2. Build patch path from current version to latest
-3. Download patches sequentially
-4. Apply all patches in one process
-5. Restart application once
+3. Download the net file set (update_planner.py) when it is smaller than the
+   chain, otherwise download the chain's patches concurrently; each download is
+   checked against its SHA-256 from version.json while it streams. Chains
+   published as solid archives (solid_patch.py) are extracted straight from
+   the download into a staging folder instead
+4. Stage the update next to the install in the background (every file built
+   and verified) while the app keeps running
+5. On restart the helper process (patch_applier.py) only swaps the staged
+   files in and restarts the app; the previous version is kept, so
+   rollback_update() can return to it just as quickly
+
+Downloads go through a local mirror (shared folder or cache server, see
+update_mirror.py) when one is configured for the workstation.
+
+Installs may hold only some components (components.py, e.g. no CUDA/torch on
+CPU-only machines): updates then only fetch and stage the files of those
+components, and install_components_async() adds more on demand.
 
 Usage:
     from updater import Updater
@@ -29,10 +44,20 @@ import hashlib
 import zipfile
 import shutil
 from pathlib import Path
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+from concurrent.futures import ThreadPoolExecutor, wait
 from packaging import version as pkg_version
 
+from downloader import download, open_stream, DownloadError, DEFAULT_CONNECTIONS, PART_SUFFIX, STATE_SUFFIX
+from manifest_generator import HashCache
+from update_check import UpdateChecker
+from update_planner import (fetch_manifest, plan_net_update, plan_local_update, format_plan,
+                            build_net_patch, blob_name)
+from solid_patch import extract_stream
+from update_mirror import open_mirror, configured_mirror
+from patch_applier import (STAGING_SUFFIX, BACKUP_SUFFIX, BACKUP_INDEX, STAGED_INDEX,
+                           write_staged_index, read_staged_index, stage_update)
+from components import installed_components, with_requirements, filter_manifest, rules_of, skip_filter
+
 
 class Updater:
     """Handles checking, downloading, and installing updates with sequential patch support."""
@@ -40,7 +65,14 @@ class Updater:
     # Minimum version that supports patch updates
     MIN_SUPPORTED_VERSION = "1.0.5"
     
-    def __init__(self, version_url: str, current_version: str, app_folder: str = None):
+    # Update helper built from patch_applier.py (release.bat)
+    HELPER_EXE = "ZI-Updater.exe"
+    
+    # Connections shared by all concurrent downloads of one update
+    MAX_CONNECTIONS = DEFAULT_CONNECTIONS
+    
+    def __init__(self, version_url: str, current_version: str, app_folder: str = None,
+                 mirror: str = None):
         """
         Initialize the updater.
         
@@ -48,12 +80,21 @@ class Updater:
             version_url: URL to the version.json file.
             current_version: The current version string (e.g., "1.0.0").
             app_folder: Path to the application folder for updates.
+            mirror: Local mirror folder or URL (default: ZI_UPDATE_MIRROR or
+                update_mirror.txt in the app folder, see update_mirror.py).
         """
         self.version_url = version_url
         self.current_version = current_version
         self.app_folder = app_folder or self._get_app_folder()
         self._download_thread = None
-        self._cancel_download = False
+        self._cancel_event = threading.Event()
+        self.checker = UpdateChecker(version_url, os.path.join(self._state_dir(), "update_check.json"))
+        self.last_check_error = None
+        self.components = installed_components(self.app_folder)  # None: every component
+        mirror = mirror or configured_mirror(self.app_folder)
+        self.mirror = open_mirror(mirror)
+        if self.mirror:
+            print(f"[Updater] Using local mirror: {mirror}")
     
     def _get_app_folder(self) -> str:
         """Get the application folder path."""
@@ -64,35 +105,100 @@ class Updater:
             # Running as script
             return os.path.dirname(os.path.abspath(__file__))
     
-    def check_for_updates(self) -> tuple[bool, dict | None]:
+    def _state_dir(self) -> str:
+        """Per-user folder for updater state (the app folder may be read-only)."""
+        base = os.environ.get('LOCALAPPDATA') or tempfile.gettempdir()
+        return os.path.join(base, "ZI-BGRemover")
+    
+    def check_for_updates(self, force: bool = False) -> tuple[bool, dict | None]:
         """
         Check if a new version is available.
         
+        version.json is served from the local cache within its TTL and
+        revalidated with a conditional request after that; while the server
+        is unreachable the check answers immediately (see update_check.py).
+        
+        Args:
+            force: Skip the cache TTL and the failure backoff.
+        
         Returns:
-            Tuple of (has_update: bool, info: dict or None).
+            Tuple of (has_update: bool, info: dict or None). On failure
+            last_check_error holds the reason.
         """
+        self.last_check_error = None
         try:
-            req = Request(self.version_url, headers={'User-Agent': 'ZI-BGRemover-Updater'})
-            with urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
+            data = self.checker.fetch(force)
+            if self.checker.last_source == "stale":
+                print("[Updater] Update server unreachable, using cached version info")
             
             remote_version = data.get('version', '0.0.0')
             
             if pkg_version.parse(remote_version) > pkg_version.parse(self.current_version):
-                return True, {
-                    'version': remote_version,
-                    'full_url': data.get('full_url', ''),
-                    'changelog': data.get('changelog', 'No changelog provided.'),
-                    'patches': data.get('patches', []),
-                    'min_supported_version': data.get('min_supported_version', self.MIN_SUPPORTED_VERSION)
-                }
+                return True, self._update_info(data)
             else:
                 return False, None
                 
         except Exception as e:
             print(f"[Updater] Error checking for updates: {e}")
+            self.last_check_error = str(e)
             return False, None
     
+    def _update_info(self, data: dict) -> dict:
+        """Update info dict from version.json data."""
+        return {
+            'version': data.get('version', '0.0.0'),
+            'full_url': data.get('full_url', ''),
+            'full_sha256': data.get('full_sha256', ''),
+            'changelog': data.get('changelog', 'No changelog provided.'),
+            'patches': data.get('patches', []),
+            'manifest_url': data.get('manifest_url', ''),
+            'content_url': data.get('content_url', ''),
+            'components': data.get('components', {}),
+            'min_supported_version': data.get('min_supported_version', self.MIN_SUPPORTED_VERSION)
+        }
+    
+    def repair_info(self) -> dict | None:
+        """
+        Update info that re-installs the current version over itself.
+        
+        Passed to download_and_apply_async(verify_local=True), it scans the
+        install and fetches only the files that differ from the manifest of
+        this version (verify/repair). There is no patch chain or full-update
+        fallback, so a repair never moves to another version.
+        
+        Returns:
+            Dict like check_for_updates() returns, or None when version.json is
+            unavailable or has no content store.
+        """
+        try:
+            data = self.checker.fetch()
+        except Exception as e:
+            print(f"[Updater] Error checking for updates: {e}")
+            return None
+        info = self._update_info(data)
+        if not info['manifest_url'] or not info['content_url']:
+            return None
+        info.update(version=self.current_version, patches=[], full_url='', full_sha256='',
+                    changelog='')
+        return info
+    
+    def check_for_updates_async(self, callback):
+        """
+        Silent background check (e.g. at startup); never blocks the caller.
+        
+        Args:
+            callback: Called from the worker thread with (has_update, info)
+                when the check succeeds; failures are only logged.
+        """
+        def worker():
+            has_update, info = self.check_for_updates()
+            if not self.last_check_error:
+                callback(has_update, info)
+        
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+    
     def _calculate_file_hash(self, filepath: str) -> str:
         """Calculate SHA256 hash of a file."""
         hash_func = hashlib.sha256()
@@ -205,346 +311,712 @@ class Updater:
             return True, chain, info
         return False, None, None
     
-    def download_file(self, url: str, dest_path: str, progress_callback=None) -> bool:
-        """Download a file with progress callback."""
-        self._cancel_download = False
+    def download_file(self, url: str, dest_path: str, progress_callback=None,
+                      connections: int = 1, sha256: str = None, cancel_event: threading.Event = None,
+                      key: str = None) -> bool:
+        """
+        Download a file with resume support (see downloader.py).
+        
+        A failed or cancelled download leaves dest_path + '.part' behind, so
+        the next attempt continues where this one stopped. With sha256 the
+        file is hashed while it streams and rejected (and deleted) on mismatch.
+        With a content key (SHA-256 or blob name) the local mirror is tried
+        first, if one is configured.
+        """
+        cancel_event = cancel_event or self._cancel_event
         try:
-            req = Request(url, headers={'User-Agent': 'ZI-BGRemover-Updater'})
-            with urlopen(req, timeout=300) as response:
-                total_size = int(response.headers.get('Content-Length', 0))
-                downloaded = 0
-                
-                with open(dest_path, 'wb') as f:
-                    while True:
-                        if self._cancel_download:
-                            return False
-                        
-                        chunk = response.read(8192)
-                        if not chunk:
-                            break
-                        
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if progress_callback and total_size > 0:
-                            progress_callback(downloaded, total_size)
-                
-                return True
-        except Exception as e:
+            if self.mirror and key:
+                source = self.mirror.fetch(key, url, dest_path, sha256, progress_callback, cancel_event,
+                                           connections)
+                print(f"[Updater] {os.path.basename(dest_path)}: {source}")
+            else:
+                download(url, dest_path, progress_callback, cancel_event, connections=connections, sha256=sha256)
+            return True
+        except InterruptedError:
+            print(f"[Updater] Download cancelled: {os.path.basename(dest_path)}")
+            return False
+        except (DownloadError, OSError) as e:
             print(f"[Updater] Download error: {e}")
             return False
     
+    def _prepare_download_dir(self, folder: str):
+        """Create a download folder, dropping old files but keeping partial downloads."""
+        os.makedirs(folder, exist_ok=True)
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and not name.endswith((PART_SUFFIX, STATE_SUFFIX)):
+                os.remove(path)
+    
+    def _download_all(self, items: list[dict], progress_callback=None) -> bool:
+        """
+        Download several files concurrently within MAX_CONNECTIONS connections.
+        
+        Args:
+            items: Dicts with 'url', 'path', 'weight' (expected size, for
+                progress) and optional 'sha256' and mirror 'key'
+            progress_callback: Called with (done, total) in weight units over all files
+            
+        Returns:
+            True if every file was downloaded (and verified). The first failure
+            stops the other downloads.
+        """
+        if not items:
+            return True
+        
+        parallel = min(self.MAX_CONNECTIONS, len(items))
+        per_file = max(1, self.MAX_CONNECTIONS // parallel)
+        total = sum(item['weight'] for item in items)
+        done = [0] * len(items)
+        lock = threading.Lock()
+        abort = threading.Event()
+        
+        def fetch(index: int) -> bool:
+            item = items[index]
+            
+            def file_progress(downloaded, file_total):
+                if progress_callback and total > 0 and file_total > 0:
+                    with lock:
+                        done[index] = item['weight'] * downloaded // file_total
+                        current = sum(done)
+                    progress_callback(current, total)
+            
+            ok = self.download_file(item['url'], item['path'], file_progress, per_file,
+                                    item.get('sha256') or None, abort, item.get('key'))
+            if not ok:
+                abort.set()
+            return ok
+        
+        # Largest first, so the long downloads start immediately
+        order = sorted(range(len(items)), key=lambda i: -items[i]['weight'])
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            futures = [pool.submit(fetch, i) for i in order]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.1)
+                if self._cancel_event.is_set():
+                    abort.set()
+            return all(future.result() for future in futures) and not self._cancel_event.is_set()
+    
     def download_sequential_patches(self, patch_chain: list[dict], 
                                      progress_callback=None,
                                      step_callback=None) -> list[str] | None:
         """
-        Download all patches in the chain sequentially.
+        Download all patches in the chain concurrently.
+        
+        Each patch is checked against its 'sha256' from version.json while it
+        downloads, so a bad patch fails here instead of at apply time. A chain
+        with a patch that has no published SHA-256 is refused (the caller falls
+        back to the full update).
         
         Args:
-            patch_chain: List of patch dicts with 'url', 'from', 'to' keys
-            progress_callback: Called with (downloaded_bytes, total_bytes) for each file
-            step_callback: Called with (current_step, total_steps, from_ver, to_ver)
+            patch_chain: List of patch dicts with 'url', 'from', 'to', 'size', 'sha256' keys
+            progress_callback: Called with (downloaded_bytes, total_bytes) over the whole chain
+            step_callback: Called once with (1, 1, from_ver, to_ver) of the whole chain
             
         Returns:
-            List of downloaded patch file paths, or None on failure
+            List of downloaded patch file paths (in chain order), or None on failure
         """
+        unverified = [f"{patch.get('from', '?')} -> {patch.get('to', '?')}"
+                      for patch in patch_chain if not patch.get('sha256')]
+        if unverified:
+            print(f"[Updater] No SHA-256 published for patch {', '.join(unverified)}, not using the chain")
+            return None
+        
         temp_dir = tempfile.gettempdir()
         patch_dir = os.path.join(temp_dir, "zi_patches")
         
-        # Clean up old patches
-        if os.path.exists(patch_dir):
-            shutil.rmtree(patch_dir)
-        os.makedirs(patch_dir)
-        
-        downloaded_patches = []
-        total_steps = len(patch_chain)
+        # Clean up old patches (interrupted downloads are resumed)
+        self._prepare_download_dir(patch_dir)
         
-        for index, patch in enumerate(patch_chain):
-            if self._cancel_download:
-                return None
-            
+        items = []
+        for patch in patch_chain:
             from_ver = patch.get('from', '?')
             to_ver = patch.get('to', '?')
-            url = patch.get('url')
-            
-            if not url:
+            if not patch.get('url'):
                 print(f"[Updater] No URL for patch {from_ver} -> {to_ver}")
                 return None
+            items.append({
+                'url': patch['url'],
+                'path': os.path.join(patch_dir, f"patch_{from_ver}_to_{to_ver}.zip"),
+                'weight': patch.get('size') or 1,
+                'sha256': patch.get('sha256'),
+                'key': patch.get('sha256'),
+            })
+        
+        if step_callback:
+            step_callback(1, 1, patch_chain[0].get('from', '?'), patch_chain[-1].get('to', '?'))
+        
+        print(f"[Updater] Downloading {len(items)} patches concurrently")
+        if not self._download_all(items, progress_callback):
+            print("[Updater] Failed to download the patch chain")
+            return None
+        
+        return [item['path'] for item in items]
+    
+    def _staging_dir(self) -> str:
+        """
+        Empty staging folder: next to the install, so the swap is a rename on
+        one volume, or in the per-user folder if that isn't writable.
+        """
+        staging_dir = self.app_folder.rstrip("/\\") + STAGING_SUFFIX
+        try:
+            if os.path.exists(staging_dir):
+                shutil.rmtree(staging_dir)
+            os.makedirs(staging_dir)
+        except OSError:
+            staging_dir = os.path.join(self._state_dir(), "staging")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir, exist_ok=True)
+        return staging_dir
+    
+    def _open_stream(self, url: str, progress_callback=None, sha256: str = None):
+        """Readable download stream, from the local mirror when there is one (keyed by SHA-256)."""
+        if self.mirror and sha256:
+            return self.mirror.open(sha256, url, sha256, progress_callback, self._cancel_event)
+        return open_stream(url, progress_callback, self._cancel_event, sha256=sha256)
+    
+    def stream_solid_patches(self, patch_chain: list[dict], progress_callback=None,
+                             step_callback=None) -> list[str] | None:
+        """
+        Download and extract a chain of solid patches in one pass.
+        
+        Each archive is decompressed while it downloads, straight into a
+        staging folder (every file is hash-checked on the way); the archives
+        themselves are never written to disk. The whole stream is also checked
+        against 'solid_sha256' from version.json.
+        
+        Args:
+            patch_chain: Patch dicts with 'solid_url', 'solid_size', 'solid_sha256'
+            progress_callback: Called with (downloaded_bytes, total_bytes) over the chain
+            step_callback: Called once with (1, 1, from_ver, to_ver) of the whole chain
             
-            # Notify step progress
-            if step_callback:
-                step_callback(index + 1, total_steps, from_ver, to_ver)
+        Returns:
+            [staging folder] for apply_sequential_patches(), or None on failure
+        """
+        if not all(patch.get('solid_url') for patch in patch_chain):
+            return None
+        if step_callback:
+            step_callback(1, 1, patch_chain[0].get('from', '?'), patch_chain[-1].get('to', '?'))
+        
+        total = sum(patch.get('solid_size') or 0 for patch in patch_chain)
+        staging_dir = self._staging_dir()
+        changes = {"staged": set(), "deleted": set()}
+        offset = 0
+        try:
+            for patch in patch_chain:
+                def stream_progress(downloaded, size, offset=offset):
+                    if progress_callback and total > 0:
+                        progress_callback(min(offset + downloaded, total), total)
+                
+                print(f"[Updater] Streaming solid patch {patch.get('from')} -> {patch.get('to')}")
+                with self._open_stream(patch['solid_url'], stream_progress, patch.get('solid_sha256') or None) as stream:
+                    staged, deleted = extract_stream(stream, self.app_folder, staging_dir, changes,
+                                                     skip=skip_filter(self.components))
+                    offset += stream.finish()
+            write_staged_index(staging_dir, staged, deleted, version=patch_chain[-1].get('to'),
+                               base_version=self.current_version)
+            print(f"[Updater] Staged {len(staged)} files, {len(deleted)} to delete")
+            return [staging_dir]
+        except InterruptedError:
+            print("[Updater] Download cancelled")
+        except Exception as e:
+            print(f"[Updater] Streaming solid patches failed: {e}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return None
+    
+    def stage_downloaded(self, path_or_paths, is_full_update: bool = False, version: str = None,
+                         progress_callback=None, components: list[str] = None) -> str | None:
+        """
+        Build downloaded patches (or a full update ZIP) into a staging folder.
+        
+        Runs while the app is in use; the install is only read. The downloaded
+        archives are removed afterwards. Only files of the installed
+        components are staged; components is the new list when the download
+        adds some.
+        
+        Returns:
+            The staging folder for apply_sequential_patches([...]), or None on failure
+        """
+        staging_dir = self._staging_dir()
+        skip = skip_filter(components if components is not None else self.components)
+        try:
+            if is_full_update:
+                index = stage_update(self.app_folder, staging_dir, full_update=path_or_paths,
+                                     version=version, base_version=self.current_version,
+                                     progress_callback=progress_callback, skip=skip)
+            else:
+                index = stage_update(self.app_folder, staging_dir, patch_files=path_or_paths,
+                                     version=version, base_version=self.current_version,
+                                     progress_callback=progress_callback, skip=skip,
+                                     components=components)
+        except Exception as e:
+            print(f"[Updater] Staging failed, the helper will apply the download instead: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return None
+        
+        if is_full_update:
+            os.remove(path_or_paths)
+        else:
+            shutil.rmtree(os.path.dirname(path_or_paths[0]), ignore_errors=True)
+        print(f"[Updater] Staged v{version} ({index['mode']}): {len(index['files'])} files, "
+              f"{len(index['deleted'])} to delete")
+        return staging_dir
+    
+    def pending_update(self) -> dict | None:
+        """
+        A staged update still waiting for a restart, if any.
+        
+        Returns:
+            The staged index plus 'path', or None. Stale staging folders (not
+            newer than the running version, or patches staged for another
+            version) are removed. Components staged for the running version
+            count as pending too.
+        """
+        for staging_dir in (self.app_folder.rstrip("/\\") + STAGING_SUFFIX,
+                            os.path.join(self._state_dir(), "staging")):
+            index = read_staged_index(staging_dir)
+            if index is None:
+                continue
+            staged_version = index.get('version')
+            try:
+                newer = pkg_version.parse(staged_version) > pkg_version.parse(self.current_version)
+            except Exception:
+                newer = False
+            adds_components = index.get('components') is not None and staged_version == self.current_version
+            if (newer or adds_components) and (index.get('mode') == 'folder'
+                                               or index.get('base_version') == self.current_version):
+                return dict(index, path=staging_dir)
+            print(f"[Updater] Removing stale staged update: {staging_dir}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return None
+    
+    def can_rollback(self) -> bool:
+        """True if the last staged update kept the previous version."""
+        backup_dir = self.app_folder.rstrip("/\\") + BACKUP_SUFFIX
+        return os.path.isfile(os.path.join(backup_dir, BACKUP_INDEX))
+    
+    def rollback_update(self):
+        """Restart into the previous version (see patch_applier.rollback)."""
+        if not self.can_rollback():
+            print("[Updater] No previous version to roll back to")
+            return
+        self._launch_helper({"rollback": True})
+    
+    def missing_components(self, names) -> list[str]:
+        """Components (with their requirements) that this install doesn't have."""
+        if self.components is None:
+            return []
+        return [name for name in with_requirements(names) if name not in self.components]
+    
+    def _installed_part(self, manifest, rules: list[dict]):
+        """The part of a manifest that belongs to the installed components."""
+        if self.components is None:
+            return manifest
+        return filter_manifest(manifest, self.components, rules)
+    
+    def install_components_async(self, names, progress_callback=None, complete_callback=None,
+                                 error_callback=None, prepare_callback=None):
+        """
+        Add components to this install in a background thread.
+        
+        The files of the installed version come from the content store (like a
+        net update: each distinct content once, checked against its hash) and
+        are staged; the restart then only swaps them in.
+        
+        Args:
+            names: Components wanted (requirements are added)
+            progress_callback: Called with (downloaded, total) bytes
+            complete_callback: Called with ([staging folder], False), see apply_sequential_patches
+            error_callback: Called with error message string
+            prepare_callback: Called with (done, total) files while staging
+        """
+        self._cancel_event.clear()
+        
+        def worker():
+            try:
+                missing = self.missing_components(names)
+                data = self.checker.fetch()
+                manifest_url = data.get('manifest_url', '')
+                content_url = data.get('content_url', '')
+                if not missing or not manifest_url or not content_url:
+                    if error_callback:
+                        error_callback("No components to download or no content store available.")
+                    return
+                
+                manifest = fetch_manifest(manifest_url.format(version=self.current_version))
+                rules = rules_of(manifest)
+                plan = plan_local_update(self.app_folder, filter_manifest(manifest, missing, rules),
+                                         cache=HashCache(self._hash_cache_path()))
+                plan['from'] = plan['to'] = self.current_version
+                print(f"[Updater] Installing components {', '.join(missing)}: {len(plan['files'])} files")
+                
+                patch_files = self.download_net_update(plan, content_url, progress_callback)
+                if not patch_files:
+                    if error_callback and not self._cancel_event.is_set():
+                        error_callback("Download failed or was cancelled.")
+                    return
+                staging_dir = self.stage_downloaded(patch_files, False, self.current_version, prepare_callback,
+                                                    components=with_requirements(self.components + missing, rules))
+                if not staging_dir:
+                    if error_callback:
+                        error_callback("Staging the components failed.")
+                    return
+                if complete_callback:
+                    complete_callback([staging_dir], False)
+            except Exception as e:
+                if error_callback:
+                    error_callback(str(e))
+        
+        self._download_thread = threading.Thread(target=worker, daemon=True)
+        self._download_thread.start()
+    
+    def component_size(self, names) -> int:
+        """Approximate bytes of components (version.json 'components', 0 if unknown)."""
+        try:
+            sizes = self.checker.fetch().get('components', {})
+        except Exception:
+            return 0
+        return sum(sizes.get(name, {}).get('size', 0) for name in names)
+    
+    def _hash_cache_path(self) -> str:
+        """Persisted hash cache of the install (outside the app folder, which may be read-only)."""
+        cache_dir = self._state_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, "install_hashes.json")
+    
+    def plan_net_update(self, update_info: dict, patch_chain: list[dict] = None) -> dict | None:
+        """
+        Plan a collapsed update from the version manifests.
+        
+        Only files of the installed components are planned; a partial install
+        always takes the net download, since the patch chain carries every
+        component.
+        
+        Returns:
+            Plan dict from update_planner.plan_net_update() plus 'drift' (see
+            _install_drift), or None when version.json has no content store or
+            a manifest is unavailable.
+        """
+        manifest_url = update_info.get('manifest_url', '')
+        if not manifest_url or not update_info.get('content_url'):
+            return None
+        
+        try:
+            local_manifest = fetch_manifest(manifest_url.format(version=self.current_version))
+            target_manifest = fetch_manifest(manifest_url.format(version=update_info['version']))
+            rules = rules_of(target_manifest)
+            plan = plan_net_update(self._installed_part(local_manifest, rules),
+                                   self._installed_part(target_manifest, rules), patch_chain)
+        except Exception as e:
+            print(f"[Updater] Net update planning failed: {e}")
+            return None
+        
+        if self.components is not None:
+            plan['use_net'] = True
+        plan['drift'] = self._install_drift(self._installed_part(local_manifest, rules))
+        plan['from'] = self.current_version
+        plan['to'] = update_info['version']
+        for line in format_plan(plan).splitlines():
+            print(f"[Updater] {line.strip()}")
+        return plan
+    
+    def _install_drift(self, manifest: dict) -> int:
+        """Files of a manifest that are missing from the install or have another size (stat only)."""
+        drift = 0
+        for rel_path, info in manifest['files'].items():
+            try:
+                if os.path.getsize(os.path.join(self.app_folder, *rel_path.split('/'))) != info['size']:
+                    drift += 1
+            except OSError:
+                drift += 1
+        return drift
+    
+    def plan_local_update(self, update_info: dict, patch_chain: list[dict] = None,
+                          progress_callback=None) -> dict | None:
+        """
+        Plan an update against the files actually installed.
+        
+        Scans the app folder in parallel (reusing the persisted hash cache) and
+        compares it with the target manifest, so only files that differ locally
+        are fetched. Corrupted or half-updated installs are repaired on the way;
+        with update_info['version'] equal to the current version this is a repair.
+        
+        Args:
+            update_info: Dict from check_for_updates()
+            patch_chain: Optional chain, only used for the bytes-saved report
+            progress_callback: Called with (hashed_bytes, total_bytes) during the scan
             
-            # Download patch
-            patch_filename = f"patch_{from_ver}_to_{to_ver}.zip"
-            patch_path = os.path.join(patch_dir, patch_filename)
+        Returns:
+            Plan dict, or None when version.json has no content store or the scan failed.
+        """
+        manifest_url = update_info.get('manifest_url', '')
+        if not manifest_url or not update_info.get('content_url'):
+            return None
+        
+        try:
+            target_manifest = fetch_manifest(manifest_url.format(version=update_info['version']))
+            try:
+                installed_manifest = fetch_manifest(manifest_url.format(version=self.current_version))
+            except Exception as e:
+                print(f"[Updater] No manifest for {self.current_version} ({e}), nothing will be deleted")
+                installed_manifest = None
             
-            print(f"[Updater] Downloading patch {index + 1}/{total_steps}: {from_ver} -> {to_ver}")
+            rules = rules_of(target_manifest)
+            target_manifest = self._installed_part(target_manifest, rules)
+            if installed_manifest is not None:
+                installed_manifest = self._installed_part(installed_manifest, rules)
             
-            if not self.download_file(url, patch_path, progress_callback):
-                print(f"[Updater] Failed to download patch {from_ver} -> {to_ver}")
-                return None
+            stats = {}
+            plan = plan_local_update(self.app_folder, target_manifest, installed_manifest, patch_chain,
+                                     cache=HashCache(self._hash_cache_path()),
+                                     progress_callback=progress_callback, stats=stats)
+        except Exception as e:
+            print(f"[Updater] Local scan failed: {e}")
+            return None
+        
+        print(f"[Updater] Checked {stats['checked']} files: {stats['missing']} missing, "
+              f"{stats['size_mismatch']} size mismatch, {stats['hashed']} hashed, {stats['cached']} cached")
+        plan['from'] = self.current_version
+        plan['to'] = update_info['version']
+        for line in format_plan(plan).splitlines():
+            print(f"[Updater] {line.strip()}")
+        return plan
+    
+    def download_net_update(self, plan: dict, content_url: str, progress_callback=None) -> list[str] | None:
+        """
+        Download every blob of a net plan and pack them into one patch.
+        
+        Args:
+            plan: Plan from plan_net_update()
+            content_url: Base URL of the content store
+            progress_callback: Called with (downloaded_bytes, total_bytes) over all blobs
             
-            downloaded_patches.append(patch_path)
+        Returns:
+            [patch_path] for apply_sequential_patches, or None on failure
+        """
+        patch_dir = os.path.join(tempfile.gettempdir(), "zi_patches")
+        blob_dir = os.path.join(patch_dir, "blobs")
+        self._prepare_download_dir(patch_dir)
+        self._prepare_download_dir(blob_dir)
+        
+        # Blob sizes are unknown up front: progress is weighted by file size.
+        # Blobs are checked against the file hashes when the patch is applied.
+        items = [{
+            'url': content_url.rstrip('/') + '/' + blob_name(file_hash),
+            'path': os.path.join(blob_dir, blob_name(file_hash)),
+            'weight': size,
+            'key': blob_name(file_hash),
+        } for file_hash, size in plan['blobs'].items()]
+        if not self._download_all(items, progress_callback):
+            print("[Updater] Failed to download the net update")
+            return None
         
-        return downloaded_patches
+        patch_path = os.path.join(patch_dir, f"net_{plan['from']}_to_{plan['to']}.zip")
+        build_net_patch(plan, blob_dir, patch_path, plan['from'], plan['to'])
+        shutil.rmtree(blob_dir, ignore_errors=True)
+        return [patch_path]
     
-    def download_full_update(self, url: str, progress_callback=None) -> str | None:
-        """Download full update zip."""
+    def download_full_update(self, url: str, progress_callback=None, sha256: str = None) -> str | None:
+        """Download full update zip (verified while streaming when sha256 is given)."""
         temp_dir = tempfile.gettempdir()
         update_path = os.path.join(temp_dir, "zi_full_update.zip")
         
-        if self.download_file(url, update_path, progress_callback):
+        if self.download_file(url, update_path, progress_callback, self.MAX_CONNECTIONS, sha256, key=sha256):
             return update_path
         return None
     
-    def apply_sequential_patches(self, patch_files: list[str]):
+    def _launch_helper(self, plan: dict):
         """
-        Apply multiple patches in sequence.
-        Creates a batch script to:
-        1. Wait for app to close
-        2. Extract each patch in order
-        3. Restart app
-        """
-        if not patch_files or len(patch_files) == 0:
-            print("[Updater] No patches to apply")
-            return
-        
-        # Validate all patch files exist and are valid zips
-        for patch_path in patch_files:
-            if not os.path.exists(patch_path):
-                print(f"[Updater] Patch file not found: {patch_path}")
-                return
-            try:
-                with zipfile.ZipFile(patch_path, 'r') as zf:
-                    if zf.testzip() is not None:
-                        print(f"[Updater] Corrupted patch file: {patch_path}")
-                        return
-            except zipfile.BadZipFile:
-                print(f"[Updater] Invalid zip file: {patch_path}")
-                return
+        Start patch_applier as a helper process and exit the app.
         
-        # Get paths
+        The helper waits for this process to exit, installs the update with
+        atomic renames and restarts the app. Frozen builds ship it as
+        ZI-Updater.exe, which is copied to the temp folder first so an update
+        can replace it too.
+        """
         if getattr(sys, 'frozen', False):
             current_exe = sys.executable
             app_folder = os.path.dirname(current_exe)
+            helper = os.path.join(tempfile.gettempdir(), self.HELPER_EXE)
+            shutil.copy2(os.path.join(app_folder, self.HELPER_EXE), helper)
+            command = [helper]
         else:
             current_exe = os.path.abspath(sys.argv[0])
             app_folder = os.path.dirname(current_exe)
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "patch_applier.py")]
         
-        exe_name = os.path.basename(current_exe)
-        
-        # Build extraction commands for each patch
-        extract_commands = []
-        for i, patch_path in enumerate(patch_files):
-            extract_commands.append(f'''
-echo Applying patch {i + 1} of {len(patch_files)}...
-powershell -Command "Expand-Archive -Path '{patch_path}' -DestinationPath '{app_folder}' -Force"
-if %ERRORLEVEL% NEQ 0 (
-    echo ERROR: Failed to apply patch {i + 1}!
-    pause
-    exit /b 1
-)
-''')
-        
-        # Create update script
-        batch_path = os.path.join(tempfile.gettempdir(), "zi_sequential_update.bat")
-        batch_content = f'''@echo off
-echo ========================================
-echo ZI Background Remover - Sequential Update
-echo ========================================
-echo.
-echo Applying {len(patch_files)} patches...
-echo.
-
-echo Waiting for application to close...
-ping 127.0.0.1 -n 3 > nul
-
-echo Force closing application...
-taskkill /F /IM "{exe_name}" 2>nul
-
-echo Waiting for process to fully terminate...
-:waitloop
-tasklist /FI "IMAGENAME eq {exe_name}" 2>nul | find /i "{exe_name}" >nul
-if %ERRORLEVEL%==0 (
-    echo   Process still running, waiting...
-    ping 127.0.0.1 -n 2 > nul
-    goto waitloop
-)
-echo   Process terminated.
-echo.
-
-{"".join(extract_commands)}
-
-echo.
-echo ========================================
-echo   All patches applied successfully!
-echo ========================================
-echo.
-echo Starting application...
-ping 127.0.0.1 -n 2 > nul
-start "" "{current_exe}"
-
-echo Cleaning up...
-ping 127.0.0.1 -n 2 > nul
-rmdir /s /q "{os.path.dirname(patch_files[0])}"
-del /f /q "%~f0"
-'''
+        restart = [current_exe] if getattr(sys, 'frozen', False) else [sys.executable, current_exe]
+        plan = dict(plan, app_folder=app_folder, wait_pid=os.getpid(), restart=restart)
+        plan_path = os.path.join(tempfile.gettempdir(), "zi_update_plan.json")
+        with open(plan_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2)
+        command.append(plan_path)
         
-        with open(batch_path, 'w', encoding='utf-8') as f:
-            f.write(batch_content)
+        print(f"[Updater] Starting update helper: {command}")
         
-        print(f"[Updater] Created sequential update script: {batch_path}")
-        
-        # Launch updater with UAC prompt
+        # The install folder usually needs admin rights (Program Files)
         try:
             import ctypes
-            print(f"[Updater] Executing update script as Admin: {batch_path}")
-            
-            ret = ctypes.windll.shell32.ShellExecuteW(
-                None, 
-                "runas", 
-                "cmd.exe", 
-                f'/c "{batch_path}"', 
-                None, 
-                1  # SW_SHOWNORMAL
-            )
-            
+            params = subprocess.list2cmdline(command[1:])
+            ret = ctypes.windll.shell32.ShellExecuteW(None, "runas", command[0], params, None, 1)
             if ret <= 32:
                 raise Exception(f"ShellExecute failed with return code {ret}")
-                
         except Exception as e:
-            print(f"[Updater] Failed to elevate, trying normal Popen: {e}")
-            subprocess.Popen(
-                ['cmd', '/c', batch_path],
-                creationflags=subprocess.CREATE_NEW_CONSOLE,
-                close_fds=True
-            )
+            print(f"[Updater] Failed to elevate, starting helper normally: {e}")
+            creationflags = subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0
+            subprocess.Popen(command, creationflags=creationflags, close_fds=True)
         
         # Exit application
         sys.exit(0)
     
-    def apply_full_update(self, update_zip_path: str):
-        """Apply full update from zip file."""
-        if not os.path.exists(update_zip_path):
-            print(f"[Updater] Update file not found: {update_zip_path}")
+    def apply_sequential_patches(self, patch_files: list[str]):
+        """
+        Apply multiple patches in sequence.
+        Hands the chain to the patch_applier helper, which:
+        1. Waits for the app to close
+        2. Builds the final version of each changed file once (in parallel)
+        3. Swaps them in with atomic renames and restarts the app
+        """
+        if not patch_files or len(patch_files) == 0:
+            print("[Updater] No patches to apply")
             return
         
-        # Get paths
-        if getattr(sys, 'frozen', False):
-            current_exe = sys.executable
-            app_folder = os.path.dirname(current_exe)
-        else:
-            current_exe = os.path.abspath(sys.argv[0])
-            app_folder = os.path.dirname(current_exe)
-        
-        exe_name = os.path.basename(current_exe)
-        
-        # Create update script
-        batch_path = os.path.join(tempfile.gettempdir(), "zi_full_update.bat")
-        batch_content = f'''@echo off
-echo ========================================
-echo ZI Background Remover - Full Update
-echo ========================================
-echo.
-
-echo Waiting for application to close...
-ping 127.0.0.1 -n 3 > nul
-
-echo Force closing application...
-taskkill /F /IM "{exe_name}" 2>nul
-
-echo Waiting for process to fully terminate...
-:waitloop
-tasklist /FI "IMAGENAME eq {exe_name}" 2>nul | find /i "{exe_name}" >nul
-if %ERRORLEVEL%==0 (
-    echo   Process still running, waiting...
-    ping 127.0.0.1 -n 2 > nul
-    goto waitloop
-)
-echo   Process terminated.
-
-echo.
-echo Creating backup...
-if exist "{app_folder}_backup" rmdir /s /q "{app_folder}_backup"
-rename "{app_folder}" "{os.path.basename(app_folder)}_backup"
-
-echo Extracting update...
-powershell -Command "Expand-Archive -Path '{update_zip_path}' -DestinationPath '{os.path.dirname(app_folder)}' -Force"
-
-if %ERRORLEVEL% NEQ 0 (
-    echo.
-    echo ERROR: Failed to extract update!
-    echo Restoring backup...
-    rename "{os.path.basename(app_folder)}_backup" "{os.path.basename(app_folder)}"
-    pause
-    exit /b 1
-)
-
-echo.
-echo ========================================
-echo   Full update applied successfully!
-echo ========================================
-echo.
-echo Starting application...
-ping 127.0.0.1 -n 2 > nul
-start "" "{current_exe}"
-
-echo Cleaning up...
-ping 127.0.0.1 -n 2 > nul
-del /f /q "{update_zip_path}"
-del /f /q "%~f0"
-'''
+        # Staged in the background (or streamed): the helper only swaps
+        if len(patch_files) == 1 and os.path.isfile(os.path.join(patch_files[0], STAGED_INDEX)):
+            self._launch_helper({"staged": patch_files[0]})
+            return
         
-        with open(batch_path, 'w', encoding='utf-8') as f:
-            f.write(batch_content)
+        # Contents were verified while downloading (SHA-256 from version.json)
+        # and every file is verified again when it is staged
+        for patch_path in patch_files:
+            if not os.path.exists(patch_path):
+                print(f"[Updater] Patch file not found: {patch_path}")
+                return
         
-        print(f"[Updater] Created full update script: {batch_path}")
+        self._launch_helper({
+            "patches": patch_files,
+            "components": self.components,
+            "cleanup": [os.path.dirname(patch_files[0])],
+        })
+    
+    def apply_full_update(self, update_zip_path: str):
+        """Apply full update from zip file (the previous install is kept as a backup)."""
+        if not os.path.exists(update_zip_path):
+            print(f"[Updater] Update file not found: {update_zip_path}")
+            return
         
-        # Launch with UAC
-        try:
-            import ctypes
-            ret = ctypes.windll.shell32.ShellExecuteW(
-                None, "runas", "cmd.exe", f'/c "{batch_path}"', None, 1
-            )
-            if ret <= 32:
-                raise Exception(f"ShellExecute failed: {ret}")
-        except Exception as e:
-            print(f"[Updater] Fallback to normal Popen: {e}")
-            subprocess.Popen(['cmd', '/c', batch_path], 
-                           creationflags=subprocess.CREATE_NEW_CONSOLE, close_fds=True)
+        if not zipfile.is_zipfile(update_zip_path):
+            print(f"[Updater] Invalid zip file: {update_zip_path}")
+            return
         
-        sys.exit(0)
+        self._launch_helper({
+            "full_update": update_zip_path,
+            "components": self.components,
+            "cleanup": [update_zip_path],
+        })
     
     def cancel_download(self):
         """Cancel an ongoing download."""
-        self._cancel_download = True
+        self._cancel_event.set()
     
     def download_and_apply_async(self, update_info: dict, 
                                   progress_callback=None, 
                                   step_callback=None,
                                   complete_callback=None, 
-                                  error_callback=None):
+                                  error_callback=None,
+                                  verify_local=False,
+                                  scan_callback=None,
+                                  prepare_callback=None):
         """
-        Download and apply update in background thread.
-        Automatically chooses sequential patches or full update.
+        Download and stage an update in a background thread.
+        Automatically chooses the net file set, sequential patches or full update.
+        The download is then built into a staging folder (stage_downloaded), so
+        the restart only has to swap it in.
         
         Args:
             update_info: Dict from check_for_updates()
             progress_callback: Called with (downloaded, total) for each file
             step_callback: Called with (current_step, total_steps, from_ver, to_ver)
-            complete_callback: Called with (patch_files_or_path, is_full_update)
+            complete_callback: Called with (patch_files_or_path, is_full_update);
+                a staged update arrives as ([staging folder], False), and a
+                verified install with nothing to repair as ([], False)
             error_callback: Called with error message string
+            verify_local: Diff against the installed files instead of trusting
+                that the install matches the current version (repairs it).
+                Also done when the install differs from the manifest of its
+                version or that manifest is unavailable.
+            scan_callback: Called with (hashed_bytes, total_bytes) during the local scan
+            prepare_callback: Called with (done, total) files while staging
         """
+        self._cancel_event.clear()
+        target_version = update_info.get('version')
+        
+        def complete(path_or_paths, is_full_update):
+            if not (isinstance(path_or_paths, list) and len(path_or_paths) == 1
+                    and os.path.isdir(path_or_paths[0])):
+                staging_dir = self.stage_downloaded(path_or_paths, is_full_update, target_version,
+                                                    prepare_callback)
+                if staging_dir:
+                    path_or_paths, is_full_update = [staging_dir], False
+            if complete_callback:
+                complete_callback(path_or_paths, is_full_update)
+        
         def worker():
             try:
+                # Already staged by an earlier run
+                pending = self.pending_update()
+                if pending and pending.get('version') == target_version:
+                    print(f"[Updater] v{target_version} is already staged")
+                    if complete_callback:
+                        complete_callback([pending['path']], False)
+                    return
+                
                 # Check if sequential update is possible
                 can_use, patch_chain, chain_info = self.can_use_sequential_update(update_info)
                 
+                # Collapsed update: only the final version of each changed file.
+                # The net plan and the chain assume an intact install: a repair, an
+                # install that differs from its manifest, or a version without one
+                # is diffed against the files on disk instead.
+                plan = None if verify_local else self.plan_net_update(update_info, patch_chain)
+                if plan and plan['drift']:
+                    print(f"[Updater] {plan['drift']} installed files differ from the "
+                          f"v{self.current_version} manifest, checking the install")
+                local = verify_local or plan is None or plan['drift'] > 0
+                if local:
+                    plan = self.plan_local_update(update_info, patch_chain, scan_callback)
+                
+                if plan and local and not plan['files'] and not plan['deleted']:
+                    print("[Updater] The install matches the manifest, nothing to download")
+                    if complete_callback:
+                        complete_callback([], False)
+                    return
+                
+                # The chain assumes an intact install, so a local plan always wins
+                if plan and (local or plan['use_net']):
+                    print(f"[Updater] Using net update: {len(plan['files'])} files")
+                    if step_callback:
+                        step_callback(1, 1, self.current_version, update_info.get('version', '?'))
+                    
+                    patch_files = self.download_net_update(plan, update_info['content_url'], progress_callback)
+                    if patch_files:
+                        complete(patch_files, False)
+                        return
+                    if self._cancel_event.is_set():
+                        return
+                    print("[Updater] Net download failed, trying patch chain...")
+                
                 if can_use and patch_chain:
                     print(f"[Updater] Using sequential update: {chain_info['version_path_str']}")
                     print(f"[Updater] Total patches: {chain_info['patch_count']}, Total size: {chain_info['total_size']} bytes")
                     
+                    staged = self.stream_solid_patches(patch_chain, progress_callback, step_callback)
+                    if staged:
+                        complete(staged, False)
+                        return
+                    if self._cancel_event.is_set():
+                        return
+                    
                     patch_files = self.download_sequential_patches(
                         patch_chain, 
                         progress_callback,
@@ -552,8 +1024,9 @@ del /f /q "%~f0"
                     )
                     
                     if patch_files and len(patch_files) > 0:
-                        if complete_callback:
-                            complete_callback(patch_files, False)
+                        complete(patch_files, False)
+                        return
+                    elif self._cancel_event.is_set():
                         return
                     else:
                         print("[Updater] Sequential download failed, trying full update...")
@@ -571,12 +1044,12 @@ del /f /q "%~f0"
                 
                 full_path = self.download_full_update(
                     full_url, 
-                    progress_callback
+                    progress_callback,
+                    update_info.get('full_sha256')
                 )
                 
                 if full_path:
-                    if complete_callback:
-                        complete_callback(full_path, True)
+                    complete(full_path, True)
                 else:
                     if error_callback:
                         error_callback("Download failed or was cancelled.")